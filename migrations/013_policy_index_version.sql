@@ -0,0 +1,56 @@
+-- Migration 013: Policy index version counter
+-- Date: 2026-03-02
+-- Description: Single-row counter bumped by every write to the tables the
+--   compiled policy index (src/core/policy_index.py) is built from. Tower
+--   compares it with the version the index was built at on each access check,
+--   so changes made by jumphost_cli_v2.py or direct SQL are seen immediately
+--   instead of after the MAX_INDEX_AGE rebuild.
+
+BEGIN;
+
+CREATE TABLE policy_index_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO policy_index_version (id, version) VALUES (1, 0);
+
+-- Row update (not a sequence) so the bump commits or rolls back with the change
+CREATE OR REPLACE FUNCTION bump_policy_index_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE policy_index_version SET version = version + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER access_policies_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON access_policies
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+CREATE TRIGGER policy_ssh_logins_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON policy_ssh_logins
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+CREATE TRIGGER policy_schedules_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON policy_schedules
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+CREATE TRIGGER user_groups_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON user_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+CREATE TRIGGER server_groups_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON server_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+CREATE TRIGGER user_group_members_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON user_group_members
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+CREATE TRIGGER server_group_members_index_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON server_group_members
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_index_version();
+
+COMMENT ON TABLE policy_index_version IS 'Bumped on every write to policy/group tables - policy index freshness check';
+
+COMMIT;
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark admission control with a burst of TCP connects.
+
+Runs an AdmissionController behind a local listener. The stub handler takes
+HANDSHAKE_TIME to "authenticate" (holding a handshake slot), sends OK and
+keeps the connection for SESSION_TIME. A burst of connects from several
+loopback source addresses (127.0.0.x), plus one address opening more than
+the per-IP limit, checks that:
+
+    - at most handshake_workers handlers are in handshake at once
+    - threads are only used by handshakes and served sessions, not by
+      queued or refused sockets
+    - every connection is either served (OK) or refused with a plaintext
+      SSH_MSG_DISCONNECT, reason 12 (too many connections) - never a reset
+    - the per-IP limit refuses the greedy address beyond its limit
+
+Usage:
+    python3 scripts/benchmark_admission.py [connections] [handshake_workers]
+"""
+
+import logging
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.proxy.admission import (  # noqa: E402
+    SSH_DISCONNECT_TOO_MANY_CONNECTIONS, SSH_MSG_DISCONNECT, AdmissionController
+)
+
+HANDSHAKE_TIME = 0.05
+SESSION_TIME = 1.0
+SOURCE_ADDRESSES = 20
+GREEDY_ADDRESS = '127.0.0.250'
+
+
+class StubHandler:
+    """handle_client stand-in recording handshake concurrency"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handshaking = 0
+        self.peak_handshaking = 0
+        self.peak_threads = 0
+
+    def __call__(self, sock, addr, is_tproxy, ticket):
+        with self.lock:
+            self.handshaking += 1
+            self.peak_handshaking = max(self.peak_handshaking, self.handshaking)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+        time.sleep(HANDSHAKE_TIME)
+        with self.lock:
+            self.handshaking -= 1
+        ticket.handshake_done()
+        try:
+            sock.sendall(b'OK')
+            time.sleep(SESSION_TIME)
+        finally:
+            sock.close()
+
+
+def parse_reply(data: bytes) -> str:
+    """'served', 'refused' (SSH disconnect reason 12) or what else came back"""
+    if data.startswith(b'OK'):
+        return 'served'
+    if not data.startswith(b'SSH-2.0-'):
+        return 'reset' if not data else 'garbage'
+    packet = data[data.index(b'\r\n') + 2:]
+    if len(packet) < 10:
+        return 'truncated'
+    message, reason = struct.unpack('>BI', packet[5:10])
+    if message == SSH_MSG_DISCONNECT and reason == SSH_DISCONNECT_TOO_MANY_CONNECTIONS:
+        return 'refused'
+    return f'disconnect-{reason}'
+
+
+def connect_burst(port, count, greedy):
+    """Open all connections, return {socket: source address}"""
+    clients = {}
+    for i in range(count):
+        source = GREEDY_ADDRESS if i < greedy else f'127.0.0.{2 + i % SOURCE_ADDRESSES}'
+        sock = socket.socket()
+        sock.bind((source, 0))
+        sock.connect(('127.0.0.1', port))
+        sock.setblocking(False)
+        clients[sock] = source
+    return clients
+
+
+def collect(clients, timeout):
+    """Read every client until EOF (or a reply), return {source: Counter(result)}"""
+    selector = selectors.DefaultSelector()
+    replies = {}
+    for sock in clients:
+        selector.register(sock, selectors.EVENT_READ)
+        replies[sock] = b''
+    results = {}
+    deadline = time.monotonic() + timeout
+    while replies and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            sock = key.fileobj
+            try:
+                data = sock.recv(4096)
+            except ConnectionResetError:
+                data = b''
+            replies[sock] += data
+            if not data or replies[sock].startswith(b'OK'):
+                results[sock] = parse_reply(replies.pop(sock))
+                selector.unregister(sock)
+                sock.close()
+    for sock in replies:
+        results[sock] = 'timeout'
+        sock.close()
+
+    by_source = {}
+    for sock, result in results.items():
+        by_source.setdefault(clients[sock], Counter())[result] += 1
+    return by_source
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    logging.disable(logging.INFO)
+    config = {
+        'handshake_workers': workers,
+        'max_connections': 1000,
+        'max_connections_per_ip': 50,
+        'queue_size': 256,
+        'queue_timeout': 5
+    }
+    greedy = config['max_connections_per_ip'] * 2
+
+    print("=" * 60)
+    print(f"Admission benchmark: {count} connects, {workers} handshake workers")
+    print("=" * 60)
+
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(4096)
+    port = listener.getsockname()[1]
+
+    handler = StubHandler()
+    admission = AdmissionController(handler, config)
+    admission.start()
+    baseline = threading.active_count()
+
+    def accept_loop():
+        while True:
+            try:
+                sock, addr = listener.accept()
+            except OSError:
+                return
+            admission.submit(sock, addr)
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+
+    started = time.perf_counter()
+    clients = connect_burst(port, count, greedy)
+    by_source = collect(clients, timeout=config['queue_timeout'] + SESSION_TIME + 30)
+    elapsed = time.perf_counter() - started
+
+    totals = Counter()
+    for results in by_source.values():
+        totals.update(results)
+    greedy_results = by_source.get(GREEDY_ADDRESS, Counter())
+
+    print(f"results      {dict(totals)} in {elapsed:.1f}s")
+    print(f"handshaking  peak {handler.peak_handshaking} (limit {workers})")
+    threads = handler.peak_threads - baseline
+    print(f"threads      peak {threads} above baseline ({totals['served']} sessions served)")
+    print(f"per-IP       {GREEDY_ADDRESS}: {dict(greedy_results)} (limit {config['max_connections_per_ip']})")
+    print(f"admission    {admission.get_stats()}")
+
+    failures = []
+    if handler.peak_handshaking > workers:
+        failures.append(f"{handler.peak_handshaking} handshakes at once")
+    if threads > workers + totals['served']:
+        failures.append(f"{threads} threads for {totals['served']} served connections")
+    unclean = sum(n for result, n in totals.items() if result not in ('served', 'refused'))
+    if unclean:
+        failures.append(f"{unclean} connections neither served nor cleanly refused")
+    if greedy_results['served'] > config['max_connections_per_ip']:
+        failures.append(f"{greedy_results['served']} connections served from one address")
+    if totals['served'] == 0:
+        failures.append("nothing served")
+
+    admission.stop()
+    listener.close()
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
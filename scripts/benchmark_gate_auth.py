@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark and check gate token authentication (require_gate_auth cache).
+
+Uses a scratch SQLite database and the Flask test client - no Tower needed.
+
+    heartbeat   req/s and SQL statements per request of the heartbeat
+                endpoint, with the token cache and with it disabled
+                (GATE_TOKEN_CACHE_TTL = 0, a DB lookup per request)
+    invalidate  invalidate_gate_token_cache() makes the next request see a
+                deactivated gate (403)
+    mixed       heartbeats interleaved with reload_current_gate() calls (grant
+                checks): token lookups that went to the DB (expected 0 - a
+                heartbeat bumps updated_at, which must not drop the cache)
+    reload      a change made behind the cache's back (direct SQL, as another
+                Tower process would) is seen by reload_current_gate() at once,
+                while the cached snapshot still has the old state; a gate
+                found deactivated is dropped from the cache
+
+Usage:
+    python3 scripts/benchmark_gate_auth.py [requests]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Scratch database only, never the configured one
+os.environ['DATABASE_URL'] = ''
+
+from flask import Flask, jsonify  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import src.api.auth as auth  # noqa: E402
+from src.api.gates import gates_bp  # noqa: E402
+from src.core.database import Base, Gate  # noqa: E402
+
+TOKEN = 'benchmark-token'
+
+
+def make_app():
+    app = Flask('benchmark_gate_auth')
+    app.register_blueprint(gates_bp)
+
+    @app.route('/check/state')
+    @auth.require_gate_auth
+    def state():
+        cached = auth.get_current_gate()
+        cached_maintenance = cached.in_maintenance
+        gate = auth.reload_current_gate()
+        if gate is None:
+            return jsonify({'error': 'gate_inactive'}), 403
+        return jsonify({'cached': cached_maintenance, 'current': gate.in_maintenance})
+
+    return app
+
+
+def heartbeats(client, count, statements):
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    before = statements[0]
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.post('/api/v1/gates/heartbeat', json={'version': 'bench'}, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"heartbeat failed: {response.status_code} {response.get_data(as_text=True)}")
+    elapsed = time.perf_counter() - started
+    return count / elapsed, (statements[0] - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    path = os.path.join(tempfile.mkdtemp(), 'gate_auth.db')
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine, tables=[Gate.__table__])
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(Gate(name='bench', hostname='bench', api_token=TOKEN, is_active=True))
+    db.commit()
+    db.close()
+    auth.SessionLocal = Session
+
+    statements = [0]
+    token_lookups = [0]
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_statement(conn, cursor, statement, *args):
+        statements[0] += 1
+        if 'gates.api_token =' in statement:
+            token_lookups[0] += 1
+
+    client = make_app().test_client()
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    failures = []
+
+    print("=" * 60)
+    print(f"Gate auth benchmark: {count} heartbeats")
+    print("=" * 60)
+
+    ttl = auth.GATE_TOKEN_CACHE_TTL
+    auth.GATE_TOKEN_CACHE_TTL = 0
+    rate, per_request = heartbeats(client, count, statements)
+    print(f"no cache     {rate:7.0f} req/s  {per_request:.1f} SQL statements/request")
+    auth.GATE_TOKEN_CACHE_TTL = ttl
+    auth.invalidate_gate_token_cache()
+    heartbeats(client, 10, statements)
+    rate, per_request = heartbeats(client, count, statements)
+    print(f"cache        {rate:7.0f} req/s  {per_request:.1f} SQL statements/request")
+
+    # Grant checks between heartbeats keep the cached token
+    before = token_lookups[0]
+    for _ in range(100):
+        heartbeats(client, 1, statements)
+        client.get('/check/state', headers=headers)
+    lookups = token_lookups[0] - before
+    print(f"mixed        {lookups} token lookups in the DB for 100 heartbeats + 100 reloads")
+    if lookups:
+        failures.append(f"reload_current_gate() dropped the cached token {lookups} times")
+
+    # Change behind the cache's back, as another Tower process would
+    with engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE gates SET in_maintenance = 1")
+    state = client.get('/check/state', headers=headers).get_json()
+    print(f"reload       cached in_maintenance={state['cached']}, reloaded={state['current']}")
+    if not state['current']:
+        failures.append("reload_current_gate() returned the stale gate")
+
+    def set_active(active):
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"UPDATE gates SET is_active = {int(active)}")
+
+    def heartbeat_status():
+        return client.post('/api/v1/gates/heartbeat', json={'version': 'bench'}, headers=headers).status_code
+
+    heartbeat_status()  # Cache the active gate
+    set_active(False)
+    cached_status = heartbeat_status()
+    status = client.get('/check/state', headers=headers).status_code
+    after_status = heartbeat_status()
+    print(f"reload       deactivated gate: heartbeat (cached) {cached_status}, reload {status}, "
+          f"heartbeat after reload {after_status}")
+    if status != 403 or after_status != 403:
+        failures.append("deactivated gate still accepted after reload_current_gate()")
+
+    set_active(True)
+    heartbeat_status()
+    set_active(False)
+    auth.invalidate_gate_token_cache()
+    status = heartbeat_status()
+    print(f"invalidate   heartbeat of deactivated gate -> {status}")
+    if status != 403:
+        failures.append(f"heartbeat after invalidation answered {status}")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
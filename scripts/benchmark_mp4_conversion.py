@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark RDP recording to MP4 conversion throughput.
+
+Converts every .pyrdp file of a directory with 1, 2, ... N parallel
+conversions (same pyrdp-convert invocation as the MP4 workers) and reports
+wall time, recordings/minute and input MB/s for each worker count, to pick
+MAX_WORKERS for a host.
+
+Usage:
+    python3 scripts/benchmark_mp4_conversion.py <dir with .pyrdp files> [worker counts, e.g. 1,2,4]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def convert_all(files, workers, output_dir):
+    """Convert files with a pool of workers, returns (wall seconds, per-file seconds, failures)"""
+    from src.core.mp4_converter import convert_pyrdp
+
+    def convert(path):
+        started = time.monotonic()
+        try:
+            convert_pyrdp(str(path), os.path.join(output_dir, f"{path.stem}.mp4"))
+            return time.monotonic() - started, None
+        except Exception as e:
+            return time.monotonic() - started, f"{path.name}: {e}"
+
+    started = time.monotonic()
+    # Threads are enough: each conversion is its own pyrdp-convert process
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(convert, files))
+    return time.monotonic() - started, [r[0] for r in results], [r[1] for r in results if r[1]]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+
+    files = sorted(Path(sys.argv[1]).glob("*.pyrdp"))
+    if not files:
+        print(f"No .pyrdp files in {sys.argv[1]}")
+        return 1
+
+    from src.core.mp4_converter import MAX_WORKERS
+    if len(sys.argv) > 2:
+        counts = [int(n) for n in sys.argv[2].split(",")]
+    else:
+        counts = sorted({1, 2, MAX_WORKERS})
+
+    total_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
+    print("=" * 60)
+    print(f"MP4 conversion benchmark: {len(files)} recordings, {total_mb:.1f} MB, {os.cpu_count()} CPUs")
+    print("=" * 60)
+
+    for workers in counts:
+        output_dir = tempfile.mkdtemp(prefix="mp4-bench-")
+        try:
+            wall, per_file, failures = convert_all(files, workers, output_dir)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        converted = len(files) - len(failures)
+        print(f"{workers:3d} workers: {wall:8.1f}s wall, "
+              f"{converted / wall * 60:6.1f} recordings/min, {total_mb / wall:6.2f} MB/s, "
+              f"avg {sum(per_file) / len(per_file):.1f}s per recording")
+        for failure in failures:
+            print(f"    ✗ {failure}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
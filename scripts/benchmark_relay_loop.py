@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmark and check the relay loops over real paramiko channels.
+
+Each session is two SSH connections over local socket pairs (user <-> gate,
+gate <-> backend) relayed by a ChannelRelay on a RelayLoopPool.
+
+Sweep, for each session count (default 10, 100 and 1000):
+
+    idle       process CPU seconds per idle session per minute, the part of
+               it spent in the relay loop threads, and loop wake-ups
+               (expected 0). Process CPU includes the paramiko transport
+               threads of both ends, which poll their sockets on a timeout.
+    keystroke  p50/p99 round trip of one byte user -> backend, every session
+
+Checks, on the sessions of the smallest count:
+
+    blocked    bulk output to a user reading slowly: data intact, and loop
+               wake-ups while the relay waits for the SSH window
+    recorder   keystroke latency of a session while another session on the
+               same loop has a recorder taking 200ms per write
+    backlog    bulk output with a slow recorder: the relay stops reading at
+               TAP_MAX_BYTES queued for the tap thread, recording intact
+    exit       backend exit status reaches the user, relay finishes, and
+               everything relayed was recorded before relay.wait() returns
+
+Usage:
+    python3 scripts/benchmark_relay_loop.py [session_counts] [bulk_megabytes]
+    python3 scripts/benchmark_relay_loop.py 10,100,1000 8
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import paramiko
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.proxy import relay_loop  # noqa: E402
+from src.proxy.relay_loop import ChannelRelay, RelayLoopPool  # noqa: E402
+
+SLOW_RECORDER_DELAY = 0.2
+IDLE_SECONDS = 10
+KEYSTROKES = 3
+LOOPS = 2
+
+
+class StubServer(paramiko.ServerInterface):
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_auth_none(self, username):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'none'
+
+
+class StubRecorder:
+    """Collects recorded data, optionally slow"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.data = {'client': bytearray(), 'server': bytearray()}
+
+    def write_data(self, data, direction):
+        if self.delay:
+            time.sleep(self.delay)
+        self.data[direction] += data
+
+
+def channel_pair(key):
+    """(server side channel, client side channel) of one SSH connection"""
+    a, b = socket.socketpair()
+    server = paramiko.Transport(a)
+    server.add_server_key(key)
+    server.start_server(event=threading.Event(), server=StubServer())
+    client = paramiko.Transport(b)
+    client.start_client()
+    client.auth_none('bench')
+    client_channel = client.open_session()
+    return server.accept(5), client_channel
+
+
+class Session:
+    def __init__(self, key, pool, name, recorder=None, loop=None):
+        self.gate_client, self.user = channel_pair(key)
+        self.backend, self.gate_backend = channel_pair(key)
+        self.relay = ChannelRelay(self.gate_client, self.gate_backend, recorder=recorder, session_id=name)
+        if loop:
+            loop.add(self.relay)
+            self.loop = loop
+        else:
+            self.loop = pool.register(self.relay)
+
+    def keystroke(self) -> float:
+        started = time.perf_counter()
+        self.user.send(b'k')
+        if self.backend.recv(1) != b'k':
+            raise RuntimeError(f"{self.relay.session_id}: keystroke lost")
+        return time.perf_counter() - started
+
+    def close(self):
+        for channel in (self.user, self.gate_client, self.backend, self.gate_backend):
+            channel.get_transport().close()
+
+
+def total_wakeups(pool) -> int:
+    return sum(loop.wakeups for loop in pool.loops)
+
+
+def thread_cpu(threads) -> float:
+    """CPU seconds used by the given threads so far (Linux /proc, 0 elsewhere)"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0
+    for thread in threads:
+        try:
+            with open(f'/proc/self/task/{thread.native_id}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        total += int(fields[11]) + int(fields[12])  # utime + stime
+    return total / ticks
+
+
+def loop_threads(pool):
+    return [thread for loop in pool.loops for thread in (loop._thread, loop._tap_thread)]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def sweep(key, count, failures):
+    """Idle CPU and keystroke latency with count sessions"""
+    pool = RelayLoopPool(LOOPS)
+    started = time.perf_counter()
+    sessions = [Session(key, pool, f"s{i}") for i in range(count)]
+    setup = time.perf_counter() - started
+
+    time.sleep(1)
+    wakeups = total_wakeups(pool)
+    cpu = time.process_time()
+    loop_cpu = thread_cpu(loop_threads(pool))
+    time.sleep(IDLE_SECONDS)
+    cpu = time.process_time() - cpu
+    loop_cpu = thread_cpu(loop_threads(pool)) - loop_cpu
+    wakeups = total_wakeups(pool) - wakeups
+    per_minute = 60 / IDLE_SECONDS / count
+
+    latencies = [session.keystroke() for _ in range(KEYSTROKES) for session in sessions]
+    print(f"{count:5d} sessions  idle {cpu * per_minute * 1000:7.2f}ms CPU/session/min "
+          f"(relay loops {loop_cpu * per_minute * 1000:.2f}ms, {wakeups} wake-ups)  "
+          f"keystroke p50 {percentile(latencies, 0.5) * 1000:.2f}ms "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f}ms  (setup {setup:.0f}s)")
+    if wakeups:
+        failures.append(f"{wakeups} idle wake-ups with {count} sessions")
+
+    for session in sessions:
+        session.close()
+    pool.stop()
+
+
+def checks(key, count, bulk, failures):
+    pool = RelayLoopPool(LOOPS)
+    recorded = StubRecorder()
+    sessions = [Session(key, pool, f"s{i}", recorder=recorded if i == 0 else None) for i in range(count)]
+
+    # Blocked on the user's window
+    session = sessions[1]
+    payload = bytes(range(256)) * (bulk // 256)
+    threading.Thread(target=session.backend.sendall, args=(payload,), daemon=True).start()
+    before = total_wakeups(pool)
+    started = time.perf_counter()
+    received = bytearray()
+    while len(received) < len(payload):
+        received += session.user.recv(65536)
+        time.sleep(0.002)  # Slow reader - the relay keeps running out of window
+    elapsed = time.perf_counter() - started
+    wakeups = total_wakeups(pool) - before
+    intact = received == payload
+    print(f"blocked      {len(payload) / elapsed / 2**20:.1f}MB/s to a slow reader, "
+          f"{wakeups} wake-ups, intact={intact}")
+    if not intact:
+        failures.append("bulk data corrupted")
+
+    # Slow recorder on the same loop
+    slow = StubRecorder(SLOW_RECORDER_DELAY)
+    victim = sessions[2]
+    noisy = Session(key, pool, 'slow-recorder', recorder=slow, loop=victim.loop)
+    for _ in range(10):
+        noisy.user.send(b'x')
+    latencies = [victim.keystroke() for _ in range(10)]
+    print(f"recorder     keystroke max {max(latencies) * 1000:.2f}ms next to a "
+          f"{SLOW_RECORDER_DELAY * 1000:.0f}ms/write recorder on the same loop")
+    if max(latencies) >= SLOW_RECORDER_DELAY:
+        failures.append("slow recorder delayed another session")
+
+    # Bulk output with a slow recorder: bounded tap backlog
+    lagging = StubRecorder(0.02)
+    burst = Session(key, pool, 'tap-backlog', recorder=lagging)
+    payload = os.urandom(relay_loop.TAP_MAX_BYTES * 3)
+    threading.Thread(target=burst.backend.sendall, args=(payload,), daemon=True).start()
+    received = bytearray()
+    peak = 0
+    while len(received) < len(payload):
+        received += burst.user.recv(65536)
+        peak = max(peak, burst.relay.tap_bytes)
+    while burst.relay.tap_bytes:
+        time.sleep(0.05)
+    # One pump may read MAX_READS_PER_TURN chunks per direction after the check
+    limit = relay_loop.TAP_MAX_BYTES + 2 * relay_loop.MAX_READS_PER_TURN * relay_loop.RECV_CHUNK_SIZE
+    complete = received == payload and lagging.data['server'] == payload
+    print(f"backlog      peak {peak / 2**20:.1f}MB queued for a slow recorder "
+          f"(limit {relay_loop.TAP_MAX_BYTES / 2**20:.0f}MB), relayed and recorded intact={complete}")
+    if peak > limit:
+        failures.append(f"tap backlog reached {peak} bytes")
+    if not complete:
+        failures.append("backlogged data lost")
+
+    # Exit status and complete recording
+    session = sessions[0]
+    session.user.send(b'last')
+    session.backend.recv(4)
+    session.backend.send_exit_status(3)
+    session.backend.close()
+    finished = session.relay.wait(5)
+    exit_status = session.user.recv_exit_status() if finished else None
+    complete = recorded.data['client'].endswith(b'last')
+    print(f"exit         finished={finished} exit status={exit_status} recorded before wait()={complete}")
+    if not finished or exit_status != 3 or not complete:
+        failures.append("exit status / recording incomplete")
+
+    for extra in (noisy, burst):
+        extra.backend.send_exit_status(0)
+        extra.backend.close()
+        extra.relay.wait(5)
+    for session in sessions[1:]:
+        session.close()
+    pool.stop()
+
+
+def main():
+    counts = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [10, 100, 1000]
+    bulk = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 8 * 1024 * 1024
+
+    logging.disable(logging.CRITICAL)  # Transports torn down mid-session log errors
+    key = paramiko.RSAKey.generate(1024)
+    failures = []
+
+    print("=" * 60)
+    print(f"Relay loop benchmark: {LOOPS} loops, {', '.join(map(str, counts))} sessions, "
+          f"{bulk / 2**20:.0f}MB bulk")
+    print("=" * 60)
+
+    for count in counts:
+        sweep(key, count, failures)
+    checks(key, max(min(counts), 3), bulk, failures)
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
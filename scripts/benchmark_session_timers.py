@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark session deadline scheduling: per-session threads vs the timer wheel.
+
+Runs the same sessions (stub channels/transports/Tower) under both models:
+
+    threads  one monitor thread per session waking every 10s to look at its
+             idle time and grant end (the monitor_inactivity_timeout model)
+    wheel    one TimerWheel thread firing GrantMonitor and InactivityMonitor
+             timers, plus the GrantMonitor batch poll thread
+
+Grant ends and idle times are spread so every session gets a 5-minute grant
+warning and a 5-minute idle warning during the run. Reports extra threads,
+thread wake-ups and how late the warnings were sent.
+
+Usage:
+    python3 scripts/benchmark_session_timers.py [sessions] [seconds]
+"""
+
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+IDLE_TIMEOUT_MINUTES = 10
+OLD_CHECK_INTERVAL = 10  # monitor_inactivity_timeout sleep
+
+
+class StubTransport:
+    def __init__(self, channel=None):
+        self.channel = channel
+
+    def is_active(self):
+        return True
+
+    def close(self):
+        pass
+
+    def _send_user_message(self, message):
+        self.channel.send(message.asbytes())
+
+
+class StubChannel:
+    """Records when each warning reached the client"""
+
+    def __init__(self):
+        self.sent = {}
+        # Channel state used by send_nowait()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.eof_sent = False
+        self.remote_chanid = 0
+        self.out_window_size = 2 ** 31
+        self.out_max_packet_size = 32768
+        self.transport = StubTransport(self)
+
+    def send(self, data):
+        text = data.decode(errors='replace')
+        for key, marker in (('grant', 'access grant expires in 5 minutes'), ('idle', 'Inactivity detected')):
+            if marker in text and key not in self.sent:
+                self.sent[key] = datetime.utcnow()
+
+    def close(self):
+        pass
+
+
+class StubTower:
+    def get_sessions_grant_status(self, db_session_ids):
+        return {}
+
+    def update_session(self, **kwargs):
+        pass
+
+
+def make_sessions(count, seconds, rng):
+    """(session_id, grant end, last activity) - both 5-minute warnings due during the run"""
+    now = datetime.utcnow()
+    idle = timedelta(minutes=IDLE_TIMEOUT_MINUTES)
+    return [
+        (f"bench-{i}",
+         now + timedelta(minutes=5, seconds=rng.uniform(1, seconds - 2)),
+         now - idle + timedelta(minutes=5, seconds=rng.uniform(1, seconds - 2)))
+        for i in range(count)
+    ]
+
+
+def lateness(channels, deadlines):
+    """Sorted seconds between each warning deadline and its delivery"""
+    late = []
+    for key in ('grant', 'idle'):
+        for session_id, channel in channels.items():
+            if key in channel.sent:
+                late.append((channel.sent[key] - deadlines[key][session_id]).total_seconds())
+    return sorted(late)
+
+
+def run_threads(sessions, seconds):
+    """Old model: one sleeping monitor thread per session"""
+    stop = threading.Event()
+    wakeups = [0]
+    channels = {}
+
+    def monitor(session_id, grant_end, last_activity, channel):
+        while True:
+            stop.wait(OLD_CHECK_INTERVAL)
+            if stop.is_set():
+                return
+            wakeups[0] += 1
+            now = datetime.utcnow()
+            if (grant_end - now).total_seconds() <= 300 and 'grant' not in channel.sent:
+                channel.send(b"*** WARNING: Your access grant expires in 5 minutes ***")
+            idle_remaining = IDLE_TIMEOUT_MINUTES * 60 - (now - last_activity).total_seconds()
+            if idle_remaining <= 300 and 'idle' not in channel.sent:
+                channel.send(b"*** WARNING: Inactivity detected ***")
+
+    baseline = threading.active_count()
+    workers = []
+    for session_id, grant_end, last_activity in sessions:
+        channels[session_id] = StubChannel()
+        workers.append(threading.Thread(target=monitor, daemon=True,
+                                        args=(session_id, grant_end, last_activity, channels[session_id])))
+        workers[-1].start()
+    threads = threading.active_count() - baseline
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return threads, wakeups[0], channels
+
+
+def run_wheel(sessions, seconds):
+    """New model: one TimerWheel thread + GrantMonitor batch poll thread"""
+    from src.proxy.grant_monitor import GrantMonitor
+    from src.proxy.inactivity_monitor import InactivityMonitor
+    from src.proxy.timer_wheel import TimerWheel
+
+    tower = StubTower()
+    last_activity = {}
+    metadata = {}
+    channels = {}
+    baseline = threading.active_count()
+
+    timers = TimerWheel()
+    grant_monitor = GrantMonitor(tower, lambda *args: None, timers)
+    inactivity_monitor = InactivityMonitor(tower, timers, last_activity, metadata,
+                                           lambda **kwargs: None, lambda *args: None)
+    timers.start()
+    grant_monitor.start()
+
+    for db_id, (session_id, grant_end, activity) in enumerate(sessions):
+        channel = channels[session_id] = StubChannel()
+        last_activity[session_id] = activity
+        metadata[session_id] = {'grant_end_time': grant_end}
+        grant_monitor.register(session_id, db_id, channel, channel, StubTransport(), StubTransport(),
+                               'bench', end_time=grant_end)
+        inactivity_monitor.register(session_id, db_id, channel, channel, StubTransport(), StubTransport(),
+                                    IDLE_TIMEOUT_MINUTES, 'bench')
+    threads = threading.active_count() - baseline
+    time.sleep(seconds)
+
+    stats = timers.get_stats()
+    polls = grant_monitor.checks + grant_monitor.failures
+    grant_monitor.stop()
+    timers.stop()
+    return threads, stats['wakeups'] + polls, channels, stats
+
+
+def report(label, sessions, threads, wakeups, channels, seconds):
+    deadlines = {
+        'grant': {sid: end - timedelta(minutes=5) for sid, end, _ in sessions},
+        'idle': {sid: act + timedelta(minutes=IDLE_TIMEOUT_MINUTES - 5) for sid, _, act in sessions}
+    }
+    late = lateness(channels, deadlines)
+    sent = len(late)
+    p50 = late[len(late) // 2] if late else 0
+    worst = late[-1] if late else 0
+    print(f"{label:8s} threads {threads:5d}   wake-ups {wakeups:6d} ({wakeups / seconds:7.1f}/s)   "
+          f"warnings {sent:5d}/{2 * len(sessions)}   late p50 {p50:6.2f}s  max {worst:6.2f}s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    import logging
+    logging.disable(logging.INFO)
+
+    print("=" * 60)
+    print(f"Session timers benchmark: {count} sessions, {seconds}s")
+    print("=" * 60)
+
+    sessions = make_sessions(count, seconds, random.Random(1))
+    threads, wakeups, channels = run_threads(sessions, seconds)
+    report("threads", sessions, threads, wakeups, channels, seconds)
+
+    sessions = make_sessions(count, seconds, random.Random(1))
+    threads, wakeups, channels, stats = run_wheel(sessions, seconds)
+    report("wheel", sessions, threads, wakeups, channels, seconds)
+    print(f"\n  wheel: {stats['scheduled']} scheduled, {stats['fired']} fired, "
+          f"{stats['cascaded']} cascaded, {stats['pending']} pending")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark gate login latency against a local stub Tower.
+
+Starts an HTTPS stub of the Tower API (self-signed certificate) and runs
+logins - the Tower calls an SSH login makes (auth/check, sessions/create,
+stays/start, recordings/start) - from several threads, either with a new
+TowerClient per login (cold TCP+TLS each time) or with the shared pooled
+client from get_client().
+
+Usage:
+    python3 scripts/benchmark_tower_client.py [logins] [threads]
+"""
+
+import datetime
+import json
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+LOGIN_CALLS = [
+    ('POST', '/api/v1/auth/check'),
+    ('POST', '/api/v1/sessions/create'),
+    ('POST', '/api/v1/stays/start'),
+    ('POST', '/api/v1/recordings/start'),
+]
+
+
+class StubTowerHandler(BaseHTTPRequestHandler):
+    """Answers every Tower call with a small JSON body, keep-alive enabled"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        body = json.dumps({'allowed': True, 'session_id': 1, 'stay_id': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """Self-signed certificate for localhost, returns (cert path, key path)"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.utcnow()
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(key.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def start_stub_tower(directory):
+    """Run the stub Tower in a background thread, returns its URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubTowerHandler)
+    server.daemon_threads = True
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*make_certificate(directory))
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"https://127.0.0.1:{server.server_address[1]}"
+
+
+def run(label, client_for_login, logins, threads):
+    def login(_):
+        started = time.monotonic()
+        client = client_for_login()
+        for method, endpoint in LOGIN_CALLS:
+            client._request(method, endpoint, data={}, retry=False)
+        return (time.monotonic() - started) * 1000
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(login, range(logins)))
+    wall = time.monotonic() - started
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    print(f"{label:24s} p50 {percentile(0.5):6.1f} ms   p90 {percentile(0.9):6.1f} ms   "
+          f"p99 {percentile(0.99):6.1f} ms   {logins / wall:7.1f} logins/s")
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    from src.gate.api_client import TowerClient
+    from src.gate.config import GateConfig
+
+    directory = tempfile.mkdtemp(prefix='tower-bench-')
+    tower_url = start_stub_tower(directory)
+    config_path = os.path.join(directory, 'gate.conf')
+    with open(config_path, 'w') as f:
+        f.write(f"[tower]\nurl = {tower_url}\ntoken = bench\nverify_ssl = false\n\n"
+                f"[gate]\nname = gate-bench\n\n[api]\nretry_attempts = 1\npool_size = {threads}\n")
+
+    print("=" * 60)
+    print(f"Tower client benchmark: {logins} logins x {len(LOGIN_CALLS)} calls, {threads} threads")
+    print("=" * 60)
+
+    # Before: config parsed and a new client (new connections) for every login
+    run("new client per login", lambda: TowerClient(GateConfig(config_path)), logins, threads)
+
+    shared = TowerClient(GateConfig(config_path))
+    run("shared pooled client", lambda: shared, logins, threads)
+
+    print()
+    for endpoint, stats in shared.get_stats().items():
+        print(f"  {endpoint:32s} n={stats['count']:5d} avg {stats['avg_ms']:5.1f} ms  "
+              f"p90 <= {stats['p90_ms']} ms  p99 <= {stats['p99_ms']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Check the recursive group CTEs against a plain Python walk of the hierarchy.
+
+Builds user and server group hierarchies in an in-memory SQLite database
+(the CTEs are plain SQL, the same on PostgreSQL) and compares
+
+    get_all_user_groups / get_all_server_groups   (_group_ancestors)
+    group_descendants_cte                         (members in the same query)
+
+with a breadth-first walk of the parent links, for these shapes:
+
+    chain    a deep chain of parent links, members at every level
+    fanout   one root with many children, each with a few grandchildren
+    cycle    a 3-group cycle with a child hanging off it
+    missing  a group id that does not exist, a member of a missing group
+             and a member of no group
+
+Each call must also be a single SQL statement.
+
+Usage:
+    python3 scripts/check_group_hierarchy.py [depth] [fanout]
+"""
+
+import os
+import sys
+from collections import deque
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# The checks use their own SQLite engine, never the configured database
+os.environ['DATABASE_URL'] = ''
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.core.database import (  # noqa: E402
+    Base, ServerGroup, ServerGroupMember, UserGroup, UserGroupMember,
+    get_all_server_groups, get_all_user_groups, group_descendants_cte
+)
+
+MISSING_GROUP = 999999
+
+
+class Hierarchy:
+    """Parent links and memberships of one group table, mirrored in Python"""
+
+    def __init__(self, db, group_class, member_class, member_column, group_column):
+        self.db = db
+        self.group_class = group_class
+        self.member_class = member_class
+        self.member_column = member_column
+        self.group_column = group_column
+        self.parents = {}
+        self.members = {}  # member id -> set of direct group ids
+
+    def add_groups(self, parents):
+        """parents: {group id: parent id or None} (parents may be set later for cycles)"""
+        self.db.bulk_insert_mappings(self.group_class, [
+            {'id': gid, 'name': f"{self.group_class.__tablename__}-{gid}", 'parent_group_id': None}
+            for gid in parents
+        ])
+        self.db.bulk_update_mappings(self.group_class, [
+            {'id': gid, 'parent_group_id': parent} for gid, parent in parents.items() if parent is not None
+        ])
+        self.parents.update(parents)
+
+    def add_member(self, member_id, group_id):
+        self.db.bulk_insert_mappings(self.member_class, [
+            {self.member_column: member_id, self.group_column: group_id}
+        ])
+        self.members.setdefault(member_id, set()).add(group_id)
+
+    def ancestors(self, member_id):
+        """Reference: direct groups plus all parents (visited set stops cycles)"""
+        seen = set()
+        queue = deque(self.members.get(member_id, ()))
+        while queue:
+            gid = queue.popleft()
+            if gid in seen:
+                continue
+            seen.add(gid)
+            parent = self.parents.get(gid)
+            if parent is not None:
+                queue.append(parent)
+        return seen
+
+    def descendants(self, group_id):
+        """Reference: group plus all children (empty if the group does not exist)"""
+        if group_id not in self.parents:
+            return set()
+        children = {}
+        for gid, parent in self.parents.items():
+            if parent is not None:
+                children.setdefault(parent, []).append(gid)
+        seen = set()
+        queue = deque([group_id])
+        while queue:
+            gid = queue.popleft()
+            if gid in seen:
+                continue
+            seen.add(gid)
+            queue.extend(children.get(gid, ()))
+        return seen
+
+    def members_of(self, group_id):
+        groups = self.descendants(group_id)
+        return {mid for mid, direct in self.members.items() if direct & groups}
+
+
+class Checker:
+    def __init__(self, engine):
+        self.statements = 0
+        self.failures = 0
+        self.checks = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.statements += 1
+
+    def call(self, fn, *args):
+        """Run fn, return (result, SQL statements it took)"""
+        before = self.statements
+        result = fn(*args)
+        return result, self.statements - before
+
+    def expect(self, label, got, expected, statements):
+        self.checks += 1
+        problems = []
+        if got != expected:
+            problems.append(f"missing {sorted(expected - got)[:10]}, unexpected {sorted(got - expected)[:10]}")
+        if statements != 1:
+            problems.append(f"{statements} SQL statements")
+        if problems:
+            self.failures += 1
+            print(f"✗ {label}: {'; '.join(problems)}")
+
+
+def check_ancestors(checker, hierarchy, get_groups, label, member_id):
+    got, statements = checker.call(get_groups, member_id, hierarchy.db)
+    checker.expect(f"{label} ancestors of member {member_id}", got, hierarchy.ancestors(member_id), statements)
+
+
+def check_descendants(checker, hierarchy, label, group_id):
+    db = hierarchy.db
+    group_class = hierarchy.group_class
+
+    def groups():
+        cte = group_descendants_cte(group_id, db, group_class)
+        return {gid for (gid,) in db.query(cte.c.group_id)}
+
+    def members():
+        # Same shape as the search page: members fetched in the same round trip
+        cte = group_descendants_cte(group_id, db, group_class)
+        member_column = getattr(hierarchy.member_class, hierarchy.member_column)
+        group_column = getattr(hierarchy.member_class, hierarchy.group_column)
+        return {mid for (mid,) in db.query(member_column).filter(group_column.in_(db.query(cte.c.group_id)))}
+
+    got, statements = checker.call(groups)
+    checker.expect(f"{label} descendants of group {group_id}", got, hierarchy.descendants(group_id), statements)
+    got, statements = checker.call(members)
+    checker.expect(f"{label} members of group {group_id}", got, hierarchy.members_of(group_id), statements)
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine, tables=[
+        UserGroup.__table__, UserGroupMember.__table__, ServerGroup.__table__, ServerGroupMember.__table__
+    ])
+    db = sessionmaker(bind=engine)()
+    checker = Checker(engine)
+
+    users = Hierarchy(db, UserGroup, UserGroupMember, 'user_id', 'user_group_id')
+    servers = Hierarchy(db, ServerGroup, ServerGroupMember, 'server_id', 'group_id')
+
+    for hierarchy, get_groups, label in ((users, get_all_user_groups, 'user'),
+                                         (servers, get_all_server_groups, 'server')):
+        # chain: group 1 is the root, group depth the deepest; member i in group i
+        hierarchy.add_groups({gid: (gid - 1 if gid > 1 else None) for gid in range(1, depth + 1)})
+        for gid in range(1, depth + 1, max(depth // 10, 1)):
+            hierarchy.add_member(gid, gid)
+        hierarchy.add_member(depth, depth)
+
+        # fanout: root 100000, children 100001.., 3 grandchildren each
+        root = 100000
+        children = {root + i: root for i in range(1, fanout + 1)}
+        grandchildren = {200000 + 3 * i + j: root + i for i in range(1, fanout + 1) for j in range(3)}
+        hierarchy.add_groups({root: None, **children, **grandchildren})
+        for i, gid in enumerate(list(grandchildren)[::max(fanout // 20, 1)]):
+            hierarchy.add_member(10000 + i, gid)
+
+        # cycle: 300001 -> 300002 -> 300003 -> 300001, 300004 below 300001
+        # (a group can't be its own parent - CHECK constraint)
+        hierarchy.add_groups({300001: 300003, 300002: 300001, 300003: 300002, 300004: 300001})
+        hierarchy.add_member(20001, 300004)
+        hierarchy.add_member(20002, 300002)
+
+        # missing: member of a group that does not exist (SQLite does not enforce the FK)
+        hierarchy.add_member(30001, MISSING_GROUP)
+        db.commit()
+
+        for member_id in sorted(hierarchy.members) + [40001]:  # 40001: in no group
+            check_ancestors(checker, hierarchy, get_groups, label, member_id)
+        for group_id in (1, depth // 2, depth, root, root + 1, 300001, 300003, 300004, MISSING_GROUP):
+            check_descendants(checker, hierarchy, label, group_id)
+
+    print(f"{checker.checks} checks (chain depth {depth}, fan-out {fanout}x3): {checker.failures} failures")
+    return 1 if checker.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Check the compiled policy index against the database it was built from.
+
+Builds random users, servers, group chains, policies (direct, group, source
+IP, protocol, expired) and SSH logins in a scratch SQLite database, then
+compares PolicyIndex.match() for random lookups with a reference evaluation
+of the rows (check_access_v2 rules: direct user policies win, otherwise the
+user's groups, both against the server and its groups).
+
+    match      index built once vs the reference
+    version    writes from "another process" (a separate connection, no ORM
+               events): deactivated/new policies, memberships, group parents
+               and SSH logins. With the policy_index_version triggers (the
+               SQLite twin of migration 013) the next ensure_fresh() must see
+               all of them, and an unchanged index costs one SQL statement
+    same_as    without the version table, an SSH login changed behind the
+               index's back must be caught by _match_policies (same_as) and
+               the policy reloaded
+
+Usage:
+    python3 scripts/check_policy_index.py [policies] [lookups] [seed]
+"""
+
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Scratch database only, never the configured one
+os.environ['DATABASE_URL'] = ''
+
+from sqlalchemy import JSON, create_engine, event, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import src.core.database as database  # noqa: E402
+from src.core.database import (  # noqa: E402
+    AccessPolicy, PolicySSHLogin, Server, ServerGroup, ServerGroupMember,
+    User, UserGroup, UserGroupMember, UserSourceIP,
+    get_all_server_groups, get_all_user_groups
+)
+
+INDEX_TABLES = (
+    'access_policies', 'policy_ssh_logins', 'policy_schedules', 'user_groups',
+    'server_groups', 'user_group_members', 'server_group_members'
+)
+USERS = 200
+SERVERS = 300
+GROUP_CHAIN = 8  # Groups per parent chain
+LOGINS = ('root', 'admin', 'deploy')
+
+
+def install_version_triggers(engine):
+    """SQLite twin of migrations/013_policy_index_version.sql"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE policy_index_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+        ))
+        connection.execute(text("INSERT INTO policy_index_version (id, version) VALUES (1, 0)"))
+        for table in INDEX_TABLES:
+            for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                connection.execute(text(
+                    f"CREATE TRIGGER {table}_{operation.lower()}_index_version AFTER {operation} ON {table} "
+                    f"BEGIN UPDATE policy_index_version SET version = version + 1 WHERE id = 1; END"
+                ))
+
+
+def populate(db, rng, count, now):
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', is_active=True) for i in range(USERS)]
+    servers = [Server(name=f'server{i}', ip_address=f'10.2.{i // 250}.{i % 250}', is_active=True, deleted=False)
+               for i in range(SERVERS)]
+    db.add_all(users + servers)
+    db.flush()
+    ips = [UserSourceIP(user_id=user.id, source_ip=f'10.1.{user.id // 250}.{user.id % 250}', is_active=True)
+           for user in users]
+    db.add_all(ips)
+
+    user_groups, server_groups = [], []
+    for i in range(GROUP_CHAIN * 5):
+        group = UserGroup(name=f'ug{i}', parent_group_id=user_groups[-1].id if i % GROUP_CHAIN else None)
+        db.add(group)
+        db.flush()
+        user_groups.append(group)
+    for i in range(GROUP_CHAIN * 10):
+        group = ServerGroup(name=f'sg{i}', parent_group_id=server_groups[-1].id if i % GROUP_CHAIN else None)
+        db.add(group)
+        db.flush()
+        server_groups.append(group)
+    for user in users:
+        for group in rng.sample(user_groups, 2):
+            db.add(UserGroupMember(user_id=user.id, user_group_id=group.id))
+    for server in servers:
+        for group in rng.sample(server_groups, 2):
+            db.add(ServerGroupMember(server_id=server.id, group_id=group.id))
+
+    for i in range(count):
+        kind = rng.random()
+        policy = AccessPolicy(
+            start_time=now - timedelta(days=rng.choice([1, 1, 1, -1])),  # Some not started yet
+            end_time=rng.choice([None, now + timedelta(days=30), now - timedelta(hours=1)]),
+            is_active=rng.random() < 0.9,
+            protocol=rng.choice([None, 'ssh', 'rdp'])
+        )
+        if kind < 0.5:
+            policy.user_id = rng.choice(users).id
+            policy.scope_type = 'server'
+            policy.target_server_id = rng.choice(servers).id
+            if rng.random() < 0.3:
+                policy.source_ip_id = rng.choice(ips).id
+        elif kind < 0.7:
+            policy.user_id = rng.choice(users).id
+            policy.scope_type = 'group'
+            policy.target_group_id = rng.choice(server_groups).id
+        else:
+            policy.user_group_id = rng.choice(user_groups).id
+            policy.scope_type = rng.choice(['group', 'server'])
+            if policy.scope_type == 'group':
+                policy.target_group_id = rng.choice(server_groups).id
+            else:
+                policy.target_server_id = rng.choice(servers).id
+        db.add(policy)
+        db.flush()
+        for login in rng.sample(LOGINS, rng.choice([0, 0, 1, 2])):
+            db.add(PolicySSHLogin(policy_id=policy.id, allowed_login=login))
+    db.commit()
+    return users, servers, user_groups, server_groups
+
+
+def reference(db, user_id, source_ip_id, server_id, protocol, now):
+    """Matching policy ids and direct flag, straight from the rows"""
+    server_groups = get_all_server_groups(server_id, db)
+
+    def current(policies):
+        return [
+            p for p in policies
+            if p.is_active and (p.protocol is None or p.protocol == protocol)
+            and p.start_time <= now and (p.end_time is None or p.end_time >= now)
+            and ((p.scope_type == 'group' and p.target_group_id in server_groups)
+                 or (p.scope_type != 'group' and p.target_server_id == server_id))
+        ]
+
+    direct = [
+        p for p in current(db.query(AccessPolicy).filter(AccessPolicy.user_id == user_id))
+        if p.source_ip_id is None or (source_ip_id is not None and p.source_ip_id == source_ip_id)
+    ]
+    if direct:
+        return sorted(p.id for p in direct), True
+    user_groups = get_all_user_groups(user_id, db)
+    if not user_groups:
+        return [], False
+    group = current(db.query(AccessPolicy).filter(AccessPolicy.user_group_id.in_(user_groups)))
+    return sorted(p.id for p in group), False
+
+
+def compare(db, index, lookups, now, label):
+    """Number of lookups where the index disagrees with the rows"""
+    index.ensure_fresh(db)
+    wrong = 0
+    for user_id, source_ip_id, server_id, protocol in lookups:
+        compiled, direct = index.match(user_id, source_ip_id, server_id, protocol, now)
+        got = ([p.id for p in compiled], direct)
+        expected = reference(db, user_id, source_ip_id, server_id, protocol, now)
+        logins = {
+            p.id: p.ssh_logins == {login for (login,) in db.query(PolicySSHLogin.allowed_login).filter(
+                PolicySSHLogin.policy_id == p.id)}
+            for p in compiled
+        }
+        if got != expected or not all(logins.values()):
+            wrong += 1
+            if wrong <= 5:
+                print(f"✗ {label}: user {user_id} ip {source_ip_id} server {server_id} {protocol}: "
+                      f"index {got}, rows {expected}, stale logins {[pid for pid, ok in logins.items() if not ok]}")
+    print(f"{label:10s} {len(lookups)} lookups, {wrong} wrong")
+    return wrong
+
+
+def external_writes(engine, rng, policy_ids, users, user_groups, server_groups):
+    """Writes from 'another process': plain SQL on its own connection, no ORM events"""
+    with engine.begin() as connection:
+        for policy_id in rng.sample(policy_ids, 50):
+            connection.execute(text("UPDATE access_policies SET is_active = NOT is_active WHERE id = :id"),
+                               {'id': policy_id})
+        for user in rng.sample(users, 50):
+            connection.execute(text(
+                "INSERT INTO user_group_members (user_id, user_group_id) VALUES (:user, :group)"
+            ), {'user': user.id, 'group': rng.choice(user_groups).id})
+        for group in rng.sample(server_groups[1:], 10):
+            if group.parent_group_id:
+                connection.execute(text("UPDATE server_groups SET parent_group_id = NULL WHERE id = :id"),
+                                   {'id': group.id})
+        for policy_id in rng.sample(policy_ids, 50):
+            connection.execute(text("DELETE FROM policy_ssh_logins WHERE policy_id = :id"), {'id': policy_id})
+            connection.execute(text(
+                "INSERT INTO policy_ssh_logins (policy_id, allowed_login) VALUES (:id, :login)"
+            ), {'id': policy_id, 'login': rng.choice(LOGINS)})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    lookup_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    import logging
+    logging.disable(logging.WARNING)
+    from src.core.access_control_v2 import AccessControlEngineV2
+    from src.core.policy_index import PolicyIndex
+
+    # PostgreSQL ARRAY columns of policy_schedules stored as JSON in SQLite
+    for column in ('weekdays', 'months', 'days_of_month'):
+        database.PolicySchedule.__table__.c[column].type = JSON()
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'policy_index.db')}")
+    database.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    users, servers, user_groups, server_groups = populate(db, rng, count, now)
+    policy_ids = [pid for (pid,) in db.query(AccessPolicy.id)]
+    ip_ids = [iid for (iid,) in db.query(UserSourceIP.id)]
+    lookups = [
+        (rng.choice(users).id, rng.choice(ip_ids + [None]), rng.choice(servers).id, rng.choice(['ssh', 'rdp']))
+        for _ in range(lookup_count)
+    ]
+
+    print("=" * 60)
+    print(f"Policy index check: {count} policies, {lookup_count} lookups, seed {seed}")
+    print("=" * 60)
+    wrong = compare(db, PolicyIndex(), lookups, now, 'match')
+
+    # Writes from another process, seen through policy_index_version
+    db.rollback()  # Release the read transaction - SQLite locks the whole file
+    install_version_triggers(engine)
+    index = PolicyIndex()
+    index.ensure_fresh(db)
+    statements = [0]
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+    index.ensure_fresh(db)
+    unchanged = statements[0]
+    print(f"version    unchanged index: {unchanged} SQL statement(s) per ensure_fresh()")
+    if unchanged != 1:
+        wrong += 1
+    db.rollback()  # New request - see the other connection's commits
+    external_writes(engine, rng, policy_ids, users, user_groups, server_groups)
+    db.expire_all()
+    wrong += compare(db, index, lookups, now, 'version')
+
+    # No version table: same_as must catch a login changed behind the index's back
+    index = PolicyIndex()
+    index.versioned = False
+    index.ensure_fresh(db)
+    access = AccessControlEngineV2()
+    caught = 0
+    tried = 0
+    for user_id, source_ip_id, server_id, protocol in lookups:
+        compiled, _ = index.match(user_id, source_ip_id, server_id, protocol, now)
+        if not compiled:
+            continue
+        policy_id = compiled[0].id
+        new_logins = {rng.choice(LOGINS) + '-changed'}
+        db.rollback()
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM policy_ssh_logins WHERE policy_id = :id"), {'id': policy_id})
+            connection.execute(text(
+                "INSERT INTO policy_ssh_logins (policy_id, allowed_login) VALUES (:id, :login)"
+            ), {'id': policy_id, 'login': next(iter(new_logins))})
+        db.expire_all()
+        user_ip = db.get(UserSourceIP, source_ip_id) if source_ip_id else None
+        matches, _ = access._match_policies(db, index, db.get(User, user_id), user_ip,
+                                             db.get(Server, server_id), protocol, now)
+        tried += 1
+        if any(c.id == policy_id and c.ssh_logins == new_logins for c, _ in matches):
+            caught += 1
+        if tried == 20:
+            break
+    print(f"same_as    {caught}/{tried} SSH login changes caught without the version table")
+    if caught != tried:
+        wrong += tried - caught
+
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Property check of CompiledSchedule against the reference matches_schedule().
+
+Generates random schedule rules (weekday/month/day filters, same-day and
+overnight time ranges, timezones with DST, half-hour DST and midnight
+transitions) and random instants (biased towards DST transitions, midnight
+and window boundaries), then checks:
+
+    is_open(t)            == matches_schedule(rule, t)
+    current_window_end(t)  open on [t, end], closed right after end
+    next_open(t)           open at the result, closed on [t, result) minute by minute
+
+Usage:
+    python3 scripts/check_schedule_compiler.py [cases] [seed]
+"""
+
+import random
+import sys
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+import pytz
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+TIMEZONES = [
+    'UTC', 'Europe/Warsaw', 'America/New_York', 'Australia/Lord_Howe',
+    'America/Sao_Paulo', 'America/Havana', 'Asia/Kolkata', 'Pacific/Chatham'
+]
+
+TINY = timedelta(microseconds=1)
+
+
+def random_subset(rng, values):
+    if rng.random() < 0.4:
+        return None
+    if rng.random() < 0.1:
+        return []
+    return sorted(rng.sample(values, rng.randint(1, len(values))))
+
+
+def random_time(rng):
+    return time(rng.randrange(24), rng.choice([0, 0, 15, 30, 45, rng.randrange(60)]))
+
+
+def random_rule(rng):
+    rule = {
+        'name': 'random',
+        'weekdays': random_subset(rng, list(range(7))),
+        'months': random_subset(rng, list(range(1, 13))) if rng.random() < 0.5 else None,
+        'days_of_month': random_subset(rng, list(range(1, 32))) if rng.random() < 0.4 else None,
+        'timezone': rng.choice(TIMEZONES),
+        'time_start': None,
+        'time_end': None
+    }
+    shape = rng.random()
+    if shape < 0.75:
+        rule['time_start'] = random_time(rng)
+        rule['time_end'] = random_time(rng)  # Overnight when end < start
+    elif shape < 0.85:
+        rule['time_start'] = random_time(rng)
+    elif shape < 0.9:
+        rule['time_end'] = random_time(rng)
+    return rule
+
+
+def transitions(tz):
+    return [t for t in getattr(tz, '_utc_transition_times', []) if 2015 <= t.year <= 2030]
+
+
+def random_instant(rng, rule):
+    tz = pytz.timezone(rule['timezone'])
+    moments = transitions(tz)
+    pick = rng.random()
+    if moments and pick < 0.4:
+        base = rng.choice(moments)
+    elif pick < 0.7 and rule['time_start'] is not None:
+        local = datetime(rng.randint(2018, 2028), rng.randint(1, 12), rng.randint(1, 28))
+        wall = datetime.combine(local.date(), rng.choice([rule['time_start'], rule['time_end'] or time(0, 0), time(0, 0)]))
+        base = tz.localize(wall).astimezone(pytz.utc).replace(tzinfo=None)
+    else:
+        base = datetime(2018, 1, 1) + timedelta(minutes=rng.randrange(11 * 365 * 24 * 60))
+    return base + timedelta(minutes=rng.randint(-90, 90), seconds=rng.choice([0, 0, 1, 30, 59]))
+
+
+def check_case(rule, t, matches_schedule, CompiledSchedule):
+    compiled = CompiledSchedule(rule)
+    ref = lambda moment: matches_schedule(rule, moment)
+
+    if compiled.is_open(t) != ref(t):
+        return f"is_open({t}) = {compiled.is_open(t)}, matches_schedule = {ref(t)}"
+
+    end = compiled.current_window_end(t)
+    if ref(t):
+        if end is not None:
+            if end < t:
+                return f"current_window_end({t}) = {end} is in the past"
+            step = max((end - t) / 50, TINY)
+            probe = t
+            while probe < end:
+                if not ref(probe):
+                    return f"current_window_end({t}) = {end} but closed at {probe}"
+                probe += step
+            if ref(end + TINY):
+                return f"current_window_end({t}) = {end} but still open after it"
+        elif compiled.has_time or not compiled.all_dates:
+            return f"current_window_end({t}) = None for a closing schedule"
+    elif end is not None:
+        return f"current_window_end({t}) = {end} while closed"
+
+    opens = compiled.next_open(t)
+    if opens is not None:
+        if opens < t or not ref(opens):
+            return f"next_open({t}) = {opens} is not open"
+        probe = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = min(opens, t + timedelta(days=3))
+        if t < opens and ref(t):
+            return f"next_open({t}) = {opens} but open at {t}"
+        while probe < limit:
+            if ref(probe):
+                return f"next_open({t}) = {opens} but open at {probe}"
+            probe += timedelta(minutes=1)
+        if opens - t <= timedelta(days=3) and opens > t and ref(opens - timedelta(seconds=1)) and \
+                opens - timedelta(seconds=1) >= t:
+            return f"next_open({t}) = {opens} but open one second earlier"
+    else:
+        for days in range(0, 60):
+            probe = t + timedelta(days=days, minutes=random.randrange(24 * 60))
+            if ref(probe):
+                return f"next_open({t}) = None but open at {probe}"
+    return None
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    import logging
+    logging.disable(logging.DEBUG)
+    from src.core.schedule_checker import CompiledSchedule, matches_schedule
+
+    rng = random.Random(seed)
+    failures = 0
+    for case in range(cases):
+        rule = random_rule(rng)
+        t = random_instant(rng, rule)
+        problem = check_case(rule, t, matches_schedule, CompiledSchedule)
+        if problem:
+            failures += 1
+            if failures <= 20:
+                print(f"✗ case {case}: {problem}\n    rule {rule}")
+
+    print(f"{cases} cases, seed {seed}: {failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,78 @@
 
 This module provides authentication middleware for Tower API endpoints.
 Gates authenticate using Bearer tokens stored in gates.api_token.
+
+Validated tokens are cached in memory (keyed by SHA-256 of the token) for
+GATE_TOKEN_CACHE_TTL seconds, so heartbeats and recording chunks don't hit
+the database just to authenticate. Gate edits/deactivation/deletion and
+maintenance changes call invalidate_gate_token_cache(); other Tower worker
+processes pick up the change when the TTL expires. Endpoints whose answer
+depends on the gate's current state (grant checks, session grant status)
+re-read the Gate row with reload_current_gate() instead of trusting the cache.
 """
 
+import hashlib
+import threading
+import time
 from functools import wraps
+from typing import Optional
 from flask import request, jsonify, g
 from sqlalchemy.orm import Session
 from src.core.database import SessionLocal, Gate
 
+GATE_TOKEN_CACHE_TTL = 60  # seconds
+
+# Gate columns that decide authentication and access answers. A reloaded gate
+# differing in one of them replaces the cached snapshot - updated_at is no
+# use for that, every heartbeat bumps it.
+GATE_AUTH_FIELDS = (
+    'api_token', 'is_active', 'mfa_enabled', 'in_maintenance',
+    'maintenance_scheduled_at', 'maintenance_grace_minutes'
+)
+
+# sha256(token) -> (detached Gate, expires_at monotonic)
+_token_cache = {}
+_token_cache_lock = threading.Lock()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _lookup_gate(token: str):
+    """Return Gate for token (cached, detached from any DB session) or None"""
+    key = _token_key(token)
+    entry = _token_cache.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    
+    db: Session = SessionLocal()
+    try:
+        gate = db.query(Gate).filter(Gate.api_token == token).first()
+        if gate is None:
+            return None
+        # Read-only snapshot shared between requests
+        db.expunge(gate)
+    finally:
+        db.close()
+    
+    with _token_cache_lock:
+        _token_cache[key] = (gate, time.monotonic() + GATE_TOKEN_CACHE_TTL)
+    return gate
+
+
+def invalidate_gate_token_cache(gate_id: int = None):
+    """Drop cached tokens of a gate (None = all gates).
+    
+    Call after a gate is edited, deactivated, deleted or enters/exits maintenance.
+    """
+    with _token_cache_lock:
+        if gate_id is None:
+            _token_cache.clear()
+            return
+        for key in [k for k, (gate, _) in _token_cache.items() if gate.id == gate_id]:
+            del _token_cache[key]
+
 
 def require_gate_auth(f):
     """Decorator to require valid Gate Bearer token authentication.
@@ -30,6 +95,10 @@ def require_gate_auth(f):
     
     Note: Maintenance mode uses gate.in_maintenance, not is_active.
           is_active=False permanently blocks ALL gate operations.
+    
+    g.current_gate is a cached read-only snapshot (don't modify it, update the
+    Gate row via get_db_session() instead). The DB session is only opened if
+    the endpoint calls get_db_session().
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -55,31 +124,30 @@ def require_gate_auth(f):
                 'message': 'Bearer token cannot be empty'
             }), 401
         
-        # Validate token against database
-        db: Session = SessionLocal()
+        # Validate token (in-memory cache, database on miss)
+        gate = _lookup_gate(token)
+        
+        if not gate:
+            return jsonify({
+                'error': 'invalid_token',
+                'message': 'Token not recognized'
+            }), 401
+        
+        if not gate.is_active:
+            return jsonify({
+                'error': 'gate_inactive',
+                'message': f'Gate "{gate.name}" is deactivated'
+            }), 403
+        
+        # Store authenticated gate in Flask g for use in endpoint
+        g.current_gate = gate
+        
         try:
-            gate = db.query(Gate).filter(Gate.api_token == token).first()
-            
-            if not gate:
-                return jsonify({
-                    'error': 'invalid_token',
-                    'message': 'Token not recognized'
-                }), 401
-            
-            if not gate.is_active:
-                return jsonify({
-                    'error': 'gate_inactive',
-                    'message': f'Gate "{gate.name}" is deactivated'
-                }), 403
-            
-            # Store authenticated gate in Flask g for use in endpoint
-            g.current_gate = gate
-            g.db_session = db
-            
             return f(*args, **kwargs)
-        
         finally:
-            db.close()
+            db = g.pop('db_session', None)
+            if db is not None:
+                db.close()
     
     return decorated_function
 
@@ -101,6 +169,29 @@ def get_current_gate() -> Gate:
     return g.current_gate
 
 
+def reload_current_gate() -> Optional[Gate]:
+    """Re-read the authenticated gate from the database, bypassing the token cache.
+    
+    The cached snapshot can be GATE_TOKEN_CACHE_TTL seconds old when the gate
+    was changed through another Tower process (is_active, maintenance, MFA).
+    
+    Returns:
+        Gate attached to get_db_session() (also set as g.current_gate), or None
+        if the gate was deleted or deactivated meanwhile (caller returns 403)
+    """
+    cached = get_current_gate()
+    gate = get_db_session().query(Gate).filter(Gate.id == cached.id).first()
+    
+    if gate is None or any(getattr(gate, field) != getattr(cached, field) for field in GATE_AUTH_FIELDS):
+        # Stale snapshot - next request re-reads it
+        invalidate_gate_token_cache(cached.id)
+    if gate is None or not gate.is_active:
+        return None
+    
+    g.current_gate = gate
+    return gate
+
+
 def get_db_session() -> Session:
     """Get the database session from request context.
     
@@ -112,7 +203,10 @@ def get_db_session() -> Session:
     Raises:
         RuntimeError if called outside authenticated context
     """
-    if not hasattr(g, 'db_session'):
+    if not hasattr(g, 'current_gate'):
         raise RuntimeError('get_db_session() called outside @require_gate_auth context')
     
+    # Opened on first use, closed by require_gate_auth
+    if 'db_session' not in g:
+        g.db_session = SessionLocal()
     return g.db_session
@@ -58,19 +58,20 @@ def heartbeat():
     active_sessions = data.get('active_sessions')
     active_session_ids = data.get('active_session_ids', [])
     
-    # Update gate
+    # Update gate (single UPDATE - gate from auth is a cached read-only snapshot)
     now = datetime.utcnow()
-    gate.last_heartbeat = now
-    gate.status = 'online'
-    gate.updated_at = now
-    
+    values = {
+        'last_heartbeat': now,
+        'status': 'online',
+        'updated_at': now
+    }
     if version:
-        gate.version = version
+        values['version'] = version
     if hostname:
-        gate.hostname = hostname
+        values['hostname'] = hostname
     
+    db.query(Gate).filter(Gate.id == gate.id).update(values, synchronize_session=False)
     db.commit()
-    db.refresh(gate)
     
     # NEW: Check which sessions from this gate need relay (browser watchers)
     relay_sessions = []
@@ -85,9 +86,9 @@ def heartbeat():
     return jsonify({
         'gate_id': gate.id,
         'gate_name': gate.name,
-        'status': gate.status,
-        'last_heartbeat': gate.last_heartbeat.isoformat(),
-        'version': gate.version,
+        'status': values['status'],
+        'last_heartbeat': now.isoformat(),
+        'version': values.get('version', gate.version),
         'message': 'Heartbeat received',
         'active_stays': active_stays,
         'active_sessions': active_sessions,
@@ -8,11 +8,12 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import and_, or_
 import pytz
 import logging
-from src.api.auth import require_gate_auth, get_current_gate, get_db_session
+from src.api.auth import require_gate_auth, get_current_gate, get_db_session, reload_current_gate
 from src.core.database import (
     AccessPolicy, User, Server, ServerGroup, UserSourceIP,
     PolicySchedule, UserGroup, UserGroupMember, ServerGroupMember
 )
+from src.core.schedule_checker import CompiledSchedule
 
 logger = logging.getLogger(__name__)
 
@@ -60,43 +61,12 @@ def check_schedule_access(grant: AccessPolicy, db) -> tuple[bool, str]:
     
     # Check each schedule - if ANY matches, allow access
     for schedule in schedules:
-        # Get timezone-aware current time
-        tz = pytz.timezone(schedule.timezone)
-        now_local = pytz.utc.localize(now_utc).astimezone(tz)
-        
-        # Check weekday (0=Monday, 6=Sunday)
-        if schedule.weekdays is not None:
-            if now_local.weekday() not in schedule.weekdays:
-                continue  # Wrong day of week
-        
-        # Check month
-        if schedule.months is not None:
-            if now_local.month not in schedule.months:
-                continue  # Wrong month
-        
-        # Check day of month
-        if schedule.days_of_month is not None:
-            if now_local.day not in schedule.days_of_month:
-                continue  # Wrong day of month
-        
-        # Check time range
-        if schedule.time_start is not None and schedule.time_end is not None:
-            current_time = now_local.time()
-            
-            # Handle time ranges that cross midnight
-            if schedule.time_start <= schedule.time_end:
-                # Normal range (e.g., 08:00 - 16:00)
-                if not (schedule.time_start <= current_time <= schedule.time_end):
-                    continue  # Outside time window
-            else:
-                # Crosses midnight (e.g., 22:00 - 02:00)
-                if not (current_time >= schedule.time_start or current_time <= schedule.time_end):
-                    continue  # Outside time window
-        
-        # All checks passed for this schedule
-        return True, f"Matches schedule: {schedule.name or f'#{schedule.id}'}"
+        compiled = CompiledSchedule.from_row(schedule)
+        if compiled.is_open(now_utc):
+            return True, f"Matches schedule: {schedule.name or f'#{schedule.id}'}"
     
     # No schedule matched
+    now_local = pytz.utc.localize(now_utc).astimezone(compiled.tz)
     return False, f"Current time ({now_local.strftime('%Y-%m-%d %H:%M %Z')}) outside allowed windows"
 
 
@@ -135,7 +105,8 @@ def check_grant():
             "effective_end_time": "2026-01-07T18:00:00",
             "port_forwarding_allowed": true,
             "ssh_logins": ["p.mojski"],
-            "reason": "Access granted"
+            "reason": "Access granted",
+            "cacheable": true                # Gate may cache this decision (see below)
         }
         
         403 Forbidden (DENIED): {
@@ -146,10 +117,22 @@ def check_grant():
         }
         
         400 Bad Request: Missing parameters
+    
+    Decisions on gates with MFA enabled depend on the user's Stay, known source IP
+    or MFA token, not only on the request - they are marked "cacheable": false so
+    the gate never answers them from its grant cache or offline. Denials are
+    never cacheable: a new policy, source IP or group membership changes no
+    active grant, so a cached denial would outlive the access just given.
     """
     from sqlalchemy import and_, or_
     
-    gate = get_current_gate()
+    # Current gate row - is_active/MFA may have changed in another Tower process
+    gate = reload_current_gate()
+    if gate is None:
+        return jsonify({
+            'error': 'gate_inactive',
+            'message': 'Gate is deactivated'
+        }), 403
     db = get_db_session()
     
     data = request.get_json()
@@ -179,6 +162,9 @@ def check_grant():
             'message': 'Protocol must be "ssh" or "rdp"'
         }), 400
     
+    # Identity from Stay/known IP/MFA can end without a grant change - gate must ask again
+    cacheable = not gate.mfa_enabled
+    
     # MFA PHASE 2: User identification and Stay management
     # STEP 1: Identify user_id (required before Stay matching)
     user_id = None
@@ -440,7 +426,8 @@ def check_grant():
         'inactivity_timeout_minutes': selected_policy.inactivity_timeout_minutes if selected_policy else 60,
         'reason': result.get('reason', 'Access granted'),
         'gate_id': gate.id,
-        'gate_name': gate.name
+        'gate_name': gate.name,
+        'cacheable': cacheable
     }
     
     # MFA Phase 2: If this was MFA verification, tell Gate to save fingerprint in Stay
@@ -9,8 +9,9 @@ Allows administrators to schedule disconnections for:
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from sqlalchemy import and_
-from src.api.auth import require_gate_auth, get_current_gate, get_db_session
+from src.api.auth import require_gate_auth, get_current_gate, get_db_session, invalidate_gate_token_cache
 from src.core.database import Session as DBSession, Gate, Server
+from src.web.grant_events import publish_grant_event
 
 maintenance_bp = Blueprint('maintenance', __name__, url_prefix='/api/v1')
 
@@ -80,6 +81,8 @@ def force_disconnect_session(session_id):
     session.termination_details = reason
     db.commit()
     
+    publish_grant_event('session_forced_disconnect', gate_id=session.gate_id, session_id=session.id)
+    
     return jsonify({
         'success': True,
         'session_id': session_id,
@@ -212,6 +215,9 @@ def enter_gate_maintenance(gate_id):
     
     db.commit()
     
+    invalidate_gate_token_cache(gate_id)
+    publish_grant_event('gate_maintenance', gate_id=gate_id, scheduled_at=scheduled_at.isoformat())
+    
     return jsonify({
         'success': True,
         'gate_id': gate_id,
@@ -344,6 +350,8 @@ def enter_backend_maintenance(server_id):
     
     db.commit()
     
+    publish_grant_event('backend_maintenance', server_id=server_id, scheduled_at=scheduled_at.isoformat())
+    
     return jsonify({
         'success': True,
         'server_id': server_id,
@@ -404,6 +412,9 @@ def exit_gate_maintenance(gate_id):
     
     db.commit()
     
+    invalidate_gate_token_cache(gate_id)
+    publish_grant_event('gate_maintenance_ended', gate_id=gate_id)
+    
     return jsonify({
         'success': True,
         'gate_id': gate_id,
@@ -458,6 +469,8 @@ def exit_backend_maintenance(server_id):
     
     db.commit()
     
+    publish_grant_event('backend_maintenance_ended', server_id=server_id)
+    
     return jsonify({
         'success': True,
         'server_id': server_id,
@@ -13,7 +13,7 @@ import os
 # Add project root to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.api.auth import require_gate_auth
+from src.api.auth import require_gate_auth, get_db_session
 from src.core.database import SessionLocal, MFAChallenge, User, Stay, AccessPolicy
 from config.saml_config import MFA_CHALLENGE_TIMEOUT_MINUTES, MFA_TOKEN_LENGTH, TOWER_BASE_URL
 
@@ -49,7 +49,7 @@ def create_mfa_challenge():
         }
     """
     gate = g.current_gate
-    db = g.db_session
+    db = get_db_session()
     
     data = request.get_json()
     user_id = data.get('user_id')  # Optional in Phase 2
@@ -151,7 +151,7 @@ def check_mfa_status(token):
             "stay_id": int (if verified)
         }
     """
-    db = g.db_session
+    db = get_db_session()
     
     challenge = db.query(MFAChallenge).filter(MFAChallenge.token == token).first()
     
@@ -186,6 +186,62 @@ def check_mfa_status(token):
         })
 
 
+@mfa_bp.route('/status', methods=['POST'])
+@require_gate_auth
+def check_mfa_statuses():
+    """Check many MFA challenges of the calling Gate in one request
+    
+    Used by the gate's MFA waiter as a fallback/safety net for 'mfa_verified'
+    grant events, instead of one status poll per waiting handshake.
+    
+    Request JSON:
+        {"tokens": [str, ...]}
+    
+    Response:
+        {
+            "challenges": {
+                token: {"verified": bool, "expired": bool, "user_id": int, "saml_email": str}
+                       or {"verified": false, "error": "invalid_token"} (unknown/cancelled)
+            }
+        }
+    """
+    gate = g.current_gate
+    db = get_db_session()
+    
+    tokens = (request.get_json() or {}).get('tokens') or []
+    if not isinstance(tokens, list):
+        return jsonify({
+            'error': 'invalid_parameters',
+            'message': 'tokens must be a list'
+        }), 400
+    
+    challenges = {
+        challenge.token: challenge
+        for challenge in db.query(MFAChallenge).filter(
+            MFAChallenge.gate_id == gate.id,
+            MFAChallenge.token.in_(tokens)
+        )
+    } if tokens else {}
+    
+    now = datetime.utcnow()
+    result = {}
+    for token in tokens:
+        challenge = challenges.get(token)
+        if not challenge:
+            result[token] = {'verified': False, 'error': 'invalid_token'}
+        elif challenge.verified:
+            result[token] = {
+                'verified': True,
+                'user_id': challenge.user_id,
+                'verified_at': challenge.verified_at.isoformat() if challenge.verified_at else None,
+                'saml_email': challenge.saml_email
+            }
+        else:
+            result[token] = {'verified': False, 'expired': challenge.expires_at < now}
+    
+    return jsonify({'challenges': result})
+
+
 @mfa_bp.route('/challenge/<token>', methods=['DELETE'])
 @require_gate_auth
 def cancel_mfa_challenge(token):
@@ -197,7 +253,7 @@ def cancel_mfa_challenge(token):
             "message": str
         }
     """
-    db = g.db_session
+    db = get_db_session()
     
     challenge = db.query(MFAChallenge).filter(MFAChallenge.token == token).first()
     
@@ -2,14 +2,37 @@
 
 Gates stream session recordings in real-time to Tower.
 Tower stores recordings persistently.
+
+Two upload formats (chosen by the gate in /start):
+- jsonl: JSON body with base64 chunk_data (JSON Lines events)
+- binary: raw application/octet-stream body with compressed blocks
+  (src.core.recording_format), appended as-is
+
+Gates batch chunks of several active recordings into one /chunks request.
+
+Chunks are appended through long-lived file handles (one per active
+recording) instead of opening the file for every chunk. Finalize queues the
+recording's seekable index (src.core.recording_index) for paged playback; it
+is built by a background thread, or by the viewer if playback comes first.
+Appended chunks are pushed to live viewers (src.web.recording_tail).
 """
 
 import os
 import base64
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from src.api.auth import require_gate_auth, get_current_gate, get_db_session
 from src.core.database import Session
+from src.core import recording_index
+from src.core.recording_format import FILE_MAGIC, RecordingFormatError, unpack_batch
+from src.web import recording_tail
+
+logger = logging.getLogger(__name__)
 
 recordings_bp = Blueprint('recordings', __name__, url_prefix='/api/v1/recordings')
 
@@ -18,6 +41,99 @@ recordings_bp = Blueprint('recordings', __name__, url_prefix='/api/v1/recordings
 LOG_DIR = os.getenv('LOG_DIR', '/var/log/jumphost')
 RECORDINGS_DIR = os.getenv('RECORDINGS_DIR', f'{LOG_DIR}/recordings')
 
+RECORDING_FORMATS = ('jsonl', 'binary')
+
+
+class RecordingWriters:
+    """Append handles for recordings being streamed.
+    
+    Handles stay open between chunks and are closed on finalize, when idle
+    for idle_timeout seconds or when more than max_open are open (least
+    recently used first). Every append is flushed so live view sees it.
+    """
+    
+    def __init__(self, max_open: int = 256, idle_timeout: int = 300):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.files = OrderedDict()  # path -> (file, last_used)
+    
+    def append(self, path: str, data: bytes):
+        with self.lock:
+            entry = self.files.pop(path, None)
+            f = entry[0] if entry else open(path, 'ab')
+            now = time.monotonic()
+            self.files[path] = (f, now)
+            try:
+                f.write(data)
+                f.flush()
+            except Exception:
+                self._close(path)
+                raise
+            
+            # Oldest entries first - close idle ones and enforce max_open
+            while self.files:
+                oldest_path, (_, last_used) = next(iter(self.files.items()))
+                if len(self.files) <= self.max_open and now - last_used < self.idle_timeout:
+                    break
+                self._close(oldest_path)
+    
+    def is_open(self, path: str) -> bool:
+        with self.lock:
+            return path in self.files
+    
+    def close(self, path: str):
+        with self.lock:
+            self._close(path)
+    
+    def _close(self, path: str):
+        entry = self.files.pop(path, None)
+        if entry:
+            try:
+                entry[0].close()
+            except Exception:
+                pass
+
+
+class RecordingIndexer:
+    """Builds indexes of finalized recordings on one background thread.
+    
+    Scanning a long recording takes seconds, so finalize only queues it.
+    A recording queued again before its build starts is indexed once.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.queued = set()
+        self.thread = None
+    
+    def submit(self, path: str):
+        with self.lock:
+            if path in self.queued:
+                return
+            self.queued.add(path)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='RecordingIndexer', daemon=True)
+                self.thread.start()
+        self.queue.put(path)
+    
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            with self.lock:
+                self.queued.discard(path)
+            try:
+                # Viewer builds it on demand if it is opened first or this fails
+                if recording_index.get_index(path, build=False) is None:
+                    recording_index.build_index(path)
+            except Exception as e:
+                logger.warning(f"Failed to index recording {path}: {e}")
+
+
+_writers = RecordingWriters()
+_indexer = RecordingIndexer()
+
 
 @recordings_bp.route('/start', methods=['POST'])
 @require_gate_auth
@@ -29,13 +145,15 @@ def start_recording():
             "session_id": "uuid-string",
             "person_username": "p.mojski",
             "server_name": "Test-SSH-Server",
-            "server_ip": "10.0.160.4"
+            "server_ip": "10.0.160.4",
+            "format": "binary"  # Optional: jsonl (default) or binary
         }
     
     Response:
         201 Created: {
             "session_id": "uuid-string",
             "recording_path": "/opt/jumphost/logs/recordings/20260107/p.mojski_Test-SSH-Server_20260107_105500_abc123.rec",
+            "format": "binary",
             "message": "Recording started"
         }
     """
@@ -50,6 +168,10 @@ def start_recording():
     person_username = data.get('person_username')
     server_name = data.get('server_name')
     server_ip = data.get('server_ip')
+    recording_format = data.get('format') or 'jsonl'
+    
+    if recording_format not in RECORDING_FORMATS:
+        recording_format = 'jsonl'
     
     if not all([session_id, person_username, server_name]):
         return jsonify({
@@ -72,13 +194,18 @@ def start_recording():
     
     # Create empty file
     with open(recording_path, 'wb') as f:
-        # Write header
-        header = f"Session Recording\nUser: {person_username}\nServer: {server_name} ({server_ip})\nStarted: {datetime.now().isoformat()}\n\n"
-        f.write(header.encode('utf-8'))
+        if recording_format == 'binary':
+            # Metadata is in the session_start frame
+            f.write(FILE_MAGIC)
+        else:
+            # Write header
+            header = f"Session Recording\nUser: {person_username}\nServer: {server_name} ({server_ip})\nStarted: {datetime.now().isoformat()}\n\n"
+            f.write(header.encode('utf-8'))
     
     return jsonify({
         'session_id': session_id,
         'recording_path': recording_path,
+        'format': recording_format,
         'message': 'Recording started'
     }), 201
 
@@ -88,6 +215,9 @@ def start_recording():
 def upload_chunk():
     """Gate uploads a chunk of recording data.
     
+    Binary recordings: Content-Type application/octet-stream, raw block as body,
+    session_id, recording_path and chunk_index as query parameters.
+    
     Request JSON:
         {
             "session_id": "uuid-string",
@@ -109,29 +239,42 @@ def upload_chunk():
     """
     gate = get_current_gate()
     
-    data = request.get_json()
-    if not data:
-        return jsonify({'error': 'missing_body'}), 400
-    
-    session_id = data.get('session_id')
-    recording_path = data.get('recording_path')
-    chunk_data_b64 = data.get('chunk_data')
-    chunk_index = data.get('chunk_index', 0)
-    
-    if not all([session_id, recording_path, chunk_data_b64]):
-        return jsonify({
-            'error': 'missing_parameters',
-            'message': 'Required: session_id, recording_path, chunk_data'
-        }), 400
-    
-    # Decode base64 data
-    try:
-        chunk_data = base64.b64decode(chunk_data_b64)
-    except Exception as e:
-        return jsonify({
-            'error': 'invalid_base64',
-            'message': f'Failed to decode base64: {e}'
-        }), 400
+    if request.mimetype == 'application/octet-stream':
+        # Binary block - stored as received
+        session_id = request.args.get('session_id')
+        recording_path = request.args.get('recording_path')
+        chunk_index = request.args.get('chunk_index', 0, type=int)
+        chunk_data = request.get_data()
+        
+        if not all([session_id, recording_path, chunk_data]):
+            return jsonify({
+                'error': 'missing_parameters',
+                'message': 'Required: session_id, recording_path (query), block (body)'
+            }), 400
+    else:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'missing_body'}), 400
+        
+        session_id = data.get('session_id')
+        recording_path = data.get('recording_path')
+        chunk_data_b64 = data.get('chunk_data')
+        chunk_index = data.get('chunk_index', 0)
+        
+        if not all([session_id, recording_path, chunk_data_b64]):
+            return jsonify({
+                'error': 'missing_parameters',
+                'message': 'Required: session_id, recording_path, chunk_data'
+            }), 400
+        
+        # Decode base64 data
+        try:
+            chunk_data = base64.b64decode(chunk_data_b64)
+        except Exception as e:
+            return jsonify({
+                'error': 'invalid_base64',
+                'message': f'Failed to decode base64: {e}'
+            }), 400
     
     # Validate recording path (security: must be under RECORDINGS_DIR)
     if not recording_path.startswith(RECORDINGS_DIR):
@@ -140,7 +283,7 @@ def upload_chunk():
             'message': 'Recording path must be under recordings directory'
         }), 400
     
-    if not os.path.exists(recording_path):
+    if not _writers.is_open(recording_path) and not os.path.exists(recording_path):
         return jsonify({
             'error': 'recording_not_found',
             'message': f'Recording file not found: {recording_path}'
@@ -148,8 +291,8 @@ def upload_chunk():
     
     # Append chunk to file
     try:
-        with open(recording_path, 'ab') as f:
-            f.write(chunk_data)
+        _writers.append(recording_path, chunk_data)
+        recording_tail.notify_appended(recording_path)
         
         bytes_written = len(chunk_data)
         
@@ -167,6 +310,66 @@ def upload_chunk():
         }), 500
 
 
+@recordings_bp.route('/chunks', methods=['POST'])
+@require_gate_auth
+def upload_chunks():
+    """Gate uploads chunks of several recordings in one request.
+    
+    Request: Content-Type application/octet-stream, body built with
+    src.core.recording_format.pack_batch. Chunks are appended in body order.
+    
+    Response:
+        200 OK: {
+            "appended": 3,
+            "bytes_written": 4096,
+            "errors": [{"recording_path": "...", "error": "recording_not_found"}]
+        }
+        
+        400 Bad Request: Malformed batch body
+    """
+    gate = get_current_gate()
+    
+    try:
+        entries = list(unpack_batch(request.get_data()))
+    except (RecordingFormatError, UnicodeDecodeError) as e:
+        return jsonify({
+            'error': 'invalid_batch',
+            'message': f'Failed to parse batch: {e}'
+        }), 400
+    
+    appended = 0
+    bytes_written = 0
+    errors = []
+    appended_paths = []
+    for recording_path, chunk_index, chunk_data in entries:
+        # Same checks as /chunk, per entry
+        if not recording_path.startswith(RECORDINGS_DIR):
+            errors.append({'recording_path': recording_path, 'error': 'invalid_path'})
+            continue
+        
+        if not _writers.is_open(recording_path) and not os.path.exists(recording_path):
+            errors.append({'recording_path': recording_path, 'error': 'recording_not_found'})
+            continue
+        
+        try:
+            _writers.append(recording_path, chunk_data)
+            appended += 1
+            bytes_written += len(chunk_data)
+            if recording_path not in appended_paths:
+                appended_paths.append(recording_path)
+        except Exception as e:
+            errors.append({'recording_path': recording_path, 'error': f'write_failed: {e}'})
+    
+    for recording_path in appended_paths:
+        recording_tail.notify_appended(recording_path)
+    
+    return jsonify({
+        'appended': appended,
+        'bytes_written': bytes_written,
+        'errors': errors
+    }), 200
+
+
 @recordings_bp.route('/finalize', methods=['POST'])
 @require_gate_auth
 def finalize_recording():
@@ -205,6 +408,9 @@ def finalize_recording():
             'message': 'Required: session_id, recording_path'
         }), 400
     
+    _writers.close(recording_path)
+    recording_tail.evict_tail(recording_path)
+    
     # Verify file exists and get actual size
     if not os.path.exists(recording_path):
         return jsonify({
@@ -214,6 +420,9 @@ def finalize_recording():
     
     actual_size = os.path.getsize(recording_path)
     
+    # Index for paged playback - built in the background, not in this request
+    _indexer.submit(recording_path)
+    
     # Update session in database
     try:
         db_session = db.query(Session).filter(Session.session_id == session_id).first()
@@ -3,11 +3,17 @@ Session grant status endpoint for simplified v1.11 architecture.
 
 Returns current effective grant end time for a session.
 This is THE SINGLE SOURCE OF TRUTH for grant expiry monitoring.
+
+The batch variant (POST /api/v1/sessions/grant_status) answers for all live
+sessions of a gate in one request - used by the gate's GrantMonitor.
 """
 
-from flask import Blueprint, jsonify
-from src.core.database import get_db, Session as DBSession, AccessPolicy
-from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request
+from src.api.auth import require_gate_auth, get_db_session, reload_current_gate
+from src.core.database import (
+    get_db, Session as DBSession, AccessPolicy, User, Server, MaintenanceAccess
+)
+from datetime import datetime, timezone, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -85,3 +91,214 @@ def get_session_grant_status(session_id):
         })
     finally:
         db.close()
+
+
+MAX_BATCH_SESSIONS = 5000
+
+
+def _in_maintenance(entity, now):
+    """True if entity (Gate/Server) is in maintenance or its grace period"""
+    if not entity or not entity.in_maintenance or not entity.maintenance_scheduled_at:
+        return False
+    grace_start = entity.maintenance_scheduled_at - timedelta(minutes=entity.maintenance_grace_minutes or 0)
+    return now >= grace_start
+
+
+# Handled above with end_time at maintenance start - check_access_v2 already
+# denies from grace start, which is for new logins only
+MAINTENANCE_DENIALS = ('gate_maintenance', 'backend_maintenance', 'maintenance_grace_period')
+
+
+def _access_key(gate, db_session):
+    """check_access_v2 arguments of a live session: (source_ip, dest_ip, protocol, ssh_login)
+    
+    Same identity as check_grant used at login: on MFA gates the session's
+    Stay (or its identified user), otherwise the client source IP.
+    Returns None if the session lacks connection info (never checked at
+    heartbeat either).
+    """
+    if not db_session.source_ip or not db_session.proxy_ip:
+        return None
+    source_ip = db_session.source_ip
+    if gate.mfa_enabled:
+        if db_session.stay_id:
+            source_ip = f"_stay_{db_session.stay_id}"
+        elif db_session.user_id:
+            source_ip = f"_identified_user_{db_session.user_id}"
+    ssh_login = db_session.ssh_username if db_session.protocol == 'ssh' else None
+    return (source_ip, db_session.proxy_ip, db_session.protocol, ssh_login)
+
+
+def _check_access(engine, db, gate, key, now):
+    """Denial reason if the full access evaluation no longer allows key, else None"""
+    source_ip, dest_ip, protocol, ssh_login = key
+    result = engine.check_access_v2(
+        db=db,
+        source_ip=source_ip,
+        dest_ip=dest_ip,
+        protocol=protocol,
+        gate_id=gate.id,
+        ssh_login=ssh_login,
+        check_time=now
+    )
+    if result['has_access'] or result.get('denial_reason') in MAINTENANCE_DENIALS:
+        return None
+    if result.get('denial_reason') == 'internal_error':
+        # Keep the session - a failed evaluation is not a revocation
+        logger.error(f"Access re-check failed for {source_ip} -> {dest_ip}: {result.get('reason')}")
+        return None
+    return result.get('reason') or 'Access revoked'
+
+
+@bp.route('/api/v1/sessions/grant_status', methods=['POST'])
+@require_gate_auth
+def get_sessions_grant_status():
+    """
+    Get current grant status for many sessions at once.
+    
+    Same semantics as the per-session endpoint, plus the checks the gate's
+    heartbeat used to make with one /auth/check call per session:
+    user deactivated, grant deactivated, schedule window (end_time is brought
+    forward to the window end), gate/server maintenance (end_time is brought
+    forward to the maintenance start), forced disconnect.
+    Sessions that pass those are re-evaluated with check_access_v2 (source IP,
+    proxy IP, protocol, SSH login - once per distinct combination), so removed
+    source IPs, group membership changes and policy scope/SSH login edits end
+    them too.
+    Sessions handled by another gate are reported as 'Session not found'.
+    
+    Request:
+        {'session_ids': [int, ...]}  # Database session IDs
+    
+    Returns:
+        {
+            'sessions': {
+                '<id>': {'valid': bool, 'end_time': str or null, 'reason': str or null}
+            },
+            'timestamp': str
+        }
+    """
+    # Current gate row - maintenance may have changed in another Tower process
+    gate = reload_current_gate()
+    if gate is None:
+        return jsonify({
+            'error': 'gate_inactive',
+            'message': 'Gate is deactivated'
+        }), 403
+    db = get_db_session()
+    
+    data = request.get_json(silent=True) or {}
+    session_ids = data.get('session_ids')
+    if not isinstance(session_ids, list):
+        return jsonify({
+            'error': 'missing_parameters',
+            'message': 'Required: session_ids (list)'
+        }), 400
+    if len(session_ids) > MAX_BATCH_SESSIONS:
+        return jsonify({
+            'error': 'too_many_sessions',
+            'message': f'At most {MAX_BATCH_SESSIONS} session_ids per request'
+        }), 400
+    
+    try:
+        session_ids = {int(sid) for sid in session_ids}
+    except (TypeError, ValueError):
+        return jsonify({
+            'error': 'invalid_parameters',
+            'message': 'session_ids must be integers'
+        }), 400
+    
+    now = datetime.utcnow()
+    
+    # One query for sessions + their grant, user and backend server
+    rows = []
+    if session_ids:
+        rows = db.query(DBSession, AccessPolicy, User, Server).outerjoin(
+            AccessPolicy, DBSession.policy_id == AccessPolicy.id
+        ).outerjoin(
+            User, DBSession.user_id == User.id
+        ).outerjoin(
+            Server, DBSession.server_id == Server.id
+        ).filter(
+            DBSession.id.in_(session_ids),
+            DBSession.gate_id == gate.id  # Only this gate's sessions
+        ).all()
+    
+    # Maintenance exemptions - one query, only if something is in maintenance
+    gate_maintenance = _in_maintenance(gate, now)
+    exempt = set()
+    if gate_maintenance or any(_in_maintenance(server, now) for _, _, _, server in rows):
+        user_ids = {s.user_id for s, _, _, _ in rows if s.user_id}
+        if user_ids:
+            exempt = {
+                (m.entity_type, m.entity_id, m.person_id)
+                for m in db.query(MaintenanceAccess).filter(MaintenanceAccess.person_id.in_(user_ids))
+            }
+    
+    # Schedule checks are per grant, not per session
+    from src.core.access_control_v2 import AccessControlEngineV2
+    engine = AccessControlEngineV2()
+    schedule_results = {}
+    access_results = {}
+    
+    statuses = {}
+    for db_session, policy, user, server in rows:
+        # Running sessions end at maintenance start (new logins are blocked from grace start)
+        end_time = policy.end_time if policy else None
+        reason = None
+        for entity, label, active in (
+            (gate, 'Gate', gate_maintenance),
+            (server, 'Server', server is not None and _in_maintenance(server, now))
+        ):
+            if active and (label.lower(), entity.id, db_session.user_id) not in exempt:
+                if not end_time or entity.maintenance_scheduled_at < end_time:
+                    end_time = entity.maintenance_scheduled_at
+                    reason = f"{label} in maintenance mode: {entity.maintenance_reason}"
+        
+        status = {'valid': True, 'end_time': None, 'reason': None}
+        if db_session.is_active and db_session.termination_reason == 'forced_disconnect':
+            status = {'valid': False, 'end_time': None, 'reason': 'Forced disconnect by administrator'}
+        elif db_session.policy_id and not policy:
+            status = {'valid': False, 'end_time': None, 'reason': 'Grant not found'}
+        elif user and not user.is_active:
+            status = {'valid': False, 'end_time': None, 'reason': 'User deactivated'}
+        elif policy and not policy.is_active:
+            status = {'valid': False, 'end_time': None, 'reason': 'Grant revoked'}
+        elif policy and policy.start_time and now < policy.start_time:
+            status = {'valid': False, 'end_time': None, 'reason': 'Grant not yet active'}
+        elif end_time and now >= end_time:
+            status = {'valid': False, 'end_time': None, 'reason': reason or 'Grant expired'}
+        else:
+            if policy:
+                if policy.id not in schedule_results:
+                    allowed, _ = engine.check_schedule_access(db, policy, now)
+                    window_end = engine.get_schedule_window_end(db, policy, now) if allowed else None
+                    schedule_results[policy.id] = (allowed, window_end)
+                allowed, window_end = schedule_results[policy.id]
+                if not allowed:
+                    status = {'valid': False, 'end_time': None, 'reason': 'Outside allowed time windows'}
+                elif window_end and (not end_time or window_end < end_time):
+                    # Gate disconnects exactly at the schedule window end
+                    end_time = window_end
+            if status['valid']:
+                key = _access_key(gate, db_session)
+                if key:
+                    if key not in access_results:
+                        access_results[key] = _check_access(engine, db, gate, key, now)
+                    denial = access_results[key]
+                    if denial:
+                        status = {'valid': False, 'end_time': None, 'reason': denial}
+            if status['valid'] and end_time:
+                # Database stores naive UTC datetime - add 'Z' suffix
+                status['end_time'] = end_time.isoformat() + 'Z'
+        
+        statuses[str(db_session.id)] = status
+    
+    for sid in session_ids:
+        if str(sid) not in statuses:
+            statuses[str(sid)] = {'valid': False, 'end_time': None, 'reason': 'Session not found'}
+    
+    return jsonify({
+        'sessions': statuses,
+        'timestamp': now.isoformat() + 'Z'
+    })
@@ -1,16 +1,16 @@
 """Access Control Engine V2 - New flexible policy-based system."""
 from datetime import datetime
 from typing import Optional, List, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import and_, or_
 import logging
 
 from .database import (
     User, Server, AccessGrant, AuditLog, IPAllocation,
-    UserSourceIP, ServerGroup, ServerGroupMember, AccessPolicy, PolicySSHLogin,
-    UserGroup, UserGroupMember, PolicySchedule, get_all_user_groups, get_all_server_groups
+    UserSourceIP, AccessPolicy, PolicySchedule
 )
-from .schedule_checker import check_policy_schedules
+from .schedule_checker import CompiledSchedule, check_policy_schedules, get_access_window_end
+from .policy_index import CompiledPolicy, PolicyIndex, get_policy_index
 
 logger = logging.getLogger(__name__)
 
@@ -124,33 +124,95 @@ class AccessControlEngineV2:
             # Schedule-based access disabled for this policy
             return (True, None)
         
-        # Get all schedules for this policy
-        schedules = db.query(PolicySchedule).filter(
-            PolicySchedule.policy_id == policy.id,
-            PolicySchedule.is_active == True
-        ).all()
-        
-        # Convert to dict format for checker
-        schedule_dicts = []
-        for s in schedules:
-            schedule_dicts.append({
-                'name': s.name,
-                'weekdays': s.weekdays,
-                'time_start': s.time_start,
-                'time_end': s.time_end,
-                'months': s.months,
-                'days_of_month': s.days_of_month,
-                'timezone': s.timezone,
-                'is_active': s.is_active
-            })
-        
-        matches, matched_name = check_policy_schedules(schedule_dicts, check_time)
+        matches, matched_name = check_policy_schedules(self._policy_schedules(db, policy), check_time)
         
         if not matches:
             return (False, "Outside allowed time windows")
         
         return (True, matched_name)
     
+    def get_schedule_window_end(
+        self,
+        db: Session,
+        policy: 'AccessPolicy',
+        check_time: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """
+        Get the time the policy's schedules stop allowing access.
+        
+        Args:
+            db: Database session
+            policy: AccessPolicy object
+            check_time: Time to check (default: now)
+        
+        Returns:
+            End of the current (joined) schedule window in UTC, None if schedules
+            are disabled, not open or never close
+        """
+        if not policy.use_schedules:
+            return None
+        return get_access_window_end(self._policy_schedules(db, policy), check_time)
+    
+    def _policy_schedules(self, db: Session, policy: 'AccessPolicy') -> List[CompiledSchedule]:
+        """Active compiled schedules of a policy"""
+        # Schedules compiled by the policy index (no query, no per-request compile)
+        index = get_policy_index()
+        index.ensure_fresh(db)
+        compiled = index.policies.get(policy.id)
+        if compiled is not None and compiled.same_as(policy):
+            return compiled.schedules
+        
+        # Not in the index (inactive policy) - compile its schedules now
+        return [
+            CompiledSchedule.from_row(s) for s in db.query(PolicySchedule).filter(
+                PolicySchedule.policy_id == policy.id,
+                PolicySchedule.is_active == True
+            )
+        ]
+    
+    def _match_policies(
+        self,
+        db: Session,
+        index: PolicyIndex,
+        user: 'User',
+        user_ip: Optional['UserSourceIP'],
+        server: 'Server',
+        protocol: str,
+        now: datetime
+    ) -> tuple[list, bool]:
+        """
+        Match policies in the compiled index and load the matching AccessPolicy rows.
+        
+        The rows are loaded by primary key with their SSH logins and schedules
+        (three queries). If a row no longer matches its index snapshot (changed
+        by another process), those policies are reloaded into the index and
+        matching is repeated once.
+        
+        Returns:
+            ([(CompiledPolicy, AccessPolicy), ...], True if direct user policies)
+        """
+        user_ip_id = user_ip.id if user_ip else None
+        for attempt in range(2):
+            compiled, direct = index.match(user.id, user_ip_id, server.id, protocol, now)
+            if not compiled:
+                return [], direct
+            
+            loaded = {
+                policy.id: policy
+                for policy in db.query(AccessPolicy).options(
+                    selectinload(AccessPolicy.ssh_logins),
+                    selectinload(AccessPolicy.schedules)
+                ).filter(AccessPolicy.id.in_([c.id for c in compiled]))
+            }
+            stale = [c.id for c in compiled if c.id not in loaded or not c.same_as(loaded[c.id])]
+            if not stale or attempt:
+                break
+            
+            logger.info(f"Policy index out of date for policies {stale}, reloading")
+            index.refresh_policies(db, stale)
+        
+        return [(c, loaded[c.id]) for c in compiled if c.id in loaded], direct
+    
     def _create_auto_grant(
         self,
         db: Session,
@@ -662,67 +724,24 @@ class AccessControlEngineV2:
                         }
             
             # Step 3: Find matching policies with PRIORITY: user > group
+            # (compiled policy index - groups, SSH logins and schedules without SQL)
             now = check_time
+            index = get_policy_index()
+            index.ensure_fresh(db)
             
-            # Get all server groups (including parent groups)
-            server_group_ids = get_all_server_groups(server.id, db)
+            matches, direct = self._match_policies(db, index, user, user_ip, server, protocol, now)
+            matching_policies = [policy for _, policy in matches]
             
-            # PRIORITY 1: Check for direct user policies first
-            user_policies_query = db.query(AccessPolicy).filter(
-                AccessPolicy.user_id == user.id,
-                AccessPolicy.is_active == True,
-                AccessPolicy.start_time <= now,
-                or_(AccessPolicy.end_time == None, AccessPolicy.end_time >= now)
-            ).filter(
-                # Source IP match: NULL (all IPs) or specific user_source_ip_id
-                # Note: user_ip can be None when using fingerprint-based authentication
-                or_(
-                    AccessPolicy.source_ip_id == None,
-                    AccessPolicy.source_ip_id == user_ip.id if user_ip else None
-                )
-            ).filter(
-                # Protocol match: NULL (all protocols) or specific
-                or_(
-                    AccessPolicy.protocol == None,
-                    AccessPolicy.protocol == protocol
-                )
-            )
-            
-            # Check if user has direct policies for this server
-            direct_user_policies = []
-            for policy in user_policies_query:
-                if policy.scope_type == 'group':
-                    if policy.target_group_id in server_group_ids:
-                        direct_user_policies.append(policy)
-                elif policy.scope_type in ('server', 'service'):
-                    if policy.target_server_id == server.id:
-                        direct_user_policies.append(policy)
-            
-            # If user has direct policies, use ONLY those (ignore group inheritance)
-            if direct_user_policies:
-                matching_policies = direct_user_policies
-                logger.debug(f"Using {len(direct_user_policies)} direct user policies (ignoring groups)")
+            if direct:
+                # User has direct policies - use ONLY those (ignore group inheritance)
+                logger.debug(f"Using {len(matches)} direct user policies (ignoring groups)")
                 
                 # For SSH, filter by login BEFORE proceeding
                 # If direct policy exists but login not allowed - DENY (no fallback to groups)
                 if protocol == 'ssh' and ssh_login:
-                    valid_policies = []
-                    for policy in matching_policies:
-                        allowed_logins = db.query(PolicySSHLogin).filter(
-                            PolicySSHLogin.policy_id == policy.id
-                        ).all()
-                        
-                        # No restrictions = all logins allowed
-                        if not allowed_logins:
-                            valid_policies.append(policy)
-                        else:
-                            # Check if requested login is in allowed list
-                            for login in allowed_logins:
-                                if login.allowed_login == ssh_login:
-                                    valid_policies.append(policy)
-                                    break
+                    valid_matches = [m for m in matches if m[0].allows_login(ssh_login)]
                     
-                    if not valid_policies:
+                    if not valid_matches:
                         logger.warning(
                             f"Access denied: Login '{ssh_login}' not allowed for {user.username} "
                             f"to {server.name} (user has direct policy, group inheritance blocked)"
@@ -738,45 +757,11 @@ class AccessControlEngineV2:
                             'reason': f'SSH login "{ssh_login}" not allowed by direct user policy'
                         }
                     
-                    matching_policies = valid_policies
-            else:
-                # PRIORITY 2: No direct user policies, check group policies
-                user_group_ids = get_all_user_groups(user.id, db)
-                
-                if not user_group_ids:
-                    # No groups - will check auto-grant later
-                    logger.debug(
-                        f"No direct policies and no groups for {user.username}, "
-                        f"will check auto-grant eligibility"
-                    )
-                    matching_policies = []
-                else:
-                    # Has groups - check group policies
-                    group_policies_query = db.query(AccessPolicy).filter(
-                        AccessPolicy.user_group_id.in_(user_group_ids),
-                        AccessPolicy.is_active == True,
-                        AccessPolicy.start_time <= now,
-                        or_(AccessPolicy.end_time == None, AccessPolicy.end_time >= now)
-                    ).filter(
-                        # Protocol match: NULL (all protocols) or specific
-                        or_(
-                            AccessPolicy.protocol == None,
-                            AccessPolicy.protocol == protocol
-                        )
-                    )
-                    
-                    matching_policies = []
-                    for policy in group_policies_query:
-                        if policy.scope_type == 'group':
-                            if policy.target_group_id in server_group_ids:
-                                matching_policies.append(policy)
-                        elif policy.scope_type in ('server', 'service'):
-                            if policy.target_server_id == server.id:
-                                matching_policies.append(policy)
-                    
-                    logger.debug(f"Using {len(matching_policies)} group policies (no direct user policies)")
+                    matches = valid_matches
+            elif matches:
+                logger.debug(f"Using {len(matches)} group policies (no direct user policies)")
             
-            if not matching_policies:
+            if not matches:
                 # NO MATCHING POLICY FOUND (neither user nor group)
                 # Check if auto-grant should be created
                 
@@ -788,13 +773,7 @@ class AccessControlEngineV2:
                 # Step 1: Check if there was a REVOKED (expired) grant for this user+server
                 # Revoke = admin set end_time in the past
                 # If revoked grant exists, DENY access permanently (no auto-grant)
-                revoked_grant = db.query(AccessPolicy).filter(
-                    AccessPolicy.user_id == user.id,
-                    AccessPolicy.target_server_id == server.id,
-                    AccessPolicy.scope_type.in_(['server', 'service']),  # Only server-level grants
-                    AccessPolicy.end_time < now,  # Expired = revoked
-                    AccessPolicy.is_active == True  # Still in database (not deleted)
-                ).first()
+                revoked_grant = index.find_revoked_grant(user.id, server.id, now)
                 
                 if revoked_grant:
                     # Access was explicitly REVOKED - deny permanently
@@ -846,8 +825,8 @@ class AccessControlEngineV2:
                             'reason': 'Auto-grant disabled for this gate'
                         }
                     
-                    # Use the newly created auto-grant
-                    matching_policies = [auto_grant]
+                    # Use the newly created auto-grant (no logins/schedules restrictions)
+                    matches = [(CompiledPolicy(auto_grant), auto_grant)]
                     
                     logger.info(
                         f"Auto-grant created successfully: policy_id={auto_grant.id}, "
@@ -867,18 +846,20 @@ class AccessControlEngineV2:
                         'reason': f'Failed to create automatic grant: {str(e)}'
                     }
             
+            matching_policies = [policy for _, policy in matches]
+            
             # Step 3.5: Filter policies by schedule (if use_schedules enabled)
-            schedule_filtered_policies = []
-            for policy in matching_policies:
-                schedule_ok, schedule_name = self.check_schedule_access(db, policy, now)
+            schedule_filtered = []
+            for compiled, policy in matches:
+                schedule_ok, schedule_name = compiled.check_schedule(now)
                 if schedule_ok:
-                    schedule_filtered_policies.append(policy)
+                    schedule_filtered.append((compiled, policy))
                     if schedule_name:
                         logger.debug(f"Policy {policy.id} schedule matched: {schedule_name}")
                 else:
                     logger.debug(f"Policy {policy.id} schedule check failed: outside time window")
             
-            if not schedule_filtered_policies:
+            if not schedule_filtered:
                 logger.warning(
                     f"Access denied: No policy active at this time for {user.username} "
                     f"from {source_ip} to {server.name} ({protocol})"
@@ -894,28 +875,15 @@ class AccessControlEngineV2:
                     'reason': 'Outside allowed time windows'
                 }
             
-            matching_policies = schedule_filtered_policies
+            matches = schedule_filtered
+            matching_policies = [policy for _, policy in matches]
             
             # Step 4: For SSH with group policies, check login restrictions
             # (Direct user policies already filtered ssh_login above)
-            if protocol == 'ssh' and ssh_login and not direct_user_policies:
-                valid_policies = []
-                for policy in matching_policies:
-                    allowed_logins = db.query(PolicySSHLogin).filter(
-                        PolicySSHLogin.policy_id == policy.id
-                    ).all()
-                    
-                    # No restrictions = all logins allowed
-                    if not allowed_logins:
-                        valid_policies.append(policy)
-                    else:
-                        # Check if requested login is in allowed list
-                        for login in allowed_logins:
-                            if login.allowed_login == ssh_login:
-                                valid_policies.append(policy)
-                                break
+            if protocol == 'ssh' and ssh_login and not direct:
+                valid_matches = [m for m in matches if m[0].allows_login(ssh_login)]
                 
-                if not valid_policies:
+                if not valid_matches:
                     logger.warning(
                         f"Access denied: Login '{ssh_login}' not allowed for {user.username} "
                         f"to {server.name} (group policies)"
@@ -931,7 +899,8 @@ class AccessControlEngineV2:
                         'reason': f'SSH login "{ssh_login}" not allowed by group policy'
                     }
                 
-                matching_policies = valid_policies
+                matches = valid_matches
+                matching_policies = [policy for _, policy in matches]
             
             # Success!
             logger.info(
@@ -951,32 +920,14 @@ class AccessControlEngineV2:
                 effective_end_time = earliest_policy_end
                 
                 # Check if any policy has schedules - find earliest schedule window end
-                from src.core.schedule_checker import get_earliest_schedule_end
-                
-                for policy in matching_policies:
-                    if policy.use_schedules:
-                        # Get schedules for this policy
-                        schedule_rules = []
-                        for s in policy.schedules:
-                            if s.is_active:
-                                schedule_rules.append({
-                                    'name': s.name,
-                                    'weekdays': s.weekdays,
-                                    'time_start': s.time_start,
-                                    'time_end': s.time_end,
-                                    'months': s.months,
-                                    'days_of_month': s.days_of_month,
-                                    'timezone': s.timezone,
-                                    'is_active': s.is_active
-                                })
-                        
-                        if schedule_rules:
-                            schedule_end = get_earliest_schedule_end(schedule_rules, now)
-                            if schedule_end:
-                                # Use earliest of: policy end_time or schedule window end
-                                if effective_end_time is None or schedule_end < effective_end_time:
-                                    effective_end_time = schedule_end
-                                    logger.info(f"Effective end_time adjusted to schedule window end: {schedule_end}")
+                for compiled, policy in matches:
+                    if policy.use_schedules and compiled.schedules:
+                        schedule_end = get_access_window_end(compiled.schedules, now)
+                        if schedule_end:
+                            # Use earliest of: policy end_time or schedule window end
+                            if effective_end_time is None or schedule_end < effective_end_time:
+                                effective_end_time = schedule_end
+                                logger.info(f"Effective end_time adjusted to schedule window end: {schedule_end}")
             
             # Select first matching policy for session tracking (OR logic - any policy grants access)
             selected_policy = matching_policies[0] if matching_policies else None
@@ -653,10 +653,51 @@ class SessionTransfer(Base):
     )
 
 
+def _group_ancestors(db, member_query, model_class):
+    """
+    Group ids from member_query plus all their parent groups, in one query.
+    
+    Recursive CTE walking parent_group_id upwards. UNION (not UNION ALL)
+    drops rows already seen, so a cycle in the hierarchy terminates.
+    """
+    ancestors = member_query.cte(name='group_ancestors', recursive=True)
+    ancestors = ancestors.union(
+        db.query(model_class.parent_group_id).filter(
+            model_class.id == ancestors.c.group_id,
+            model_class.parent_group_id != None
+        )
+    )
+    return {group_id for (group_id,) in db.query(ancestors.c.group_id)}
+
+
+def group_descendants_cte(group_id, db, model_class):
+    """
+    Recursive CTE with group_id and all its child groups (any depth).
+    
+    Use as a subquery, e.g. Member.group_id.in_(db.query(cte.c.group_id)),
+    so group members are fetched in the same round trip. Empty if the group
+    does not exist.
+    
+    Args:
+        group_id: Root group ID
+        db: Database session
+        model_class: UserGroup or ServerGroup
+        
+    Returns:
+        CTE with a single column: group_id
+    """
+    descendants = db.query(model_class.id.label('group_id')).filter(
+        model_class.id == group_id
+    ).cte(name='group_descendants', recursive=True)
+    return descendants.union(
+        db.query(model_class.id).filter(model_class.parent_group_id == descendants.c.group_id)
+    )
+
+
 def get_all_user_groups(user_id, db):
     """
     Get all user groups recursively (including parent groups).
-    Uses BFS with cycle detection.
+    Single recursive query, cycle-safe.
     
     Args:
         user_id: User ID
@@ -665,39 +706,17 @@ def get_all_user_groups(user_id, db):
     Returns:
         set: Set of UserGroup IDs
     """
-    visited = set()
-    queue = []
-    
-    # Get direct group memberships
-    direct_memberships = db.query(UserGroupMember).filter(
-        UserGroupMember.user_id == user_id
-    ).all()
-    
-    for membership in direct_memberships:
-        queue.append(membership.user_group_id)
-    
-    # BFS traversal with cycle detection
-    while queue:
-        group_id = queue.pop(0)
-        
-        if group_id in visited:
-            continue
-            
-        visited.add(group_id)
-        
-        # Get parent group
-        group = db.query(UserGroup).filter(UserGroup.id == group_id).first()
-        if group and group.parent_group_id:
-            if group.parent_group_id not in visited:
-                queue.append(group.parent_group_id)
-    
-    return visited
+    return _group_ancestors(
+        db,
+        db.query(UserGroupMember.user_group_id.label('group_id')).filter(UserGroupMember.user_id == user_id),
+        UserGroup
+    )
 
 
 def get_all_server_groups(server_id, db):
     """
     Get all server groups recursively (including parent groups).
-    Uses BFS with cycle detection.
+    Single recursive query, cycle-safe.
     
     Args:
         server_id: Server ID
@@ -706,33 +725,11 @@ def get_all_server_groups(server_id, db):
     Returns:
         set: Set of ServerGroup IDs
     """
-    visited = set()
-    queue = []
-    
-    # Get direct group memberships
-    direct_memberships = db.query(ServerGroupMember).filter(
-        ServerGroupMember.server_id == server_id
-    ).all()
-    
-    for membership in direct_memberships:
-        queue.append(membership.group_id)
-    
-    # BFS traversal with cycle detection
-    while queue:
-        group_id = queue.pop(0)
-        
-        if group_id in visited:
-            continue
-            
-        visited.add(group_id)
-        
-        # Get parent group
-        group = db.query(ServerGroup).filter(ServerGroup.id == group_id).first()
-        if group and group.parent_group_id:
-            if group.parent_group_id not in visited:
-                queue.append(group.parent_group_id)
-    
-    return visited
+    return _group_ancestors(
+        db,
+        db.query(ServerGroupMember.group_id.label('group_id')).filter(ServerGroupMember.server_id == server_id),
+        ServerGroup
+    )
 
 
 def validate_no_group_cycle(group_id, new_parent_id, db, model_class):
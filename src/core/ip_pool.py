@@ -1,16 +1,32 @@
 """IP Pool Manager - manages dynamic IP allocation from 10.0.160.128/25."""
 import ipaddress
 from datetime import datetime, timedelta
-from typing import Optional, List, Tuple
+from itertools import islice
+from typing import Dict, Iterator, Optional, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, cast, distinct, func, or_
+from sqlalchemy.dialects.postgresql import INET
 import os
 from dotenv import load_dotenv
 
-from .database import IPAllocation, get_db
+from .database import Gate, IPAllocation, get_db
 
 load_dotenv()
 
+# Advisory lock namespace for pool allocation (second key is the gate ID, 0 = legacy pool)
+IP_POOL_LOCK_ID = 0x1B9A
+
+
+def _active_allocation_filter():
+    """Allocations that hold their IP: permanent or not yet expired"""
+    return and_(
+        IPAllocation.is_active == True,
+        or_(
+            IPAllocation.expires_at.is_(None),  # Permanent allocations
+            IPAllocation.expires_at > datetime.utcnow()  # Active temporary allocations
+        )
+    )
+
 
 class IPPoolManager:
     """Manages IP pool allocation and deallocation."""
@@ -31,44 +47,105 @@ class IPPoolManager:
             self.network = ipaddress.IPv4Network(os.getenv("IP_POOL_NETWORK", "10.0.160.128/25"))
             self.pool_start = ipaddress.IPv4Address(os.getenv("IP_POOL_START", "10.0.160.129"))
             self.pool_end = ipaddress.IPv4Address(os.getenv("IP_POOL_END", "10.0.160.254"))
+    
+    @property
+    def total_ips(self) -> int:
+        return int(self.pool_end) - int(self.pool_start) + 1
+    
+    def _in_pool_filter(self):
+        ip = cast(IPAllocation.allocated_ip, INET)
+        return and_(ip >= cast(str(self.pool_start), INET), ip <= cast(str(self.pool_end), INET))
+    
+    def _allocated_offsets(self, db: Session, gate_id: Optional[int] = None) -> List[int]:
+        """Sorted pool offsets of allocated IPs (only allocations are loaded, never the range)"""
+        query = db.query(IPAllocation.allocated_ip).filter(
+            _active_allocation_filter(),
+            self._in_pool_filter()
+        ).distinct()
+        if gate_id is not None:
+            query = query.filter(IPAllocation.gate_id == gate_id)
         
-    def get_available_ips(self, db: Session, gate_id: Optional[int] = None) -> List[str]:
+        start = int(self.pool_start)
+        size = self.total_ips
+        offsets = set()
+        for (ip_str,) in query:
+            try:
+                offset = int(ipaddress.IPv4Address(ip_str)) - start
+            except ValueError:
+                continue
+            if 0 <= offset < size:
+                offsets.add(offset)
+        return sorted(offsets)
+    
+    def _free_ranges(self, allocated_offsets: List[int]) -> Iterator[range]:
+        """Free pool offsets as ranges - the gaps between allocated offsets"""
+        current = 0
+        for offset in allocated_offsets:
+            if offset > current:
+                yield range(current, offset)
+            current = offset + 1
+        if current < self.total_ips:
+            yield range(current, self.total_ips)
+    
+    def iter_available_ips(self, db: Session, gate_id: Optional[int] = None) -> Iterator[str]:
+        """Available IPs in pool order, generated lazily from the free ranges"""
+        start = int(self.pool_start)
+        for free in self._free_ranges(self._allocated_offsets(db, gate_id)):
+            for offset in free:
+                yield str(ipaddress.IPv4Address(start + offset))
+    
+    def get_available_ips(self, db: Session, gate_id: Optional[int] = None, limit: Optional[int] = None) -> List[str]:
         """Get list of available IPs from the pool for a specific gate.
         
         Args:
             db: Database session
             gate_id: Optional gate ID to filter by (if None, checks all gates)
+            limit: Optional maximum number of IPs to return (first ones in the pool)
         
         Returns:
             List of available IP addresses
         """
-        from sqlalchemy import or_
-        
-        # Get all currently allocated IPs for this gate (or all gates if gate_id=None)
-        query = db.query(IPAllocation.allocated_ip).filter(
-            IPAllocation.is_active == True,
-            or_(
-                IPAllocation.expires_at.is_(None),  # Permanent allocations
-                IPAllocation.expires_at > datetime.utcnow()  # Active temporary allocations
-            )
+        return list(islice(self.iter_available_ips(db, gate_id), limit))
+    
+    def count_allocated(self, db: Session, gate_id: Optional[int] = None) -> int:
+        """Number of allocated IPs inside this pool, counted in SQL."""
+        query = db.query(func.count(distinct(IPAllocation.allocated_ip))).filter(
+            _active_allocation_filter(),
+            self._in_pool_filter()
         )
-        
         if gate_id is not None:
             query = query.filter(IPAllocation.gate_id == gate_id)
+        return query.scalar() or 0
+    
+    @staticmethod
+    def allocated_counts(db: Session) -> Dict[int, int]:
+        """Allocated IPs inside each gate's pool, for all gates in one query.
         
-        allocated = query.all()
-        allocated_ips = {ip[0] for ip in allocated}
-        
-        # Generate list of available IPs
-        available = []
-        current_ip = self.pool_start
-        while current_ip <= self.pool_end:
-            ip_str = str(current_ip)
-            if ip_str not in allocated_ips:
-                available.append(ip_str)
-            current_ip += 1
+        Returns:
+            Dict of gate_id -> number of allocated IPs (gates without allocations are missing)
+        """
+        ip = cast(IPAllocation.allocated_ip, INET)
+        rows = db.query(
+            IPAllocation.gate_id, func.count(distinct(IPAllocation.allocated_ip))
+        ).join(
+            Gate, IPAllocation.gate_id == Gate.id
+        ).filter(
+            _active_allocation_filter(),
+            ip >= cast(Gate.ip_pool_start, INET),
+            ip <= cast(Gate.ip_pool_end, INET)
+        ).group_by(IPAllocation.gate_id).all()
+        return {gate_id: count for gate_id, count in rows}
+    
+    def _lock_pool(self, db: Session, gate_id: Optional[int]):
+        """Serialize allocations from one pool until the transaction ends.
         
-        return available
+        Two allocators computing the first free IP at the same time would both
+        pick it; the transaction-scoped advisory lock makes the second one wait
+        for the first one's commit and then see its allocation.
+        """
+        if db.get_bind().dialect.name != 'postgresql':
+            return
+        db.execute(func.pg_advisory_xact_lock(IP_POOL_LOCK_ID, gate_id or 0).select())
     
     def allocate_permanent_ip(
         self,
@@ -94,6 +171,8 @@ class IPPoolManager:
         Returns:
             Allocated IP address or None if pool is exhausted
         """
+        self._lock_pool(db, gate_id)
+        
         if specific_ip:
             # Validate specific IP is in pool range
             from ipaddress import ip_address
@@ -113,12 +192,10 @@ class IPPoolManager:
             allocated_ip = specific_ip
         else:
             # Auto-allocate from available pool (for this gate)
-            available_ips = self.get_available_ips(db, gate_id=gate_id)
+            allocated_ip = next(self.iter_available_ips(db, gate_id=gate_id), None)
             
-            if not available_ips:
+            if not allocated_ip:
                 return None
-            
-            allocated_ip = available_ips[0]
         
         # Create permanent allocation record (no user_id, source_ip, expires_at, session_id)
         allocation = IPAllocation(
@@ -162,13 +239,14 @@ class IPPoolManager:
         Returns:
             Allocated IP address or None if pool is exhausted
         """
-        available_ips = self.get_available_ips(db)
+        self._lock_pool(db, None)
         
-        if not available_ips:
+        # Take the first available IP
+        allocated_ip = next(self.iter_available_ips(db), None)
+        
+        if not allocated_ip:
             return None
         
-        # Take the first available IP
-        allocated_ip = available_ips[0]
         expires_at = datetime.utcnow() + timedelta(minutes=duration_minutes)
         
         # Create allocation record
@@ -256,9 +334,9 @@ class IPPoolManager:
         Returns:
             Dictionary with pool statistics
         """
-        total_ips = int(self.pool_end) - int(self.pool_start) + 1
-        available_ips = len(self.get_available_ips(db))
-        allocated_ips = total_ips - available_ips
+        total_ips = self.total_ips
+        allocated_ips = self.count_allocated(db)
+        available_ips = total_ips - allocated_ips
         
         active_allocations = db.query(IPAllocation).filter(
             IPAllocation.is_active == True,
@@ -1,240 +1,326 @@
-"""MP4 conversion worker for RDP session recordings."""
+"""MP4 conversion worker for RDP session recordings.
+
+Queue protocol (PostgreSQL):
+- a job is claimed atomically with SELECT ... FOR UPDATE SKIP LOCKED, so any
+  number of workers (processes or hosts) never pick the same job
+- the claiming worker holds a session-level advisory lock on the job while it
+  converts; a 'converting' job whose lock is free belongs to a crashed worker
+  and is put back to 'pending' (reclaim_stale_jobs)
+- idle workers sleep in LISTEN and are woken by notify_queue() when a job is
+  queued, instead of polling
+- progress is written at most every PROGRESS_INTERVAL seconds
+"""
 import os
 import re
+import select
 import subprocess
 import time
 import logging
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
-from sqlalchemy import and_
-from src.core.database import SessionLocal, MP4ConversionQueue
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - MP4Worker-%(process)d - %(levelname)s - %(message)s'
-)
+from typing import Callable, Optional
+from sqlalchemy import func, select as sql_select, text, update
+from src.core.database import MP4ConversionQueue, engine
+
 logger = logging.getLogger(__name__)
 
 # Configuration
 PYRDP_CONVERT_PATH = "/opt/jumphost/venv-pyrdp-converter/bin/pyrdp-convert"
-VENV_ACTIVATE = "source /opt/jumphost/venv-pyrdp-converter/bin/activate"
 REPLAYS_DIR = "/var/log/jumphost/rdp_recordings/replays"
 MP4_CACHE_DIR = "/var/log/jumphost/rdp_recordings/mp4_cache"
-MAX_WORKERS = 2
-POLL_INTERVAL = 5  # Check queue every 5 seconds
+MAX_WORKERS = os.cpu_count() or 2  # pyrdp-convert is single-threaded: one worker per core
+POLL_INTERVAL = 60  # Fallback re-check of the queue when no notification arrives
+PROGRESS_INTERVAL = 2  # Seconds between progress writes
+RECLAIM_INTERVAL = 30  # Seconds between stale job checks
+QUEUE_CHANNEL = "mp4_conversion_queue"
+JOB_LOCK_ID = 0x3D4  # Advisory lock namespace (second key is the job ID)
 PROGRESS_REGEX = re.compile(r'(\d+)% \((\d+) of (\d+)\)')
 
 
+def notify_queue(db):
+    """Wake idle workers - call before committing a new or re-queued job."""
+    db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": QUEUE_CHANNEL})
+
+
+def reclaim_stale_jobs(conn) -> int:
+    """
+    Put 'converting' jobs of crashed workers back to 'pending'.
+    
+    A live worker holds the job's advisory lock on its own connection, so a
+    job whose lock can be taken here has no worker any more.
+    
+    Returns:
+        Number of jobs reclaimed
+    """
+    reclaimed = 0
+    with conn.begin():
+        job_ids = conn.execute(
+            sql_select(MP4ConversionQueue.id).where(MP4ConversionQueue.status == 'converting')
+        ).scalars().all()
+    for job_id in job_ids:
+        with conn.begin():
+            if not conn.execute(sql_select(func.pg_try_advisory_lock(JOB_LOCK_ID, job_id))).scalar():
+                continue
+            try:
+                result = conn.execute(
+                    update(MP4ConversionQueue)
+                    .where(MP4ConversionQueue.id == job_id, MP4ConversionQueue.status == 'converting')
+                    .values(status='pending', started_at=None, progress=0, eta_seconds=None)
+                )
+                if result.rowcount:
+                    conn.execute(text("SELECT pg_notify(:channel, '')"), {"channel": QUEUE_CHANNEL})
+                    reclaimed += 1
+                    logger.warning(f"Reclaimed stale conversion job {job_id}")
+            finally:
+                conn.execute(sql_select(func.pg_advisory_unlock(JOB_LOCK_ID, job_id)))
+    return reclaimed
+
+
+def convert_pyrdp(pyrdp_path: str, mp4_path: str,
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Convert a .pyrdp recording to MP4 with pyrdp-convert.
+    
+    Args:
+        pyrdp_path: Source recording
+        mp4_path: Requested output file (pyrdp-convert may add a prefix)
+        on_progress: Called with (current, total) for every progress line
+    
+    Returns:
+        Path of the created MP4 file
+    """
+    venv_bin = os.path.dirname(PYRDP_CONVERT_PATH)
+    env = dict(os.environ,
+               QT_QPA_PLATFORM='offscreen',
+               VIRTUAL_ENV=os.path.dirname(venv_bin),
+               PATH=f"{venv_bin}:{os.environ.get('PATH', '')}")
+    
+    # Start conversion process (the venv's script directly - no shell)
+    process = subprocess.Popen(
+        [PYRDP_CONVERT_PATH, '-f', 'mp4', '-o', mp4_path, pyrdp_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        bufsize=1,
+        env=env
+    )
+    
+    # Track progress: "30% (2143 of 7005)"
+    for line in iter(process.stdout.readline, ''):
+        match = PROGRESS_REGEX.search(line)
+        if match and on_progress:
+            on_progress(int(match.group(2)), int(match.group(3)))
+    
+    # Wait for completion
+    return_code = process.wait()
+    if return_code != 0:
+        raise RuntimeError(f"Conversion failed with return code {return_code}")
+    
+    # pyrdp-convert creates file with prefix, find actual file
+    mp4_dir = os.path.dirname(mp4_path)
+    stem = Path(mp4_path).stem
+    created_files = list(Path(mp4_dir).glob(f"*{stem}*.mp4"))
+    if not created_files:
+        raise RuntimeError(f"Conversion completed but MP4 file not found in {mp4_dir}")
+    return str(created_files[0])
+
+
 class MP4ConversionWorker:
     """Worker process for MP4 conversion queue."""
     
     def __init__(self, worker_id: int):
         self.worker_id = worker_id
         self.current_session_id = None
+        self.conn = None  # Holds the advisory lock of the job being converted
+        self._listen_conn = None
+        self._last_reclaim = 0.0
         logger.info(f"Worker {worker_id} initialized")
         
         # Ensure MP4 cache directory exists
         os.makedirs(MP4_CACHE_DIR, exist_ok=True)
     
     def run(self):
-        """Main worker loop - monitors queue and processes jobs."""
+        """Main worker loop - claims jobs, sleeps in LISTEN when the queue is empty."""
         logger.info(f"Worker {self.worker_id} started")
         
         while True:
             try:
+                if self.conn is None:
+                    self.conn = engine.connect()
+                if time.monotonic() - self._last_reclaim >= RECLAIM_INTERVAL:
+                    self._last_reclaim = time.monotonic()
+                    reclaim_stale_jobs(self.conn)
+                
                 job = self._get_next_job()
                 
                 if job:
-                    self.current_session_id = job.session_id
-                    logger.info(f"Worker {self.worker_id} picked up job: {job.session_id}")
+                    job_id, session_id = job
+                    self.current_session_id = session_id
+                    logger.info(f"Worker {self.worker_id} picked up job: {session_id}")
                     
                     try:
-                        self._process_job(job)
+                        self._process_job(job_id, session_id)
                     except Exception as e:
-                        logger.error(f"Error processing job {job.session_id}: {e}", exc_info=True)
-                        self._mark_failed(job.session_id, str(e))
+                        logger.error(f"Error processing job {session_id}: {e}", exc_info=True)
+                        self._mark_failed(job_id, str(e))
                     finally:
+                        self._release_job(job_id)
                         self.current_session_id = None
                 else:
-                    # No jobs available, sleep
-                    time.sleep(POLL_INTERVAL)
-                    
+                    self._wait_for_jobs(POLL_INTERVAL)
+            
             except KeyboardInterrupt:
                 logger.info(f"Worker {self.worker_id} shutting down")
                 break
             except Exception as e:
                 logger.error(f"Worker {self.worker_id} error: {e}", exc_info=True)
-                time.sleep(POLL_INTERVAL)
+                self._reset_connections()
+                time.sleep(5)
     
     def _get_next_job(self):
-        """Get next pending job from queue (priority-ordered)."""
-        db = SessionLocal()
-        try:
-            # Check how many jobs are currently converting
-            converting_count = db.query(MP4ConversionQueue).filter(
-                MP4ConversionQueue.status == 'converting'
-            ).count()
-            
-            if converting_count >= MAX_WORKERS:
-                return None
-            
-            # Get highest priority pending job
-            job = db.query(MP4ConversionQueue).filter(
-                MP4ConversionQueue.status == 'pending'
-            ).order_by(
-                MP4ConversionQueue.priority.desc(),
-                MP4ConversionQueue.created_at.asc()
+        """
+        Claim the next pending job (priority-ordered).
+        
+        Returns:
+            (job_id, session_id) or None if the queue is empty
+        """
+        with self.conn.begin():
+            row = self.conn.execute(
+                sql_select(MP4ConversionQueue.id, MP4ConversionQueue.session_id)
+                .where(MP4ConversionQueue.status == 'pending')
+                .order_by(MP4ConversionQueue.priority.desc(), MP4ConversionQueue.created_at.asc())
+                .limit(1)
+                .with_for_update(skip_locked=True)
             ).first()
+            if not row:
+                return None
             
-            if job:
-                # Mark as converting
-                job.status = 'converting'
-                job.started_at = datetime.utcnow()
-                db.commit()
-                db.refresh(job)
-                return job
-            
-            return None
-            
+            # Lock before the status change commits: 'converting' always has a live owner
+            self.conn.execute(sql_select(func.pg_advisory_lock(JOB_LOCK_ID, row.id)))
+            self.conn.execute(
+                update(MP4ConversionQueue)
+                .where(MP4ConversionQueue.id == row.id)
+                .values(status='converting', started_at=datetime.utcnow(), progress=0, eta_seconds=None)
+            )
+        return row.id, row.session_id
+    
+    def _release_job(self, job_id: int):
+        try:
+            with self.conn.begin():
+                self.conn.execute(sql_select(func.pg_advisory_unlock(JOB_LOCK_ID, job_id)))
         except Exception as e:
-            logger.error(f"Error getting next job: {e}")
-            db.rollback()
-            return None
-        finally:
-            db.close()
+            logger.error(f"Error releasing job {job_id}: {e}")
+            self._reset_connections()
     
-    def _process_job(self, job):
+    def _wait_for_jobs(self, timeout: float):
+        """Sleep until a job is queued (NOTIFY) or the timeout passes."""
+        try:
+            if self._listen_conn is None:
+                raw = engine.raw_connection()
+                raw.driver_connection.autocommit = True
+                with raw.driver_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {QUEUE_CHANNEL}")
+                self._listen_conn = raw
+            listen = self._listen_conn.driver_connection
+            if select.select([listen], [], [], timeout)[0]:
+                listen.poll()
+                listen.notifies.clear()
+        except Exception as e:
+            logger.warning(f"LISTEN unavailable, polling: {e}")
+            self._close_listen()
+            time.sleep(min(timeout, 5))
+    
+    def _close_listen(self):
+        if self._listen_conn is not None:
+            try:
+                self._listen_conn.invalidate()  # Autocommit + LISTEN: never back to the pool
+            except Exception:
+                pass
+            self._listen_conn = None
+    
+    def _reset_connections(self):
+        self._close_listen()
+        if self.conn is not None:
+            try:
+                self.conn.invalidate()
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+    
+    def _process_job(self, job_id: int, session_id: str):
         """Process MP4 conversion job."""
-        session_id = job.session_id
-        
         # Find .pyrdp file
         pyrdp_files = list(Path(REPLAYS_DIR).glob(f"*{session_id}*.pyrdp"))
         if not pyrdp_files:
             raise FileNotFoundError(f"No .pyrdp file found for session {session_id}")
         
         pyrdp_path = str(pyrdp_files[0])
-        mp4_filename = f"{session_id}.mp4"
-        mp4_path = os.path.join(MP4_CACHE_DIR, mp4_filename)
+        mp4_path = os.path.join(MP4_CACHE_DIR, f"{session_id}.mp4")
         
         logger.info(f"Converting {pyrdp_path} to {mp4_path}")
         
-        # Build conversion command
-        cmd = [
-            'bash', '-c',
-            f'{VENV_ACTIVATE} && '
-            f'export QT_QPA_PLATFORM=offscreen && '
-            f'{PYRDP_CONVERT_PATH} -f mp4 -o {mp4_path} {pyrdp_path}'
-        ]
-        
-        # Start conversion process
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
-        
-        # Track progress
-        for line in iter(process.stdout.readline, ''):
-            if not line:
-                break
-            
-            # Parse progress: "30% (2143 of 7005)"
-            match = PROGRESS_REGEX.search(line)
-            if match:
-                percent = int(match.group(1))
-                current = int(match.group(2))
-                total = int(match.group(3))
-                
-                # Estimate ETA (rough calculation)
-                elapsed = (datetime.utcnow() - job.started_at).total_seconds()
-                if current > 0:
-                    eta = int((elapsed / current) * (total - current))
-                else:
-                    eta = None
-                
-                self._update_progress(session_id, current, total, eta)
-                logger.debug(f"Progress {session_id}: {percent}% ({current}/{total}), ETA: {eta}s")
+        started = time.monotonic()
+        last_write = [0.0]
         
-        # Wait for completion
-        return_code = process.wait()
+        def on_progress(current: int, total: int):
+            now = time.monotonic()
+            if now - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            # Estimate ETA (rough calculation)
+            eta = int(((now - started) / current) * (total - current)) if current > 0 else None
+            self._update_progress(job_id, current, total, eta)
+            logger.debug(f"Progress {session_id}: {current}/{total}, ETA: {eta}s")
         
-        # pyrdp-convert creates file with prefix, find actual file
-        if return_code == 0:
-            # Find created MP4 file (may have prefix added by pyrdp-convert)
-            mp4_dir = os.path.dirname(mp4_path)
-            created_files = list(Path(mp4_dir).glob(f"*{session_id}*.mp4"))
-            
-            if created_files:
-                actual_mp4_path = str(created_files[0])
-                self._mark_completed(session_id, actual_mp4_path)
-                logger.info(f"Successfully converted {session_id} to {actual_mp4_path}")
-            else:
-                raise RuntimeError(f"Conversion completed but MP4 file not found in {mp4_dir}")
-        else:
-            raise RuntimeError(f"Conversion failed with return code {return_code}")
-    
-    def _update_progress(self, session_id: str, progress: int, total: int, eta: int = None):
+        actual_mp4_path = convert_pyrdp(pyrdp_path, mp4_path, on_progress)
+        self._mark_completed(job_id, actual_mp4_path)
+        logger.info(f"Successfully converted {session_id} to {actual_mp4_path} "
+                    f"in {time.monotonic() - started:.1f}s")
+    
+    def _update_progress(self, job_id: int, progress: int, total: int, eta: int = None):
         """Update job progress in database."""
-        db = SessionLocal()
+        values = {'progress': progress, 'total': total}
+        if eta is not None:
+            values['eta_seconds'] = eta
         try:
-            job = db.query(MP4ConversionQueue).filter(
-                MP4ConversionQueue.session_id == session_id
-            ).first()
-            
-            if job:
-                job.progress = progress
-                job.total = total
-                if eta is not None:
-                    job.eta_seconds = eta
-                db.commit()
+            with self.conn.begin():
+                self.conn.execute(
+                    update(MP4ConversionQueue).where(MP4ConversionQueue.id == job_id).values(**values)
+                )
         except Exception as e:
             logger.error(f"Error updating progress: {e}")
-            db.rollback()
-        finally:
-            db.close()
     
-    def _mark_completed(self, session_id: str, mp4_path: str):
+    def _mark_completed(self, job_id: int, mp4_path: str):
         """Mark job as completed."""
-        db = SessionLocal()
         try:
-            job = db.query(MP4ConversionQueue).filter(
-                MP4ConversionQueue.session_id == session_id
-            ).first()
-            
-            if job:
-                job.status = 'completed'
-                job.mp4_path = mp4_path
-                job.completed_at = datetime.utcnow()
-                job.progress = job.total  # Ensure 100%
-                job.eta_seconds = 0
-                db.commit()
+            with self.conn.begin():
+                self.conn.execute(
+                    update(MP4ConversionQueue).where(MP4ConversionQueue.id == job_id).values(
+                        status='completed',
+                        mp4_path=mp4_path,
+                        completed_at=datetime.utcnow(),
+                        progress=MP4ConversionQueue.total,  # Ensure 100%
+                        eta_seconds=0
+                    )
+                )
         except Exception as e:
             logger.error(f"Error marking completed: {e}")
-            db.rollback()
-        finally:
-            db.close()
     
-    def _mark_failed(self, session_id: str, error_msg: str):
+    def _mark_failed(self, job_id: int, error_msg: str):
         """Mark job as failed."""
-        db = SessionLocal()
         try:
-            job = db.query(MP4ConversionQueue).filter(
-                MP4ConversionQueue.session_id == session_id
-            ).first()
-            
-            if job:
-                job.status = 'failed'
-                job.error_msg = error_msg
-                job.completed_at = datetime.utcnow()
-                db.commit()
+            with self.conn.begin():
+                self.conn.execute(
+                    update(MP4ConversionQueue).where(MP4ConversionQueue.id == job_id).values(
+                        status='failed',
+                        error_msg=error_msg,
+                        completed_at=datetime.utcnow()
+                    )
+                )
         except Exception as e:
             logger.error(f"Error marking failed: {e}")
-            db.rollback()
-        finally:
-            db.close()
 
 
 def start_worker(worker_id: int):
@@ -243,12 +329,46 @@ def start_worker(worker_id: int):
     worker.run()
 
 
+def run_supervisor(workers: int = MAX_WORKERS):
+    """
+    Run a pool of worker processes and restart any that die.
+    
+    Args:
+        workers: Number of worker processes (default: one per CPU core)
+    """
+    logger.info(f"Supervisor starting {workers} MP4 workers")
+    processes = {}
+    try:
+        while True:
+            for worker_id in range(1, workers + 1):
+                process = processes.get(worker_id)
+                if process is None or not process.is_alive():
+                    if process is not None:
+                        logger.warning(f"Worker {worker_id} exited ({process.exitcode}), restarting")
+                    # Fresh interpreter state: no DB connections inherited across fork
+                    engine.dispose(close=False)
+                    process = multiprocessing.Process(target=start_worker, args=(worker_id,), daemon=True)
+                    process.start()
+                    processes[worker_id] = process
+            time.sleep(5)
+    except KeyboardInterrupt:
+        logger.info("Supervisor shutting down")
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=10)
+
+
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1:
-        worker_id = int(sys.argv[1])
-    else:
-        worker_id = 1
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - MP4Worker-%(process)d - %(levelname)s - %(message)s'
+    )
     
-    start_worker(worker_id)
+    if len(sys.argv) > 1 and sys.argv[1] == '--supervisor':
+        run_supervisor(int(sys.argv[2]) if len(sys.argv) > 2 else MAX_WORKERS)
+    else:
+        start_worker(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
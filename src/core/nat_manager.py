@@ -1,17 +1,91 @@
-"""NAT and routing manager for dynamic IP forwarding."""
+"""NAT and routing manager for dynamic IP forwarding.
+
+The manager keeps the desired ruleset (pool IP:port -> target IP:port) and
+programs it in one atomic batch instead of one iptables process per rule:
+
+- iptables backend: our own chains (INSIDE-DNAT, INSIDE-SNAT, INSIDE-FORWARD)
+  rewritten by a single `iptables-restore --noflush`, other rules untouched
+- nftables backend: table `inside_nat` with a map keyed by pool IP . port,
+  so a packet is translated with one map lookup however many IPs are allocated
+
+dry_run=True renders the ruleset without running anything (no root needed).
+"""
+import os
 import subprocess
 import logging
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+
+from sqlalchemy.orm import Session
+
+from .database import IPAllocation, Server
+from .ip_pool import _active_allocation_filter
 
 logger = logging.getLogger(__name__)
 
+PROTOCOL_PORTS = {"ssh": 22, "rdp": 3389}
+
+DNAT_CHAIN = "INSIDE-DNAT"
+SNAT_CHAIN = "INSIDE-SNAT"
+FORWARD_CHAIN = "INSIDE-FORWARD"
+NFT_TABLE = "inside_nat"
+
+# (allocated_ip, port) -> (target_ip, target_port)
+NATRules = Dict[Tuple[str, int], Tuple[str, int]]
+
+
+def rules_from_allocations(db: Session, gate_id: Optional[int] = None) -> NATRules:
+    """Desired NAT rules for the active IP allocations (SSH and RDP for each).
+    
+    Args:
+        db: Database session
+        gate_id: Only allocations of this gate (None = all)
+    
+    Returns:
+        Rules keyed by (allocated_ip, port)
+    """
+    query = db.query(
+        IPAllocation.allocated_ip, Server.ip_address, Server.ssh_port, Server.rdp_port
+    ).join(
+        Server, IPAllocation.server_id == Server.id
+    ).filter(_active_allocation_filter())
+    if gate_id is not None:
+        query = query.filter(IPAllocation.gate_id == gate_id)
+    
+    rules = {}
+    for allocated_ip, target_ip, ssh_port, rdp_port in query:
+        if ':' in allocated_ip or ':' in target_ip:
+            logger.debug(f"Skipping IPv6 allocation {allocated_ip} -> {target_ip}")
+            continue
+        rules[(allocated_ip, PROTOCOL_PORTS["ssh"])] = (target_ip, ssh_port or PROTOCOL_PORTS["ssh"])
+        rules[(allocated_ip, PROTOCOL_PORTS["rdp"])] = (target_ip, rdp_port or PROTOCOL_PORTS["rdp"])
+    return rules
+
 
 class NATManager:
     """Manages iptables NAT rules for dynamic port forwarding."""
     
-    def __init__(self):
-        """Initialize NAT manager."""
-        self.rules = []  # Track active rules for cleanup
+    def __init__(self, backend: Optional[str] = None, dry_run: bool = False):
+        """Initialize NAT manager.
+        
+        Args:
+            backend: 'iptables' or 'nftables' (default: NAT_BACKEND env var, else iptables)
+            dry_run: Only render rulesets (see last_ruleset), never run commands
+        """
+        self.backend = backend or os.getenv("NAT_BACKEND", "iptables")
+        if self.backend not in ("iptables", "nftables"):
+            logger.error(f"Unknown NAT backend: {self.backend}, using iptables")
+            self.backend = "iptables"
+        self.dry_run = dry_run
+        self.desired: NATRules = {}
+        self.applied: Optional[NATRules] = None  # None until the first apply (kernel state unknown)
+        self.last_ruleset: Optional[str] = None
+        self._jumps_installed = False
+    
+    @property
+    def rules(self) -> List[str]:
+        """Rule IDs of the active rules (for cleanup/listing)"""
+        return [f"{ip}:{port}->{target_ip}:{target_port}"
+                for (ip, port), (target_ip, target_port) in sorted(self.desired.items())]
     
     def add_nat_rule(
         self,
@@ -30,57 +104,18 @@ class NATManager:
         Returns:
             True if rules added successfully
         """
-        try:
-            if protocol == "ssh":
-                port = 22
-            elif protocol == "rdp":
-                port = 3389
-            else:
-                logger.error(f"Unknown protocol: {protocol}")
-                return False
-            
-            # DNAT rule: incoming traffic to allocated_ip:port -> target_ip:port
-            dnat_cmd = [
-                "iptables", "-t", "nat", "-A", "PREROUTING",
-                "-d", allocated_ip,
-                "-p", "tcp", "--dport", str(port),
-                "-j", "DNAT", "--to-destination", f"{target_ip}:{port}"
-            ]
-            
-            # SNAT rule: outgoing traffic appears to come from jump host
-            snat_cmd = [
-                "iptables", "-t", "nat", "-A", "POSTROUTING",
-                "-d", target_ip,
-                "-p", "tcp", "--dport", str(port),
-                "-j", "MASQUERADE"
-            ]
-            
-            # FORWARD rule: allow forwarding
-            forward_cmd = [
-                "iptables", "-A", "FORWARD",
-                "-d", target_ip,
-                "-p", "tcp", "--dport", str(port),
-                "-j", "ACCEPT"
-            ]
-            
-            # Execute commands
-            subprocess.run(["sudo"] + dnat_cmd, check=True, capture_output=True)
-            subprocess.run(["sudo"] + snat_cmd, check=True, capture_output=True)
-            subprocess.run(["sudo"] + forward_cmd, check=True, capture_output=True)
-            
-            # Track rule for cleanup
-            rule_id = f"{allocated_ip}:{port}->{target_ip}:{port}"
-            self.rules.append(rule_id)
-            
-            logger.info(f"Added NAT rules: {rule_id}")
-            return True
-            
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to add NAT rules: {e.stderr.decode() if e.stderr else str(e)}")
+        port = PROTOCOL_PORTS.get(protocol)
+        if port is None:
+            logger.error(f"Unknown protocol: {protocol}")
             return False
-        except Exception as e:
-            logger.error(f"Error adding NAT rules: {str(e)}")
+        
+        rules = dict(self.desired)
+        rules[(allocated_ip, port)] = (target_ip, port)
+        if not self.set_rules(rules):
             return False
+        
+        logger.info(f"Added NAT rules: {allocated_ip}:{port}->{target_ip}:{port}")
+        return True
     
     def remove_nat_rule(
         self,
@@ -99,57 +134,166 @@ class NATManager:
         Returns:
             True if rules removed successfully
         """
-        try:
-            if protocol == "ssh":
-                port = 22
-            elif protocol == "rdp":
-                port = 3389
-            else:
-                return False
-            
-            # Remove DNAT rule
-            dnat_cmd = [
-                "iptables", "-t", "nat", "-D", "PREROUTING",
-                "-d", allocated_ip,
-                "-p", "tcp", "--dport", str(port),
-                "-j", "DNAT", "--to-destination", f"{target_ip}:{port}"
-            ]
-            
-            # Remove SNAT rule
-            snat_cmd = [
-                "iptables", "-t", "nat", "-D", "POSTROUTING",
-                "-d", target_ip,
-                "-p", "tcp", "--dport", str(port),
-                "-j", "MASQUERADE"
-            ]
-            
-            # Remove FORWARD rule
-            forward_cmd = [
-                "iptables", "-D", "FORWARD",
-                "-d", target_ip,
-                "-p", "tcp", "--dport", str(port),
-                "-j", "ACCEPT"
-            ]
-            
-            # Execute commands (ignore errors if rule doesn't exist)
-            subprocess.run(["sudo"] + dnat_cmd, capture_output=True)
-            subprocess.run(["sudo"] + snat_cmd, capture_output=True)
-            subprocess.run(["sudo"] + forward_cmd, capture_output=True)
-            
-            rule_id = f"{allocated_ip}:{port}->{target_ip}:{port}"
-            if rule_id in self.rules:
-                self.rules.remove(rule_id)
+        port = PROTOCOL_PORTS.get(protocol)
+        if port is None:
+            return False
+        
+        rules = dict(self.desired)
+        if rules.get((allocated_ip, port)) == (target_ip, port):
+            del rules[(allocated_ip, port)]
+        if not self.set_rules(rules):
+            return False
+        
+        logger.info(f"Removed NAT rules: {allocated_ip}:{port}->{target_ip}:{port}")
+        return True
+    
+    def set_rules(self, rules: NATRules) -> bool:
+        """
+        Replace the whole ruleset and program it in one atomic batch.
+        
+        Args:
+            rules: (allocated_ip, port) -> (target_ip, target_port)
             
-            logger.info(f"Removed NAT rules: {rule_id}")
+        Returns:
+            True if applied (or rendered in dry-run mode)
+        """
+        rules = dict(rules)
+        if rules == self.applied:
+            self.desired = rules
             return True
+        
+        if self.backend == "nftables":
+            ruleset = self.render_nftables(rules)
+            command = ["nft", "-f", "-"]
+        else:
+            ruleset = self.render_iptables_restore(rules)
+            command = ["iptables-restore", "--noflush"]
+        self.last_ruleset = ruleset
+        
+        if not self.dry_run:
+            try:
+                if self.backend == "iptables":
+                    self._ensure_jumps()
+                subprocess.run(["sudo"] + command, input=ruleset.encode(), check=True, capture_output=True)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Failed to apply NAT rules: {e.stderr.decode() if e.stderr else str(e)}")
+                return False
+            except Exception as e:
+                logger.error(f"Error applying NAT rules: {str(e)}")
+                return False
+        
+        self.desired = rules
+        self.applied = dict(rules)
+        logger.debug(f"Applied {len(rules)} NAT rules ({self.backend}{', dry run' if self.dry_run else ''})")
+        return True
+    
+    def diff(self, rules: NATRules) -> dict:
+        """
+        Compare a ruleset with the one currently programmed.
+        
+        Returns:
+            Dictionary with 'added', 'removed' and 'changed' rule IDs
+        """
+        current = self.applied or {}
+        rule_id = lambda key, target: f"{key[0]}:{key[1]}->{target[0]}:{target[1]}"
+        return {
+            "added": sorted(rule_id(k, v) for k, v in rules.items() if k not in current),
+            "removed": sorted(rule_id(k, v) for k, v in current.items() if k not in rules),
+            "changed": sorted(rule_id(k, v) for k, v in rules.items() if k in current and current[k] != v),
+        }
+    
+    def reconcile(self, db: Session, gate_id: Optional[int] = None) -> dict:
+        """
+        Bring the NAT rules in line with the active IP allocations.
+        
+        The first reconcile always reprograms (state left by a previous process
+        is unknown); later ones only when the allocations changed.
+        
+        Args:
+            db: Database session
+            gate_id: Only allocations of this gate (None = all)
             
-        except Exception as e:
-            logger.error(f"Error removing NAT rules: {str(e)}")
-            return False
+        Returns:
+            diff() of the change plus 'applied' (bool)
+        """
+        rules = rules_from_allocations(db, gate_id)
+        changes = self.diff(rules)
+        changes["applied"] = self.set_rules(rules)
+        if any(changes[key] for key in ("added", "removed", "changed")):
+            logger.info(f"NAT reconcile: +{len(changes['added'])} -{len(changes['removed'])} "
+                        f"~{len(changes['changed'])}")
+        return changes
+    
+    def render_iptables_restore(self, rules: NATRules) -> str:
+        """iptables-restore input rewriting our chains (use with --noflush)"""
+        dnat = []
+        targets = set()
+        for (allocated_ip, port), (target_ip, target_port) in sorted(rules.items()):
+            dnat.append(f"-A {DNAT_CHAIN} -d {allocated_ip}/32 -p tcp -m tcp --dport {port} "
+                        f"-j DNAT --to-destination {target_ip}:{target_port}")
+            targets.add((target_ip, target_port))
+        
+        # Declaring a chain with --noflush empties it, so the batch replaces our rules only
+        lines = ["*nat", f":{DNAT_CHAIN} - [0:0]", f":{SNAT_CHAIN} - [0:0]"]
+        lines.extend(dnat)
+        lines.extend(f"-A {SNAT_CHAIN} -d {ip}/32 -p tcp -m tcp --dport {port} -j MASQUERADE"
+                     for ip, port in sorted(targets))
+        lines.extend(["COMMIT", "*filter", f":{FORWARD_CHAIN} - [0:0]"])
+        lines.extend(f"-A {FORWARD_CHAIN} -d {ip}/32 -p tcp -m tcp --dport {port} -j ACCEPT"
+                     for ip, port in sorted(targets))
+        lines.append("COMMIT")
+        return "\n".join(lines) + "\n"
+    
+    def render_nftables(self, rules: NATRules) -> str:
+        """nft -f input replacing our table (create + delete + define is one transaction)"""
+        dnat = ", ".join(f"{ip} . {port} : {target_ip} . {target_port}"
+                         for (ip, port), (target_ip, target_port) in sorted(rules.items()))
+        targets = ", ".join(f"{ip} . {port}" for ip, port in sorted(set(rules.values())))
+        return "\n".join([
+            f"table ip {NFT_TABLE}",
+            f"delete table ip {NFT_TABLE}",
+            f"table ip {NFT_TABLE} {{",
+            "    map dnat {",
+            "        type ipv4_addr . inet_service : ipv4_addr . inet_service",
+            f"        elements = {{ {dnat} }}" if dnat else "",
+            "    }",
+            "    set targets {",
+            "        type ipv4_addr . inet_service",
+            f"        elements = {{ {targets} }}" if targets else "",
+            "    }",
+            "    chain prerouting {",
+            "        type nat hook prerouting priority dstnat; policy accept;",
+            "        dnat ip addr . port to ip daddr . tcp dport map @dnat",
+            "    }",
+            "    chain postrouting {",
+            "        type nat hook postrouting priority srcnat; policy accept;",
+            "        ip daddr . tcp dport @targets masquerade",
+            "    }",
+            "    chain forward {",
+            "        type filter hook forward priority filter; policy accept;",
+            "        ip daddr . tcp dport @targets accept",
+            "    }",
+            "}",
+        ]) + "\n"
+    
+    def _ensure_jumps(self):
+        """Hook our chains into PREROUTING/POSTROUTING/FORWARD (once)"""
+        if self._jumps_installed:
+            return
+        for table, chain, target in (("nat", "PREROUTING", DNAT_CHAIN),
+                                     ("nat", "POSTROUTING", SNAT_CHAIN),
+                                     ("filter", "FORWARD", FORWARD_CHAIN)):
+            subprocess.run(["sudo", "iptables", "-t", table, "-N", target], capture_output=True)
+            check = subprocess.run(["sudo", "iptables", "-t", table, "-C", chain, "-j", target],
+                                   capture_output=True)
+            if check.returncode != 0:
+                subprocess.run(["sudo", "iptables", "-t", table, "-I", chain, "-j", target],
+                               check=True, capture_output=True)
+        self._jumps_installed = True
     
     def list_active_rules(self) -> List[str]:
         """List all NAT rules created by this manager."""
-        return self.rules.copy()
+        return self.rules
     
     def flush_nat_rules(self) -> bool:
         """
@@ -161,7 +305,9 @@ class NATManager:
         try:
             subprocess.run(["sudo", "iptables", "-t", "nat", "-F"], check=True)
             subprocess.run(["sudo", "iptables", "-F", "FORWARD"], check=True)
-            self.rules.clear()
+            self.desired = {}
+            self.applied = None
+            self._jumps_installed = False
             logger.warning("Flushed all NAT rules")
             return True
         except subprocess.CalledProcessError as e:
@@ -191,7 +337,8 @@ if __name__ == "__main__":
     """Test NAT manager."""
     logging.basicConfig(level=logging.INFO)
     
-    manager = NATManager()
+    # Dry run: render the batch without root
+    manager = NATManager(dry_run=True)
     
     # Test adding rule
     print("Adding test NAT rule...")
@@ -204,6 +351,7 @@ if __name__ == "__main__":
     
     # List rules
     print(f"\nActive rules: {manager.list_active_rules()}")
+    print(f"\n{manager.backend} ruleset:\n{manager.last_ruleset}")
     
     # Note: Cleanup would be done when IP is released
     # manager.remove_nat_rule("10.0.160.129", "10.210.1.156", "ssh")
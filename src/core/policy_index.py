@@ -0,0 +1,511 @@
+"""Policy Index - Compiled in-memory view of access policies for AccessControlEngineV2.
+
+check_access_v2 used to run one query per group hierarchy level, one query for
+the user's policies, one per policy for SSH logins and one per policy for
+schedules. The index holds all active policies keyed by
+(user | user group, server | server group), the user/server group closures and
+each policy's SSH logins and schedules, so matching policies for a connection
+is a few dict lookups without SQL.
+
+Keeping it fresh:
+- Every write to these tables, from any process (Tower, jumphost_cli_v2.py,
+  direct SQL), bumps the policy_index_version row (triggers from migration
+  013). ensure_fresh() reads it on each lookup - one single-row query - and
+  rebuilds when it differs from the version the index was built at.
+- ORM commits in this process touching policies, SSH logins, schedules, groups
+  or memberships are recorded by session event listeners and applied on the
+  next lookup: changed policies / memberships are reloaded by id, a group
+  parent change recomputes the closures. Bulk query().update()/delete() on
+  these tables trigger a full rebuild. Without migration 013 this (plus a full
+  rebuild every MAX_INDEX_AGE seconds for writes from other processes) is all
+  that keeps the index fresh.
+- Matched policies are checked against their rows, SSH logins and schedules
+  (CompiledPolicy.same_as) before they are used.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from .database import (
+    AccessPolicy, PolicySSHLogin, PolicySchedule,
+    UserGroup, UserGroupMember, ServerGroup, ServerGroupMember
+)
+from .schedule_checker import CompiledSchedule, check_policy_schedules
+
+logger = logging.getLogger(__name__)
+
+# Full rebuild interval (seconds) - fallback for databases without migration 013
+MAX_INDEX_AGE = 300
+
+_VERSION_QUERY = text("SELECT version FROM policy_index_version WHERE id = 1")
+
+_SESSION_INFO_KEY = 'policy_index_changes'
+
+
+class CompiledPolicy:
+    """Snapshot of one active AccessPolicy with its SSH logins and schedules"""
+
+    __slots__ = (
+        'id', 'user_id', 'user_group_id', 'source_ip_id', 'scope_type',
+        'target_server_id', 'target_group_id', 'protocol', 'start_time',
+        'end_time', 'use_schedules', 'ssh_logins', 'schedules', 'schedule_rows'
+    )
+
+    def __init__(self, policy: AccessPolicy):
+        self.id = policy.id
+        self.user_id = policy.user_id
+        self.user_group_id = policy.user_group_id
+        self.source_ip_id = policy.source_ip_id
+        self.scope_type = policy.scope_type
+        self.target_server_id = policy.target_server_id
+        self.target_group_id = policy.target_group_id
+        self.protocol = policy.protocol
+        self.start_time = policy.start_time
+        self.end_time = policy.end_time
+        self.use_schedules = policy.use_schedules
+        self.ssh_logins: FrozenSet[str] = frozenset()  # Empty = all logins allowed
+        self.schedules: List[CompiledSchedule] = []  # Active schedules, compiled once per load
+        self.schedule_rows: FrozenSet[tuple] = frozenset()  # _schedule_row() of each active schedule
+
+    @property
+    def key(self) -> Tuple[str, int, str, int]:
+        """Index key: (principal kind, principal id, target kind, target id)"""
+        principal = ('user', self.user_id) if self.user_id else ('user_group', self.user_group_id)
+        if self.scope_type == 'group':
+            return principal + ('server_group', self.target_group_id)
+        return principal + ('server', self.target_server_id)
+
+    def is_current(self, now: datetime) -> bool:
+        return self.start_time <= now and (self.end_time is None or self.end_time >= now)
+
+    def matches(self, protocol: str, now: datetime) -> bool:
+        return (self.protocol is None or self.protocol == protocol) and self.is_current(now)
+
+    def allows_login(self, ssh_login: str) -> bool:
+        return not self.ssh_logins or ssh_login in self.ssh_logins
+
+    def check_schedule(self, now: datetime) -> Tuple[bool, Optional[str]]:
+        """Same result as AccessControlEngineV2.check_schedule_access"""
+        if not self.use_schedules:
+            return (True, None)
+        matches, matched_name = check_policy_schedules(self.schedules, now)
+        if not matches:
+            return (False, "Outside allowed time windows")
+        return (True, matched_name)
+
+    def same_as(self, policy: AccessPolicy) -> bool:
+        """True if the loaded policy still matches this snapshot (detects writes from other processes)
+
+        Compares the policy row and its SSH logins and active schedules
+        (policy.ssh_logins / policy.schedules - load them with selectinload
+        to avoid a query per policy). Group memberships are not per policy;
+        changes to those are caught by the index version check.
+        """
+        if not (
+            policy.is_active
+            and policy.start_time == self.start_time
+            and policy.end_time == self.end_time
+            and policy.protocol == self.protocol
+            and policy.source_ip_id == self.source_ip_id
+            and policy.use_schedules == self.use_schedules
+        ):
+            return False
+        if frozenset(login.allowed_login for login in policy.ssh_logins) != self.ssh_logins:
+            return False
+        if self.use_schedules:
+            return frozenset(_schedule_row(s) for s in policy.schedules if s.is_active) == self.schedule_rows
+        return True
+
+
+def _schedule_row(schedule: PolicySchedule) -> tuple:
+    """Fields of a schedule row that CompiledSchedule depends on"""
+    return (
+        schedule.id, schedule.name, tuple(schedule.weekdays or ()), schedule.time_start,
+        schedule.time_end, tuple(schedule.months or ()), tuple(schedule.days_of_month or ()),
+        schedule.timezone
+    )
+
+
+def _closures(direct: Dict[int, Set[int]], parents: Dict[int, Optional[int]]) -> Dict[int, FrozenSet[int]]:
+    """Member id -> all group ids (direct groups plus ancestors), cycle-safe"""
+    ancestors: Dict[int, FrozenSet[int]] = {}
+
+    def group_ancestors(group_id: int) -> FrozenSet[int]:
+        if group_id not in ancestors:
+            chain = []
+            current = group_id
+            while current is not None and current not in ancestors and current not in chain:
+                chain.append(current)
+                current = parents.get(current)
+            inherited = ancestors.get(current, frozenset())
+            for gid in reversed(chain):
+                inherited = inherited | {gid}
+                ancestors[gid] = inherited
+        return ancestors[group_id]
+
+    closures = {}
+    for member_id, group_ids in direct.items():
+        closure = set()
+        for gid in group_ids:
+            closure |= group_ancestors(gid)
+        closures[member_id] = frozenset(closure)
+    return closures
+
+
+class _Changes:
+    """Changes recorded from one ORM session until commit"""
+
+    def __init__(self):
+        self.policies: Set[int] = set()
+        self.users: Set[int] = set()
+        self.servers: Set[int] = set()
+        self.groups = False
+        self.full = False
+
+    def __bool__(self):
+        return bool(self.policies or self.users or self.servers or self.groups or self.full)
+
+
+class PolicyIndex:
+    """Process-wide compiled policy index (see module docstring)
+
+    Usage:
+        index = get_policy_index()
+        index.ensure_fresh(db)
+        policies, direct = index.match(user.id, user_ip_id, server.id, protocol, now)
+    """
+
+    def __init__(self, max_age: int = MAX_INDEX_AGE):
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.built_at: Optional[float] = None
+        self.version: Optional[int] = None  # policy_index_version the index was built at
+        self.versioned: Optional[bool] = None  # policy_index_version exists (None = not probed yet)
+
+        self.policies: Dict[int, CompiledPolicy] = {}
+        self.by_key: Dict[tuple, Dict[int, CompiledPolicy]] = {}
+
+        self.user_group_parents: Dict[int, Optional[int]] = {}
+        self.server_group_parents: Dict[int, Optional[int]] = {}
+        self.user_direct_groups: Dict[int, Set[int]] = {}
+        self.server_direct_groups: Dict[int, Set[int]] = {}
+        self.user_closures: Dict[int, FrozenSet[int]] = {}
+        self.server_closures: Dict[int, FrozenSet[int]] = {}
+
+        self.pending = _Changes()
+
+        # Counters
+        self.rebuilds = 0
+        self.incremental_updates = 0
+        self.lookups = 0
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    def mark_changed(self, changes: _Changes):
+        """Queue committed changes; applied on next ensure_fresh()"""
+        with self.lock:
+            self.pending.policies |= changes.policies
+            self.pending.users |= changes.users
+            self.pending.servers |= changes.servers
+            self.pending.groups = self.pending.groups or changes.groups
+            self.pending.full = self.pending.full or changes.full
+
+    def invalidate(self):
+        """Force full rebuild on next lookup"""
+        with self.lock:
+            self.pending.full = True
+
+    def _read_version(self, db: Session) -> Optional[int]:
+        """Current policy_index_version (None if migration 013 is not applied)"""
+        if self.versioned is False:
+            return None
+        if self.versioned:
+            return db.execute(_VERSION_QUERY).scalar()
+        try:
+            # First probe in a savepoint - a missing table must not abort the caller's transaction
+            with db.begin_nested():
+                version = db.execute(_VERSION_QUERY).scalar()
+        except Exception as e:
+            logger.warning(f"Policy index version unavailable ({e.__class__.__name__}), "
+                           f"falling back to {self.max_age}s rebuilds - apply migration 013")
+            self.versioned = False
+            return None
+        self.versioned = True
+        return version
+
+    def ensure_fresh(self, db: Session):
+        """Apply queued changes (or rebuild) using db"""
+        with self.lock:
+            version = self._read_version(db)
+            if (self.built_at is None or self.pending.full
+                    or (version is not None and version != self.version)
+                    or time.monotonic() - self.built_at >= self.max_age):
+                self.rebuild(db, version)
+                return
+            if not self.pending:
+                return
+
+            pending, self.pending = self.pending, _Changes()
+            if pending.groups:
+                self._load_groups(db)
+            if pending.users:
+                self._load_user_memberships(db, pending.users)
+            if pending.servers:
+                self._load_server_memberships(db, pending.servers)
+            if pending.groups or pending.users:
+                self.user_closures = _closures(self.user_direct_groups, self.user_group_parents)
+            if pending.groups or pending.servers:
+                self.server_closures = _closures(self.server_direct_groups, self.server_group_parents)
+            if pending.policies:
+                self.refresh_policies(db, pending.policies)
+            self.incremental_updates += 1
+
+    def rebuild(self, db: Session, version: Optional[int] = None):
+        """Load everything from the database
+
+        Args:
+            db: Database session
+            version: policy_index_version read before loading (read here if None)
+        """
+        with self.lock:
+            started = time.monotonic()
+            self.pending = _Changes()
+            # Read before loading - a write committed meanwhile bumps it past this
+            self.version = version if version is not None else self._read_version(db)
+
+            self._load_groups(db)
+            self.user_direct_groups = {}
+            for user_id, group_id in db.query(UserGroupMember.user_id, UserGroupMember.user_group_id):
+                self.user_direct_groups.setdefault(user_id, set()).add(group_id)
+            self.server_direct_groups = {}
+            for server_id, group_id in db.query(ServerGroupMember.server_id, ServerGroupMember.group_id):
+                self.server_direct_groups.setdefault(server_id, set()).add(group_id)
+            self.user_closures = _closures(self.user_direct_groups, self.user_group_parents)
+            self.server_closures = _closures(self.server_direct_groups, self.server_group_parents)
+
+            self.policies = {}
+            self.by_key = {}
+            self._load_policies(db, db.query(AccessPolicy).filter(AccessPolicy.is_active == True))
+
+            self.built_at = time.monotonic()
+            self.rebuilds += 1
+            logger.info(
+                f"Policy index rebuilt: {len(self.policies)} policies, "
+                f"{len(self.user_closures)} users / {len(self.server_closures)} servers in groups "
+                f"({(self.built_at - started) * 1000:.0f}ms)"
+            )
+
+    def refresh_policies(self, db: Session, policy_ids):
+        """Reload given policies (removed from the index if deleted or inactive)"""
+        policy_ids = {pid for pid in policy_ids if pid is not None}
+        if not policy_ids:
+            return
+        with self.lock:
+            for policy_id in policy_ids:
+                self._remove_policy(policy_id)
+            self._load_policies(db, db.query(AccessPolicy).filter(
+                AccessPolicy.id.in_(policy_ids),
+                AccessPolicy.is_active == True
+            ))
+
+    def _load_policies(self, db: Session, query):
+        compiled = {policy.id: CompiledPolicy(policy) for policy in query}
+        if not compiled:
+            return
+        ids = list(compiled)
+
+        for policy_id, login in db.query(PolicySSHLogin.policy_id, PolicySSHLogin.allowed_login).filter(
+            PolicySSHLogin.policy_id.in_(ids)
+        ):
+            compiled[policy_id].ssh_logins = compiled[policy_id].ssh_logins | {login}
+
+        scheduled = [pid for pid, c in compiled.items() if c.use_schedules]
+        if scheduled:
+            for schedule in db.query(PolicySchedule).filter(
+                PolicySchedule.policy_id.in_(scheduled),
+                PolicySchedule.is_active == True
+            ):
+                compiled[schedule.policy_id].schedules.append(CompiledSchedule.from_row(schedule))
+                compiled[schedule.policy_id].schedule_rows |= {_schedule_row(schedule)}
+
+        for policy in compiled.values():
+            self.policies[policy.id] = policy
+            self.by_key.setdefault(policy.key, {})[policy.id] = policy
+
+    def _remove_policy(self, policy_id: int):
+        policy = self.policies.pop(policy_id, None)
+        if policy:
+            bucket = self.by_key.get(policy.key)
+            if bucket is not None:
+                bucket.pop(policy_id, None)
+                if not bucket:
+                    del self.by_key[policy.key]
+
+    def _load_groups(self, db: Session):
+        self.user_group_parents = dict(db.query(UserGroup.id, UserGroup.parent_group_id))
+        self.server_group_parents = dict(db.query(ServerGroup.id, ServerGroup.parent_group_id))
+
+    def _load_user_memberships(self, db: Session, user_ids: Set[int]):
+        for user_id in user_ids:
+            self.user_direct_groups.pop(user_id, None)
+        for user_id, group_id in db.query(UserGroupMember.user_id, UserGroupMember.user_group_id).filter(
+            UserGroupMember.user_id.in_(user_ids)
+        ):
+            self.user_direct_groups.setdefault(user_id, set()).add(group_id)
+
+    def _load_server_memberships(self, db: Session, server_ids: Set[int]):
+        for server_id in server_ids:
+            self.server_direct_groups.pop(server_id, None)
+        for server_id, group_id in db.query(ServerGroupMember.server_id, ServerGroupMember.group_id).filter(
+            ServerGroupMember.server_id.in_(server_ids)
+        ):
+            self.server_direct_groups.setdefault(server_id, set()).add(group_id)
+
+    # ------------------------------------------------------------------
+    # Lookups (no SQL - call ensure_fresh() first)
+    # ------------------------------------------------------------------
+
+    def user_groups(self, user_id: int) -> FrozenSet[int]:
+        """All user group ids of user (including parent groups)"""
+        return self.user_closures.get(user_id, frozenset())
+
+    def server_groups(self, server_id: int) -> FrozenSet[int]:
+        """All server group ids of server (including parent groups)"""
+        return self.server_closures.get(server_id, frozenset())
+
+    def _candidates(self, kind: str, principal_id: int, server_id: int, server_group_ids) -> List[CompiledPolicy]:
+        found = list(self.by_key.get((kind, principal_id, 'server', server_id), {}).values())
+        for group_id in server_group_ids:
+            found.extend(self.by_key.get((kind, principal_id, 'server_group', group_id), {}).values())
+        return found
+
+    def match(self, user_id: int, source_ip_id: Optional[int], server_id: int,
+              protocol: str, now: datetime) -> Tuple[List[CompiledPolicy], bool]:
+        """Policies granting user access to server, same rules as check_access_v2 step 3
+
+        Direct user policies win over group policies: if the user has any direct
+        policy for the server, group policies are ignored.
+
+        Returns:
+            (policies sorted by id, True if they are direct user policies)
+        """
+        with self.lock:
+            self.lookups += 1
+            server_group_ids = self.server_groups(server_id)
+
+            direct = [
+                p for p in self._candidates('user', user_id, server_id, server_group_ids)
+                if p.matches(protocol, now)
+                and (p.source_ip_id is None or (source_ip_id is not None and p.source_ip_id == source_ip_id))
+            ]
+            if direct:
+                return sorted(direct, key=lambda p: p.id), True
+
+            group = []
+            for user_group_id in self.user_groups(user_id):
+                group.extend(
+                    p for p in self._candidates('user_group', user_group_id, server_id, server_group_ids)
+                    if p.matches(protocol, now)
+                )
+            return sorted(group, key=lambda p: p.id), False
+
+    def find_revoked_grant(self, user_id: int, server_id: int, now: datetime) -> Optional[CompiledPolicy]:
+        """Active server-level user policy whose end_time has passed (revoked by admin)"""
+        with self.lock:
+            for policy in self.by_key.get(('user', user_id, 'server', server_id), {}).values():
+                if policy.end_time is not None and policy.end_time < now:
+                    return policy
+        return None
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'policies': len(self.policies),
+                'keys': len(self.by_key),
+                'users_in_groups': len(self.user_closures),
+                'servers_in_groups': len(self.server_closures),
+                'age_seconds': int(time.monotonic() - self.built_at) if self.built_at else None,
+                'version': self.version,
+                'rebuilds': self.rebuilds,
+                'incremental_updates': self.incremental_updates,
+                'lookups': self.lookups
+            }
+
+
+# Global index instance (one per Tower process)
+_policy_index = PolicyIndex()
+
+
+def get_policy_index() -> PolicyIndex:
+    """Get global policy index"""
+    return _policy_index
+
+
+# ----------------------------------------------------------------------
+# Change tracking via ORM session events
+# ----------------------------------------------------------------------
+
+def _values(obj, attr: str) -> Set[int]:
+    """Current and previous (changed in this flush) values of an attribute"""
+    values = {getattr(obj, attr)}
+    history = inspect(obj).attrs[attr].history
+    values.update(history.deleted or ())
+    return {v for v in values if v is not None}
+
+
+def _session_changes(session) -> _Changes:
+    changes = session.info.get(_SESSION_INFO_KEY)
+    if changes is None:
+        changes = session.info[_SESSION_INFO_KEY] = _Changes()
+    return changes
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flush(session, flush_context):
+    changes = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, (AccessPolicy, PolicySSHLogin, PolicySchedule, UserGroup,
+                                ServerGroup, UserGroupMember, ServerGroupMember)):
+            continue
+        if changes is None:
+            changes = _session_changes(session)
+        if isinstance(obj, AccessPolicy):
+            changes.policies.add(obj.id)
+        elif isinstance(obj, (PolicySSHLogin, PolicySchedule)):
+            changes.policies |= _values(obj, 'policy_id')
+        elif isinstance(obj, UserGroupMember):
+            changes.users |= _values(obj, 'user_id')
+        elif isinstance(obj, ServerGroupMember):
+            changes.servers |= _values(obj, 'server_id')
+        else:
+            changes.groups = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (AccessPolicy, PolicySSHLogin, PolicySchedule, UserGroup,
+                                                ServerGroup, UserGroupMember, ServerGroupMember):
+        _session_changes(orm_execute_state.session).full = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_commit(session):
+    changes = session.info.pop(_SESSION_INFO_KEY, None)
+    if changes:
+        _policy_index.mark_changed(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_SESSION_INFO_KEY, None)
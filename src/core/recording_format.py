@@ -0,0 +1,212 @@
+"""Binary session recording format (shared by Gate and Tower).
+
+JSONL recordings store every keystroke as a JSON object with an ISO timestamp
+and the data as a JSON string; uploads base64 it once more. The binary format
+stores terminal I/O as raw bytes in length-prefixed frames, grouped into
+compressed blocks (one block = one uploaded chunk). Tower only appends blocks;
+decoding happens when a recording is played back.
+
+File layout:
+    FILE_MAGIC
+    block*
+
+Block:
+    BLOCK_HEADER: magic b'RB', codec (u8), base timestamp ms (u64),
+                  raw length (u32), payload length (u32)
+    payload: frames, compressed with codec
+
+Frame:
+    FRAME_HEADER: kind (u8), delta ms from previous frame (u32), length (u32)
+    data: raw terminal bytes (KIND_CLIENT/KIND_SERVER) or
+          JSON object without timestamp (KIND_EVENT - session_start, session_end, ...)
+
+The first frame of each block is relative to the block base timestamp, so blocks
+decode independently.
+
+Batch upload body (chunks of several recordings in one request):
+    entry*: BATCH_ENTRY_HEADER (path length u16, chunk index u32, data length u32),
+            recording path (utf-8), chunk data (block or JSONL lines, appended as-is)
+"""
+
+import json
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, List, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    # zstd is optional - zlib is always available
+    zstandard = None
+
+FILE_MAGIC = b'INSIDE-REC1\n'
+
+BLOCK_MAGIC = b'RB'
+BLOCK_HEADER = struct.Struct('>2sBQII')
+FRAME_HEADER = struct.Struct('>BII')
+BATCH_ENTRY_HEADER = struct.Struct('>HII')
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'zstd': CODEC_ZSTD}
+
+KIND_CLIENT = 0
+KIND_SERVER = 1
+KIND_EVENT = 2
+KIND_NAMES = {KIND_CLIENT: 'client', KIND_SERVER: 'server'}
+DIRECTION_KINDS = {'client': KIND_CLIENT, 'server': KIND_SERVER}
+
+# (kind, timestamp ms since epoch, data)
+Frame = Tuple[int, int, bytes]
+
+
+class RecordingFormatError(Exception):
+    """Corrupt block or unsupported codec."""
+    pass
+
+
+def codec_from_name(name: str) -> int:
+    """Codec id for 'zstd', 'zlib' or 'none' (zstd falls back to zlib if not installed)."""
+    codec = CODECS.get((name or 'zlib').lower(), CODEC_ZLIB)
+    if codec == CODEC_ZSTD and zstandard is None:
+        return CODEC_ZLIB
+    return codec
+
+
+def timestamp_ms(dt: datetime = None) -> int:
+    """Milliseconds since epoch (now if dt is None)."""
+    dt = dt or datetime.now(timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def is_binary_recording(header: bytes) -> bool:
+    return header.startswith(FILE_MAGIC)
+
+
+def event_frame(event: dict) -> Frame:
+    """KIND_EVENT frame for a named event dict with ISO 'timestamp'."""
+    event = dict(event)
+    ts = event.pop('timestamp', None)
+    ts_ms = timestamp_ms(datetime.fromisoformat(ts.replace('Z', '+00:00'))) if ts else timestamp_ms()
+    return (KIND_EVENT, ts_ms, json.dumps(event, separators=(',', ':')).encode('utf-8'))
+
+
+def frame_to_event(kind: int, ts_ms: int, data: bytes) -> dict:
+    """Frame as JSONL-style event dict (same shape the recorder used to write)."""
+    timestamp = datetime.fromtimestamp(ts_ms / 1000, timezone.utc).isoformat()
+    if kind == KIND_EVENT:
+        event = json.loads(data.decode('utf-8'))
+        event['timestamp'] = timestamp
+        return event
+    return {
+        'type': KIND_NAMES.get(kind, 'unknown'),
+        'timestamp': timestamp,
+        'data': data.decode('utf-8', errors='replace')
+    }
+
+
+def encode_block(frames: List[Frame], codec: int = CODEC_ZLIB) -> bytes:
+    """Encode frames (in time order) into one compressed block."""
+    base_ms = frames[0][1] if frames else 0
+    parts = []
+    previous = base_ms
+    for kind, ts_ms, data in frames:
+        delta = max(0, ts_ms - previous)
+        previous = max(previous, ts_ms)
+        parts.append(FRAME_HEADER.pack(kind, delta, len(data)))
+        parts.append(data)
+    raw = b''.join(parts)
+
+    # Fastest levels - recordings are compressed inline on the Gate
+    if codec == CODEC_ZSTD:
+        payload = zstandard.ZstdCompressor(level=1).compress(raw)
+    elif codec == CODEC_ZLIB:
+        payload = zlib.compress(raw, 1)
+    else:
+        payload = raw
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, codec, base_ms, len(raw), len(payload)) + payload
+
+
+def _decompress(codec: int, payload: bytes, raw_len: int) -> bytes:
+    if codec == CODEC_NONE:
+        return payload
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RecordingFormatError("Recording uses zstd compression - install zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=raw_len)
+    raise RecordingFormatError(f"Unknown recording codec {codec}")
+
+
+def decode_block(codec: int, base_ms: int, raw_len: int, payload: bytes) -> Iterator[Frame]:
+    """Frames of one block."""
+    raw = _decompress(codec, payload, raw_len)
+    ts_ms = base_ms
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(raw):
+        kind, delta, length = FRAME_HEADER.unpack_from(raw, offset)
+        offset += FRAME_HEADER.size
+        ts_ms += delta
+        yield (kind, ts_ms, raw[offset:offset + length])
+        offset += length
+
+
+def iter_blocks(f: BinaryIO) -> Iterator[Tuple[int, int, int, bytes]]:
+    """(codec, base_ms, raw_len, payload) for every complete block after FILE_MAGIC.
+
+    A truncated last block (recording still being written) is ignored.
+    """
+    if f.tell() == 0 and f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise RecordingFormatError("Not a binary recording")
+    while True:
+        header = f.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            return
+        magic, codec, base_ms, raw_len, payload_len = BLOCK_HEADER.unpack(header)
+        if magic != BLOCK_MAGIC:
+            raise RecordingFormatError(f"Bad block magic at offset {f.tell() - BLOCK_HEADER.size}")
+        payload = f.read(payload_len)
+        if len(payload) < payload_len:
+            return
+        yield codec, base_ms, raw_len, payload
+
+
+def iter_frames(f: BinaryIO) -> Iterator[Frame]:
+    """All frames of a binary recording file."""
+    for codec, base_ms, raw_len, payload in iter_blocks(f):
+        yield from decode_block(codec, base_ms, raw_len, payload)
+
+
+def read_events(f: BinaryIO) -> List[dict]:
+    """All frames of a binary recording as JSONL-style event dicts."""
+    return [frame_to_event(*frame) for frame in iter_frames(f)]
+
+
+def pack_batch(entries: List[Tuple[str, int, bytes]]) -> bytes:
+    """Batch upload body for [(recording_path, chunk_index, data), ...]."""
+    parts = []
+    for path, chunk_index, data in entries:
+        path_bytes = path.encode('utf-8')
+        parts.append(BATCH_ENTRY_HEADER.pack(len(path_bytes), chunk_index, len(data)))
+        parts.append(path_bytes)
+        parts.append(data)
+    return b''.join(parts)
+
+
+def unpack_batch(body: bytes) -> Iterator[Tuple[str, int, bytes]]:
+    """(recording_path, chunk_index, data) for every entry of a batch upload body."""
+    offset = 0
+    while offset < len(body):
+        if offset + BATCH_ENTRY_HEADER.size > len(body):
+            raise RecordingFormatError("Truncated batch entry header")
+        path_len, chunk_index, data_len = BATCH_ENTRY_HEADER.unpack_from(body, offset)
+        offset += BATCH_ENTRY_HEADER.size
+        if offset + path_len + data_len > len(body):
+            raise RecordingFormatError("Truncated batch entry")
+        path = body[offset:offset + path_len].decode('utf-8')
+        offset += path_len
+        yield path, chunk_index, body[offset:offset + data_len]
+        offset += data_len
@@ -0,0 +1,303 @@
+"""Seekable index for SSH session recordings (JSONL and binary).
+
+Viewing a recording used to parse the whole file into memory. The index is a
+sidecar file (<recording>.idx) written in the background after Tower finalizes
+a recording (or on first view, if that comes first or for an older one); readers use it to decode only the events of a
+requested page or time window, streaming from the nearest checkpoint.
+
+Index layout:
+    INDEX_HEADER: magic, recording file size, indexed size, event count,
+                  checkpoint count, metadata length
+    event times: event count x EVENT_TIME (u32 ms since first event, non-decreasing)
+    checkpoints: checkpoint count x CHECKPOINT (byte offset, event number, elapsed ms)
+    metadata: JSON (format, base timestamp, session_start/session_end events)
+
+An event is a frame (binary) or a line starting with '{' (JSONL), numbered from
+0 in file order. Checkpoints are taken every CHECKPOINT_INTERVAL_MS or
+CHECKPOINT_EVENTS events, at block starts for binary recordings (blocks decode
+independently) and at line starts for JSONL.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from src.core import recording_format
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'INSIDE-IDX1\n'
+INDEX_HEADER = struct.Struct('>12sQQQII')
+EVENT_TIME = struct.Struct('>I')
+CHECKPOINT = struct.Struct('>QQI')
+
+CHECKPOINT_INTERVAL_MS = 10000
+CHECKPOINT_EVENTS = 1000
+
+# Fallback location when the recordings directory is not writable
+FALLBACK_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'inside-recording-index')
+
+_TIMESTAMP_RE = re.compile(rb'"timestamp":\s*"([^"]+)"')
+_META_TYPES = (b'"session_start"', b'"session_end"')
+
+
+def detect_format(header: bytes) -> Optional[str]:
+    """'binary', 'jsonl' or None (legacy JSON / raw recordings are not indexed)."""
+    if recording_format.is_binary_recording(header):
+        return 'binary'
+    first_line = header.split(b'\n')[0]
+    # Same detection as the session viewer (.rec files have a text header before JSONL)
+    if (first_line.startswith(b'{"type":') or b'"timestamp"' in first_line or
+            b'Session Recording' in header):
+        return 'jsonl'
+    return None
+
+
+def index_paths(recording_path: str) -> List[str]:
+    """Sidecar path and fallback path, in lookup order."""
+    digest = hashlib.sha1(recording_path.encode('utf-8')).hexdigest()
+    return [recording_path + '.idx', os.path.join(FALLBACK_INDEX_DIR, f'{digest}.idx')]
+
+
+def _parse_ms(value: bytes) -> Optional[int]:
+    try:
+        return recording_format.timestamp_ms(
+            datetime.fromisoformat(value.decode('ascii').replace('Z', '+00:00')))
+    except ValueError:
+        return None
+
+
+def _scan_binary(f: BinaryIO, end: list) -> Iterator[Tuple[int, bool, Optional[int], Optional[dict]]]:
+    """(unit offset, unit start, timestamp ms, metadata event) for every frame."""
+    f.seek(len(recording_format.FILE_MAGIC))
+    end[0] = f.tell()
+    offset = f.tell()
+    for codec, base_ms, raw_len, payload in recording_format.iter_blocks(f):
+        first = True
+        for kind, ts_ms, data in recording_format.decode_block(codec, base_ms, raw_len, payload):
+            event = None
+            if kind == recording_format.KIND_EVENT:
+                event = recording_format.frame_to_event(kind, ts_ms, data)
+            yield offset, first, ts_ms, event
+            first = False
+        offset = end[0] = f.tell()
+
+
+def _scan_jsonl(f: BinaryIO, end: list) -> Iterator[Tuple[int, bool, Optional[int], Optional[dict]]]:
+    """(line offset, True, timestamp ms, metadata event) for every complete JSON line."""
+    f.seek(0)
+    offset = 0
+    for line in f:
+        if not line.endswith(b'\n'):
+            break  # Line still being written
+        line_offset = offset
+        offset += len(line)
+        end[0] = offset
+        if not line.lstrip().startswith(b'{'):
+            continue
+        match = _TIMESTAMP_RE.search(line)
+        event = None
+        if any(t in line for t in _META_TYPES):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                pass
+        yield line_offset, True, _parse_ms(match.group(1)) if match else None, event
+
+
+def build_index(recording_path: str) -> Optional['RecordingIndex']:
+    """Scan a recording and write its index (sidecar, or fallback dir if not writable).
+
+    Returns:
+        RecordingIndex, or None if the recording is not JSONL/binary
+    """
+    with open(recording_path, 'rb') as f:
+        fmt = detect_format(f.read(500))
+        if fmt is None:
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+
+        for path in index_paths(recording_path):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                out = open(tmp_path, 'wb')
+                break
+            except OSError as e:
+                logger.debug(f"Cannot write recording index {path}: {e}")
+        else:
+            raise OSError(f"No writable location for index of {recording_path}")
+
+        try:
+            with out:
+                out.write(b'\0' * INDEX_HEADER.size)
+                end = [0]
+                scan = _scan_binary(f, end) if fmt == 'binary' else _scan_jsonl(f, end)
+                checkpoints = []
+                times = array('I')
+                count = 0
+                base_ms = None
+                elapsed = 0
+                meta = {'format': fmt, 'session_start': None, 'session_end': None}
+
+                for offset, unit_start, ts_ms, event in scan:
+                    if ts_ms is not None:
+                        if base_ms is None:
+                            base_ms = ts_ms
+                        # Non-decreasing, so event times can be bisected
+                        elapsed = max(elapsed, min(ts_ms - base_ms, 0xFFFFFFFF))
+                    if unit_start and (not checkpoints or
+                                       elapsed - checkpoints[-1][2] >= CHECKPOINT_INTERVAL_MS or
+                                       count - checkpoints[-1][1] >= CHECKPOINT_EVENTS):
+                        checkpoints.append((offset, count, elapsed))
+                    # Same metadata the viewer used: first event session_start, last event session_end
+                    event_type = event.get('type') if event else None
+                    if event_type == 'session_start' and count == 0:
+                        meta['session_start'] = event
+                    meta['session_end'] = event if event_type == 'session_end' else None
+                    times.append(elapsed)
+                    count += 1
+                    if len(times) >= 65536:
+                        out.write(_pack_times(times))
+                        times = array('I')
+
+                out.write(_pack_times(times))
+                for checkpoint in checkpoints:
+                    out.write(CHECKPOINT.pack(*checkpoint))
+                meta['base_ms'] = base_ms
+                meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+                out.write(meta_bytes)
+                out.seek(0)
+                out.write(INDEX_HEADER.pack(INDEX_MAGIC, file_size, end[0], count,
+                                            len(checkpoints), len(meta_bytes)))
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    logger.debug(f"Indexed recording {recording_path}: {count} events, {len(checkpoints)} checkpoints")
+    return RecordingIndex(path, recording_path)
+
+
+def _pack_times(times: array) -> bytes:
+    """Event times as big-endian EVENT_TIME records"""
+    if sys.byteorder == 'little':
+        times = array('I', times)
+        times.byteswap()
+    return times.tobytes()
+
+
+def get_index(recording_path: str, build: bool = True) -> Optional['RecordingIndex']:
+    """Index covering the current recording file (rebuilt if missing or stale).
+
+    Returns:
+        RecordingIndex, or None if the recording is not indexable
+    """
+    file_size = os.path.getsize(recording_path)
+    for path in index_paths(recording_path):
+        if os.path.exists(path):
+            try:
+                index = RecordingIndex(path, recording_path)
+                if index.file_size == file_size:
+                    return index
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable recording index {path}: {e}")
+    return build_index(recording_path) if build else None
+
+
+class _EventTimes:
+    """Event times read from the index file on demand (bisect-able sequence)"""
+
+    def __init__(self, f: BinaryIO, count: int):
+        self.f = f
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> int:
+        self.f.seek(INDEX_HEADER.size + i * EVENT_TIME.size)
+        return EVENT_TIME.unpack(self.f.read(EVENT_TIME.size))[0]
+
+
+class RecordingIndex:
+    """Loaded index header, checkpoints and metadata (event times stay on disk)"""
+
+    def __init__(self, path: str, recording_path: str):
+        self.path = path
+        self.recording_path = recording_path
+        with open(path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            if len(header) < INDEX_HEADER.size:
+                raise ValueError("Truncated recording index")
+            (magic, self.file_size, self.indexed_size, self.event_count,
+             checkpoint_count, meta_len) = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC:
+                raise ValueError("Not a recording index")
+            f.seek(INDEX_HEADER.size + self.event_count * EVENT_TIME.size)
+            data = f.read(checkpoint_count * CHECKPOINT.size)
+            self.checkpoints = [CHECKPOINT.unpack_from(data, i * CHECKPOINT.size)
+                                for i in range(checkpoint_count)]
+            self.meta = json.loads(f.read(meta_len))
+        self.format = self.meta['format']
+        self.base_ms = self.meta.get('base_ms')
+        self._checkpoint_events = [c[1] for c in self.checkpoints]
+
+    @property
+    def duration_ms(self) -> int:
+        return self.elapsed_ms(self.event_count - 1) if self.event_count else 0
+
+    def elapsed_ms(self, event_number: int) -> int:
+        """Milliseconds from the first event to event_number"""
+        with open(self.path, 'rb') as f:
+            return _EventTimes(f, self.event_count)[event_number]
+
+    def find_event(self, elapsed_ms: int) -> int:
+        """Number of the first event at or after elapsed_ms (event_count if none)"""
+        with open(self.path, 'rb') as f:
+            return bisect.bisect_left(_EventTimes(f, self.event_count), elapsed_ms)
+
+    def iter_events(self, first: int = 0, last: Optional[int] = None) -> Iterator[Tuple[int, Optional[dict]]]:
+        """(event number, event dict) for events first..last (inclusive), streamed from disk.
+
+        Unparseable JSONL lines keep their number and yield None.
+        """
+        if last is None or last >= self.event_count:
+            last = self.event_count - 1
+        if first > last or not self.checkpoints:
+            return
+
+        offset, number, _ = self.checkpoints[bisect.bisect_right(self._checkpoint_events, first) - 1]
+        with open(self.recording_path, 'rb') as f:
+            f.seek(offset)
+            for event in self._read_from(f):
+                if number > last:
+                    return
+                if number >= first:
+                    yield number, event
+                number += 1
+
+    def _read_from(self, f: BinaryIO) -> Iterator[Optional[dict]]:
+        if self.format == 'binary':
+            for frame in recording_format.iter_frames(f):
+                yield recording_format.frame_to_event(*frame)
+            return
+
+        for line in f:
+            if not line.lstrip().startswith(b'{'):
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                logger.warning(f"Invalid JSONL line in {self.recording_path}: {e}")
+                yield None
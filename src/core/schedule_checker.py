@@ -1,11 +1,256 @@
-"""Schedule checker - validates if current time matches policy schedule rules"""
-from datetime import datetime, time, timedelta
+"""Schedule checker - validates if current time matches policy schedule rules
+
+Schedules are evaluated by CompiledSchedule: filters are compiled once into
+weekday/month/day bitmasks with a cached tz object, and the compiled schedule
+answers is_open(t), current_window_end(t) and next_open(t). Windows are in the
+schedule's local wall time (DST aware); a window crossing midnight belongs to
+the local date it is on (22:00-02:00 on Fri = Fri 00:00-02:00 and Fri 22:00-24:00).
+matches_schedule() is the original dict-based check and stays as reference.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
 from typing import List, Optional
 import pytz
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Days scanned for the next window start/end (every filter combination repeats within this)
+MAX_SCAN_DAYS = 4 * 366 + 7
+
+# Per timezone name: (tz, offset change instants as naive UTC, offset in effect from each)
+_timezones = {}
+
+
+def _timezone(name: str):
+    """pytz timezone with its transition table, cached (tz.localize/astimezone per check are slow)"""
+    entry = _timezones.get(name)
+    if entry is None:
+        tz = pytz.timezone(name)
+        transitions = getattr(tz, '_utc_transition_times', None)
+        if transitions:
+            # Same tables pytz uses in fromutc()
+            entry = (tz, list(transitions), [info[0] for info in tz._transition_info])
+        else:
+            entry = (tz, [datetime.min], [tz.utcoffset(datetime(2000, 1, 1))])
+        _timezones[name] = entry
+    return entry
+
+
+def _bitmask(values, all_bits: int) -> int:
+    """Filter list to bitmask (bit N set = value N allowed), None/empty = all_bits"""
+    if not values:
+        return all_bits
+    mask = 0
+    for value in values:
+        if 0 <= value < 64:
+            mask |= 1 << value
+    return mask
+
+
+def _to_utc(check_time: Optional[datetime]) -> datetime:
+    """Naive UTC (database convention) from naive UTC, aware datetime or None (now)"""
+    if check_time is None:
+        return datetime.utcnow()
+    if check_time.tzinfo is not None:
+        return check_time.astimezone(pytz.utc).replace(tzinfo=None)
+    return check_time
+
+
+class CompiledSchedule:
+    """One schedule rule compiled for repeated evaluation
+
+    Usage:
+        compiled = CompiledSchedule(schedule_rule)   # or CompiledSchedule.from_row(PolicySchedule)
+        compiled.is_open(now)
+        compiled.current_window_end(now)   # naive UTC, None if closed or never closes
+        compiled.next_open(now)            # naive UTC, None if never opens
+
+    All times returned are naive UTC; check times may be naive UTC or aware.
+    """
+
+    __slots__ = ('name', 'is_active', 'tz', 'transitions', 'offsets', 'weekday_mask', 'month_mask',
+                 'day_mask', 'has_time', 'time_start', 'time_end', 'overnight', 'all_dates')
+
+    def __init__(self, schedule_rule: dict):
+        self.name = schedule_rule.get('name')
+        self.is_active = schedule_rule.get('is_active', True)
+        self.tz, self.transitions, self.offsets = _timezone(schedule_rule.get('timezone', 'Europe/Warsaw'))
+
+        self.weekday_mask = _bitmask(schedule_rule.get('weekdays'), 0b1111111)    # bits 0-6
+        self.month_mask = _bitmask(schedule_rule.get('months'), 0b1111111111110)  # bits 1-12
+        self.day_mask = _bitmask(schedule_rule.get('days_of_month'), (1 << 32) - 2)  # bits 1-31
+        self.all_dates = (self.weekday_mask & 0b1111111 == 0b1111111
+                          and self.month_mask & 0b1111111111110 == 0b1111111111110
+                          and self.day_mask & ((1 << 32) - 2) == (1 << 32) - 2)
+
+        time_start = schedule_rule.get('time_start')
+        time_end = schedule_rule.get('time_end')
+        self.has_time = time_start is not None or time_end is not None
+        self.time_start = time_start if time_start is not None else time(0, 0)
+        self.time_end = time_end if time_end is not None else time(23, 59, 59)
+        self.overnight = self.time_start > self.time_end
+
+    @classmethod
+    def from_row(cls, schedule) -> 'CompiledSchedule':
+        """Compile a PolicySchedule row"""
+        return cls({
+            'name': schedule.name,
+            'weekdays': schedule.weekdays,
+            'time_start': schedule.time_start,
+            'time_end': schedule.time_end,
+            'months': schedule.months,
+            'days_of_month': schedule.days_of_month,
+            'timezone': schedule.timezone,
+            'is_active': schedule.is_active
+        })
+
+    def __repr__(self):
+        return f"<CompiledSchedule {self.name!r} {self.tz.zone}>"
+
+    def _offset(self, utc: datetime) -> timedelta:
+        return self.offsets[max(bisect_right(self.transitions, utc) - 1, 0)]
+
+    def _local(self, utc: datetime) -> datetime:
+        """Naive UTC to naive local wall time"""
+        return utc + self._offset(utc)
+
+    def _date_ok(self, day: date) -> bool:
+        return bool((self.weekday_mask >> day.weekday()) & (self.month_mask >> day.month)
+                    & (self.day_mask >> day.day) & 1)
+
+    def _time_ok(self, moment: time) -> bool:
+        if not self.has_time:
+            return True
+        if self.overnight:
+            return moment >= self.time_start or moment <= self.time_end
+        return self.time_start <= moment <= self.time_end
+
+    def _wall_to_utc(self, wall: datetime, not_before: datetime) -> datetime:
+        """Earliest instant (naive UTC, >= not_before if possible) when local wall time reaches wall
+
+        Wall times repeated by a DST fall-back give the first occurrence not before
+        not_before; wall times skipped by spring-forward give the transition instant.
+        """
+        transitions, offsets = self.transitions, self.offsets
+        first = max(bisect_right(transitions, wall - timedelta(days=1)) - 1, 0)
+        last = bisect_right(transitions, wall + timedelta(days=1))
+
+        # Larger offset first = earlier instant
+        occurrences = [wall - offset for offset in sorted(set(offsets[first:last]), reverse=True)
+                       if self._offset(wall - offset) == offset]
+        if occurrences:
+            for occurrence in occurrences:
+                if occurrence >= not_before:
+                    return occurrence
+            return occurrences[-1]
+
+        # Skipped: the jump over it is a transition with wall before < wall <= wall after
+        for i in range(max(first, 1), last):
+            if transitions[i] + offsets[i - 1] <= wall < transitions[i] + offsets[i]:
+                return transitions[i]
+        return wall - offsets[first]
+
+    def is_open(self, check_time: Optional[datetime] = None) -> bool:
+        """Same result as matches_schedule(schedule_rule, check_time)"""
+        local = self._local(_to_utc(check_time))
+        return self._date_ok(local.date()) and self._time_ok(local.time())
+
+    def current_window_end(self, check_time: Optional[datetime] = None) -> Optional[datetime]:
+        """End of the window check_time is in (naive UTC)
+
+        The end is the instant the local wall clock reaches time_end (last open
+        moment), local midnight when the window runs into a day that does not
+        match the date filters, or a DST jump that moves the wall clock out of it.
+
+        Returns:
+            End of the window, None if closed at check_time or never closing
+        """
+        utc = _to_utc(check_time)
+        local = self._local(utc)
+        today = local.date()
+        if not (self._date_ok(today) and self._time_ok(local.time())):
+            return None
+
+        end = self._window_end(utc, today, local.time())
+        # A DST jump before that end can move the wall clock out of the window
+        for transition in self._transitions_between(utc, end):
+            if not self.is_open(transition):
+                return transition
+        return end
+
+    def _transitions_between(self, start: datetime, end: Optional[datetime]):
+        """Offset change instants in (start, end) - end None = next MAX_SCAN_DAYS"""
+        if end is None:
+            end = start + timedelta(days=MAX_SCAN_DAYS)
+        transitions = self.transitions
+        return transitions[bisect_right(transitions, start):bisect_left(transitions, end)]
+
+    def _window_end(self, utc: datetime, today: date, moment: time) -> Optional[datetime]:
+        if self.has_time:
+            if not self.overnight or moment <= self.time_end:
+                # Same-day range, or morning part of an overnight range
+                return self._wall_to_utc(datetime.combine(today, self.time_end), utc)
+            # Evening part of an overnight range - continues after midnight if tomorrow matches
+            tomorrow = today + timedelta(days=1)
+            if self._date_ok(tomorrow):
+                return self._wall_to_utc(datetime.combine(tomorrow, self.time_end), utc)
+            return self._wall_to_utc(datetime.combine(tomorrow, time(0, 0)), utc)
+
+        # Whole days - open until the first day not matching the date filters
+        if self.all_dates:
+            return None
+        day = today + timedelta(days=1)
+        for _ in range(MAX_SCAN_DAYS):
+            if not self._date_ok(day):
+                return self._wall_to_utc(datetime.combine(day, time(0, 0)), utc)
+            day += timedelta(days=1)
+        return None
+
+    def next_open(self, check_time: Optional[datetime] = None) -> Optional[datetime]:
+        """Earliest instant at or after check_time when the schedule is open (naive UTC)
+
+        Returns:
+            check_time itself if open, None if no window within MAX_SCAN_DAYS
+        """
+        utc = _to_utc(check_time)
+        local = self._local(utc)
+        if self._date_ok(local.date()) and self._time_ok(local.time()):
+            return utc
+
+        opens = self._next_start(utc, local)
+        # A DST jump (e.g. fall-back into the window again) can open it before that start
+        for transition in self._transitions_between(utc, opens):
+            if self.is_open(transition):
+                return transition
+        return opens
+
+    def _next_start(self, utc: datetime, local: datetime) -> Optional[datetime]:
+        day = local.date()
+        for offset in range(MAX_SCAN_DAYS):
+            if self._date_ok(day):
+                if offset == 0:
+                    # Today matches but the time does not - only a later start today can open
+                    # (also a start already passed but repeated by a DST fall-back)
+                    candidate = datetime.combine(day, self.time_start) if self.has_time else None
+                elif self.has_time and not self.overnight:
+                    candidate = datetime.combine(day, self.time_start)
+                else:
+                    # Whole day or overnight range - open from midnight
+                    candidate = datetime.combine(day, time(0, 0))
+                if candidate is not None:
+                    opens = self._wall_to_utc(candidate, utc)
+                    # A window entirely inside a DST gap never opens that day
+                    if opens >= utc and self.is_open(opens):
+                        return opens
+            day += timedelta(days=1)
+        return None
+
+
+def compile_schedules(schedules: List) -> List[CompiledSchedule]:
+    """Compile schedule dicts (already compiled schedules are kept as they are)"""
+    return [s if isinstance(s, CompiledSchedule) else CompiledSchedule(s) for s in schedules]
+
 
 def get_schedule_window_end(
     schedule_rule: dict,
@@ -15,7 +260,7 @@ def get_schedule_window_end(
     Get the end time of the current schedule window.
     
     Args:
-        schedule_rule: Dict with schedule configuration
+        schedule_rule: Dict with schedule configuration (or CompiledSchedule)
         check_time: Current time to check (default: now in UTC)
     
     Returns:
@@ -23,42 +268,13 @@ def get_schedule_window_end(
     
     Example:
         If schedule is Mon-Fri 8-16 and current time is Mon 10:00 Warsaw,
-        returns Mon 16:00 UTC (today at end of business hours)
+        returns Mon 16:00 UTC (today at end of business hours).
+        If schedule is Fri 22:00-02:00 and current time is Fri 23:00 Warsaw,
+        returns Sat 00:00 (Fri is allowed, Sat is not) - never a time in the past.
     """
-    if check_time is None:
-        check_time = datetime.utcnow()
-    
-    # First check if we're currently in a valid window
-    if not matches_schedule(schedule_rule, check_time):
-        return None
-    
-    # Convert to policy timezone
-    tz = pytz.timezone(schedule_rule.get('timezone', 'Europe/Warsaw'))
-    if check_time.tzinfo is None:
-        check_time = pytz.utc.localize(check_time)
-    
-    local_time = check_time.astimezone(tz)
-    
-    # Get time_end from schedule
-    time_end = schedule_rule.get('time_end')
-    if time_end is None:
-        time_end = time(23, 59, 59)
-    
-    # Create datetime for end of current window (today at time_end in policy timezone)
-    window_end_local = tz.localize(datetime(
-        local_time.year,
-        local_time.month,
-        local_time.day,
-        time_end.hour,
-        time_end.minute,
-        time_end.second
-    ))
-    
-    # Convert back to UTC
-    window_end_utc = window_end_local.astimezone(pytz.utc)
-    
-    # Remove timezone info to return naive datetime (for consistency with database)
-    return window_end_utc.replace(tzinfo=None)
+    if not isinstance(schedule_rule, CompiledSchedule):
+        schedule_rule = CompiledSchedule(schedule_rule)
+    return schedule_rule.current_window_end(check_time)
 
 
 def get_earliest_schedule_end(
@@ -69,7 +285,7 @@ def get_earliest_schedule_end(
     Get the earliest end time among all active schedule windows.
     
     Args:
-        schedules: List of schedule rules
+        schedules: List of schedule rules (dicts or CompiledSchedule)
         check_time: Current time to check
     
     Returns:
@@ -83,17 +299,51 @@ def get_earliest_schedule_end(
         return None
     
     end_times = []
-    for schedule in schedules:
-        if not schedule.get('is_active', True):
+    for schedule in compile_schedules(schedules):
+        if not schedule.is_active:
             continue
         
-        window_end = get_schedule_window_end(schedule, check_time)
+        window_end = schedule.current_window_end(check_time)
         if window_end:
             end_times.append(window_end)
     
     return min(end_times) if end_times else None
 
 
+def get_access_window_end(
+    schedules: List[dict],
+    check_time: Optional[datetime] = None,
+    max_windows: int = 8
+) -> Optional[datetime]:
+    """
+    Get the time access through a policy's schedules ends.
+
+    Schedules are OR-ed: windows that overlap or follow each other without a
+    gap are joined (Mon 8-16 + Mon 16-20 ends at 20:00, not 16:00).
+
+    Args:
+        schedules: List of schedule rules (dicts or CompiledSchedule)
+        check_time: Current time to check
+        max_windows: Joined windows followed at most
+
+    Returns:
+        End time (UTC), or None if no window is open, an open window never
+        closes or windows keep joining past max_windows
+    """
+    compiled = [s for s in compile_schedules(schedules or []) if s.is_active]
+    moment = _to_utc(check_time)
+    end = None
+    for _ in range(max_windows):
+        ends = [s.current_window_end(moment) for s in compiled if s.is_open(moment)]
+        if not ends:
+            return end
+        if None in ends:
+            return None
+        end = max(ends)
+        moment = end + timedelta(microseconds=1)
+    return None
+
+
 def matches_schedule(
     schedule_rule: dict,
     check_time: Optional[datetime] = None
@@ -188,7 +438,7 @@ def check_policy_schedules(
     Check if current time matches ANY of the policy schedules.
     
     Args:
-        schedules: List of schedule rule dicts
+        schedules: List of schedule rule dicts or CompiledSchedule objects
         check_time: Datetime to check (default: now)
     
     Returns:
@@ -224,12 +474,12 @@ def check_policy_schedules(
         return (True, None)
     
     # Check each schedule - if ANY matches, grant access
-    for schedule in schedules:
-        if not schedule.get('is_active', True):
+    for schedule in compile_schedules(schedules):
+        if not schedule.is_active:
             continue
             
-        if matches_schedule(schedule, check_time):
-            return (True, schedule.get('name', 'Unnamed schedule'))
+        if schedule.is_open(check_time):
+            return (True, schedule.name or 'Unnamed schedule')
     
     # No schedule matched
     return (False, None)
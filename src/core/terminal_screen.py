@@ -0,0 +1,608 @@
+"""Terminal screen emulator (VT100/xterm subset) for screen-state keyframes.
+
+Replaying raw output to show a session's current screen costs as much as the
+output that was replayed. TerminalScreen is fed the server output and keeps
+only the resulting screen: cell contents with their SGR attributes, cursor,
+scroll region and the alternate screen. render() turns that state into a short
+byte sequence that redraws the screen on any xterm-compatible terminal, so
+watchers (SessionMultiplexer, Tower web viewer) and recording playback jump
+to a keyframe and replay only the output that followed it.
+
+Supported: printable text (UTF-8, wide characters), C0 controls, cursor
+movement, erase/insert/delete of characters and lines, scroll regions, SGR
+(16/256/true colour), save/restore cursor, DEC autowrap and cursor visibility,
+alternate screen (47/1047/1049) and full reset. Other sequences (OSC titles,
+DCS, charsets, mouse and keypad modes, queries) are consumed and ignored.
+"""
+
+import codecs
+import re
+import unicodedata
+from typing import List, Optional
+
+DEFAULT_ROWS = 24
+DEFAULT_COLS = 80
+
+# Sequences left unterminated longer than this are dropped, not buffered
+MAX_PENDING_SEQUENCE = 4096
+
+_TOKEN_RE = re.compile(
+    r'(?P<text>[^\x00-\x1f\x7f-\x9f]+)'
+    r'|\x1b\[(?P<private>[?>=<!]?)(?P<params>[0-9;:]*)[ -/]*(?P<final>[@-~])'
+    r'|\x1b[\]P^_X][^\x07\x1b]*(?:\x07|\x1b\\)'
+    r'|\x1b[()*+\-./#%][\x20-\x7e]'
+    r'|\x1b(?P<esc>[^\[\]P^_X()*+\-./#%])'
+    r'|(?P<ctrl>[\x00-\x1a\x1c-\x1f\x7f-\x9f])'
+)
+# Start of an escape sequence that continues in the next chunk
+_PARTIAL_RE = re.compile(
+    r'\x1b(?:\[[?>=<!]?[0-9;:]*[ -/]*|[\]P^_X][^\x07\x1b]*\x1b?|[()*+\-./#%])?'
+)
+
+_ALT_SCREEN_MODES = ('47', '1047', '1049')
+
+# SGR parameter -> attribute slot it sets (0: intensity, 1: italic, ...)
+_SGR_FLAGS = {
+    1: (0, '1'), 2: (0, '2'), 22: (0, None),
+    3: (1, '3'), 23: (1, None),
+    4: (2, '4'), 24: (2, None),
+    5: (3, '5'), 25: (3, None),
+    7: (4, '7'), 27: (4, None),
+    8: (5, '8'), 28: (5, None),
+    9: (6, '9'), 29: (6, None),
+}
+_FG = 7
+_BG = 8
+_NO_ATTRS = (None,) * 9
+
+# (attributes, SGR params) -> resulting attributes; output reuses a few SGR sequences
+SGR_CACHE_SIZE = 4096
+_SGR_CACHE = {}
+
+
+def _char_width(char: str) -> int:
+    if unicodedata.combining(char):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+class TerminalScreen:
+    """Screen state of a terminal fed with its output"""
+
+    def __init__(self, rows: int = DEFAULT_ROWS, cols: int = DEFAULT_COLS):
+        self.rows = max(1, rows or DEFAULT_ROWS)
+        self.cols = max(1, cols or DEFAULT_COLS)
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._pending = ''
+        self.reset()
+
+    def reset(self):
+        """Full reset (RIS): clear both screens, default attributes and modes"""
+        self.chars = self._blank_rows(self.rows)
+        self.attrs = self._blank_attr_rows(self.rows)
+        self.cursor_row = 0
+        self.cursor_col = 0
+        self.wrap_pending = False
+        self.sgr = _NO_ATTRS
+        self.attr = ''
+        self.scroll_top = 0
+        self.scroll_bottom = self.rows - 1
+        self.autowrap = True
+        self.cursor_visible = True
+        self.saved_cursor = None
+        self.alt_screen = False
+        self._main = None  # Main screen while the alternate screen is shown
+        self._last_char = ' '
+
+    # ------------------------------------------------------------------
+    # Input
+
+    def feed(self, data: bytes):
+        """Process terminal output (escape sequences may be split across calls)"""
+        text = self._pending + self._decoder.decode(data)
+        self._pending = ''
+        position = 0
+        end = len(text)
+        match_token = _TOKEN_RE.match
+        while position < end:
+            match = match_token(text, position)
+            if match is None:
+                # Incomplete escape sequence - wait for the rest (invalid ones are skipped)
+                if end - position <= MAX_PENDING_SEQUENCE and _PARTIAL_RE.fullmatch(text, position):
+                    self._pending = text[position:]
+                    return
+                position += 1
+                continue
+            position = match.end()
+            kind = match.lastgroup
+            if kind == 'text':
+                self._draw(match.group(kind))
+            elif kind == 'final':
+                private, params, final = match.group('private', 'params', 'final')
+                if final == 'm' and not private:
+                    self._sgr(params)
+                else:
+                    self._csi(private, params, final)
+            elif kind == 'ctrl':
+                char = match.group(kind)
+                # Most frequent controls handled inline
+                if char == '\r':
+                    self.cursor_col = 0
+                    self.wrap_pending = False
+                elif char == '\n':
+                    self._linefeed()
+                    self.wrap_pending = False
+                else:
+                    self._control(char)
+            elif kind == 'esc':
+                self._escape(match.group(kind))
+
+    def resize(self, rows: int, cols: int):
+        """Terminal window changed: keep the top-left of the screen, clamp the cursor"""
+        rows = max(1, rows or DEFAULT_ROWS)
+        cols = max(1, cols or DEFAULT_COLS)
+        if (rows, cols) == (self.rows, self.cols):
+            return
+        # Rows below the cursor are cut first, then rows leave at the top (as in xterm)
+        drop = max(0, self.cursor_row - (rows - 1))
+        screens = [(self.chars, self.attrs)]
+        if self._main:
+            screens.append((self._main['chars'], self._main['attrs']))
+        for chars, attrs in screens:
+            del chars[:drop]
+            del attrs[:drop]
+            del chars[rows:]
+            del attrs[rows:]
+            chars.extend(self._blank_rows(rows - len(chars), cols))
+            attrs.extend(self._blank_attr_rows(rows - len(attrs), cols))
+            for row in range(rows):
+                if cols < len(chars[row]):
+                    del chars[row][cols:]
+                    del attrs[row][cols:]
+                else:
+                    chars[row].extend(' ' * (cols - len(chars[row])))
+                    attrs[row].extend([''] * (cols - len(attrs[row])))
+        self.cursor_row -= drop
+        if self._main and self._main['cursor']:
+            self._main['cursor'] = self._clamp_cursor_state(self._main['cursor'], drop, rows, cols)
+        if self.saved_cursor:
+            self.saved_cursor = self._clamp_cursor_state(self.saved_cursor, drop, rows, cols)
+        self.rows = rows
+        self.cols = cols
+        self.cursor_row = min(self.cursor_row, rows - 1)
+        self.cursor_col = min(self.cursor_col, cols - 1)
+        self.scroll_top = 0
+        self.scroll_bottom = rows - 1
+        self.wrap_pending = False
+
+    # ------------------------------------------------------------------
+    # Output
+
+    def render(self) -> bytes:
+        """Escape sequences that redraw this screen on an xterm-compatible terminal"""
+        out = ['\x1b[0m\x1b[r\x1b[H\x1b[2J']
+        if self.alt_screen:
+            # Main screen first, so it is back when the full-screen program exits
+            self._render_rows(out, self._main['chars'], self._main['attrs'])
+            cursor = self._main['cursor'] or (0, 0)
+            out.append(f'\x1b[0m\x1b[{cursor[0] + 1};{cursor[1] + 1}H\x1b[?1049h\x1b[H\x1b[2J')
+        self._render_rows(out, self.chars, self.attrs)
+        if (self.scroll_top, self.scroll_bottom) != (0, self.rows - 1):
+            out.append(f'\x1b[{self.scroll_top + 1};{self.scroll_bottom + 1}r')
+        out.append(f'\x1b[{self.cursor_row + 1};{self.cursor_col + 1}H')
+        if self.wrap_pending:
+            # Redraw the last cell so the terminal waits to wrap, as this screen does
+            row = self.cursor_row
+            chars = self._display_row(self.chars[row])
+            col = self.cursor_col - 1 if chars[self.cursor_col] == '' else self.cursor_col
+            out.append(f'\x1b[{row + 1};{col + 1}H\x1b[0;{self.attrs[row][col]}m{chars[col]}\x1b[0m')
+        if self.attr:
+            out.append(f'\x1b[0;{self.attr}m')
+        if not self.autowrap:
+            out.append('\x1b[?7l')
+        if not self.cursor_visible:
+            out.append('\x1b[?25l')
+        return ''.join(out).encode('utf-8')
+
+    def _render_rows(self, out: List[str], screen_chars: List[list], screen_attrs: List[list]):
+        for row in range(self.rows):
+            chars = self._display_row(screen_chars[row])
+            attrs = screen_attrs[row]
+            last = self.cols - 1
+            while last >= 0 and chars[last] == ' ' and not attrs[last]:
+                last -= 1
+            if last < 0:
+                continue
+            out.append(f'\x1b[{row + 1}H')
+            current = ''
+            run = []
+            for col in range(last + 1):
+                attr = attrs[col]
+                if attr != current:
+                    out.append(''.join(run))
+                    run = []
+                    out.append(f'\x1b[0;{attr}m' if attr else '\x1b[0m')
+                    current = attr
+                run.append(chars[col])
+            out.append(''.join(run))
+            if current:
+                out.append('\x1b[0m')
+
+    @staticmethod
+    def _display_row(chars: list) -> list:
+        """Row as displayed: half of a partly overwritten wide character shows blank"""
+        if '' not in chars and ''.join(chars).isascii():
+            return chars
+        chars = list(chars)
+        last = len(chars) - 1
+        for col, char in enumerate(chars):
+            if char == '':
+                if not col or not chars[col - 1] or _char_width(chars[col - 1]) != 2:
+                    chars[col] = ' '
+            elif not char.isascii() and _char_width(char) == 2 and (col == last or chars[col + 1] != ''):
+                chars[col] = ' '
+        return chars
+
+    def text_lines(self) -> List[str]:
+        """Screen contents as plain text, one string per row"""
+        return [''.join(self._display_row(chars)).rstrip() for chars in self.chars]
+
+    def to_dict(self) -> dict:
+        """Keyframe as JSON-serializable dict"""
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'cursor': [self.cursor_row, self.cursor_col],
+            'alt_screen': self.alt_screen,
+            'lines': self.text_lines(),
+            'screen': self.render().decode('utf-8')
+        }
+
+    # ------------------------------------------------------------------
+    # Drawing
+
+    def _blank_rows(self, count: int, cols: Optional[int] = None) -> List[list]:
+        return [[' '] * (cols or self.cols) for _ in range(count)]
+
+    def _blank_attr_rows(self, count: int, cols: Optional[int] = None) -> List[list]:
+        return [[''] * (cols or self.cols) for _ in range(count)]
+
+    def _draw(self, text: str):
+        if not text.isascii():
+            self._draw_wide(text)
+            return
+        self._last_char = text[-1]
+        cols = self.cols
+        attr = self.attr
+        col = self.cursor_col
+        count = len(text)
+        if not self.wrap_pending and col + count < cols:
+            # Fits on the current row
+            self.chars[self.cursor_row][col:col + count] = text
+            self.attrs[self.cursor_row][col:col + count] = [attr] * count
+            self.cursor_col = col + count
+            return
+        while text:
+            if self.wrap_pending:
+                if not self.autowrap:
+                    text = text[-1]
+                    self.cursor_col = cols - 1
+                else:
+                    self.cursor_col = 0
+                    self._linefeed()
+                self.wrap_pending = False
+            col = self.cursor_col
+            count = min(len(text), cols - col)
+            self.chars[self.cursor_row][col:col + count] = text[:count]
+            self.attrs[self.cursor_row][col:col + count] = [attr] * count
+            text = text[count:]
+            if col + count >= cols:
+                self.cursor_col = cols - 1
+                self.wrap_pending = True
+            else:
+                self.cursor_col = col + count
+
+    def _draw_wide(self, text: str):
+        """Character by character (wide and combining characters)"""
+        for char in text:
+            width = _char_width(char)
+            if width == 0:
+                continue
+            if width == 2 and self.cursor_col == self.cols - 1 and self.autowrap:
+                self.wrap_pending = True
+            if self.wrap_pending:
+                if self.autowrap:
+                    self.cursor_col = 0
+                    self._linefeed()
+                self.wrap_pending = False
+            if width > self.cols - self.cursor_col:
+                char, width = ' ', 1
+            row = self.cursor_row
+            col = self.cursor_col
+            self.chars[row][col] = char
+            self.attrs[row][col] = self.attr
+            if width == 2:
+                self.chars[row][col + 1] = ''  # Covered by the wide character
+                self.attrs[row][col + 1] = self.attr
+            self._last_char = char
+            if col + width >= self.cols:
+                self.cursor_col = self.cols - 1
+                self.wrap_pending = True
+            else:
+                self.cursor_col = col + width
+
+    def _linefeed(self):
+        if self.cursor_row == self.scroll_bottom:
+            self._scroll_up(1)
+        elif self.cursor_row < self.rows - 1:
+            self.cursor_row += 1
+
+    def _reverse_index(self):
+        if self.cursor_row == self.scroll_top:
+            self._scroll_down(1)
+        elif self.cursor_row > 0:
+            self.cursor_row -= 1
+
+    def _scroll_up(self, count: int, top: Optional[int] = None):
+        top = self.scroll_top if top is None else top
+        bottom = self.scroll_bottom
+        if count == 1:
+            self.chars.insert(bottom + 1, [' '] * self.cols)
+            self.attrs.insert(bottom + 1, [''] * self.cols)
+            del self.chars[top]
+            del self.attrs[top]
+            return
+        count = min(count, bottom - top + 1)
+        del self.chars[top:top + count]
+        del self.attrs[top:top + count]
+        self.chars[bottom - count + 1:bottom - count + 1] = self._blank_rows(count)
+        self.attrs[bottom - count + 1:bottom - count + 1] = self._blank_attr_rows(count)
+
+    def _scroll_down(self, count: int, top: Optional[int] = None):
+        top = self.scroll_top if top is None else top
+        bottom = self.scroll_bottom
+        count = min(count, bottom - top + 1)
+        del self.chars[bottom - count + 1:bottom + 1]
+        del self.attrs[bottom - count + 1:bottom + 1]
+        self.chars[top:top] = self._blank_rows(count)
+        self.attrs[top:top] = self._blank_attr_rows(count)
+
+    def _erase(self, row: int, start: int, end: int):
+        """Blank columns start..end-1 of row (with the current background)"""
+        self.chars[row][start:end] = ' ' * (end - start)
+        self.attrs[row][start:end] = [self._erase_attr()] * (end - start)
+
+    def _erase_attr(self) -> str:
+        background = self.sgr[_BG]
+        return background or ''
+
+    def _move(self, row: int, col: int):
+        self.cursor_row = min(max(row, 0), self.rows - 1)
+        self.cursor_col = min(max(col, 0), self.cols - 1)
+        self.wrap_pending = False
+
+    # ------------------------------------------------------------------
+    # Controls and escape sequences
+
+    def _control(self, char: str):
+        if char in '\n\x0b\x0c':
+            self._linefeed()
+            self.wrap_pending = False
+        elif char == '\r':
+            self.cursor_col = 0
+            self.wrap_pending = False
+        elif char == '\x08':
+            if self.cursor_col > 0:
+                self.cursor_col -= 1
+            self.wrap_pending = False
+        elif char == '\t':
+            self.cursor_col = min(self.cols - 1, (self.cursor_col // 8 + 1) * 8)
+            self.wrap_pending = False
+        elif char == '\x84':
+            self._linefeed()
+        elif char == '\x8d':
+            self._reverse_index()
+
+    def _escape(self, char: str):
+        if char == '7':
+            self._save_cursor()
+        elif char == '8':
+            self._restore_cursor()
+        elif char == 'D':
+            self._linefeed()
+            self.wrap_pending = False
+        elif char == 'E':
+            self._linefeed()
+            self._move(self.cursor_row, 0)
+        elif char == 'M':
+            self._reverse_index()
+            self.wrap_pending = False
+        elif char == 'c':
+            self.reset()
+
+    def _cursor_state(self) -> tuple:
+        return (self.cursor_row, self.cursor_col, self.sgr, self.attr, self.wrap_pending)
+
+    def _set_cursor_state(self, state: tuple):
+        row, col, self.sgr, self.attr, wrap_pending = state
+        self._move(row, col)
+        self.wrap_pending = wrap_pending
+
+    @staticmethod
+    def _clamp_cursor_state(state: tuple, drop: int, rows: int, cols: int) -> tuple:
+        row, col, sgr, attr, wrap_pending = state
+        return (min(max(0, row - drop), rows - 1), min(col, cols - 1), sgr, attr, wrap_pending and col < cols)
+
+    def _save_cursor(self):
+        self.saved_cursor = self._cursor_state()
+
+    def _restore_cursor(self):
+        if self.saved_cursor is None:
+            self._move(0, 0)
+            return
+        self._set_cursor_state(self.saved_cursor)
+
+    def _csi(self, private: str, params: str, final: str):
+        if private:
+            if private == '?' and final in 'hl':
+                self._dec_mode(params.split(';'), final == 'h')
+            return
+        args = [int(p) if p.isdigit() else 0 for p in params.replace(':', ';').split(';')] if params else []
+        first = args[0] if args else 0
+        count = first or 1
+        row = self.cursor_row
+        col = self.cursor_col
+
+        if final == 'H' or final == 'f':
+            self._move((first or 1) - 1, (args[1] if len(args) > 1 and args[1] else 1) - 1)
+        elif final == 'A':
+            self._move(max(row - count, self.scroll_top if row >= self.scroll_top else 0), col)
+        elif final in 'Be':
+            self._move(min(row + count, self.scroll_bottom if row <= self.scroll_bottom else self.rows - 1), col)
+        elif final in 'Ca':
+            self._move(row, col + count)
+        elif final == 'D':
+            self._move(row, col - count)
+        elif final == 'E':
+            self._move(row + count, 0)
+        elif final == 'F':
+            self._move(row - count, 0)
+        elif final in 'G`':
+            self._move(row, count - 1)
+        elif final == 'd':
+            self._move(count - 1, col)
+        elif final == 'J':
+            if first == 0:
+                self._erase(row, col, self.cols)
+                for other in range(row + 1, self.rows):
+                    self._erase(other, 0, self.cols)
+            elif first == 1:
+                for other in range(row):
+                    self._erase(other, 0, self.cols)
+                self._erase(row, 0, col + 1)
+            elif first in (2, 3):
+                for other in range(self.rows):
+                    self._erase(other, 0, self.cols)
+        elif final == 'K':
+            if first == 0:
+                self._erase(row, col, self.cols)
+            elif first == 1:
+                self._erase(row, 0, col + 1)
+            elif first == 2:
+                self._erase(row, 0, self.cols)
+        elif final in 'LM':
+            if self.scroll_top <= row <= self.scroll_bottom:
+                if final == 'L':
+                    self._scroll_down(count, row)
+                else:
+                    self._scroll_up(count, row)
+                self._move(row, 0)
+        elif final == '@':
+            count = min(count, self.cols - col)
+            chars = self.chars[row]
+            attrs = self.attrs[row]
+            chars[col:col] = ' ' * count
+            attrs[col:col] = [self._erase_attr()] * count
+            del chars[self.cols:]
+            del attrs[self.cols:]
+            self.wrap_pending = False
+        elif final == 'P':
+            count = min(count, self.cols - col)
+            chars = self.chars[row]
+            attrs = self.attrs[row]
+            del chars[col:col + count]
+            del attrs[col:col + count]
+            chars.extend(' ' * count)
+            attrs.extend([self._erase_attr()] * count)
+            self.wrap_pending = False
+        elif final == 'X':
+            self._erase(row, col, min(self.cols, col + count))
+            self.wrap_pending = False
+        elif final == 'S':
+            self._scroll_up(count)
+        elif final == 'T':
+            self._scroll_down(count)
+        elif final == 'b':
+            self._draw(self._last_char * min(count, self.rows * self.cols))
+        elif final == 'r':
+            top = (first or 1) - 1
+            bottom = min(args[1] if len(args) > 1 and args[1] else self.rows, self.rows) - 1
+            if top < bottom:
+                self.scroll_top = top
+                self.scroll_bottom = bottom
+                self._move(0, 0)
+        elif final == 's':
+            self._save_cursor()
+        elif final == 'u':
+            self._restore_cursor()
+
+    def _dec_mode(self, modes: List[str], enable: bool):
+        for mode in modes:
+            if mode == '7':
+                self.autowrap = enable
+            elif mode == '25':
+                self.cursor_visible = enable
+            elif mode in _ALT_SCREEN_MODES:
+                self._switch_screen(enable, save_cursor=mode == '1049')
+
+    def _switch_screen(self, alternate: bool, save_cursor: bool):
+        if alternate == self.alt_screen:
+            return
+        if alternate:
+            # 1049 saves the cursor with the main screen (separately from DECSC)
+            cursor = self._cursor_state() if save_cursor else None
+            self._main = {'chars': self.chars, 'attrs': self.attrs, 'cursor': cursor}
+            self.chars = self._blank_rows(self.rows)
+            self.attrs = self._blank_attr_rows(self.rows)
+        else:
+            self.chars = self._main['chars']
+            self.attrs = self._main['attrs']
+            if save_cursor and self._main['cursor']:
+                self._set_cursor_state(self._main['cursor'])
+            self._main = None
+        self.alt_screen = alternate
+
+    def _sgr(self, params: str):
+        """Update current attributes (kept normalized, so equal looks compare equal)"""
+        key = (self.sgr, params)
+        cached = _SGR_CACHE.get(key)
+        if cached is None:
+            cached = _SGR_CACHE[key] = self._parse_sgr(params)
+            if len(_SGR_CACHE) > SGR_CACHE_SIZE:
+                _SGR_CACHE.clear()
+        self.sgr, self.attr = cached
+
+    def _parse_sgr(self, params: str) -> tuple:
+        """(attribute slots, attribute string) after applying SGR params"""
+        values = [int(p) if p.isdigit() else 0 for p in re.split('[;:]', params)] if params else [0]
+        sgr = list(self.sgr)
+        i = 0
+        while i < len(values):
+            value = values[i]
+            if value == 0:
+                sgr = list(_NO_ATTRS)
+            elif value in _SGR_FLAGS:
+                slot, code = _SGR_FLAGS[value]
+                sgr[slot] = code
+            elif 30 <= value <= 37 or 90 <= value <= 97:
+                sgr[_FG] = str(value)
+            elif 40 <= value <= 47 or 100 <= value <= 107:
+                sgr[_BG] = str(value)
+            elif value == 39:
+                sgr[_FG] = None
+            elif value == 49:
+                sgr[_BG] = None
+            elif value in (38, 48):
+                slot = _FG if value == 38 else _BG
+                mode = values[i + 1] if i + 1 < len(values) else None
+                if mode == 5 and i + 2 < len(values):
+                    sgr[slot] = f'{value};5;{values[i + 2]}'
+                    i += 2
+                elif mode == 2 and i + 4 < len(values):
+                    sgr[slot] = f'{value};2;{values[i + 2]};{values[i + 3]};{values[i + 4]}'
+                    i += 4
+                else:
+                    i = len(values)
+            i += 1
+        sgr = tuple(sgr)
+        return sgr, ';'.join(code for code in sgr if code)
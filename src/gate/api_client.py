@@ -4,20 +4,31 @@ Gate uses this client to communicate with Tower API.
 Never touches PostgreSQL directly - always uses Tower REST API.
 """
 
+import re
 import time
 import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 from src.gate.config import get_config
+from src.gate.grant_cache import get_grant_cache
 
 logger = logging.getLogger(__name__)
 
 
 class TowerAPIError(Exception):
-    """Base exception for Tower API errors."""
-    pass
+    """Base exception for Tower API errors.
+    
+    Attributes:
+        status_code: HTTP status of Tower's error response (None if no response)
+    """
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class TowerUnreachableError(TowerAPIError):
@@ -30,11 +41,73 @@ class TowerAuthError(TowerAPIError):
     pass
 
 
+# Latency histogram bucket upper bounds (ms); the last bucket is everything slower
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Path segments that are IDs/tokens (digits, or 8+ chars with a digit) - one histogram per endpoint
+_ID_SEGMENT_RE = re.compile(r'/(?:\d+|(?=[^/]*\d)[^/]{8,})(?=/|$)')
+
+
+class LatencyHistogram:
+    """Request latency histogram per endpoint (thread-safe)."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+    
+    def record(self, endpoint: str, elapsed_ms: float, error: bool = False):
+        bucket = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = i
+                break
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                }
+            stats['count'] += 1
+            stats['errors'] += error
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['buckets'][bucket] += 1
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per endpoint: count, errors, avg/max and approximate p50/p90/p99 (bucket bounds, ms)"""
+        with self._lock:
+            endpoints = {name: dict(stats, buckets=list(stats['buckets'])) for name, stats in self._endpoints.items()}
+        result = {}
+        for name, stats in endpoints.items():
+            count = stats['count']
+            summary = {
+                'count': count,
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total_ms'] / count, 1),
+                'max_ms': round(stats['max_ms'], 1),
+                'buckets': dict(zip([str(b) for b in LATENCY_BUCKETS_MS] + ['inf'], stats['buckets']))
+            }
+            for label, quantile in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p99_ms', 0.99)):
+                seen = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS_MS + (None,), stats['buckets']):
+                    seen += bucket_count
+                    if seen >= quantile * count:
+                        summary[label] = bound if bound is not None else summary['max_ms']
+                        break
+            result[name] = summary
+        return result
+
+
 class TowerClient:
     """Client for Tower REST API.
     
+    Thread-safe: one instance (get_client()) is shared by all sessions of a gate
+    process, so logins reuse pooled keep-alive connections to Tower instead of
+    paying a TCP+TLS handshake each.
+    
     Usage:
-        client = TowerClient()
+        client = get_client()
         result = client.check_grant(username='jan.kowalski', server='srv-prod-01', protocol='ssh')
         if result['allowed']:
             stay_id = client.start_stay(...)
@@ -54,14 +127,37 @@ class TowerClient:
             'User-Agent': f'Inside-Gate/{self.config.version} ({self.config.gate_name})'
         })
         
+        # One pool per Tower host, sized for concurrent logins (requests' default is 10)
+        pool_size = getattr(self.config, 'api_pool_size', 32)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.latency = LatencyHistogram()
+        
         # Disable SSL verification if configured (dev only!)
         if not self.config.verify_ssl:
             self.session.verify = False
             import urllib3
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
     
+    def _timeout(self, endpoint: str) -> float:
+        """Timeout for an endpoint: longest matching [api_timeouts] prefix, else api_timeout"""
+        path = endpoint.split('?', 1)[0]
+        if path.startswith('/api/v1/'):
+            path = path[len('/api/v1/'):]
+        best = None
+        for prefix, timeout in getattr(self.config, 'api_timeouts', {}).items():
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+                best = (prefix, timeout)
+        return best[1] if best else self.config.api_timeout
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Tower API latency per endpoint (see LatencyHistogram.snapshot)"""
+        return self.latency.snapshot()
+    
     def _request(self, method: str, endpoint: str, data: Optional[Dict] = None, 
-                 params: Optional[Dict] = None, retry: bool = True) -> Dict[str, Any]:
+                 params: Optional[Dict] = None, retry: bool = True,
+                 body: Optional[bytes] = None) -> Dict[str, Any]:
         """Make HTTP request to Tower API with retry logic.
         
         Args:
@@ -70,6 +166,7 @@ class TowerClient:
             data: JSON body for POST/PUT
             params: Query parameters for GET
             retry: Enable retry with exponential backoff
+            body: Raw application/octet-stream body (instead of data)
         
         Returns:
             Response JSON as dict
@@ -80,25 +177,42 @@ class TowerClient:
             TowerAPIError: Other API errors
         """
         url = f"{self.config.tower_url}{endpoint}"
+        timeout = self._timeout(endpoint)
+        histogram_key = f"{method} {_ID_SEGMENT_RE.sub('/:id', endpoint)}"
         
         attempts = self.config.api_retry_attempts if retry else 1
         backoff = 1.0
         
         for attempt in range(attempts):
+            started = time.monotonic()
             try:
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    json=data,
-                    params=params,
-                    timeout=self.config.api_timeout
-                )
+                if body is not None:
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        data=body,
+                        params=params,
+                        headers={'Content-Type': 'application/octet-stream'},
+                        timeout=timeout
+                    )
+                else:
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        json=data,
+                        params=params,
+                        timeout=timeout
+                    )
+                
+                self.latency.record(histogram_key, (time.monotonic() - started) * 1000,
+                                    error=response.status_code >= 400)
                 
                 # Check for auth errors
                 if response.status_code in [401, 403]:
                     error_data = response.json() if response.content else {}
                     raise TowerAuthError(
-                        f"Authentication failed: {error_data.get('message', response.text)}"
+                        f"Authentication failed: {error_data.get('message', response.text)}",
+                        status_code=response.status_code
                     )
                 
                 # Check for other HTTP errors
@@ -106,13 +220,15 @@ class TowerClient:
                     error_data = response.json() if response.content else {}
                     raise TowerAPIError(
                         f"Tower API error {response.status_code}: "
-                        f"{error_data.get('message', response.text)}"
+                        f"{error_data.get('message', response.text)}",
+                        status_code=response.status_code
                     )
                 
                 # Success
                 return response.json() if response.content else {}
             
             except (requests.ConnectionError, requests.Timeout) as e:
+                self.latency.record(histogram_key, (time.monotonic() - started) * 1000, error=True)
                 if attempt < attempts - 1:
                     logger.warning(
                         f"Tower API request failed (attempt {attempt + 1}/{attempts}): {e}. "
@@ -125,8 +241,8 @@ class TowerClient:
                         f"Tower unreachable after {attempts} attempts: {e}"
                     )
             
-            except TowerAuthError:
-                # Don't retry auth errors
+            except TowerAPIError:
+                # Don't retry auth/HTTP errors (and keep their status_code)
                 raise
             
             except Exception as e:
@@ -138,9 +254,13 @@ class TowerClient:
     
     def check_grant(self, source_ip: str, destination_ip: str, protocol: str, 
                     ssh_login: Optional[str] = None, ssh_key_fingerprint: Optional[str] = None,
-                    mfa_token: Optional[str] = None) -> Dict[str, Any]:
+                    mfa_token: Optional[str] = None, use_cache: bool = True) -> Dict[str, Any]:
         """Check if connection is allowed via Tower API.
         
+        Repeat checks are answered from the gate grant cache (if enabled).
+        MFA challenge results are never cached. When Tower is unreachable,
+        cached decisions are served for offline_cache_duration.
+        
         Args:
             source_ip: Client source IP address
             destination_ip: Destination IP (proxy IP on gate)
@@ -148,6 +268,7 @@ class TowerClient:
             ssh_login: SSH login name (required for SSH)
             ssh_key_fingerprint: SSH key SHA256 fingerprint for MFA session persistence
             mfa_token: Verified MFA challenge token (proof of authentication)
+            use_cache: Answer from grant cache if possible (False = always ask Tower)
         
         Returns:
             {
@@ -156,7 +277,8 @@ class TowerClient:
                 'server': dict,  # Backend server info if allowed
                 'reason': str,
                 'denial_reason': str,  # If denied
-                'port_forwarding_allowed': bool
+                'port_forwarding_allowed': bool,
+                'cacheable': bool  # Tower allows answering this from the grant cache
             }
         
         Raises:
@@ -175,12 +297,24 @@ class TowerClient:
         if mfa_token:
             data['mfa_token'] = mfa_token
         
+        cache = get_grant_cache() if not mfa_token else None
+        cache_key = None
+        if cache:
+            cache_key = cache.make_key(source_ip, destination_ip, protocol, ssh_login, ssh_key_fingerprint)
+            if use_cache:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    logger.debug(f"Grant check (cached): {source_ip} -> {destination_ip} ({protocol})")
+                    return cached
+        
         try:
             response = self._request('POST', '/api/v1/auth/check', data=data)
             logger.info(
                 f"Grant check: {source_ip} -> {destination_ip} ({protocol}): "
                 f"{'ALLOWED' if response.get('allowed') else 'DENIED'}"
             )
+            if cache_key and not response.get('mfa_required'):
+                cache.put(cache_key, response)
             return response
         
         except TowerAuthError as e:
@@ -197,6 +331,8 @@ class TowerClient:
                         f"Grant check: {source_ip} -> {destination_ip} ({protocol}): "
                         f"DENIED - {error_data.get('denial_reason', error_data.get('reason', 'unknown'))}"
                     )
+                    if cache_key and not error_data.get('mfa_required'):
+                        cache.put(cache_key, error_data)
                     return error_data
             except Exception as parse_err:
                 logger.error(f"Failed to parse denial response: {parse_err}")
@@ -208,6 +344,17 @@ class TowerClient:
                 'details': str(e)
             }
         
+        except TowerUnreachableError as e:
+            cached = cache.get_offline(cache_key) if cache_key else None
+            if cached is not None:
+                logger.warning(
+                    f"Tower unreachable - using cached decision for "
+                    f"{source_ip} -> {destination_ip} ({protocol})"
+                )
+                return cached
+            logger.error(f"Grant check failed: {e}")
+            raise
+        
         except TowerAPIError as e:
             logger.error(f"Grant check failed: {e}")
             raise
@@ -277,6 +424,22 @@ class TowerClient:
         response = self._request('GET', f'/api/v1/mfa/status/{token}', retry=False)
         return response
     
+    def check_mfa_statuses(self, tokens: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Check verification status of many MFA challenges in one request.
+        
+        Args:
+            tokens: MFA tokens of challenges created by this Gate
+        
+        Returns:
+            {token: {'verified': bool, 'expired': bool, 'user_id': int, ...}}
+            Unknown or cancelled tokens: {'verified': False, 'error': 'invalid_token'}
+        
+        Raises:
+            TowerUnreachableError: Tower not reachable
+        """
+        response = self._request('POST', '/api/v1/mfa/status', data={'tokens': list(tokens)}, retry=False)
+        return response.get('challenges', {})
+    
     def cancel_mfa_challenge(self, token: str) -> Dict[str, Any]:
         """Cancel pending MFA challenge (user disconnected before completing MFA).
         
@@ -375,13 +538,17 @@ class TowerClient:
         logger.debug(f"Fetched {len(grants)} active grants from Tower")
         return grants
     
-    def heartbeat(self, active_stays: int = 0, active_sessions: int = 0, active_session_ids: list = None) -> Dict[str, Any]:
+    def heartbeat(self, active_stays: int = 0, active_sessions: int = 0, active_session_ids: list = None,
+                  connection_stats: Optional[Dict[str, Any]] = None,
+                  cache_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Send heartbeat to Tower to report Gate is alive.
         
         Args:
             active_stays: Number of active stays on this Gate
             active_sessions: Number of active sessions on this Gate
             active_session_ids: List of active session IDs (for relay management)
+            connection_stats: Admission counters (queued/handshaking/active/rejected)
+            cache_stats: Grant cache metrics (hit rate, staleness)
         
         Returns:
             Tower response with gate status and relay_sessions
@@ -399,6 +566,15 @@ class TowerClient:
         # Add session IDs if provided (for relay management)
         if active_session_ids:
             data['active_session_ids'] = active_session_ids
+        if connection_stats:
+            data['connection_stats'] = connection_stats
+        if cache_stats:
+            data['cache_stats'] = cache_stats
+        # Tower API latency seen by this gate (summary only, no buckets)
+        api_latency = {endpoint: {k: v for k, v in stats.items() if k != 'buckets'}
+                       for endpoint, stats in self.get_stats().items()}
+        if api_latency:
+            data['api_latency'] = api_latency
         
         response = self._request('POST', '/api/v1/gates/heartbeat', data=data, retry=False)
         
@@ -568,6 +744,24 @@ class TowerClient:
         response = self._request('GET', f'/api/v1/sessions/{db_session_id}/grant_status')
         return response
     
+    def get_sessions_grant_status(self, db_session_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Get current grant status for many sessions in one request.
+        
+        Args:
+            db_session_ids: Database session IDs of live sessions on this Gate
+        
+        Returns:
+            {db_session_id: {'valid': bool, 'end_time': str or null, 'reason': str}}
+        
+        Raises:
+            TowerUnreachableError: Tower not reachable
+        """
+        response = self._request(
+            'POST', '/api/v1/sessions/grant_status',
+            data={'session_ids': list(db_session_ids)}, retry=False
+        )
+        return {int(sid): status for sid, status in response.get('sessions', {}).items()}
+    
     def update_session(self, session_id: str, ended_at: Optional[str] = None,
                       duration_seconds: Optional[int] = None,
                       is_active: Optional[bool] = None,
@@ -613,7 +807,8 @@ class TowerClient:
         return response
     
     def start_recording(self, session_id: str, person_username: str,
-                       server_name: str, server_ip: str) -> Dict[str, Any]:
+                       server_name: str, server_ip: str,
+                       recording_format: str = 'jsonl') -> Dict[str, Any]:
         """Notify Tower that recording has started.
         
         Args:
@@ -621,11 +816,13 @@ class TowerClient:
             person_username: Person username
             server_name: Server name
             server_ip: Server IP address
+            recording_format: 'jsonl' or 'binary' (see src.core.recording_format)
         
         Returns:
             {
                 'session_id': str,
                 'recording_path': str,
+                'format': str,  # Format Tower accepted (missing = jsonl, older Tower)
                 'message': str
             }
         """
@@ -633,7 +830,8 @@ class TowerClient:
             'session_id': session_id,
             'person_username': person_username,
             'server_name': server_name,
-            'server_ip': server_ip
+            'server_ip': server_ip,
+            'format': recording_format
         }
         
         response = self._request('POST', '/api/v1/recordings/start', data=payload)
@@ -672,6 +870,47 @@ class TowerClient:
         response = self._request('POST', '/api/v1/recordings/chunk', data=payload)
         return response
     
+    def upload_recording_block(self, session_id: str, recording_path: str,
+                               block: bytes, chunk_index: int = 0) -> Dict[str, Any]:
+        """Upload a binary recording block as raw octet-stream (no base64/JSON).
+        
+        Uses the client's keep-alive session, so consecutive blocks reuse
+        the same connection.
+        
+        Args:
+            session_id: Session identifier
+            recording_path: Recording path from start_recording response
+            block: Encoded block (src.core.recording_format.encode_block)
+            chunk_index: Chunk sequence number
+        
+        Returns:
+            Same as upload_recording_chunk
+        """
+        params = {
+            'session_id': session_id,
+            'recording_path': recording_path,
+            'chunk_index': chunk_index
+        }
+        
+        response = self._request('POST', '/api/v1/recordings/chunk', params=params, body=block)
+        return response
+    
+    def upload_recording_batch(self, body: bytes) -> Dict[str, Any]:
+        """Upload chunks of several recordings in one request.
+        
+        Args:
+            body: Batch body (src.core.recording_format.pack_batch)
+        
+        Returns:
+            {
+                'appended': int,
+                'bytes_written': int,
+                'errors': [{'recording_path': str, 'error': str}, ...]
+            }
+        """
+        response = self._request('POST', '/api/v1/recordings/chunks', body=body)
+        return response
+    
     def finalize_recording(self, session_id: str, recording_path: str,
                           total_bytes: int, duration_seconds: int = 0) -> Dict[str, Any]:
         """Notify Tower that recording is complete.
@@ -760,10 +999,11 @@ class TowerClient:
 
 # Global client instance
 _client = None
+_client_lock = threading.Lock()
 
 
 def get_client(config=None):
-    """Get global Tower API client instance.
+    """Get global Tower API client instance (shared by all threads of the gate process).
     
     Args:
         config: Optional GateConfig instance. Only used on first call.
@@ -773,5 +1013,7 @@ def get_client(config=None):
     """
     global _client
     if _client is None:
-        _client = TowerClient(config)
+        with _client_lock:
+            if _client is None:
+                _client = TowerClient(config)
     return _client
@@ -74,6 +74,13 @@ class GateConfig:
         self.api_timeout = self.config.getint('api', 'timeout', fallback=10)
         self.api_retry_attempts = self.config.getint('api', 'retry_attempts', fallback=3)
         self.api_retry_backoff = self.config.getfloat('api', 'retry_backoff', fallback=2.0)
+        # Keep-alive connections to Tower shared by all sessions of this gate process
+        self.api_pool_size = self.config.getint('api', 'pool_size', fallback=32)
+        # Per-endpoint timeouts (seconds), longest matching prefix wins, e.g. "recordings/ = 30"
+        self.api_timeouts = {
+            endpoint.strip('/'): float(timeout)
+            for endpoint, timeout in (self.config.items('api_timeouts') if self.config.has_section('api_timeouts') else [])
+        }
         
         # Logging settings
         self.log_level = self.config.get('logging', 'level', fallback='INFO')
@@ -85,6 +92,19 @@ class GateConfig:
         self.relay_enabled = self.config.getboolean('relay', 'enabled', fallback=False)
         self.relay_tower_url = self.config.get('relay', 'tower_url', fallback=None)
         self.relay_api_key = self.config.get('relay', 'api_key', fallback=None)
+        # Grant events pushed by Tower over Socket.IO (uses relay tower_url/api_key if set)
+        self.grant_events_enabled = self.config.getboolean('relay', 'grant_events', fallback=True)
+        # Live output frames: coalescing window (ms), frame size and buffer while Tower is slow (KB)
+        self.relay_frame_ms = self.config.getint('relay', 'frame_ms', fallback=20)
+        self.relay_frame_kb = self.config.getint('relay', 'frame_kb', fallback=64)
+        self.relay_max_buffer_kb = self.config.getint('relay', 'max_buffer_kb', fallback=1024)
+        
+        # Session recording upload (binary falls back to jsonl if Tower does not support it)
+        self.recording_format = self.config.get('recording', 'format', fallback='binary')
+        self.recording_compression = self.config.get('recording', 'compression', fallback='zlib')
+        # Background uploader: memory held for queued chunks before spilling to disk, batch size
+        self.recording_queue_max_mb = self.config.getint('recording', 'queue_max_mb', fallback=64)
+        self.recording_batch_max_kb = self.config.getint('recording', 'batch_max_kb', fallback=1024)
     
     def __repr__(self):
         return f'<GateConfig gate_name={self.gate_name} tower_url={self.tower_url}>'
@@ -0,0 +1,297 @@
+"""Gate-side grant decision cache.
+
+Caches Tower's check_grant decisions per (source_ip, destination_ip, protocol,
+ssh_login[, key fingerprint]) so repeat checks are answered from memory.
+Only allowed decisions Tower marks "cacheable" are kept - on MFA gates access
+depends on the user's Stay or known source IP, which can end without a grant
+change, and denials always go to Tower (a new policy, source IP or group
+membership does not change the active grant set).
+
+- Lookups are a dict access (no I/O); entries are fresh for cache_ttl seconds.
+- A background thread polls /api/v1/grants/active every cache_ttl seconds and
+  drops all cached decisions when the active grant set changed (new, revoked
+  or extended grants).
+- Decisions are persisted to the sqlite file at cache_path (write-behind from
+  the refresh thread) so a restarted gate can still serve them.
+- When Tower is unreachable, decisions up to offline_cache_duration old are
+  served (offline mode).
+"""
+
+import calendar
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class GrantCache:
+    """In-memory decision cache with sqlite persistence and background refresh.
+
+    Usage:
+        cache = init_grant_cache(config, tower_client)
+        result = cache.get(key)
+        if result is None:
+            result = tower_client.check_grant(...)
+            cache.put(key, result)
+    """
+
+    def __init__(self, config, tower_client):
+        """Initialize cache.
+
+        Args:
+            config: GateConfig instance (cache_ttl, cache_path, offline settings)
+            tower_client: TowerClient used for background refresh
+        """
+        self.config = config
+        self.tower_client = tower_client
+        self.ttl = config.cache_ttl
+        self.offline_enabled = config.offline_mode_enabled
+        self.offline_duration = config.offline_cache_duration
+        self.cache_path = config.cache_path
+
+        # key -> (result, fetched_at, valid_until) - wall-clock times, valid_until
+        # is the grant's effective_end_time (None = no end)
+        self.entries: Dict[Tuple, Tuple[Dict[str, Any], float, Optional[float]]] = {}
+        self._dirty: Dict[Tuple, Optional[Tuple[Dict[str, Any], float, Optional[float]]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Tower state
+        self.grants_digest = None
+        self.last_refresh = None  # Last successful /grants/active poll
+        self.tower_online = True
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.offline_hits = 0
+        self.invalidations = 0
+
+        self._db = None
+        self._load()
+
+    # -- Lookup API (hot path, no I/O) --------------------------------------
+
+    @staticmethod
+    def make_key(source_ip: str, destination_ip: str, protocol: str,
+                 ssh_login: Optional[str] = None, ssh_key_fingerprint: Optional[str] = None) -> Tuple:
+        return (source_ip, destination_ip, protocol, ssh_login or '', ssh_key_fingerprint or '')
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Return cached decision if fresh, else None."""
+        entry = self.entries.get(key)
+        now = time.time()
+        if entry is not None and now - entry[1] < self.ttl and (entry[2] is None or now < entry[2]):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def get_offline(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Return cached decision for offline mode (Tower unreachable)."""
+        if not self.offline_enabled:
+            return None
+        self.tower_online = False
+        entry = self.entries.get(key)
+        now = time.time()
+        if entry is not None and now - entry[1] < self.offline_duration and (entry[2] is None or now < entry[2]):
+            self.offline_hits += 1
+            return entry[0]
+        return None
+
+    def put(self, key: Tuple, result: Dict[str, Any]):
+        """Store a decision returned by Tower (ignored unless allowed and marked cacheable)."""
+        self.tower_online = True
+        if not (result.get('allowed') and result.get('cacheable')):
+            with self._lock:
+                if self.entries.pop(key, None) is not None:
+                    self._dirty[key] = None  # Superseded decision - delete on next flush
+            return
+        entry = (result, time.time(), self._parse_end_time(result.get('effective_end_time')))
+        with self._lock:
+            self.entries[key] = entry
+            self._dirty[key] = entry
+
+    @staticmethod
+    def _parse_end_time(value: Optional[str]) -> Optional[float]:
+        """Tower's effective_end_time (ISO UTC, 'Z' suffix) to epoch seconds."""
+        if not value:
+            return None
+        try:
+            return calendar.timegm(datetime.fromisoformat(value.rstrip('Z')).utctimetuple())
+        except ValueError:
+            return None
+
+    def invalidate(self, reason: str = 'manual'):
+        """Drop all cached decisions (memory and disk)."""
+        with self._lock:
+            count = len(self.entries)
+            self.entries = {}
+            self._dirty = {}
+            self._dirty[None] = None  # Marker: clear table on next flush
+            self.invalidations += 1
+        logger.info(f"Grant cache invalidated ({reason}): {count} decisions dropped")
+
+    # -- Background refresh -------------------------------------------------
+
+    def start(self):
+        """Start background refresh thread."""
+        self._thread = threading.Thread(target=self._refresh_loop, name='GrantCacheRefresh', daemon=True)
+        self._thread.start()
+        logger.info(f"Grant cache started (ttl={self.ttl}s, offline={self.offline_duration}s, path={self.cache_path})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._flush()
+            self._stop.wait(self.ttl)
+        self._flush()
+
+    def refresh(self):
+        """Poll /grants/active and invalidate cached decisions if the grant set changed."""
+        try:
+            grants = self.tower_client.get_active_grants(limit=10000)
+        except Exception as e:
+            if self.tower_online:
+                logger.warning(f"Grant cache refresh failed - serving cached decisions: {e}")
+            self.tower_online = False
+            return
+
+        digest = hashlib.sha256(
+            json.dumps(grants, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        ).hexdigest()
+        if self.grants_digest is not None and digest != self.grants_digest:
+            self.invalidate('active grants changed')
+        self.grants_digest = digest
+        self.last_refresh = time.time()
+        self.tower_online = True
+        self._save_meta()
+
+    # -- Persistence --------------------------------------------------------
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS decisions '
+                '(key TEXT PRIMARY KEY, result TEXT NOT NULL, fetched_at REAL NOT NULL, valid_until REAL)'
+            )
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            self._db.commit()
+        return self._db
+
+    def _load(self):
+        """Load persisted decisions still usable in offline mode."""
+        try:
+            db = self._connect()
+            cutoff = time.time() - max(self.ttl, self.offline_duration)
+            db.execute('DELETE FROM decisions WHERE fetched_at < ? OR valid_until < ?', (cutoff, time.time()))
+            rows = db.execute('SELECT key, result, fetched_at, valid_until FROM decisions')
+            for key_json, result_json, fetched_at, valid_until in rows:
+                result = json.loads(result_json)
+                if result.get('allowed') and result.get('cacheable'):  # Skip denials and unmarked decisions
+                    self.entries[tuple(json.loads(key_json))] = (result, fetched_at, valid_until)
+            row = db.execute("SELECT value FROM meta WHERE name = 'grants_digest'").fetchone()
+            if row:
+                self.grants_digest = row[0]
+            db.commit()
+            if self.entries:
+                logger.info(f"Grant cache loaded {len(self.entries)} decisions from {self.cache_path}")
+        except Exception as e:
+            logger.warning(f"Grant cache persistence disabled ({self.cache_path}): {e}")
+            self._db = None
+
+    def _flush(self):
+        """Write dirty decisions to sqlite (refresh thread only)."""
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = {}
+        if not dirty:
+            return
+        try:
+            db = self._connect()
+            if None in dirty:
+                dirty.pop(None)
+                db.execute('DELETE FROM decisions')
+            db.executemany(
+                'DELETE FROM decisions WHERE key = ?',
+                [(json.dumps(list(key)),) for key, entry in dirty.items() if entry is None]
+            )
+            db.executemany(
+                'INSERT OR REPLACE INTO decisions (key, result, fetched_at, valid_until) VALUES (?, ?, ?, ?)',
+                [(json.dumps(list(key)), json.dumps(entry[0]), entry[1], entry[2])
+                 for key, entry in dirty.items() if entry is not None]
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to persist grant cache: {e}")
+
+    def _save_meta(self):
+        try:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('grants_digest', ?)",
+                (self.grants_digest,)
+            )
+            db.commit()
+        except Exception as e:
+            logger.debug(f"Failed to persist grant cache meta: {e}")
+
+    # -- Metrics ------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and staleness metrics."""
+        now = time.time()
+        lookups = self.hits + self.misses
+        entries = list(self.entries.values())
+        return {
+            'entries': len(entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'offline_hits': self.offline_hits,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'tower_online': self.tower_online,
+            'grants_age_seconds': round(now - self.last_refresh, 1) if self.last_refresh else None,
+            'oldest_decision_seconds': round(now - min(e[1] for e in entries), 1) if entries else None
+        }
+
+
+# Global cache instance (gate process)
+_cache = None
+
+
+def init_grant_cache(config, tower_client) -> Optional[GrantCache]:
+    """Create and start the global grant cache (no-op if cache_enabled=false).
+
+    Args:
+        config: GateConfig instance
+        tower_client: TowerClient used for background refresh
+
+    Returns:
+        GrantCache instance or None if disabled
+    """
+    global _cache
+    if _cache is None and config.cache_enabled:
+        _cache = GrantCache(config, tower_client)
+        _cache.start()
+    return _cache
+
+
+def get_grant_cache() -> Optional[GrantCache]:
+    """Get global grant cache (None if not initialized or disabled)."""
+    return _cache
@@ -0,0 +1,108 @@
+"""Grant event listener for Gate.
+
+Keeps one long-lived Socket.IO connection to Tower subscribed to grant
+events (policy revoke/renew, maintenance, forced disconnect). Events are
+only hints - the callback re-validates sessions via the Tower REST API.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class GrantEventListener:
+    """Socket.IO subscriber for Tower grant events.
+
+    Usage:
+        listener = GrantEventListener(config, on_event=monitor.check_now)
+        listener.start()
+    """
+
+    def __init__(self, config, on_event: Callable[[Dict[str, Any]], None],
+                 on_connection_change: Optional[Callable[[bool], None]] = None):
+        """Initialize listener.
+
+        Args:
+            config: GateConfig instance
+            on_event: Called with the event dict for every grant event
+            on_connection_change: Called with True/False when subscription goes up/down
+        """
+        self.tower_url = config.relay_tower_url or config.tower_url
+        self.api_key = config.relay_api_key or config.tower_token
+        self.gate_name = config.gate_name
+        self.on_event = on_event
+        self.on_connection_change = on_connection_change
+        self.connected = False
+        self.events_received = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.sio = None
+
+    def start(self):
+        """Start background connection thread."""
+        import socketio
+
+        self.sio = socketio.Client(
+            reconnection=True,
+            reconnection_attempts=0,  # Retry forever
+            reconnection_delay=1,
+            reconnection_delay_max=30,
+            logger=False,
+            engineio_logger=False
+        )
+        self.sio.on('connect', self._on_connect)
+        self.sio.on('disconnect', self._on_disconnect)
+        self.sio.on('grant_event', self._on_grant_event)
+
+        self._thread = threading.Thread(target=self._run, name='GrantEvents', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.sio:
+            try:
+                self.sio.disconnect()
+            except Exception:
+                pass
+
+    def _run(self):
+        # socketio.Client only reconnects after a first successful connect
+        while not self._stop.is_set():
+            try:
+                self.sio.connect(
+                    self.tower_url,
+                    auth={
+                        'gate_api_key': self.api_key,
+                        'gate_name': self.gate_name,
+                        'subscribe': 'grant_events'
+                    },
+                    transports=['websocket', 'polling'],
+                    wait_timeout=10
+                )
+                self.sio.wait()
+            except Exception as e:
+                logger.warning(f"Grant events: cannot connect to Tower at {self.tower_url}: {e}")
+            self._stop.wait(10)
+
+    def _set_connected(self, connected: bool):
+        self.connected = connected
+        if self.on_connection_change:
+            self.on_connection_change(connected)
+
+    def _on_connect(self):
+        logger.info(f"Grant events: subscribed at {self.tower_url}")
+        self._set_connected(True)
+
+    def _on_disconnect(self):
+        logger.warning("Grant events: disconnected from Tower - falling back to polling")
+        self._set_connected(False)
+
+    def _on_grant_event(self, data):
+        self.events_received += 1
+        logger.info(f"Grant event from Tower: {data.get('type')} {data}")
+        try:
+            self.on_event(data)
+        except Exception as e:
+            logger.error(f"Error handling grant event {data.get('type')}: {e}", exc_info=True)
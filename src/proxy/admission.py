@@ -0,0 +1,255 @@
+"""
+Admission Control - Bounded handshake workers for incoming SSH connections
+
+Accepted sockets are queued instead of getting a thread each. A dispatcher
+starts handle_client only when a handshake slot is free; the slot is released
+as soon as the client finished authentication (channel accepted), so long
+MFA waits and port scans can no longer pile up thousands of threads sitting
+in transport.accept().
+
+Connections over the overall limit, over the per-source-IP limit, or that find
+the queue full are refused with a plaintext SSH_MSG_DISCONNECT (allowed before
+key exchange by RFC 4253), so clients print a proper reason instead of a reset.
+"""
+
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque, defaultdict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# RFC 4253 disconnect reason codes
+SSH_MSG_DISCONNECT = 1
+SSH_DISCONNECT_TOO_MANY_CONNECTIONS = 12
+
+SERVER_VERSION = b'SSH-2.0-InsideGate\r\n'
+
+DEFAULT_ADMISSION_CONFIG = {
+    'handshake_workers': 128,      # Concurrent connections in SSH handshake/auth
+    'max_connections': 1000,       # Queued + handshaking + established
+    'max_connections_per_ip': 50,  # Same limit, per source IP
+    'queue_size': 256,             # Accepted sockets waiting for a handshake slot
+    'queue_timeout': 30,           # Seconds a socket may wait in the queue
+    'listen_backlog': 1024         # Kernel accept backlog per listener
+}
+
+
+def send_ssh_disconnect(sock, message: str, reason: int = SSH_DISCONNECT_TOO_MANY_CONNECTIONS):
+    """Send version banner + unencrypted SSH_MSG_DISCONNECT and close socket.
+
+    Never blocks: the few bytes fit in the socket send buffer.
+    """
+    try:
+        sock.setblocking(False)
+        description = message.encode('utf-8')
+        payload = (
+            bytes([SSH_MSG_DISCONNECT]) +
+            struct.pack('>I', reason) +
+            struct.pack('>I', len(description)) + description +
+            struct.pack('>I', 0)  # language tag
+        )
+        # Binary packet: uint32 length, byte padding length, payload, padding (block size 8)
+        padding = 8 - ((5 + len(payload)) % 8)
+        if padding < 4:
+            padding += 8
+        packet = struct.pack('>IB', 1 + len(payload) + padding, padding) + payload + os.urandom(padding)
+        sock.send(SERVER_VERSION + packet)
+        sock.shutdown(socket.SHUT_WR)
+        # Drain client banner so close() doesn't turn into a RST that eats our message
+        try:
+            sock.recv(4096)
+        except OSError:
+            pass
+    except OSError as e:
+        logger.debug(f"Failed to send SSH disconnect: {e}")
+    finally:
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionTicket:
+    """Admission slot held by one connection (queued → handshaking → established)"""
+
+    def __init__(self, controller, sock, addr, is_tproxy: bool):
+        self.controller = controller
+        self.sock = sock
+        self.addr = addr
+        self.source_ip = addr[0]
+        self.is_tproxy = is_tproxy
+        self.enqueued_at = time.monotonic()
+        self.state = 'queued'
+
+    def handshake_done(self):
+        """Release the handshake slot (called once auth finished or failed)"""
+        self.controller._transition(self, 'established')
+
+    def release(self):
+        """Release all slots (connection closed)"""
+        self.controller._transition(self, 'closed')
+
+
+class AdmissionController:
+    """Bounded queue + handshake worker limit in front of handle_client
+
+    Usage:
+        admission = AdmissionController(self.handle_client, config)
+        admission.start()
+        ...
+        admission.submit(client_socket, client_addr, is_tproxy)
+    """
+
+    def __init__(self, handler: Callable, config: Optional[dict] = None):
+        """Initialize admission controller
+
+        Args:
+            handler: Callable(sock, addr, is_tproxy, ticket) handling one connection
+            config: Dict overriding DEFAULT_ADMISSION_CONFIG keys
+        """
+        self.handler = handler
+        self.config = dict(DEFAULT_ADMISSION_CONFIG)
+        if config:
+            self.config.update({k: v for k, v in config.items() if v is not None})
+
+        self.handshake_workers = self.config['handshake_workers']
+        self.max_connections = self.config['max_connections']
+        self.max_per_ip = self.config['max_connections_per_ip']
+        self.queue_size = self.config['queue_size']
+        self.queue_timeout = self.config['queue_timeout']
+
+        self.queue = deque()
+        self.per_ip = defaultdict(int)
+        self.handshaking = 0
+        self.established = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._dispatcher = None
+
+        # Counters
+        self.accepted_total = 0
+        self.rejected = defaultdict(int)
+
+    def start(self):
+        """Start dispatcher thread"""
+        self._running = True
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='AdmissionDispatcher', daemon=True)
+        self._dispatcher.start()
+        logger.info(
+            f"Admission control: {self.handshake_workers} handshake workers, "
+            f"max {self.max_connections} connections ({self.max_per_ip} per IP), queue {self.queue_size}"
+        )
+
+    def stop(self):
+        """Stop dispatcher and refuse everything still queued"""
+        with self._cond:
+            self._running = False
+            pending = list(self.queue)
+            self.queue.clear()
+            self._cond.notify_all()
+        for ticket in pending:
+            self._reject(ticket, 'shutdown', "Gate is shutting down")
+
+    def submit(self, sock, addr, is_tproxy: bool = False) -> bool:
+        """Queue an accepted socket (called from the accept loop, never blocks)
+
+        Returns:
+            True if queued, False if refused
+        """
+        ticket = ConnectionTicket(self, sock, addr, is_tproxy)
+        reason = None
+        with self._cond:
+            total = len(self.queue) + self.handshaking + self.established
+            if total >= self.max_connections:
+                reason = 'max_connections'
+            elif self.per_ip[ticket.source_ip] >= self.max_per_ip:
+                reason = 'per_ip_limit'
+            elif len(self.queue) >= self.queue_size:
+                reason = 'queue_full'
+            else:
+                self.per_ip[ticket.source_ip] += 1
+                self.queue.append(ticket)
+                self.accepted_total += 1
+                self._cond.notify()
+                return True
+
+        self._reject(ticket, reason, "Too many connections, please retry later")
+        return False
+
+    def _reject(self, ticket: ConnectionTicket, reason: str, message: str):
+        with self._cond:
+            self.rejected[reason] += 1
+        logger.debug(f"Connection from {ticket.source_ip} refused: {reason}")
+        send_ssh_disconnect(ticket.sock, message)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while self._running and (not self.queue or self.handshaking >= self.handshake_workers):
+                    self._cond.wait()
+                if not self._running:
+                    return
+                ticket = self.queue.popleft()
+                expired = time.monotonic() - ticket.enqueued_at > self.queue_timeout
+                if expired:
+                    self._drop_ip(ticket.source_ip)
+                    ticket.state = 'closed'
+                else:
+                    self.handshaking += 1
+                    ticket.state = 'handshaking'
+
+            if expired:
+                self._reject(ticket, 'queue_timeout', "Gate busy, please retry later")
+                continue
+
+            thread = threading.Thread(target=self._run, args=(ticket,), daemon=True)
+            thread.start()
+
+    def _run(self, ticket: ConnectionTicket):
+        try:
+            self.handler(ticket.sock, ticket.addr, ticket.is_tproxy, ticket)
+        except Exception as e:
+            logger.error(f"Unhandled error in connection handler for {ticket.source_ip}: {e}", exc_info=True)
+        finally:
+            ticket.release()
+
+    def _transition(self, ticket: ConnectionTicket, new_state: str):
+        with self._cond:
+            old_state = ticket.state
+            if old_state == new_state or old_state == 'closed':
+                return
+            if old_state == 'handshaking':
+                self.handshaking -= 1
+                self._cond.notify()
+            elif old_state == 'established':
+                self.established -= 1
+
+            if new_state == 'established':
+                self.established += 1
+            elif new_state == 'closed':
+                self._drop_ip(ticket.source_ip)
+            ticket.state = new_state
+
+    def _drop_ip(self, source_ip: str):
+        # you are holding the lock
+        self.per_ip[source_ip] -= 1
+        if self.per_ip[source_ip] <= 0:
+            del self.per_ip[source_ip]
+
+    def get_stats(self) -> dict:
+        """Current admission counters"""
+        with self._cond:
+            return {
+                'queued': len(self.queue),
+                'handshaking': self.handshaking,
+                'active': self.established,
+                'accepted_total': self.accepted_total,
+                'rejected_total': sum(self.rejected.values()),
+                'rejected': dict(self.rejected),
+                'source_ips': len(self.per_ip)
+            }
@@ -0,0 +1,347 @@
+"""
+Grant Monitor - One scheduler re-validating grants of all live sessions
+
+Replaces the per-session monitor_grant_expiry_v11 threads (one Tower request
+per session every 10s) and the per-session check_grant loop on heartbeat.
+The monitor sends one batch request to /api/v1/sessions/grant_status for all
+registered sessions and applies the results: 5/1 minute expiry warnings,
+disconnect on expiry or revocation, end time updates on grant extension.
+
+When Tower grant events are pushed (check_now() on every event), the batch
+request is only repeated every push_poll_interval as a safety net. Without
+push, the batch request runs every interval. Expiry warnings and disconnects
+are timers on the gate's TimerWheel, computed from known end times (policy
+end, schedule window end, maintenance) and fired exactly when due.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from src.proxy.relay_loop import send_nowait
+
+logger = logging.getLogger(__name__)
+
+
+class MonitoredSession:
+    """Channels and warning state of one session watched by GrantMonitor"""
+
+    def __init__(self, session_id: str, db_session_id: int, channel, backend_channel,
+                 transport, backend_transport, server_name: str, end_time: Optional[datetime] = None):
+        self.session_id = session_id
+        self.db_session_id = db_session_id
+        self.channel = channel
+        self.backend_channel = backend_channel
+        self.transport = transport
+        self.backend_transport = backend_transport
+        self.server_name = server_name
+        self.end_time = end_time  # naive UTC, None = permanent
+        self.sent_5min_warning = False
+        self.sent_1min_warning = False
+        self.timer = None  # TimerWheel timer for next_deadline()
+
+    def is_active(self) -> bool:
+        return self.transport.is_active() and self.backend_transport.is_active()
+
+    def next_deadline(self) -> Optional[datetime]:
+        """When the next warning or the disconnect is due (naive UTC), None = permanent"""
+        if self.end_time is None:
+            return None
+        if not self.sent_5min_warning:
+            return self.end_time - timedelta(minutes=5)
+        if not self.sent_1min_warning:
+            return self.end_time - timedelta(minutes=1)
+        return self.end_time
+
+
+def _parse_end_time(end_time_str: str) -> datetime:
+    """Parse Tower end_time ('Z' suffix or +HH:MM) to naive UTC"""
+    end_time_dt = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
+    if end_time_dt.tzinfo is not None:
+        end_time_dt = end_time_dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return end_time_dt
+
+
+class GrantMonitor:
+    """Batch grant expiry/revocation monitor for all sessions on this gate
+
+    Usage:
+        monitor = GrantMonitor(tower_client, self._close_connection, timers)
+        monitor.start()
+        monitor.register(session_id, db_session_id, channel, backend_channel,
+                         transport, backend_transport, server_name)
+        ...
+        monitor.unregister(session_id)
+    """
+
+    def __init__(self, tower_client, close_connection: Callable, timers, interval: int = 10,
+                 end_time_listener: Optional[Callable] = None, push_poll_interval: int = 60):
+        """Initialize grant monitor
+
+        Args:
+            tower_client: TowerClient used for the batch status request
+            close_connection: Callable(channel, backend_channel, transport, backend_transport,
+                              session_id, termination_reason) closing a session
+            timers: TimerWheel firing expiry warnings and disconnects
+            interval: Seconds between batch requests without push
+            end_time_listener: Optional Callable(session_id, end_time) called when
+                               a grant end time changes (extension, maintenance)
+            push_poll_interval: Seconds between batch requests while grant events are pushed
+        """
+        self.tower_client = tower_client
+        self.close_connection = close_connection
+        self.timers = timers
+        self.interval = interval
+        self.end_time_listener = end_time_listener
+        self.push_poll_interval = push_poll_interval
+        self.push_connected = False
+        self.last_poll = 0.0
+
+        self.sessions: Dict[str, MonitoredSession] = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.checks = 0
+        self.failures = 0
+        self.terminated = 0
+        self.pushed_checks = 0
+
+    def start(self):
+        """Start scheduler thread"""
+        self._thread = threading.Thread(target=self._run, name='GrantMonitor', daemon=True)
+        self._thread.start()
+        logger.info(f"Grant monitor started (batch check every {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def register(self, session_id: str, db_session_id: int, channel, backend_channel,
+                 transport, backend_transport, server_name: str = "unknown",
+                 end_time: Optional[datetime] = None):
+        """Start monitoring a session's grant (end_time: naive UTC from access check)"""
+        session = MonitoredSession(
+            session_id, db_session_id, channel, backend_channel,
+            transport, backend_transport, server_name, end_time
+        )
+        with self.lock:
+            self.sessions[session_id] = session
+        self._arm(session)
+        logger.debug(f"Session {session_id}: Registered in grant monitor ({len(self.sessions)} total)")
+
+    def unregister(self, session_id: str):
+        """Stop monitoring a session"""
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session and session.timer:
+                session.timer.cancel()
+
+    def check_now(self, event: Optional[dict] = None):
+        """Re-validate all sessions right away (grant event pushed by Tower)
+
+        Bursts of events are coalesced into one batch request.
+        """
+        self.pushed_checks += 1
+        self._wake.set()
+
+    def set_push_connected(self, connected: bool):
+        """Grant event stream went up/down"""
+        self.push_connected = connected
+        if connected:
+            # Events may have been missed while disconnected
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            pushed = self._wake.wait(max(self.last_poll + self._poll_interval() - time.time(), 0.1))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                if pushed or time.time() - self.last_poll >= self._poll_interval():
+                    self.check_all()
+            except Exception as e:
+                logger.error(f"Grant monitor error: {e}", exc_info=True)
+
+    def _poll_interval(self) -> int:
+        return self.push_poll_interval if self.push_connected else self.interval
+
+    def _active_sessions(self):
+        with self.lock:
+            for session_id in [sid for sid, s in self.sessions.items() if not s.is_active()]:
+                logger.info(f"Session {session_id}: Transport closed, removed from grant monitor")
+                session = self.sessions.pop(session_id)
+                if session.timer:
+                    session.timer.cancel()
+            return list(self.sessions.values())
+
+    def _arm(self, session: MonitoredSession):
+        """(Re)schedule the session's timer for its next warning or disconnect"""
+        with self.lock:
+            if self.sessions.get(session.session_id) is not session:
+                return  # Unregistered meanwhile
+            if session.timer:
+                session.timer.cancel()
+                session.timer = None
+            deadline = session.next_deadline()
+            if deadline is not None:
+                delay = (deadline - datetime.utcnow()).total_seconds()
+                session.timer = self.timers.schedule(delay, self._on_deadline, session)
+
+    def _on_deadline(self, session: MonitoredSession):
+        """Timer wheel callback - warning or disconnect due"""
+        with self.lock:
+            if self.sessions.get(session.session_id) is not session:
+                return
+        if not session.is_active():
+            logger.info(f"Session {session.session_id}: Transport closed, removed from grant monitor")
+            self.unregister(session.session_id)
+            return
+        try:
+            self._check_expiry(session, datetime.utcnow())
+        except Exception as e:
+            logger.error(f"Session {session.session_id}: Error checking grant expiry: {e}")
+        self._arm(session)
+
+    def check_all(self):
+        """Fetch grant status for all monitored sessions in one request and apply it"""
+        sessions = self._active_sessions()
+        self.last_poll = time.time()
+
+        if not sessions:
+            return
+
+        try:
+            statuses = self.tower_client.get_sessions_grant_status([s.db_session_id for s in sessions])
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to poll grant status for {len(sessions)} sessions: {e}")
+            return  # Keep trying next interval
+
+        self.checks += 1
+        now = datetime.utcnow()
+        for session in sessions:
+            status = statuses.get(session.db_session_id)
+            if status is None:
+                continue
+            try:
+                self._apply(session, status, now)
+            except Exception as e:
+                logger.error(f"Session {session.session_id}: Error applying grant status: {e}")
+
+    def _apply(self, session: MonitoredSession, status: dict, now: datetime):
+        session_id = session.session_id
+
+        # Check if grant still valid
+        if not status['valid']:
+            reason = status.get('reason') or 'Access denied'
+            logger.info(f"Session {session_id}: Grant no longer valid: {reason}")
+            self._terminate(session, f"*** Session terminated: {reason} ***", 'grant_revoked')
+            return
+
+        # Grant still valid - check end_time for warnings
+        end_time_str = status.get('end_time')
+        end_time = _parse_end_time(end_time_str) if end_time_str else None
+
+        if end_time != session.end_time:
+            if session.end_time is not None:
+                logger.info(f"Session {session_id}: Grant end time changed from {session.end_time} to {end_time}")
+            session.end_time = end_time
+            # Extended past the warning thresholds - warn again later
+            if end_time is None or (end_time - now).total_seconds() > 300:
+                session.sent_5min_warning = False
+                session.sent_1min_warning = False
+            if self.end_time_listener:
+                self.end_time_listener(session_id, end_time)
+            # Warnings/disconnect for the new end time (right away if already due)
+            self._arm(session)
+
+    def _check_expiry(self, session: MonitoredSession, now: datetime):
+        end_time = session.end_time
+        if end_time is None:
+            # Permanent grant, no warnings needed
+            return
+
+        # Calculate remaining time
+        remaining_seconds = (end_time - now).total_seconds()
+
+        if remaining_seconds <= 0:
+            logger.info(f"Session {session.session_id}: Grant expired")
+            self._terminate(session, "*** Your access grant has expired ***", 'grant_expired')
+            return
+
+        # Check if we should send 5-minute warning
+        if remaining_seconds <= 300 and not session.sent_5min_warning:
+            session.sent_5min_warning = True
+            self._warn(session, "5 minutes", end_time)
+
+        # Check if we should send 1-minute warning
+        elif remaining_seconds <= 60 and not session.sent_1min_warning:
+            session.sent_1min_warning = True
+            self._warn(session, "1 minute", end_time)
+
+    def _warn(self, session: MonitoredSession, remaining: str, end_time: datetime):
+        warning_msg = (
+            f"\r\n\r\n"
+            f"{'='*70}\r\n"
+            f"  *** WARNING: Your access grant expires in {remaining} ***\r\n"
+            f"  Your session will be automatically disconnected at {end_time} UTC\r\n"
+            f"{'='*70}\r\n\r\n"
+        )
+        try:
+            # Runs on the timer wheel - dropped rather than waiting for a client that stopped reading
+            if send_nowait(session.channel, warning_msg.encode()):
+                logger.info(f"Session {session.session_id}: Sent {remaining} warning")
+            else:
+                logger.warning(f"Session {session.session_id}: {remaining} warning dropped (client window full)")
+        except Exception as e:
+            logger.error(f"Session {session.session_id}: Failed to send {remaining} warning: {e}")
+
+    def _terminate(self, session: MonitoredSession, headline: str, termination_reason: str):
+        """Remove session from monitor and disconnect it (in background)"""
+        self.unregister(session.session_id)
+        self.terminated += 1
+        threading.Thread(
+            target=self._disconnect,
+            args=(session, headline, termination_reason),
+            daemon=True
+        ).start()
+
+    def _disconnect(self, session: MonitoredSession, headline: str, termination_reason: str):
+        disconnect_msg = (
+            f"\r\n\r\n"
+            f"{'='*70}\r\n"
+            f"  {headline}\r\n"
+            f"  Disconnecting now...\r\n"
+            f"{'='*70}\r\n\r\n"
+        )
+        try:
+            # A stuck client must not keep the session from being closed
+            if send_nowait(session.channel, disconnect_msg.encode()):
+                time.sleep(1)
+        except:
+            pass
+
+        self.close_connection(
+            session.channel, session.backend_channel, session.transport, session.backend_transport,
+            session.session_id, termination_reason
+        )
+
+    def get_stats(self) -> dict:
+        """Current monitor counters"""
+        with self.lock:
+            return {
+                'sessions': len(self.sessions),
+                'checks': self.checks,
+                'failures': self.failures,
+                'terminated': self.terminated,
+                'push_connected': self.push_connected,
+                'pushed_checks': self.pushed_checks
+            }
@@ -0,0 +1,294 @@
+"""
+Inactivity Monitor - Idle timeouts and terminal titles of all live sessions
+
+Replaces the per-session monitor_inactivity_timeout threads (one thread per
+session waking every 10s). Every session has one timer on the gate's
+TimerWheel, due at the earliest of: its next terminal title update, the 5/1
+minute idle warning, the idle timeout. When it fires the session's idle time
+is recomputed from the last activity recorded by the session recorder, so
+activity simply moves the next deadline - nothing is scheduled per keystroke.
+Warnings and titles are sent with send_nowait() (dropped when the client's
+SSH window is full) so a client that stopped reading never stalls the wheel.
+
+Title updates are aligned to whole minutes (10s while a warning is close), so
+the titles of all sessions are sent in one wheel wake-up.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+from src.proxy.relay_loop import send_nowait
+
+logger = logging.getLogger(__name__)
+
+# Title refresh cadence (seconds)
+TITLE_INTERVAL = 60
+TITLE_WARNING_INTERVAL = 10
+
+
+class IdleSession:
+    """Channels and warning state of one session watched by InactivityMonitor"""
+
+    def __init__(self, session_id: str, db_session_id: int, channel, backend_channel,
+                 transport, backend_transport, timeout_minutes: int, server_name: str):
+        self.session_id = session_id
+        self.db_session_id = db_session_id
+        self.channel = channel
+        self.backend_channel = backend_channel
+        self.transport = transport
+        self.backend_transport = backend_transport
+        self.timeout_minutes = timeout_minutes
+        self.server_name = server_name
+        self.sent_5min_warning = False
+        self.sent_1min_warning = False
+        self.next_title = 0.0  # time.time() of next title update
+        self.timer = None  # TimerWheel timer for the next check
+
+    def is_active(self) -> bool:
+        return self.transport.is_active() and self.backend_transport.is_active()
+
+
+class InactivityMonitor:
+    """Idle timeout monitor for all sessions on this gate
+
+    Usage:
+        monitor = InactivityMonitor(tower_client, timers, self.session_last_activity,
+                                    self.session_metadata, self.update_terminal_title,
+                                    self.clear_terminal_title)
+        monitor.register(session_id, db_session_id, channel, backend_channel,
+                         transport, backend_transport, timeout_minutes, server_name)
+        ...
+        monitor.unregister(session_id)
+    """
+
+    def __init__(self, tower_client, timers, last_activity: Dict[str, datetime],
+                 metadata: Dict[str, dict], update_title: Callable, clear_title: Callable):
+        """Initialize inactivity monitor
+
+        Args:
+            tower_client: TowerClient used to record the termination reason
+            timers: TimerWheel firing the checks
+            last_activity: session_id -> last activity (naive UTC), updated by the recorder
+            metadata: session_id -> {'grant_end_time', ...} for the title countdown
+            update_title: Callable(channel, server_name, grant_remaining_minutes,
+                          idle_current_minutes, idle_max_minutes, is_warning)
+            clear_title: Callable(channel, server_name)
+        """
+        self.tower_client = tower_client
+        self.timers = timers
+        self.last_activity = last_activity
+        self.metadata = metadata
+        self.update_title = update_title
+        self.clear_title = clear_title
+
+        self.sessions: Dict[str, IdleSession] = {}
+        self.lock = threading.Lock()
+
+        # Counters
+        self.checks = 0
+        self.warnings = 0
+        self.terminated = 0
+
+    def register(self, session_id: str, db_session_id: int, channel, backend_channel,
+                 transport, backend_transport, timeout_minutes: int, server_name: str = "unknown"):
+        """Start monitoring a session's inactivity (timeout_minutes > 0)"""
+        session = IdleSession(
+            session_id, db_session_id, channel, backend_channel,
+            transport, backend_transport, timeout_minutes, server_name
+        )
+        if session_id not in self.last_activity:
+            self.last_activity[session_id] = datetime.utcnow()
+        with self.lock:
+            self.sessions[session_id] = session
+        self._arm(session, 0)  # First title right away
+        logger.info(f"Session {session_id}: Monitoring inactivity timeout ({timeout_minutes} minutes)")
+
+    def unregister(self, session_id: str):
+        """Stop monitoring a session"""
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session and session.timer:
+                session.timer.cancel()
+
+    def _arm(self, session: IdleSession, delay: float):
+        with self.lock:
+            if self.sessions.get(session.session_id) is not session:
+                return  # Unregistered meanwhile
+            if session.timer:
+                session.timer.cancel()
+            session.timer = self.timers.schedule(delay, self._check, session)
+
+    def _check(self, session: IdleSession):
+        """Timer wheel callback - title update, warning or timeout due"""
+        with self.lock:
+            if self.sessions.get(session.session_id) is not session:
+                return
+        session_id = session.session_id
+        if not session.is_active():
+            logger.debug(f"Session {session_id}: Session disconnected, stopping inactivity monitor")
+            self.unregister(session_id)
+            return
+
+        last_activity = self.last_activity.get(session_id)
+        if not last_activity:
+            logger.warning(f"Session {session_id}: No last activity timestamp found")
+            self.unregister(session_id)
+            return
+
+        self.checks += 1
+        now = datetime.utcnow()
+        idle_seconds = (now - last_activity).total_seconds()
+        remaining_seconds = session.timeout_minutes * 60 - idle_seconds
+
+        if remaining_seconds <= 0:
+            logger.info(f"Session {session_id}: Inactivity timeout reached ({session.timeout_minutes} min)")
+            self._terminate(session)
+            return
+
+        # Activity since the last warning - warn again when idle again
+        if remaining_seconds > 300:
+            session.sent_5min_warning = False
+        if remaining_seconds > 60:
+            session.sent_1min_warning = False
+
+        # Send warnings (only for shell sessions with channel)
+        if remaining_seconds <= 300 and not session.sent_5min_warning:
+            session.sent_5min_warning = True
+            self._send(session, (
+                f"\r\n\r\n"
+                f"{'='*70}\r\n"
+                f"  *** WARNING: Inactivity detected ***\r\n"
+                f"  No activity for {int(idle_seconds / 60)} minutes\r\n"
+                f"  Session will disconnect in {int(remaining_seconds / 60)} minute(s)\r\n"
+                f"  Press any key to continue working\r\n"
+                f"{'='*70}\r\n\r\n"
+            ), "5-minute inactivity warning")
+
+        if remaining_seconds <= 60 and not session.sent_1min_warning:
+            session.sent_1min_warning = True
+            self._send(session, (
+                f"\r\n\r\n"
+                f"{'='*70}\r\n"
+                f"  *** WARNING: Session disconnecting in 1 minute ***\r\n"
+                f"  No activity detected - press any key to continue\r\n"
+                f"{'='*70}\r\n\r\n"
+            ), "1-minute inactivity warning")
+
+        wall = time.time()
+        if wall >= session.next_title:
+            interval = self._update_title(session, now, idle_seconds, remaining_seconds)
+            # Aligned to the interval so all sessions share one wheel wake-up
+            session.next_title = (wall // interval + 1) * interval
+
+        # Next check: title update, next warning or the timeout itself
+        delays = [session.next_title - wall, remaining_seconds]
+        if remaining_seconds > 300:
+            delays.append(remaining_seconds - 300)
+        elif remaining_seconds > 60:
+            delays.append(remaining_seconds - 60)
+        self._arm(session, min(delays))
+
+    def _update_title(self, session: IdleSession, now: datetime, idle_seconds: float,
+                      remaining_seconds: float) -> int:
+        """Send the terminal title countdown, return seconds until the next one"""
+        idle_minutes = int(idle_seconds / 60)
+
+        # Get grant info from metadata
+        grant_remaining_minutes = None
+        is_warning = False
+        grant_end_time = self.metadata.get(session.session_id, {}).get('grant_end_time')
+        if grant_end_time:
+            grant_remaining = (grant_end_time - now).total_seconds()
+            grant_remaining_minutes = int(grant_remaining / 60)
+            if grant_remaining < 300:  # <5 min
+                is_warning = True
+
+        if remaining_seconds < 300:  # Idle timeout warning
+            is_warning = True
+
+        self.update_title(
+            channel=session.channel,
+            server_name=session.server_name,
+            grant_remaining_minutes=grant_remaining_minutes,
+            idle_current_minutes=idle_minutes,
+            idle_max_minutes=session.timeout_minutes,
+            is_warning=is_warning
+        )
+
+        # Faster when warning
+        if is_warning or idle_minutes >= (session.timeout_minutes - 10):
+            return TITLE_WARNING_INTERVAL
+        return TITLE_INTERVAL
+
+    def _send(self, session: IdleSession, message: str, label: str):
+        try:
+            # Never blocks the wheel - dropped if the client stopped reading
+            if send_nowait(session.channel, message.encode()):
+                self.warnings += 1
+                logger.info(f"Session {session.session_id}: Sent {label}")
+            else:
+                logger.warning(f"Session {session.session_id}: {label} dropped (client window full)")
+        except Exception as e:
+            logger.error(f"Session {session.session_id}: Failed to send {label}: {e}")
+
+    def _terminate(self, session: IdleSession):
+        """Remove session from monitor and disconnect it (in background)"""
+        self.unregister(session.session_id)
+        self.terminated += 1
+        threading.Thread(target=self._disconnect, args=(session,), daemon=True).start()
+
+    def _disconnect(self, session: IdleSession):
+        session_id = session.session_id
+
+        # Clear terminal title
+        self.clear_title(session.channel, session.server_name)
+
+        # Send disconnect message
+        try:
+            message = (
+                f"\r\n\r\n"
+                f"{'='*70}\r\n"
+                f"  Session disconnected due to inactivity\r\n"
+                f"  No activity detected for {session.timeout_minutes} minutes\r\n"
+                f"{'='*70}\r\n\r\n"
+            )
+            if send_nowait(session.channel, message.encode()):
+                time.sleep(0.5)  # Give time for message to be delivered
+        except Exception as e:
+            logger.error(f"Session {session_id}: Failed to send disconnect message: {e}")
+
+        # Close connection
+        try:
+            session.channel.close()
+            session.backend_channel.close()
+        except:
+            pass
+
+        # Mark termination in database
+        if session.db_session_id:
+            try:
+                self.tower_client.update_session(
+                    session_id=session.db_session_id,
+                    is_active=False,
+                    ended_at=datetime.utcnow().isoformat(),
+                    termination_reason='inactivity_timeout'
+                )
+            except Exception as e:
+                logger.error(f"Session {session_id}: Failed to update termination reason: {e}")
+
+        # Remove from tracking
+        self.last_activity.pop(session_id, None)
+        self.metadata.pop(session_id, None)
+
+    def get_stats(self) -> dict:
+        """Current monitor counters"""
+        with self.lock:
+            return {
+                'sessions': len(self.sessions),
+                'checks': self.checks,
+                'warnings': self.warnings,
+                'terminated': self.terminated
+            }
@@ -21,7 +21,9 @@ class LazyRelayManager:
     """
     
     def __init__(self, tower_url: str, gate_api_key: str, gate_name: str, 
-                 multiplexer_registry: SessionMultiplexerRegistry):
+                 multiplexer_registry: SessionMultiplexerRegistry,
+                 frame_interval_ms: int = 20, frame_max_bytes: int = 64 * 1024,
+                 max_buffer_bytes: int = 1024 * 1024):
         """Initialize lazy relay manager
         
         Args:
@@ -29,11 +31,19 @@ class LazyRelayManager:
             gate_api_key: API key for gate authentication
             gate_name: Name of this gate
             multiplexer_registry: Registry of active session multiplexers
+            frame_interval_ms: Relay output coalescing window (see WebSocketRelayChannel)
+            frame_max_bytes: Largest relay output frame
+            max_buffer_bytes: Relay output buffered while Tower is slow
         """
         self.tower_url = tower_url
         self.gate_api_key = gate_api_key
         self.gate_name = gate_name
         self.multiplexer_registry = multiplexer_registry
+        self.frame_options = {
+            'frame_interval_ms': frame_interval_ms,
+            'frame_max_bytes': frame_max_bytes,
+            'max_buffer_bytes': max_buffer_bytes
+        }
         
         # Active relays: {session_id: WebSocketRelayChannel}
         self.active_relays: Dict[str, WebSocketRelayChannel] = {}
@@ -107,7 +117,8 @@ class LazyRelayManager:
                 gate_name=self.gate_name,
                 owner_username=multiplexer.owner_username,
                 server_name=multiplexer.server_name,
-                multiplexer=multiplexer  # Pass multiplexer for bidirectional relay
+                multiplexer=multiplexer,  # Pass multiplexer for bidirectional relay
+                **self.frame_options
             )
             
             # Add as watcher to existing multiplexer
@@ -0,0 +1,198 @@
+"""
+MFA Waiter - One scheduler for all SSH handshakes waiting for MFA
+
+Replaces the per-handshake MFA polling loops (one Tower status request per
+waiting client every 2s, for up to the challenge timeout). Handshake threads
+park on wait(); Tower pushes an 'mfa_verified' grant event when the SAML login
+completes and notify() wakes exactly that handshake.
+
+The waiter thread also checks every interval that parked clients are still
+connected and, as fallback, asks Tower for the status of all pending
+challenges in one request - every interval without grant events, every
+push_poll_interval (missed events, expiry) while they are pushed.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PendingChallenge:
+    """One handshake parked in MFAWaiter"""
+
+    def __init__(self, token: str, deadline: float, is_alive: Callable[[], bool]):
+        self.token = token
+        self.deadline = deadline  # time.monotonic()
+        self.is_alive = is_alive
+        self.status = None  # Tower challenge status once resolved
+        self.done = threading.Event()
+
+    def resolve(self, status: Optional[dict]):
+        self.status = status
+        self.done.set()
+
+
+class MFAWaiter:
+    """Parks SSH handshakes until their MFA challenge is verified
+
+    Usage:
+        waiter = MFAWaiter(tower_client)
+        waiter.start()
+        status = waiter.wait(mfa_token, timeout=300, is_alive=transport.is_active)
+        ...
+        waiter.notify(event)  # 'mfa_verified' grant event from Tower
+    """
+
+    def __init__(self, tower_client, interval: int = 2, push_poll_interval: int = 30):
+        """Initialize MFA waiter
+
+        Args:
+            tower_client: TowerClient used for the batch status request
+            interval: Seconds between liveness checks (and batch requests without push)
+            push_poll_interval: Seconds between batch requests while grant events are pushed
+        """
+        self.tower_client = tower_client
+        self.interval = interval
+        self.push_poll_interval = push_poll_interval
+        self.push_connected = False
+        self.last_poll = 0.0
+
+        self.pending: Dict[str, PendingChallenge] = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.verified = 0
+        self.pushed = 0
+        self.polls = 0
+        self.failures = 0
+
+    def start(self):
+        """Start scheduler thread"""
+        self._thread = threading.Thread(target=self._run, name='MFAWaiter', daemon=True)
+        self._thread.start()
+        logger.info(f"MFA waiter started (fallback poll every {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        # Release parked handshakes
+        with self.lock:
+            pending = list(self.pending.values())
+        for challenge in pending:
+            challenge.resolve(None)
+
+    def wait(self, token: str, timeout: float, is_alive: Callable[[], bool]) -> Optional[dict]:
+        """Block the calling handshake until its challenge is resolved
+
+        Args:
+            token: MFA token from create_mfa_challenge
+            timeout: Seconds to wait at most (challenge timeout)
+            is_alive: Returns False once the client disconnected
+
+        Returns:
+            Challenge status ({'verified': True, ...}, {'expired': True} or
+            {'error': 'invalid_token'}), None on timeout or client disconnect
+        """
+        challenge = PendingChallenge(token, time.monotonic() + timeout, is_alive)
+        with self.lock:
+            self.pending[token] = challenge
+        try:
+            challenge.done.wait(timeout)
+            return challenge.status
+        finally:
+            with self.lock:
+                if self.pending.get(token) is challenge:
+                    del self.pending[token]
+
+    def notify(self, event: dict):
+        """'mfa_verified' grant event pushed by Tower - wake the waiting handshake"""
+        token = event.get('mfa_token')
+        with self.lock:
+            challenge = self.pending.get(token)
+        if challenge is None:
+            # Another gate process, or the client already left
+            logger.debug(f"MFA verified event for unknown challenge {str(token)[:20]}...")
+            return
+        self.pushed += 1
+        self.verified += 1
+        challenge.resolve({'verified': True, 'user_id': event.get('user_id')})
+
+    def set_push_connected(self, connected: bool):
+        """Grant event stream went up/down"""
+        self.push_connected = connected
+        if connected:
+            # Verifications may have been missed while disconnected
+            self.last_poll = 0.0
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                pending = self.check_local()
+                if pending and (not self.push_connected or
+                                time.monotonic() - self.last_poll >= self.push_poll_interval):
+                    self.poll(pending)
+            except Exception as e:
+                logger.error(f"MFA waiter error: {e}", exc_info=True)
+
+    def check_local(self):
+        """Release handshakes whose client left or whose time is up, return the rest"""
+        now = time.monotonic()
+        with self.lock:
+            pending = list(self.pending.values())
+        waiting = []
+        for challenge in pending:
+            try:
+                alive = challenge.is_alive()
+            except Exception:
+                alive = False
+            if not alive or now >= challenge.deadline:
+                challenge.resolve(None)
+            else:
+                waiting.append(challenge)
+        return waiting
+
+    def poll(self, pending):
+        """Fetch status of all pending challenges in one request and wake resolved ones"""
+        self.last_poll = time.monotonic()
+        try:
+            statuses = self.tower_client.check_mfa_statuses([c.token for c in pending])
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to poll MFA status for {len(pending)} challenges: {e}")
+            return  # Keep trying next interval
+
+        self.polls += 1
+        for challenge in pending:
+            status = statuses.get(challenge.token)
+            if not status:
+                continue
+            if status.get('verified'):
+                self.verified += 1
+                challenge.resolve(status)
+            elif status.get('expired') or status.get('error'):
+                challenge.resolve(status)
+
+    def get_stats(self) -> dict:
+        """Current waiter counters"""
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'verified': self.verified,
+                'pushed': self.pushed,
+                'polls': self.polls,
+                'failures': self.failures,
+                'push_connected': self.push_connected
+            }
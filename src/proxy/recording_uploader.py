@@ -0,0 +1,267 @@
+"""
+Recording Uploader - Background sender for SSH session recordings
+
+SSHSessionRecorder used to upload every flushed chunk to Tower from the relay
+thread, so a slow Tower (or the API client's retry backoff) stalled terminal
+I/O of the session. Recorders now hand their buffered frames to this uploader
+and return immediately; one sender thread per gate encodes them, batches the
+chunks of all binary recordings into one /api/v1/recordings/chunks request and
+falls back to each recorder's offline file when Tower fails.
+
+Memory is bounded: once max_queue_bytes of frames are queued, further chunks
+are encoded by the producer and spilled to a local spool file, keeping their
+place in the queue (no reordering within a recording).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from src.core import recording_format
+from src.gate.api_client import TowerAPIError
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = '/tmp/gate-recordings'
+
+
+class RecordingUploader:
+    """Bounded per-gate queue + sender thread for recording chunks
+
+    Usage:
+        uploader = RecordingUploader(tower_client)
+        uploader.start()
+        uploader.register(recorder)
+        uploader.submit(recorder, frames)      # from the relay thread, never blocks on Tower
+        uploader.finalize(recorder, duration)  # after the last chunk
+        ...
+        uploader.stop()
+    """
+
+    def __init__(self, tower_client, max_queue_bytes: int = 64 * 1024 * 1024,
+                 batch_max_bytes: int = 1024 * 1024, idle_flush_interval: float = 1.0):
+        """Initialize uploader
+
+        Args:
+            tower_client: TowerClient used for uploads (sender thread only)
+            max_queue_bytes: Frame bytes held in memory before chunks spill to disk
+            batch_max_bytes: Largest batch of chunks sent in one request
+            idle_flush_interval: Seconds between checks for recorders with
+                                 stale buffered frames (idle sessions)
+        """
+        self.tower_client = tower_client
+        self.max_queue_bytes = max_queue_bytes
+        self.batch_max_bytes = batch_max_bytes
+        self.idle_flush_interval = idle_flush_interval
+
+        # Items: ('chunk', recorder, frames, size, spool_ref) or ('finalize', recorder, duration)
+        self.queue = deque()
+        self.queued_bytes = 0
+        self.cond = threading.Condition()
+        self.recorders = set()
+        self._stopping = False
+        self._thread = None
+        # False once Tower answered 404 to a batch (older Tower - per-chunk uploads)
+        self.batch_supported = True
+
+        # Spool for chunks that did not fit in memory: (offset, length) refs
+        self.spool_path = os.path.join(SPOOL_DIR, f'spool-{os.getpid()}.bin')
+        self.spool_file = None
+        self.spooled_items = 0
+
+        # Counters
+        self.chunks = 0
+        self.batches = 0
+        self.bytes_uploaded = 0
+        self.failures = 0
+        self.spilled = 0
+
+    def start(self):
+        """Start sender thread"""
+        self._thread = threading.Thread(target=self._run, name='RecordingUploader', daemon=True)
+        self._thread.start()
+        logger.info(f"Recording uploader started (queue {self.max_queue_bytes // (1024 * 1024)}MB, "
+                    f"batch {self.batch_max_bytes // 1024}KB)")
+
+    def stop(self, timeout: float = 10.0):
+        """Send what is queued (up to timeout seconds) and stop the sender thread"""
+        with self.cond:
+            self._stopping = True
+            self.cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Recording uploader stopped with {len(self.queue)} chunks queued")
+
+    def register(self, recorder):
+        """Include recorder in idle flushes"""
+        with self.cond:
+            self.recorders.add(recorder)
+
+    def submit(self, recorder, frames) -> None:
+        """Queue frames of one flush (called from relay/session threads)"""
+        size = sum(len(frame[2]) for frame in frames)
+        with self.cond:
+            if self.queue and self.queued_bytes + size > self.max_queue_bytes:
+                # Tower is not keeping up - keep the chunk's place in the queue, data on disk
+                chunk = recorder._encode(frames)
+                item = ('chunk', recorder, None, 0, self._spool_write(chunk))
+            else:
+                item = ('chunk', recorder, frames, size, None)
+                self.queued_bytes += size
+            self.queue.append(item)
+            self.cond.notify()
+
+    def finalize(self, recorder, duration: int):
+        """Queue finalize after the recorder's last chunk"""
+        with self.cond:
+            self.recorders.discard(recorder)
+            self.queue.append(('finalize', recorder, duration))
+            self.cond.notify()
+
+    def get_stats(self) -> dict:
+        with self.cond:
+            return {
+                'queued_items': len(self.queue),
+                'queued_bytes': self.queued_bytes,
+                'spooled_items': self.spooled_items,
+                'chunks': self.chunks,
+                'batches': self.batches,
+                'bytes_uploaded': self.bytes_uploaded,
+                'failures': self.failures,
+                'spilled': self.spilled
+            }
+
+    def _spool_write(self, chunk: bytes):
+        """Append chunk to the spool file (caller holds self.cond)"""
+        if self.spool_file is None:
+            os.makedirs(SPOOL_DIR, exist_ok=True)
+            self.spool_file = open(self.spool_path, 'w+b')
+            logger.warning(f"Recording upload queue full ({self.queued_bytes} bytes), "
+                           f"spilling chunks to {self.spool_path}")
+        self.spool_file.seek(0, os.SEEK_END)
+        offset = self.spool_file.tell()
+        self.spool_file.write(chunk)
+        self.spooled_items += 1
+        self.spilled += 1
+        return (offset, len(chunk))
+
+    def _spool_read(self, ref) -> bytes:
+        offset, length = ref
+        with self.cond:
+            self.spool_file.flush()
+            self.spool_file.seek(offset)
+            chunk = self.spool_file.read(length)
+            self.spooled_items -= 1
+            if self.spooled_items == 0:
+                # Everything spilled has been read back
+                self.spool_file.close()
+                self.spool_file = None
+                os.remove(self.spool_path)
+        return chunk
+
+    def _run(self):
+        last_idle_flush = time.monotonic()
+        while True:
+            with self.cond:
+                if not self.queue and not self._stopping:
+                    self.cond.wait(self.idle_flush_interval)
+                if not self.queue and self._stopping:
+                    return
+                batch = self._take_batch()
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"Recording uploader error: {e}", exc_info=True)
+
+            if time.monotonic() - last_idle_flush >= self.idle_flush_interval:
+                last_idle_flush = time.monotonic()
+                self._flush_idle()
+
+    def _take_batch(self):
+        """Items up to batch_max_bytes, ending at the first finalize (caller holds self.cond)"""
+        batch = []
+        size = 0
+        while self.queue and size < self.batch_max_bytes:
+            item = self.queue.popleft()
+            batch.append(item)
+            if item[0] == 'finalize':
+                break
+            if item[4] is None:
+                self.queued_bytes -= item[3]
+                size += item[3]
+            else:
+                size += item[4][1]
+        return batch
+
+    def _flush_idle(self):
+        """Flush recorders whose buffered frames are older than their flush interval"""
+        with self.cond:
+            recorders = list(self.recorders)
+        for recorder in recorders:
+            try:
+                recorder.flush_if_due()
+            except Exception as e:
+                logger.error(f"Session {recorder.session_id}: Idle recording flush failed: {e}")
+
+    def _process(self, batch):
+        """Upload items in queue order (binary chunks of online recordings as one request)"""
+        entries = []  # (recorder, chunk)
+        for item in batch:
+            recorder = item[1]
+            if item[0] == 'finalize':
+                self._send_batch(entries)
+                entries = []
+                # Offline upload can take long - do not hold up other sessions
+                threading.Thread(target=recorder._finish, args=(item[2],),
+                                 name=f'RecordingFinalize-{recorder.session_id}', daemon=True).start()
+                continue
+
+            _, _, frames, _, spool_ref = item
+            chunk = recorder._encode(frames) if frames is not None else self._spool_read(spool_ref)
+            self.chunks += 1
+            if recorder.tower_online and recorder.binary and self.batch_supported:
+                entries.append((recorder, chunk))
+            else:
+                # JSONL (older Tower) or offline recording - one chunk at a time, in order
+                self._send_batch(entries)
+                entries = []
+                recorder._deliver(chunk)
+        self._send_batch(entries)
+
+    def _send_batch(self, entries):
+        if not entries:
+            return
+
+        batch = [(recorder.recording_path, recorder.chunk_index, chunk) for recorder, chunk in entries]
+        try:
+            response = self.tower_client.upload_recording_batch(recording_format.pack_batch(batch))
+        except Exception as e:
+            if isinstance(e, TowerAPIError) and e.status_code == 404:
+                logger.warning("Tower does not accept batched recording chunks, uploading per chunk")
+                self.batch_supported = False
+                for recorder, chunk in entries:
+                    recorder._deliver(chunk)
+                return
+            self.failures += 1
+            logger.error(f"Failed to upload {len(entries)} recording chunks: {e}")
+            for recorder, chunk in entries:
+                recorder._deliver_offline(chunk)
+            return
+
+        self.batches += 1
+        self.bytes_uploaded += response.get('bytes_written', 0)
+        failed_paths = {error['recording_path'] for error in response.get('errors', [])}
+        for error in response.get('errors', []):
+            logger.error(f"Tower rejected recording chunk for {error['recording_path']}: {error['error']}")
+        for recorder, chunk in entries:
+            if recorder.recording_path in failed_paths:
+                recorder._deliver_offline(chunk)
+            else:
+                recorder.total_bytes += len(chunk)
+                recorder.chunk_index += 1
+        logger.debug(f"Uploaded {len(entries)} recording chunks in one batch "
+                     f"({response.get('bytes_written', 0)} bytes)")
@@ -0,0 +1,564 @@
+"""
+Relay Loop - Event-driven data pump for proxied SSH sessions
+
+Replaces the per-session select() polling loop of forward_channel with a small
+fixed pool of loop threads. Paramiko channels report readiness through the
+event hook of their input BufferedPipe (the same hook Channel.fileno() uses),
+so a loop only wakes up when a channel received data, hit EOF or was closed.
+Idle sessions cost no wake-ups at all.
+
+Writes never block the loop: when the remote window is exhausted the unsent
+bytes are parked on the relay and reading from the opposite side is paused
+until the peer grows the window. Paramiko signals WINDOW_ADJUST (and close)
+on the channel's out_buffer_cv; the relay installs a condition that also
+notifies the loop, so a blocked relay wakes exactly when it can send again.
+
+Recording and broadcasting to watchers run on a tap thread of each loop, in
+the order the data was relayed, so a slow recorder upload or watcher never
+delays relaying for the other sessions of that loop. The tap backlog of a
+relay is bounded: above TAP_MAX_BYTES the relay stops reading both channels
+(back-pressure, as the blocking recorder call gave before) until the tap
+thread is down to TAP_RESUME_BYTES.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from paramiko.common import cMSG_CHANNEL_DATA
+from paramiko.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Max bytes read from a channel in one recv (paramiko max packet size)
+RECV_CHUNK_SIZE = 32768
+# Max recv calls per direction before yielding to other sessions
+MAX_READS_PER_TURN = 8
+# How long to wait for exit-status after backend EOF (seconds)
+EXIT_STATUS_GRACE = 0.5
+EXIT_STATUS_POLL = 0.01
+# Recording/broadcast backlog per relay: stop reading above, resume below
+TAP_MAX_BYTES = 4 * 1024 * 1024
+TAP_RESUME_BYTES = 1024 * 1024
+
+# Results of ChannelRelay.pump()
+IDLE = 0       # Nothing left to do until the next channel event
+AGAIN = 1      # More data readable - service again on next turn
+BLOCKED = 2    # Waiting for SSH window - woken by window adjust
+WAITING = 3    # Waiting for exit-status - retry on timer
+FINISHED = 4   # Session ended
+
+
+def send_nowait(channel, data: bytes) -> bool:
+    """Send a short notice (warning, title) only if it fits the SSH window now.
+
+    Channel.send() blocks while the window is 0 (client channels have no
+    timeout), and checking send_ready() first still races with the relay
+    loop writing the same channel. The window is reserved under the channel
+    lock, as Channel.send() does, so this never blocks: a client that
+    stopped reading simply does not get the notice.
+
+    Returns:
+        True if sent, False if dropped (window full or channel closed)
+    """
+    message = Message()
+    message.add_byte(cMSG_CHANNEL_DATA)
+    message.add_int(channel.remote_chanid)
+    with channel.lock:
+        if (channel.closed or channel.eof_sent or channel.out_window_size < len(data)
+                or len(data) > channel.out_max_packet_size - 64):
+            return False
+        channel.out_window_size -= len(data)
+        message.add_string(data)
+    # Sent outside the channel lock (deadlocks during re-keying otherwise)
+    channel.transport._send_user_message(message)
+    return True
+
+
+class _ChannelEvent:
+    """Event object installed on a channel's input BufferedPipe.
+
+    BufferedPipe calls set() when data is fed or the pipe is closed and
+    clear() when the buffer was drained. We only care about set().
+    """
+
+    def __init__(self, relay):
+        self.relay = relay
+
+    def set(self):
+        self.relay.notify()
+
+    def clear(self):
+        pass
+
+
+class _WindowCondition(threading.Condition):
+    """Replacement for a channel's out_buffer_cv that also notifies the relay.
+
+    Paramiko calls out_buffer_cv.notify_all() when the remote window grows
+    and when the channel closes; threads blocked in Channel.send() still
+    wait on it as before.
+    """
+
+    def __init__(self, lock, relay):
+        super().__init__(lock)
+        self.relay = relay
+
+    def notify_all(self):
+        super().notify_all()
+        self.relay.notify()
+
+
+class ChannelRelay:
+    """Relay state for one client<->backend channel pair.
+
+    Owned by a single RelayLoop thread; other threads only call notify().
+    """
+
+    def __init__(self, client_channel, backend_channel, recorder=None, multiplexer=None,
+                 session_id: Optional[str] = None):
+        """Initialize relay
+
+        Args:
+            client_channel: Paramiko channel to the SSH client
+            backend_channel: Paramiko channel to the backend server
+            recorder: Optional SSHSessionRecorder
+            multiplexer: Optional SessionMultiplexer (join/watch)
+            session_id: Session identifier (for logging)
+        """
+        self.client_channel = client_channel
+        self.backend_channel = backend_channel
+        self.recorder = recorder
+        self.multiplexer = multiplexer
+        self.session_id = session_id
+
+        self.bytes_sent = 0       # client -> backend
+        self.bytes_received = 0   # backend -> client
+
+        # Bytes read but not yet accepted by the destination window
+        self.to_backend = bytearray()
+        self.to_client = bytearray()
+
+        self.backend_eof = False
+        self.exit_deadline = None
+
+        # Bytes queued for deliver() and reads paused on them (guarded by the loop's tap lock)
+        self.tap_bytes = 0
+        self.tap_paused = False
+
+        self.loop = None
+        self.queued = False
+        self.finished = False
+        self.done = threading.Event()
+
+    def attach(self, loop):
+        """Bind relay to a loop and hook channel/multiplexer events"""
+        self.loop = loop
+        for channel in (self.client_channel, self.backend_channel):
+            channel.in_buffer.set_event(_ChannelEvent(self))
+            with channel.lock:
+                channel.out_buffer_cv = _WindowCondition(channel.lock, self)
+        if self.multiplexer:
+            self.multiplexer.input_listener = self.notify
+
+    def detach(self):
+        """Unhook multiplexer events (channel events become no-ops once finished)"""
+        if self.multiplexer and self.multiplexer.input_listener == self.notify:
+            self.multiplexer.input_listener = None
+
+    def notify(self):
+        """Mark relay as ready (called from any thread)"""
+        if self.loop and not self.finished:
+            self.loop.notify(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block caller until the relay finished (and its data was recorded)"""
+        return self.done.wait(timeout)
+
+    def deliver(self, data: bytes, direction: str):
+        """Broadcast and record relayed data (tap thread)"""
+        # Broadcast to all multiplexed watchers/participants
+        if direction == 'server' and self.multiplexer:
+            self.multiplexer.broadcast_output(data)
+        if self.recorder:
+            # Stream data to Tower
+            self.recorder.write_data(data, direction)
+
+    def _tap(self, data: bytes, direction: str):
+        if self.recorder or (direction == 'server' and self.multiplexer):
+            self.loop.tap(self, data, direction)
+
+    def pump(self) -> int:
+        """Move as much data as possible without blocking.
+
+        Returns:
+            One of IDLE, AGAIN, BLOCKED, WAITING, FINISHED
+        """
+        blocked = False
+        again = False
+
+        if self.client_channel.closed:
+            logger.info(f"Channel closed in loop: client={self.client_channel.closed}, backend={self.backend_channel.closed}")
+            return FINISHED
+
+        # Flush bytes parked by previous turns
+        if self.to_backend and not self._flush(self.backend_channel, self.to_backend):
+            blocked = True
+        if self.to_client and not self._flush(self.client_channel, self.to_client):
+            blocked = True
+
+        # Recording/broadcast backlog full - the tap thread notifies when it drained
+        if self.loop.tap_full(self):
+            return BLOCKED if blocked else IDLE
+
+        # Pending input from multiplexed participants (join mode)
+        if self.multiplexer and not self.to_backend:
+            while not self.to_backend:
+                participant_input = self.multiplexer.get_pending_input()
+                if not participant_input:
+                    break
+                self.bytes_sent += len(participant_input)
+                self._tap(participant_input, 'client')
+                self._send_or_park(self.backend_channel, participant_input, self.to_backend)
+
+        # Client -> backend
+        reads = 0
+        while not self.to_backend:
+            if reads >= MAX_READS_PER_TURN:
+                again = True
+                break
+            data, eof = self._read(self.client_channel)
+            if eof:
+                return FINISHED
+            if not data:
+                break
+            reads += 1
+            self.bytes_sent += len(data)
+            self._tap(data, 'client')
+            self._send_or_park(self.backend_channel, data, self.to_backend)
+        if self.to_backend:
+            blocked = True
+
+        # Backend -> client
+        reads = 0
+        while not self.backend_eof and not self.to_client:
+            if reads >= MAX_READS_PER_TURN:
+                again = True
+                break
+            data, eof = self._read(self.backend_channel)
+            if eof:
+                logger.info(f"Backend channel EOF, checking exit status")
+                self.backend_eof = True
+                break
+            if not data:
+                break
+            reads += 1
+            self.bytes_received += len(data)
+            self._send_or_park(self.client_channel, data, self.to_client)
+            self._tap(data, 'server')
+        if self.to_client:
+            blocked = True
+
+        if self.backend_eof and not self.to_client:
+            return self._propagate_exit_status()
+
+        if blocked:
+            return BLOCKED
+        return AGAIN if again else IDLE
+
+    def flush_remaining(self):
+        """Blocking flush of parked bytes (called from the session thread after finish)"""
+        for channel, buf in ((self.backend_channel, self.to_backend), (self.client_channel, self.to_client)):
+            if buf and not channel.closed:
+                try:
+                    channel.sendall(bytes(buf))
+                except Exception as e:
+                    logger.debug(f"Failed to flush {len(buf)} pending bytes: {e}")
+            buf.clear()
+
+    def _propagate_exit_status(self) -> int:
+        """Forward backend exit status to client, waiting briefly for it to arrive"""
+        try:
+            if self.backend_channel.exit_status_ready():
+                exit_status = self.backend_channel.recv_exit_status()
+                self.client_channel.send_exit_status(exit_status)
+                logger.info(f"Propagated exit status {exit_status} from backend to client")
+                return FINISHED
+        except Exception as e:
+            logger.warning(f"Failed to propagate exit status: {e}", exc_info=True)
+            return FINISHED
+
+        now = time.monotonic()
+        if self.exit_deadline is None:
+            self.exit_deadline = now + EXIT_STATUS_GRACE
+        if now >= self.exit_deadline:
+            logger.warning(f"Exit status not ready after backend EOF")
+            return FINISHED
+        return WAITING
+
+    @staticmethod
+    def _read(channel):
+        """Non-blocking read: returns (data, eof)"""
+        if channel.recv_ready():
+            return channel.recv(RECV_CHUNK_SIZE), False
+        if channel.closed or channel.eof_received:
+            return b'', True
+        return b'', False
+
+    @staticmethod
+    def _send_or_park(channel, data: bytes, pending: bytearray):
+        """Send what the window allows, park the rest"""
+        # send() is also capped by the max packet size - keep going while the window is open
+        sent = 0
+        while sent < len(data) and channel.send_ready():
+            n = channel.send(data[sent:])
+            if n <= 0:
+                break
+            sent += n
+        if sent < len(data):
+            pending += data[sent:]
+
+    @staticmethod
+    def _flush(channel, pending: bytearray) -> bool:
+        """Send parked bytes while the window allows. Returns True when empty."""
+        while pending and channel.send_ready():
+            sent = channel.send(bytes(pending[:RECV_CHUNK_SIZE]))
+            if sent <= 0:
+                break
+            del pending[:sent]
+        return not pending
+
+
+class RelayLoop:
+    """Single thread servicing many ChannelRelays (plus its tap thread).
+
+    Sleeps on a condition variable until a relay is notified or the earliest
+    exit-status timer is due - there is no fixed polling interval.
+    """
+
+    def __init__(self, name: str = 'RelayLoop'):
+        self.name = name
+        self.relays = set()
+        self._ready = deque()
+        self._timers = []  # heap of (deadline, seq, relay)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Data to record/broadcast: (relay, data, direction); data None = relay done
+        self._taps = deque()
+        self._tap_bytes = 0
+        self._tap_cond = threading.Condition()
+        self._tapping = False
+        self._tap_thread = None
+
+        # Statistics
+        self.wakeups = 0
+        self.services = 0
+
+    def start(self):
+        """Start loop thread"""
+        self._running = True
+        self._tapping = True
+        self._tap_thread = threading.Thread(target=self._run_taps, name=f"{self.name}-tap", daemon=True)
+        self._tap_thread.start()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop loop thread (active relays are finished)"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._tap_cond:
+            self._tapping = False
+            self._tap_cond.notify()
+        if self._tap_thread:
+            self._tap_thread.join(timeout=5)
+
+    def add(self, relay: ChannelRelay):
+        """Register relay with this loop"""
+        with self._cond:
+            self.relays.add(relay)
+        relay.attach(self)
+        # Service once - channels may already hold data
+        self.notify(relay)
+
+    def notify(self, relay: ChannelRelay):
+        """Queue relay for servicing (thread-safe, idempotent)"""
+        with self._cond:
+            if relay.queued or relay.finished:
+                return
+            relay.queued = True
+            self._ready.append(relay)
+            self._cond.notify()
+
+    def tap(self, relay: ChannelRelay, data: Optional[bytes], direction: Optional[str] = None):
+        """Queue data for relay.deliver() on the tap thread (None: set relay.done)"""
+        with self._tap_cond:
+            self._taps.append((relay, data, direction))
+            if data:
+                relay.tap_bytes += len(data)
+                self._tap_bytes += len(data)
+            self._tap_cond.notify()
+
+    def tap_full(self, relay: ChannelRelay) -> bool:
+        """True if relay's tap backlog is over TAP_MAX_BYTES (relay pauses its reads)"""
+        with self._tap_cond:
+            if relay.tap_bytes < TAP_MAX_BYTES:
+                return False
+            relay.tap_paused = True
+            return True
+
+    def _run_taps(self):
+        while True:
+            with self._tap_cond:
+                while self._tapping and not self._taps:
+                    self._tap_cond.wait()
+                if not self._taps:
+                    break
+                batch = self._taps
+                self._taps = deque()
+
+            for relay, data, direction in batch:
+                if data is None:
+                    relay.done.set()
+                    continue
+                try:
+                    relay.deliver(data, direction)
+                except Exception as e:
+                    logger.error(f"Session {relay.session_id}: Failed to record/broadcast data: {e}")
+                with self._tap_cond:
+                    relay.tap_bytes -= len(data)
+                    self._tap_bytes -= len(data)
+                    resume = relay.tap_paused and relay.tap_bytes <= TAP_RESUME_BYTES
+                    if resume:
+                        relay.tap_paused = False
+                if resume:
+                    relay.notify()
+
+    def _schedule(self, relay: ChannelRelay, delay: float):
+        """Arm a one-shot timer for relay (loop thread only)"""
+        with self._cond:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._seq), relay))
+
+    def _run(self):
+        logger.info(f"{self.name} started")
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    timeout = None
+                    if self._timers:
+                        timeout = self._timers[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self._cond.wait(timeout)
+                if not self._running:
+                    break
+                self.wakeups += 1
+
+                # Move due timers into ready queue
+                now = time.monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    _, _, relay = heapq.heappop(self._timers)
+                    if not relay.queued and not relay.finished:
+                        relay.queued = True
+                        self._ready.append(relay)
+
+                batch = self._ready
+                self._ready = deque()
+                for relay in batch:
+                    relay.queued = False
+
+            for relay in batch:
+                self._service(relay)
+
+        # Shutdown: release all session threads
+        for relay in list(self.relays):
+            self._finish(relay)
+        logger.info(f"{self.name} stopped")
+
+    def _service(self, relay: ChannelRelay):
+        if relay.finished:
+            return
+        self.services += 1
+        try:
+            result = relay.pump()
+        except Exception as e:
+            logger.debug(f"Channel forwarding ended: {e}")
+            result = FINISHED
+
+        if result == FINISHED:
+            self._finish(relay)
+        elif result == AGAIN:
+            self.notify(relay)
+        # BLOCKED: notified by _WindowCondition when the window grows
+        elif result == WAITING:
+            self._schedule(relay, EXIT_STATUS_POLL)
+
+    def _finish(self, relay: ChannelRelay):
+        with self._cond:
+            relay.finished = True
+            self.relays.discard(relay)
+        relay.detach()
+        # Released once the tap thread recorded everything relayed before
+        self.tap(relay, None)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                'name': self.name,
+                'sessions': len(self.relays),
+                'timers': len(self._timers),
+                'taps': len(self._taps),
+                'tap_bytes': self._tap_bytes,
+                'wakeups': self.wakeups,
+                'services': self.services
+            }
+
+
+class RelayLoopPool:
+    """Fixed pool of RelayLoops; new relays go to the least loaded loop"""
+
+    def __init__(self, size: Optional[int] = None):
+        """Initialize pool
+
+        Args:
+            size: Number of loop threads (default: min(4, CPU count))
+        """
+        if not size or size < 1:
+            size = min(4, os.cpu_count() or 1)
+        self.loops: List[RelayLoop] = [RelayLoop(name=f"RelayLoop-{i}") for i in range(size)]
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for loop in self.loops:
+                loop.start()
+            self._started = True
+        logger.info(f"Relay loop pool started ({len(self.loops)} loops)")
+
+    def stop(self):
+        for loop in self.loops:
+            loop.stop()
+
+    def register(self, relay: ChannelRelay) -> RelayLoop:
+        """Assign relay to the least loaded loop"""
+        self.start()
+        loop = min(self.loops, key=lambda l: len(l.relays))
+        loop.add(relay)
+        return loop
+
+    def get_stats(self) -> List[dict]:
+        return [loop.get_stats() for loop in self.loops]
@@ -1,6 +1,14 @@
 """
 Session Multiplexer - Allows multiple clients to share a single SSH session
 Enables admin console join/watch functionality (Teleport-like session sharing)
+
+Output is fanned out without blocking the owner's relay thread: every watcher
+has a WatcherWriter (bounded queue + writer thread). A watcher that falls too
+far behind is resynced from the history buffer, one whose channel stays
+blocked is dropped.
+
+New and resynced watchers get the current screen (ScreenKeyframe, rendered by
+a terminal emulator) instead of a replay of the buffered output.
 """
 import logging
 import threading
@@ -9,8 +17,338 @@ from collections import deque
 from typing import Dict, List, Optional, Set
 from datetime import datetime
 
+from src.core.terminal_screen import DEFAULT_COLS, DEFAULT_ROWS, TerminalScreen
+
 logger = logging.getLogger(__name__)
 
+# Session history kept per multiplexer (advanced.session_history_kb)
+DEFAULT_HISTORY_BYTES = 64 * 1024
+
+# Screen clear, terminal reset and alternate screen switches - a snapshot can
+# start at the last of these (a cursor-home right before a clear is included)
+SCREEN_CLEAR = b'\x1b[2J'
+SCREEN_BOUNDARIES = (SCREEN_CLEAR, b'\x1bc',
+                     b'\x1b[?1049h', b'\x1b[?1049l', b'\x1b[?1047h', b'\x1b[?1047l',
+                     b'\x1b[?47h', b'\x1b[?47l')
+CURSOR_HOME = (b'\x1b[H', b'\x1b[1;1H')
+SCREEN_BOUNDARY_MAX_LEN = 14  # Cursor-home + clear
+
+# Output queued per watcher before it is resynced from the history buffer
+WATCHER_QUEUE_MAX_BYTES = 1024 * 1024
+# Seconds a watcher's send may block before the watcher is dropped
+WATCHER_STALL_TIMEOUT = 30.0
+# Largest write to a watcher channel (queued chunks are coalesced up to this)
+WATCHER_WRITE_MAX_BYTES = 64 * 1024
+# Seconds add_watcher waits for the history to reach the watcher
+HISTORY_WAIT_TIMEOUT = 5.0
+
+
+class OutputRingBuffer:
+    """Fixed-size byte ring buffer of session output
+    
+    Keeps the last `capacity` bytes in a preallocated bytearray and remembers
+    where the current screen starts (last clear/reset, or alternate screen
+    switch while a full-screen program runs), so snapshot() replays only what
+    is needed to rebuild the screen.
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_HISTORY_BYTES):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.end = 0  # Total bytes appended (absolute offset of the next byte)
+        
+        # Absolute offsets of the screen boundaries
+        self.main_boundary = None
+        self.alt_boundary = None
+        self.in_alt_screen = False
+        self._tail = b''  # End of previous output (sequences split across chunks)
+    
+    def __len__(self) -> int:
+        return min(self.end, self.capacity)
+    
+    @property
+    def start(self) -> int:
+        """Absolute offset of the oldest buffered byte"""
+        return max(0, self.end - self.capacity)
+    
+    @property
+    def boundary(self) -> Optional[int]:
+        return self.alt_boundary if self.in_alt_screen else self.main_boundary
+    
+    def append(self, data: bytes):
+        scan = self._tail + data
+        base = self.end - len(self._tail)
+        for position, sequence in self._find_boundaries(scan):
+            offset = base + position
+            if sequence.startswith(b'\x1b[?'):
+                self.in_alt_screen = sequence.endswith(b'h')
+                if self.in_alt_screen:
+                    self.alt_boundary = offset
+            elif self.in_alt_screen:
+                self.alt_boundary = offset
+            else:
+                self.main_boundary = offset
+        self._tail = scan[-(SCREEN_BOUNDARY_MAX_LEN - 1):]
+        
+        if len(data) > self.capacity:
+            self.end += len(data) - self.capacity
+            data = data[-self.capacity:]
+        position = self.end % self.capacity
+        first = min(len(data), self.capacity - position)
+        self.view[position:position + first] = data[:first]
+        self.view[:len(data) - first] = data[first:]
+        self.end += len(data)
+    
+    def _find_boundaries(self, scan: bytes):
+        """(position, sequence) of boundaries in scan not seen with the previous output, in order"""
+        found = []
+        for sequence in SCREEN_BOUNDARIES:
+            position = scan.find(sequence)
+            while position >= 0:
+                # Sequences ending inside the tail were found last time
+                if position + len(sequence) > len(self._tail):
+                    start = position
+                    if sequence == SCREEN_CLEAR:
+                        for home in CURSOR_HOME:
+                            if position >= len(home) and scan.startswith(home, position - len(home)):
+                                start = position - len(home)
+                    found.append((start, sequence))
+                position = scan.find(sequence, position + 1)
+        found.sort()
+        return found
+    
+    def snapshot(self, max_bytes: Optional[int] = None) -> bytes:
+        """Output needed to redraw the current screen (at most max_bytes)
+        
+        Starts at the last screen boundary if it is still buffered, otherwise
+        at the first line start of the buffered output.
+        """
+        start = max(0, self.end - self.capacity)
+        boundary = self.boundary
+        aligned = boundary is not None and boundary >= start
+        if aligned:
+            start = boundary
+        if max_bytes is not None and self.end - start > max_bytes:
+            start = self.end - max_bytes
+            aligned = False
+        
+        data = self.read(start, self.end)
+        if not aligned and start > 0:
+            # Cut in the middle of the stream - begin at a line (or escape sequence), not inside one
+            newline = data.find(b'\n')
+            if newline >= 0:
+                data = data[newline + 1:]
+            elif data.find(b'\x1b') > 0:
+                data = data[data.find(b'\x1b'):]
+        if self.in_alt_screen and not data.startswith(b'\x1b[?'):
+            # Boundary was a clear of the alternate screen (or was overwritten)
+            data = b'\x1b[?1049h' + data
+        return data
+    
+    def read(self, start: int, end: int) -> bytes:
+        """Buffered bytes between absolute offsets start and end"""
+        position = start % self.capacity
+        length = end - start
+        if position + length <= self.capacity:
+            return bytes(self.view[position:position + length])
+        return bytes(self.view[position:]) + bytes(self.view[:length - (self.capacity - position)])
+
+
+class ScreenKeyframe:
+    """Terminal screen of the output in an OutputRingBuffer, caught up on demand
+    
+    Emulating every chunk would cost the owner's relay thread more than
+    relaying it, so the emulator only runs when a snapshot is needed (join,
+    resync, resize): it replays the output appended since the cached keyframe,
+    or rebuilds the screen from the buffer's screen boundary when the keyframe
+    position has already been overwritten.
+    """
+    
+    def __init__(self, output_buffer: OutputRingBuffer, rows: Optional[int] = None, cols: Optional[int] = None):
+        self.output_buffer = output_buffer
+        self.rows = rows or DEFAULT_ROWS
+        self.cols = cols or DEFAULT_COLS
+        self.screen = None
+        self.offset = 0  # Buffer offset the screen is current at
+        self.rebuilds = 0
+    
+    def catch_up(self) -> TerminalScreen:
+        buffer = self.output_buffer
+        if self.screen is None or self.offset < buffer.start:
+            self.screen = TerminalScreen(self.rows, self.cols)
+            self.screen.feed(buffer.snapshot())
+            self.rebuilds += 1
+        elif self.offset < buffer.end:
+            self.screen.feed(buffer.read(self.offset, buffer.end))
+        self.offset = buffer.end
+        return self.screen
+    
+    def render(self) -> bytes:
+        """Output that redraws the current screen"""
+        return self.catch_up().render()
+    
+    def resize(self, rows: int, cols: int):
+        """Output so far was laid out for the old size - apply it before resizing"""
+        if self.screen is not None:
+            self.catch_up().resize(rows, cols)
+        self.rows = rows
+        self.cols = cols
+
+
+class WatcherWriter:
+    """Bounded output queue and writer thread of one watcher channel
+    
+    put() never blocks: the owner's relay thread only appends to the queue.
+    When more than max_queue_bytes are queued, the queued output is discarded
+    and replaced by a resync (notice + recent history from the multiplexer).
+    """
+    
+    def __init__(self, watcher_id: str, channel, multiplexer: 'SessionMultiplexer',
+                 max_queue_bytes: int = WATCHER_QUEUE_MAX_BYTES):
+        """Initialize writer (call start() to begin writing)
+        
+        Args:
+            watcher_id: Watcher this writer belongs to
+            channel: Paramiko channel (or adapter with send/closed)
+            multiplexer: Multiplexer providing history for resyncs
+            max_queue_bytes: Output queued before the watcher is resynced
+        """
+        self.watcher_id = watcher_id
+        self.channel = channel
+        self.multiplexer = multiplexer
+        self.max_queue_bytes = max_queue_bytes
+        
+        self.queue = deque()  # bytes, or threading.Event set when reached
+        self.queued_bytes = 0
+        self.cond = threading.Condition()
+        self.closing = False  # Exit once the queue is written
+        self.closed = False   # Exit now
+        self.dead = False     # Channel failed or closed
+        self.send_started = None  # When the send in progress started
+        
+        # Statistics
+        self.bytes_sent = 0
+        self.resyncs = 0
+        self.dropped_bytes = 0
+        
+        self.thread = threading.Thread(target=self._run, name=f'WatcherWriter-{watcher_id}', daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def put(self, data: bytes):
+        """Queue output (resyncs if the watcher is too far behind)"""
+        with self.cond:
+            if self.closed or self.dead:
+                return
+            if self.queued_bytes + len(data) > self.max_queue_bytes:
+                self._resync()
+            else:
+                self.queue.append(data)
+                self.queued_bytes += len(data)
+            self.cond.notify()
+    
+    def put_marker(self) -> threading.Event:
+        """Event set once everything queued so far has been written"""
+        marker = threading.Event()
+        with self.cond:
+            if self.closed or self.dead:
+                marker.set()
+            else:
+                self.queue.append(marker)
+                self.cond.notify()
+        return marker
+    
+    def stalled(self) -> bool:
+        """Channel blocked in send() for longer than WATCHER_STALL_TIMEOUT"""
+        started = self.send_started
+        return started is not None and time.monotonic() - started > WATCHER_STALL_TIMEOUT
+    
+    def close(self, drain: bool = False):
+        """Stop the writer (after writing what is queued if drain)"""
+        with self.cond:
+            if drain:
+                self.closing = True
+            else:
+                self.closed = True
+                self._discard()
+            self.cond.notify()
+    
+    def _discard(self):
+        """Drop queued output, releasing markers (caller holds self.cond)"""
+        for item in self.queue:
+            if isinstance(item, threading.Event):
+                item.set()
+        self.dropped_bytes += self.queued_bytes
+        self.queue.clear()
+        self.queued_bytes = 0
+    
+    def _resync(self):
+        """Replace queued output with recent history (caller holds self.cond and multiplexer.lock)"""
+        self._discard()
+        self.resyncs += 1
+        # Persistently slow watchers resync repeatedly - warn once
+        log = logger.warning if self.resyncs == 1 else logger.debug
+        log(f"Watcher {self.watcher_id} of session {self.multiplexer.session_id} fell behind - "
+            f"resyncing from history ({self.dropped_bytes} bytes skipped so far)")
+        notice = b"\r\n*** Output skipped (connection too slow) - resyncing ***\r\n"
+        self.queue.append(notice)
+        self.queued_bytes += len(notice)
+        history = self.multiplexer.screen_snapshot(self.max_queue_bytes // 2)
+        self.queue.append(history)
+        self.queued_bytes += len(history)
+    
+    def _next_write(self):
+        """Coalesced queued output (None to exit)"""
+        with self.cond:
+            while True:
+                if self.closed:
+                    return None
+                while self.queue and isinstance(self.queue[0], threading.Event):
+                    self.queue.popleft().set()
+                if self.queue:
+                    break
+                if self.closing:
+                    return None
+                self.cond.wait()
+            
+            parts = []
+            size = 0
+            while self.queue and not isinstance(self.queue[0], threading.Event) and size < WATCHER_WRITE_MAX_BYTES:
+                chunk = self.queue.popleft()
+                parts.append(chunk)
+                size += len(chunk)
+            self.queued_bytes -= size
+            self.send_started = time.monotonic()
+            return b''.join(parts)
+    
+    def _run(self):
+        while True:
+            data = self._next_write()
+            if data is None:
+                return
+            
+            try:
+                if self.channel.closed:
+                    raise EOFError("channel closed")
+                # Paramiko channels may accept only part of the data per send()
+                sendall = getattr(self.channel, 'sendall', None)
+                if sendall:
+                    sendall(data)
+                else:
+                    self.channel.send(data)
+                self.bytes_sent += len(data)
+            except Exception as e:
+                logger.info(f"Watcher {self.watcher_id} of session {self.multiplexer.session_id} "
+                            f"stopped receiving output: {e}")
+                with self.cond:
+                    self.dead = True
+                    self._discard()
+                return
+            finally:
+                self.send_started = None
+
 
 class SessionMultiplexer:
     """Multiplexes a single SSH session to multiple watchers/participants
@@ -23,14 +361,18 @@ class SessionMultiplexer:
     - Real-time broadcasting of all I/O
     """
     
-    def __init__(self, session_id: str, owner_username: str, server_name: str, buffer_size: int = 50000):
+    def __init__(self, session_id: str, owner_username: str, server_name: str,
+                 buffer_size: int = DEFAULT_HISTORY_BYTES,
+                 rows: Optional[int] = None, cols: Optional[int] = None):
         """Initialize multiplexer for a session
         
         Args:
             session_id: Unique session identifier
             owner_username: Original user who started the session
             server_name: Target server name
-            buffer_size: Size of history buffer in bytes (default 50KB)
+            buffer_size: Size of history buffer in bytes (default 64KB, allocated up front)
+            rows: Owner's terminal height (None = 24)
+            cols: Owner's terminal width (None = 80)
         """
         self.session_id = session_id
         self.owner_username = owner_username
@@ -38,14 +380,19 @@ class SessionMultiplexer:
         self.buffer_size = buffer_size
         
         # Output buffer (ring buffer) - stores recent output for new watchers
-        self.output_buffer = deque(maxlen=buffer_size)
+        self.output_buffer = OutputRingBuffer(buffer_size)
+        # Current screen for new watchers (built from the buffer when needed)
+        self.keyframe = ScreenKeyframe(self.output_buffer, rows, cols)
         
         # Input queue for participant commands (join mode)
         # Store tuples: (watcher_id, data)
         self.input_queue = deque()
+        # Called (no args) when participant input is queued - wakes the relay loop
+        self.input_listener = None
         
         # Connected watchers/participants
-        self.watchers: Dict[str, dict] = {}  # watcher_id -> {channel, username, joined_at, mode}
+        self.watchers: Dict[str, dict] = {}  # watcher_id -> {channel, writer, username, joined_at, mode}
+        self._writers = ()  # WatcherWriters of self.watchers (replaced on add/remove)
         self.lock = threading.RLock()
         
         # Statistics
@@ -76,23 +423,29 @@ class SessionMultiplexer:
                 logger.warning(f"Watcher {watcher_id} already exists in session {self.session_id}")
                 return False
             
+            writer = WatcherWriter(watcher_id, channel, self)
             self.watchers[watcher_id] = {
                 'channel': channel,
+                'writer': writer,
                 'username': username,
                 'joined_at': datetime.utcnow(),
-                'mode': mode,
-                'bytes_sent': 0
+                'mode': mode
             }
+            self._writers = tuple(w['writer'] for w in self.watchers.values())
+            writer.start()
             
             logger.info(f"Added {mode} watcher {watcher_id} ({username}) to session {self.session_id} ({len(self.watchers)} total)")
             
             # Send session history to new watcher
             self._send_history_to_watcher(watcher_id)
+            history_written = writer.put_marker()
             
             # Announce join (if not in stealth mode)
             self._announce_join(username, mode)
-            
-            return True
+        
+        # Callers write to the channel after this returns - let the history go first
+        history_written.wait(HISTORY_WAIT_TIMEOUT)
+        return True
     
     def remove_watcher(self, watcher_id: str):
         """Remove a watcher/participant from this session"""
@@ -103,6 +456,8 @@ class SessionMultiplexer:
                 mode = watcher['mode']
                 
                 del self.watchers[watcher_id]
+                self._writers = tuple(w['writer'] for w in self.watchers.values())
+                watcher['writer'].close()
                 logger.info(f"Removed {mode} watcher {watcher_id} ({username}) from session {self.session_id} ({len(self.watchers)} remaining)")
                 
                 # Announce leave
@@ -123,23 +478,30 @@ class SessionMultiplexer:
             self.output_buffer.append(data)
             self.bytes_proxied += len(data)
             
-            # Send to all watchers
-            dead_watchers = []
-            for watcher_id, watcher_info in self.watchers.items():
-                try:
-                    channel = watcher_info['channel']
-                    if not channel.closed:
-                        channel.send(data)
-                        watcher_info['bytes_sent'] += len(data)
-                    else:
-                        dead_watchers.append(watcher_id)
-                except Exception as e:
-                    logger.error(f"Error sending to watcher {watcher_id}: {e}")
-                    dead_watchers.append(watcher_id)
-            
-            # Clean up dead watchers
-            for watcher_id in dead_watchers:
-                self.remove_watcher(watcher_id)
+            # Queue for all watchers (never blocks - writers send)
+            writers = self._writers
+            for writer in writers:
+                writer.put(data)
+        
+        # Clean up dead and stalled watchers
+        for writer in writers:
+            if writer.dead:
+                self.remove_watcher(writer.watcher_id)
+            elif writer.stalled():
+                self._drop_stalled_watcher(writer)
+    
+    def _drop_stalled_watcher(self, writer: WatcherWriter):
+        """Remove a watcher whose channel has been blocked for WATCHER_STALL_TIMEOUT"""
+        logger.warning(
+            f"Watcher {writer.watcher_id} of session {self.session_id} blocked for more than "
+            f"{WATCHER_STALL_TIMEOUT:.0f}s - dropping"
+        )
+        self.remove_watcher(writer.watcher_id)
+        try:
+            # Unblocks the writer thread
+            writer.channel.close()
+        except Exception as e:
+            logger.debug(f"Error closing stalled watcher {writer.watcher_id}: {e}")
     
     def handle_participant_input(self, watcher_id: str, data: bytes) -> Optional[bytes]:
         """Handle input from a participant (join mode)
@@ -163,6 +525,8 @@ class SessionMultiplexer:
             
             # Add to input queue for forward_channel to pick up
             self.input_queue.append((watcher_id, data))
+            if self.input_listener:
+                self.input_listener()
             return data
     
     def get_pending_input(self) -> Optional[bytes]:
@@ -179,38 +543,50 @@ class SessionMultiplexer:
             return None
     
     def _send_history_to_watcher(self, watcher_id: str):
-        """Send buffered output history to a newly joined watcher"""
+        """Queue buffered output history for a newly joined watcher"""
         with self.lock:
             if watcher_id not in self.watchers:
                 return
             
             watcher = self.watchers[watcher_id]
-            channel = watcher['channel']
+            writer = watcher['writer']
             
-            # Clear screen and send banner
+            # Banner, then the owner's current screen (redrawn from the top left)
+            banner = (
+                f"\r\n{'='*60}\r\n"
+                f"Joined session: {self.session_id}\r\n"
+                f"Owner: {self.owner_username}\r\n"
+                f"Server: {self.server_name}\r\n"
+                f"Mode: {watcher['mode']}\r\n"
+                f"{'='*60}\r\n\r\n"
+            )
+            writer.put(banner.encode('utf-8') + self.screen_snapshot(writer.max_queue_bytes // 2))
+    
+    def screen_snapshot(self, max_bytes: int) -> bytes:
+        """Output that shows the current screen (caller holds self.lock)
+        
+        Rendered from the screen keyframe; falls back to buffered output since
+        the last screen boundary (at most max_bytes) if emulation fails.
+        """
+        try:
+            return self.keyframe.render()
+        except Exception as e:
+            logger.error(f"Failed to render screen of session {self.session_id}: {e}", exc_info=True)
+            self.keyframe.screen = None
+            return self.output_buffer.snapshot(max_bytes)
+    
+    def resize(self, rows: int, cols: int):
+        """Owner's terminal was resized (relayed to watcher channels that support it)"""
+        with self.lock:
             try:
-                banner = (
-                    f"\r\n{'='*60}\r\n"
-                    f"Joined session: {self.session_id}\r\n"
-                    f"Owner: {self.owner_username}\r\n"
-                    f"Server: {self.server_name}\r\n"
-                    f"Mode: {watcher['mode']}\r\n"
-                    f"{'='*60}\r\n\r\n"
-                    "--- Session History ---\r\n"
-                )
-                channel.send(banner.encode('utf-8'))
-                
-                # Send buffered output
-                for chunk in self.output_buffer:
-                    if not channel.closed:
-                        channel.send(chunk)
-                        watcher['bytes_sent'] += len(chunk)
-                
-                footer = b"\r\n--- End History (Live Stream) ---\r\n\r\n"
-                channel.send(footer)
-                
+                self.keyframe.resize(rows, cols)
             except Exception as e:
-                logger.error(f"Error sending history to watcher {watcher_id}: {e}")
+                logger.error(f"Failed to resize screen of session {self.session_id}: {e}", exc_info=True)
+                self.keyframe.screen = None
+            for watcher in self.watchers.values():
+                terminal_resized = getattr(watcher['channel'], 'terminal_resized', None)
+                if terminal_resized:
+                    terminal_resized(rows, cols)
     
     def _announce_join(self, username: str, mode: str):
         """Announce that someone joined the session"""
@@ -219,13 +595,8 @@ class SessionMultiplexer:
         
         # Broadcast to all watchers
         with self.lock:
-            for watcher_id, watcher_info in self.watchers.items():
-                try:
-                    channel = watcher_info['channel']
-                    if not channel.closed:
-                        channel.send(announcement.encode('utf-8'))
-                except Exception as e:
-                    logger.error(f"Error announcing join to watcher {watcher_id}: {e}")
+            for writer in self._writers:
+                writer.put(announcement.encode('utf-8'))
     
     def _announce_leave(self, username: str, mode: str):
         """Announce that someone left the session"""
@@ -234,18 +605,16 @@ class SessionMultiplexer:
         
         # Broadcast to all watchers
         with self.lock:
-            for watcher_id, watcher_info in self.watchers.items():
-                try:
-                    channel = watcher_info['channel']
-                    if not channel.closed:
-                        channel.send(announcement.encode('utf-8'))
-                except Exception as e:
-                    logger.error(f"Error announcing leave to watcher {watcher_id}: {e}")
+            for writer in self._writers:
+                writer.put(announcement.encode('utf-8'))
     
     def deactivate(self):
         """Mark session as inactive - no new watchers allowed"""
         with self.lock:
             self.active = False
+            # Writers exit once the remaining output is written
+            for writer in self._writers:
+                writer.close(drain=True)
             logger.info(f"SessionMultiplexer deactivated for session {self.session_id}")
     
     def get_stats(self) -> dict:
@@ -262,12 +631,18 @@ class SessionMultiplexer:
                         'username': w['username'],
                         'mode': w['mode'],
                         'joined_at': w['joined_at'].isoformat(),
-                        'bytes_sent': w['bytes_sent']
+                        'bytes_sent': w['writer'].bytes_sent,
+                        'queued_bytes': w['writer'].queued_bytes,
+                        'resyncs': w['writer'].resyncs,
+                        'dropped_bytes': w['writer'].dropped_bytes
                     }
                     for w in self.watchers.values()
                 ],
                 'bytes_proxied': self.bytes_proxied,
-                'buffer_size': len(self.output_buffer),
+                'buffer_size': self.output_buffer.capacity,
+                'buffered_bytes': len(self.output_buffer),
+                'terminal_size': [self.keyframe.rows, self.keyframe.cols],
+                'screen_rebuilds': self.keyframe.rebuilds,
                 'created_at': self.created_at.isoformat()
             }
 
@@ -299,9 +674,19 @@ class SessionMultiplexerRegistry:
         self._initialized = True
         logger.info("SessionMultiplexerRegistry initialized")
     
-    def register_session(self, session_id: str, owner_username: str, server_name: str) -> SessionMultiplexer:
+    def register_session(self, session_id: str, owner_username: str, server_name: str,
+                         buffer_size: int = DEFAULT_HISTORY_BYTES,
+                         rows: Optional[int] = None, cols: Optional[int] = None) -> SessionMultiplexer:
         """Register a new session for multiplexing
         
+        Args:
+            session_id: Session ID
+            owner_username: Session owner
+            server_name: Target server name
+            buffer_size: History kept for new watchers (bytes)
+            rows: Owner's terminal height
+            cols: Owner's terminal width
+        
         Returns:
             SessionMultiplexer instance for this session
         """
@@ -310,7 +695,7 @@ class SessionMultiplexerRegistry:
                 logger.warning(f"Session {session_id} already registered - returning existing multiplexer")
                 return self.sessions[session_id]
             
-            multiplexer = SessionMultiplexer(session_id, owner_username, server_name)
+            multiplexer = SessionMultiplexer(session_id, owner_username, server_name, buffer_size, rows, cols)
             self.sessions[session_id] = multiplexer
             
             logger.info(f"Registered session {session_id} for multiplexing ({len(self.sessions)} total)")
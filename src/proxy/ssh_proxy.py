@@ -22,12 +22,22 @@ import pytz
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 # Gate ALWAYS uses Tower API - no direct database access
+from src.core import recording_format
 from src.core.ip_pool import IPPoolManager
 from src.core.utmp_helper import write_utmp_login, write_utmp_logout
-from src.gate.api_client import TowerClient
-from src.gate.config import GateConfig
+from src.gate.api_client import get_client
+from src.gate.config import get_config
+from src.gate.grant_cache import init_grant_cache
+from src.gate.grant_events import GrantEventListener
 from src.proxy.admin_console_paramiko import AdminConsoleParamiko
-from src.proxy.session_multiplexer import SessionMultiplexerRegistry
+from src.proxy.admission import AdmissionController
+from src.proxy.grant_monitor import GrantMonitor
+from src.proxy.inactivity_monitor import InactivityMonitor
+from src.proxy.mfa_waiter import MFAWaiter
+from src.proxy.recording_uploader import RecordingUploader
+from src.proxy.relay_loop import ChannelRelay, RelayLoopPool, send_nowait
+from src.proxy.session_multiplexer import DEFAULT_HISTORY_BYTES, SessionMultiplexerRegistry
+from src.proxy.timer_wheel import TimerWheel
 
 # SO_ORIGINAL_DST constant for Linux TPROXY
 SO_ORIGINAL_DST = 80
@@ -58,7 +68,7 @@ def load_messages():
     global GATE_MESSAGES
     logger.info("Loading custom messages from Tower API")
     try:
-        tower_client = TowerClient(GateConfig())
+        tower_client = get_client()
         messages = tower_client.get_messages()
         GATE_MESSAGES.update(messages)
         logger.info(f"Custom messages loaded successfully ({len([m for m in messages.values() if m])} configured)")
@@ -138,32 +148,46 @@ def format_denial_message(result: dict, username: str, dest_ip: str, tower_clien
 
 
 class SSHSessionRecorder:
-    """Records SSH session I/O and streams to Tower API in JSONL format.
+    """Records SSH session I/O and streams to Tower API.
+    
+    Binary format (default, see src.core.recording_format): terminal I/O stays
+    raw bytes in length-prefixed frames with timestamp deltas; every flush
+    uploads one compressed block as application/octet-stream. Used when
+    [recording] format = binary and Tower accepts it, JSONL otherwise.
     
     JSONL Format (JSON Lines - one event per line):
     {"type":"session_start","timestamp":"2026-01-07T12:00:00.000Z","username":"p.mojski","server":"10.0.160.4"}
     {"type":"client","timestamp":"2026-01-07T12:00:01.123Z","data":"ls -la\n"}
     {"type":"server","timestamp":"2026-01-07T12:00:01.245Z","data":"total 24\ndrwxr-xr-x..."}
+    {"type":"resize","timestamp":"2026-01-07T12:02:00.000Z","rows":50,"cols":200}
     {"type":"session_end","timestamp":"2026-01-07T12:05:30.456Z","duration":330}
     
-    - Buffers JSONL events in memory (~50 events)
-    - Flushes to Tower every 3 seconds or when buffer full
+    - Buffers frames in memory (~50 events JSONL, 500 frames / 256KB binary)
+    - Flushes every 3 seconds or when buffer full
+    - Flushed frames go to the gate's RecordingUploader (background sender), so
+      relay threads never wait on Tower; uploads synchronously without one
     - Falls back to /tmp/ storage if Tower offline
     - Auto-uploads buffered recordings when Tower back online
     """
     
-    def __init__(self, session_id: str, username: str, server_ip: str, server_name: str, tower_client, server_instance=None):
+    def __init__(self, session_id: str, username: str, server_ip: str, server_name: str, tower_client, server_instance=None,
+                 terminal_size=None):
         self.session_id = session_id
         self.username = username
         self.server_ip = server_ip
         self.server_name = server_name
         self.tower_client = tower_client
         self.server_instance = server_instance  # Reference to SSHProxyServer for activity tracking
+        self.uploader = getattr(server_instance, 'recording_uploader', None)
         self.start_time = datetime.now(pytz.UTC)
-        
-        # JSONL event buffer (list of event dicts)
-        self.events_buffer = []
-        self.buffer_max_events = 50  # Max events before flush
+        self.lock = threading.Lock()  # Frame buffer (relay threads + uploader idle flush)
+        
+        # Frame buffer: (kind, timestamp_ms, data) - see src.core.recording_format
+        self.frames_buffer = []
+        self.buffer_bytes = 0
+        self.buffer_max_events = 50  # Max events before flush (JSONL)
+        self.buffer_max_frames = 500  # Max frames before flush (binary)
+        self.buffer_max_bytes = 256 * 1024  # Max buffered I/O bytes before flush (binary)
         self.chunk_index = 0
         self.total_events = 0
         self.total_bytes = 0
@@ -174,14 +198,21 @@ class SSHSessionRecorder:
         self.offline_file = None
         self.offline_path = None
         
-        # Write session_start event
-        self._write_event({
+        config = tower_client.config
+        self.binary = config.recording_format == 'binary'
+        self.codec = recording_format.codec_from_name(config.recording_compression)
+        
+        # Write session_start event (terminal size lets playback rebuild the screen)
+        start_event = {
             'type': 'session_start',
             'timestamp': self.start_time.isoformat(),
             'username': username,
             'server': server_ip,
             'server_name': server_name
-        })
+        }
+        if terminal_size and all(terminal_size):
+            start_event['rows'], start_event['cols'] = terminal_size
+        self._write_event(start_event)
         
         # Try to start recording on Tower
         try:
@@ -189,21 +220,36 @@ class SSHSessionRecorder:
                 session_id=session_id,
                 person_username=username,
                 server_name=server_name,
-                server_ip=server_ip
+                server_ip=server_ip,
+                recording_format='binary' if self.binary else 'jsonl'
             )
             self.recording_path = response.get('recording_path')
             self.recording_file = self.recording_path  # For compatibility
-            logger.debug(f"Recording streaming to Tower: {self.recording_path}")
+            # Older Tower ignores format and writes JSONL
+            self.binary = response.get('format') == 'binary'
+            logger.debug(f"Recording streaming to Tower ({'binary' if self.binary else 'jsonl'}): {self.recording_path}")
             
         except Exception as e:
             logger.warning(f"Tower unavailable for recording start: {e}. Using offline mode.")
-            self.tower_online = False
-            # Fallback to /tmp/ storage
-            self.offline_path = f"/tmp/gate-recordings/{session_id}.jsonl"
-            os.makedirs("/tmp/gate-recordings", exist_ok=True)
+            self._go_offline()
+        
+        if self.uploader:
+            self.uploader.register(self)
+    
+    def _go_offline(self):
+        """Switch to /tmp/ storage (same format as Tower upload would use)"""
+        self.tower_online = False
+        os.makedirs("/tmp/gate-recordings", exist_ok=True)
+        if self.binary:
+            self.offline_path = f"/tmp/gate-recordings/{self.session_id}.rec"
+            self.offline_file = open(self.offline_path, 'ab')
+            if self.offline_file.tell() == 0:
+                self.offline_file.write(recording_format.FILE_MAGIC)
+        else:
+            self.offline_path = f"/tmp/gate-recordings/{self.session_id}.jsonl"
             self.offline_file = open(self.offline_path, 'a')  # Append mode for JSONL
-            self.recording_file = self.offline_path
-            logger.info(f"Recording to offline buffer: {self.offline_path}")
+        self.recording_file = self.offline_path
+        logger.info(f"Recording to offline buffer: {self.offline_path}")
     
     def record_event(self, event_type: str, data: str):
         """Record a named event (session_start, session_end, etc.)"""
@@ -213,94 +259,131 @@ class SSHSessionRecorder:
             'data': data
         })
     
+    def record_resize(self, rows: int, cols: int):
+        """Record a terminal size change"""
+        self._write_event({
+            'type': 'resize',
+            'timestamp': datetime.now(pytz.UTC).isoformat(),
+            'rows': rows,
+            'cols': cols
+        })
+    
     def write_data(self, data: bytes, direction: str):
-        """Write terminal I/O data as JSONL event
+        """Write terminal I/O data (raw bytes, decoded only for JSONL upload)
         
         Args:
             data: Raw bytes from terminal
             direction: 'client' or 'server'
         """
-        try:
-            # Decode bytes to string (replace invalid UTF-8)
-            data_str = data.decode('utf-8', errors='replace')
-        except Exception as e:
-            logger.warning(f"Failed to decode data: {e}")
-            data_str = repr(data)  # Fallback to repr
-        
-        self._write_event({
-            'type': direction,
-            'timestamp': datetime.now(pytz.UTC).isoformat(),
-            'data': data_str
-        })
+        self._add_frame((
+            recording_format.DIRECTION_KINDS[direction],
+            recording_format.timestamp_ms(),
+            bytes(data)
+        ))
     
     def _write_event(self, event: dict):
-        """Write single event to buffer"""
+        """Write single named event to buffer"""
+        self._add_frame(recording_format.event_frame(event))
+    
+    def _add_frame(self, frame):
         # Update last activity timestamp for inactivity timeout tracking
         if self.server_instance and self.session_id:
             self.server_instance.session_last_activity[self.session_id] = datetime.utcnow()
         
-        if self.tower_online:
-            # Add to buffer
-            self.events_buffer.append(event)
+        with self.lock:
+            self.frames_buffer.append(frame)
+            self.buffer_bytes += len(frame[2])
             self.total_events += 1
             
             # Check if flush needed
             now = time.time()
-            buffer_full = len(self.events_buffer) >= self.buffer_max_events
+            if self.binary:
+                buffer_full = (len(self.frames_buffer) >= self.buffer_max_frames or
+                               self.buffer_bytes >= self.buffer_max_bytes)
+            else:
+                buffer_full = len(self.frames_buffer) >= self.buffer_max_events
             time_to_flush = (now - self.last_flush) >= self.flush_interval
             
             if buffer_full or time_to_flush:
-                self.flush()
-        else:
-            # Offline mode - write directly to /tmp/ as JSONL
-            if self.offline_file:
-                jsonl_line = json.dumps(event, separators=(',', ':')) + '\n'
-                self.offline_file.write(jsonl_line)
-                self.offline_file.flush()
-                self.total_events += 1
-                self.total_bytes += len(jsonl_line)
+                self._flush_locked()
+    
+    def _encode(self, frames) -> bytes:
+        """Frames as one binary block or JSONL lines"""
+        if self.binary:
+            return recording_format.encode_block(frames, self.codec)
+        return ''.join(
+            json.dumps(recording_format.frame_to_event(*frame), separators=(',', ':')) + '\n'
+            for frame in frames
+        ).encode('utf-8')
     
     def flush(self):
-        """Flush JSONL events buffer to Tower"""
-        if len(self.events_buffer) == 0:
+        """Flush buffered frames to Tower (or offline file)"""
+        with self.lock:
+            self._flush_locked()
+    
+    def flush_if_due(self):
+        """Flush frames buffered longer than flush_interval (idle session)"""
+        with self.lock:
+            if self.frames_buffer and (time.time() - self.last_flush) >= self.flush_interval:
+                self._flush_locked()
+    
+    def _flush_locked(self):
+        # Called with self.lock held, so chunks are queued in buffer order
+        if len(self.frames_buffer) == 0:
             return
         
-        try:
-            # Convert events to JSONL (newline-delimited JSON)
-            jsonl_data = '\n'.join(json.dumps(event, separators=(',', ':')) for event in self.events_buffer) + '\n'
-            jsonl_bytes = jsonl_data.encode('utf-8')
-            
-            # Upload chunk to Tower
-            self.tower_client.upload_recording_chunk(
-                session_id=self.session_id,
-                recording_path=self.recording_path,
-                chunk_data=jsonl_bytes,
-                chunk_index=self.chunk_index
-            )
-            
-            logger.debug(f"Flushed {len(self.events_buffer)} events ({len(jsonl_bytes)} bytes) to Tower (chunk {self.chunk_index})")
-            
-            # Clear buffer
-            self.total_bytes += len(jsonl_bytes)
-            self.events_buffer.clear()
-            self.chunk_index += 1
-            self.last_flush = time.time()
-            
-        except Exception as e:
-            logger.error(f"Failed to flush recording chunk: {e}")
-            # Switch to offline mode
-            if self.tower_online:
-                logger.warning("Switching to offline recording mode")
-                self.tower_online = False
-                self.offline_path = f"/tmp/gate-recordings/{self.session_id}.jsonl"
-                os.makedirs("/tmp/gate-recordings", exist_ok=True)
-                self.offline_file = open(self.offline_path, 'a')
-                # Write buffered events to offline file
-                for event in self.events_buffer:
-                    jsonl_line = json.dumps(event, separators=(',', ':')) + '\n'
-                    self.offline_file.write(jsonl_line)
-                self.offline_file.flush()
-                self.events_buffer.clear()
+        frames = self.frames_buffer
+        self.frames_buffer = []
+        self.buffer_bytes = 0
+        self.last_flush = time.time()
+        
+        if self.uploader:
+            # Encoded and uploaded by the uploader thread
+            self.uploader.submit(self, frames)
+        else:
+            self._deliver(self._encode(frames))
+    
+    def _deliver(self, chunk: bytes):
+        """Upload one encoded chunk to Tower, or append it to the offline file (blocking)"""
+        if self.tower_online:
+            try:
+                # Upload chunk to Tower
+                if self.binary:
+                    self.tower_client.upload_recording_block(
+                        session_id=self.session_id,
+                        recording_path=self.recording_path,
+                        block=chunk,
+                        chunk_index=self.chunk_index
+                    )
+                else:
+                    self.tower_client.upload_recording_chunk(
+                        session_id=self.session_id,
+                        recording_path=self.recording_path,
+                        chunk_data=chunk,
+                        chunk_index=self.chunk_index
+                    )
+                
+                logger.debug(f"Flushed {len(chunk)} bytes to Tower (chunk {self.chunk_index})")
+                self.total_bytes += len(chunk)
+                self.chunk_index += 1
+                return
+                
+            except Exception as e:
+                logger.error(f"Failed to flush recording chunk: {e}")
+        
+        self._deliver_offline(chunk)
+    
+    def _deliver_offline(self, chunk: bytes):
+        """Append chunk to the offline file (switching to offline mode first)"""
+        if self.tower_online:
+            logger.warning("Switching to offline recording mode")
+            self._go_offline()
+        
+        # Offline mode - append to /tmp/ file
+        if self.offline_file:
+            self.offline_file.write(chunk if self.binary else chunk.decode('utf-8'))
+            self.offline_file.flush()
+            self.total_bytes += len(chunk)
     
     def save(self):
         """Finalize recording"""
@@ -313,9 +396,16 @@ class SSHSessionRecorder:
         })
         
         # Final flush
-        if self.tower_online and len(self.events_buffer) > 0:
-            self.flush()
+        self.flush()
         
+        if self.uploader:
+            # Finalized by the uploader once the queued chunks are sent
+            self.uploader.finalize(self, duration)
+        else:
+            self._finish(duration)
+    
+    def _finish(self, duration: int):
+        """Upload offline recording (if any) and finalize on Tower"""
         # Close offline file if used
         if self.offline_file:
             self.offline_file.close()
@@ -338,46 +428,77 @@ class SSHSessionRecorder:
                 logger.error(f"Failed to finalize recording: {e}")
     
     def _upload_offline_recording(self):
-        """Upload offline JSONL recording to Tower when it comes back online"""
+        """Upload offline recording to Tower when it comes back online"""
         if not self.offline_path or not os.path.exists(self.offline_path):
             return
         
         try:
-            # Try to start recording on Tower
+            # Try to start recording on Tower (in the offline file's format)
             response = self.tower_client.start_recording(
                 session_id=self.session_id,
                 person_username=self.username,
                 server_name=self.server_name,
-                server_ip=self.server_ip
+                server_ip=self.server_ip,
+                recording_format='binary' if self.binary else 'jsonl'
             )
             recording_path = response.get('recording_path')
+            tower_binary = response.get('format') == 'binary'
             
-            # Upload file in chunks (read ~50 lines at a time)
             chunk_index = 0
-            lines_per_chunk = 50
-            
-            with open(self.offline_path, 'r') as f:
-                while True:
-                    lines = []
-                    for _ in range(lines_per_chunk):
-                        line = f.readline()
-                        if not line:
+            if self.binary:
+                with open(self.offline_path, 'rb') as f:
+                    for codec, base_ms, raw_len, payload in recording_format.iter_blocks(f):
+                        if tower_binary:
+                            # Upload blocks as written
+                            block = recording_format.BLOCK_HEADER.pack(
+                                recording_format.BLOCK_MAGIC, codec, base_ms, raw_len, len(payload)
+                            ) + payload
+                            self.tower_client.upload_recording_block(
+                                session_id=self.session_id,
+                                recording_path=recording_path,
+                                block=block,
+                                chunk_index=chunk_index
+                            )
+                        else:
+                            # Older Tower - convert block to JSONL
+                            frames = recording_format.decode_block(codec, base_ms, raw_len, payload)
+                            jsonl_chunk = ''.join(
+                                json.dumps(recording_format.frame_to_event(*frame), separators=(',', ':')) + '\n'
+                                for frame in frames
+                            )
+                            self.tower_client.upload_recording_chunk(
+                                session_id=self.session_id,
+                                recording_path=recording_path,
+                                chunk_data=jsonl_chunk.encode('utf-8'),
+                                chunk_index=chunk_index
+                            )
+                        chunk_index += 1
+            else:
+                # Upload file in chunks (read ~50 lines at a time)
+                lines_per_chunk = 50
+                
+                with open(self.offline_path, 'r') as f:
+                    while True:
+                        lines = []
+                        for _ in range(lines_per_chunk):
+                            line = f.readline()
+                            if not line:
+                                break
+                            lines.append(line.rstrip('\n'))
+                        
+                        if not lines:
                             break
-                        lines.append(line.rstrip('\n'))
-                    
-                    if not lines:
-                        break
-                    
-                    # Join lines with newline and add final newline
-                    jsonl_chunk = '\n'.join(lines) + '\n'
-                    
-                    self.tower_client.upload_recording_chunk(
-                        session_id=self.session_id,
-                        recording_path=recording_path,
-                        chunk_data=jsonl_chunk.encode('utf-8'),
-                        chunk_index=chunk_index
-                    )
-                    chunk_index += 1
+                        
+                        # Join lines with newline and add final newline
+                        jsonl_chunk = '\n'.join(lines) + '\n'
+                        
+                        self.tower_client.upload_recording_chunk(
+                            session_id=self.session_id,
+                            recording_path=recording_path,
+                            chunk_data=jsonl_chunk.encode('utf-8'),
+                            chunk_index=chunk_index
+                        )
+                        chunk_index += 1
             
             # Finalize
             duration = int((datetime.now(pytz.UTC) - self.start_time).total_seconds())
@@ -390,7 +511,7 @@ class SSHSessionRecorder:
             
             # Delete offline file
             os.remove(self.offline_path)
-            logger.info(f"Offline JSONL recording uploaded and deleted: {self.offline_path}")
+            logger.info(f"Offline recording uploaded and deleted: {self.offline_path}")
             
         except Exception as e:
             logger.error(f"Failed to upload offline recording: {e}. Will retry later.")
@@ -400,10 +521,11 @@ class SSHSessionRecorder:
 class SSHProxyHandler(paramiko.ServerInterface):
     """Handles SSH authentication and channel requests"""
     
-    def __init__(self, source_ip: str, dest_ip: str):
+    def __init__(self, source_ip: str, dest_ip: str, mfa_waiter: MFAWaiter):
         self.source_ip = source_ip
         self.dest_ip = dest_ip  # NEW: destination IP client connected to
-        self.tower_client = TowerClient(GateConfig())
+        self.tower_client = get_client()
+        self.mfa_waiter = mfa_waiter  # Shared by all handshakes waiting for MFA
         self.authenticated_user = None
         self.target_server = None
         self.matching_policies = []  # Policies that granted access
@@ -421,9 +543,8 @@ class SSHProxyHandler(paramiko.ServerInterface):
         self.pty_width = None
         self.pty_height = None
         self.pty_modes = None
-        # Grant check cache - check only once per connection
-        self.grant_checked = False
-        self.grant_result = None
+        # Access decisions of this connection (see _access_decision)
+        self.access_decisions = {}  # (source_ip, dest_ip, login, fingerprint) -> check_grant result
         # Channel type and exec command
         self.channel_type = None  # 'shell', 'exec', or 'subsystem'
         self.exec_command = None
@@ -434,8 +555,59 @@ class SSHProxyHandler(paramiko.ServerInterface):
         # Backend channel/transport (set after connection established)
         self.backend_channel = None
         self.backend_transport = None
+        # Session recorder and multiplexer (told about terminal resizes)
+        self.recorder = None
+        self.multiplexer = None
         # Environment variables from client
         self.env_vars = {}  # name -> value
+    
+    def _access_decision(self, username: str, ssh_key_fingerprint: str = None, mfa_token: str = None):
+        """Grant decision for this connection, evaluated by Tower once per identity.
+        
+        Auth callbacks run several times per handshake (paramiko asks about
+        each offered key before and after the signature, clients fall back
+        from keys to password). The decision is kept per
+        (source_ip, dest_ip, login, fingerprint) and reused by every later
+        callback and by channel setup (access_result).
+        
+        Args:
+            username: SSH login
+            ssh_key_fingerprint: Fingerprint of the offered key (None for password/interactive)
+            mfa_token: Verified MFA token - MFA state changed, so all cached
+                decisions are dropped and this one is evaluated again
+        
+        Returns:
+            check_grant result dict
+        """
+        key = (self.source_ip, self.dest_ip, username, ssh_key_fingerprint)
+        if mfa_token:
+            self.access_decisions.clear()
+        elif key in self.access_decisions:
+            logger.debug(f"Reusing access decision for {username} (fingerprint={ssh_key_fingerprint})")
+            return self.access_decisions[key]
+        
+        result = self.tower_client.check_grant(
+            source_ip=self.source_ip,
+            destination_ip=self.dest_ip,
+            protocol='ssh',
+            ssh_login=username,
+            ssh_key_fingerprint=ssh_key_fingerprint,
+            mfa_token=mfa_token
+        )
+        self.access_decisions[key] = result
+        return result
+    
+    def _wait_for_mfa(self, mfa_token: str, timeout_min: int):
+        """Park this handshake until its MFA challenge is verified (pushed by Tower).
+        
+        Returns:
+            Challenge status dict, None on timeout or client disconnect
+        """
+        return self.mfa_waiter.wait(
+            mfa_token,
+            timeout=timeout_min * 60,
+            is_alive=lambda: self.transport.is_active() and self.transport.is_alive()
+        )
         
     def check_auth_none(self, username: str):
         """Check 'none' authentication - called AFTER get_banner
@@ -499,19 +671,8 @@ class SSHProxyHandler(paramiko.ServerInterface):
         """
         logger.info(f"Password auth attempt: {username} from {self.source_ip} to {self.dest_ip}")
         
-        # Check access permissions using Tower API (cache result)
-        if not self.grant_checked:
-            result = self.tower_client.check_grant(
-                source_ip=self.source_ip,
-                destination_ip=self.dest_ip,
-                protocol='ssh',
-                ssh_login=username,
-                ssh_key_fingerprint=None  # No key used in password auth
-            )
-            self.grant_checked = True
-            self.grant_result = result
-        else:
-            result = self.grant_result
+        # Check access permissions using Tower API (once per login, no key used in password auth)
+        result = self._access_decision(username)
         
         # Check if MFA is required (unknown source IP, no fingerprint)
         if not result.get('allowed') and result.get('mfa_required'):
@@ -578,47 +739,27 @@ class SSHProxyHandler(paramiko.ServerInterface):
                 except Exception as be:
                     logger.warning(f"Could not send MFA banner: {be}")
                 
-                # Poll MFA status
-                poll_interval = 2
-                max_polls = (timeout_min * 60) // poll_interval
-                logger.info(f"Polling MFA status for password auth (max {max_polls} attempts)")
+                # Wait for MFA verification
+                logger.info(f"Waiting for MFA verification for password auth (timeout {timeout_min} min)")
+                status = self._wait_for_mfa(mfa_token, timeout_min)
                 
-                for attempt in range(max_polls):
-                    if not self.transport.is_active() or not self.transport.is_alive():
-                        logger.info(f"Transport closed during MFA poll - client disconnected")
-                        return paramiko.AUTH_FAILED
+                if not self.transport.is_active() or not self.transport.is_alive():
+                    logger.info(f"Transport closed during MFA wait - client disconnected")
+                    return paramiko.AUTH_FAILED
+                
+                if status and status.get('verified'):
+                    logger.info(f"MFA verified for password auth: {username}")
+                    self.pending_mfa_token = None
                     
-                    try:
-                        status = self.tower_client.check_mfa_status(mfa_token)
-                        
-                        if status.get('verified'):
-                            logger.info(f"MFA verified for password auth: {username}")
-                            self.pending_mfa_token = None
-                            
-                            # MFA verified - check grant again with mfa_token
-                            result = self.tower_client.check_grant(
-                                source_ip=self.source_ip,
-                                destination_ip=self.dest_ip,
-                                protocol='ssh',
-                                ssh_login=username,
-                                ssh_key_fingerprint=None,  # Still no key
-                                mfa_token=mfa_token
-                            )
-                            self.grant_result = result
-                            break
-                        elif status.get('expired'):
-                            logger.warning(f"MFA expired for password auth: {username}")
-                            self.pending_mfa_token = None
-                            self.no_grant_reason = "MFA authentication expired"
-                            return paramiko.AUTH_FAILED
-                        
-                        time.sleep(poll_interval)
-                        
-                    except Exception as pe:
-                        logger.error(f"MFA poll error: {pe}")
-                        time.sleep(poll_interval)
+                    # MFA verified - check grant again with mfa_token (still no key)
+                    result = self._access_decision(username, mfa_token=mfa_token)
+                elif status:
+                    logger.warning(f"MFA expired for password auth: {username}")
+                    self.pending_mfa_token = None
+                    self.no_grant_reason = "MFA authentication expired"
+                    return paramiko.AUTH_FAILED
                 
-                # After poll loop - check if MFA was verified
+                # After wait - check if MFA was verified
                 if not result.get('allowed'):
                     if result.get('verified'):
                         # MFA succeeded but grant denied (no access rights)
@@ -681,19 +822,8 @@ class SSHProxyHandler(paramiko.ServerInterface):
         self.ssh_key_fingerprint = base64.b64encode(fingerprint_hash).decode('ascii')
         logger.debug(f"SSH key fingerprint: {self.ssh_key_fingerprint}")
         
-        # Check access permissions using Tower API (cache result)
-        if not self.grant_checked:
-            result = self.tower_client.check_grant(
-                source_ip=self.source_ip,
-                destination_ip=self.dest_ip,
-                protocol='ssh',
-                ssh_login=username,
-                ssh_key_fingerprint=self.ssh_key_fingerprint
-            )
-            self.grant_checked = True
-            self.grant_result = result
-        else:
-            result = self.grant_result
+        # Check access permissions using Tower API (once per login and key)
+        result = self._access_decision(username, self.ssh_key_fingerprint)
         
         # Check if MFA is required
         if not result.get('allowed') and result.get('mfa_required'):
@@ -758,55 +888,26 @@ class SSHProxyHandler(paramiko.ServerInterface):
                 except Exception as be:
                     logger.warning(f"Could not send banner: {be}")
                 
-                # Poll MFA status
-                poll_interval = 2
-                max_polls = (timeout_min * 60) // poll_interval
-                logger.info(f"Polling MFA status (max {max_polls} attempts)")
+                # Wait for MFA verification (woken by Tower push, polled in batch as fallback)
+                logger.info(f"Waiting for MFA verification (timeout {timeout_min} min)")
+                status = self._wait_for_mfa(mfa_token, timeout_min)
                 
-                for attempt in range(max_polls):
-                    # Check if transport is still alive (client disconnected?)
-                    if not self.transport.is_active() or not self.transport.is_alive():
-                        logger.info(f"Transport closed during MFA polling - client disconnected")
-                        return paramiko.AUTH_FAILED
-                    
-                    try:
-                        status = self.tower_client.check_mfa_status(mfa_token)
-                        
-                        if status.get('verified'):
-                            logger.info(f"MFA verified for {username}, user_id={status.get('user_id')}")
-                            # Challenge verified - clear tracking
-                            self.pending_mfa_token = None
-                            # Re-check grant - now with MFA token to prove identity
-                            result = self.tower_client.check_grant(
-                                source_ip=self.source_ip,
-                                destination_ip=self.dest_ip,
-                                protocol='ssh',
-                                ssh_login=username,
-                                ssh_key_fingerprint=self.ssh_key_fingerprint,
-                                mfa_token=mfa_token  # Proof of verified MFA
-                            )
-                            self.grant_result = result
-                            break
-                        elif status.get('expired'):
-                            logger.warning(f"MFA expired for {username}")
-                            self.pending_mfa_token = None  # Clear on expiry
-                            self.no_grant_reason = "MFA authentication expired"
-                            return paramiko.AUTH_FAILED
-                        
-                        time.sleep(poll_interval)
-                        
-                        # Check again after sleep (user might have disconnected during sleep)
-                        if not self.transport.is_active() or not self.transport.is_alive():
-                            logger.info(f"Transport closed during sleep - client disconnected")
-                            return paramiko.AUTH_FAILED
-                            
-                    except Exception as pe:
-                        logger.error(f"MFA poll error: {pe}")
-                        # Check if it's transport closed
-                        if not self.transport.is_active():
-                            logger.info(f"Transport closed during MFA poll - client disconnected")
-                            return paramiko.AUTH_FAILED
-                        time.sleep(poll_interval)
+                # Check if transport is still alive (client disconnected?)
+                if not self.transport.is_active() or not self.transport.is_alive():
+                    logger.info(f"Transport closed during MFA wait - client disconnected")
+                    return paramiko.AUTH_FAILED
+                
+                if status and status.get('verified'):
+                    logger.info(f"MFA verified for {username}, user_id={status.get('user_id')}")
+                    # Challenge verified - clear tracking
+                    self.pending_mfa_token = None
+                    # Re-check grant - now with MFA token to prove identity
+                    result = self._access_decision(username, self.ssh_key_fingerprint, mfa_token=mfa_token)
+                elif status:
+                    logger.warning(f"MFA expired for {username}")
+                    self.pending_mfa_token = None  # Clear on expiry
+                    self.no_grant_reason = "MFA authentication expired"
+                    return paramiko.AUTH_FAILED
                 
                 if not result.get('allowed'):
                     logger.warning(f"MFA timeout for {username}")
@@ -879,19 +980,8 @@ class SSHProxyHandler(paramiko.ServerInterface):
         """
         logger.info(f"Interactive auth attempt: {username} from {self.source_ip} to {self.dest_ip}")
         
-        # Check access permissions using Tower API (cache result)
-        if not self.grant_checked:
-            result = self.tower_client.check_grant(
-                source_ip=self.source_ip,
-                destination_ip=self.dest_ip,
-                protocol='ssh',
-                ssh_login=username,
-                ssh_key_fingerprint=self.ssh_key_fingerprint
-            )
-            self.grant_checked = True
-            self.grant_result = result
-        else:
-            result = self.grant_result
+        # Check access permissions using Tower API (once per login and key)
+        result = self._access_decision(username, self.ssh_key_fingerprint)
         
         # Check if MFA is required (unknown source IP, no fingerprint)
         if not result.get('allowed') and result.get('mfa_required'):
@@ -1169,6 +1259,12 @@ class SSHProxyHandler(paramiko.ServerInterface):
         self.pty_width = width
         self.pty_height = height
         
+        # Keep screen snapshots (join/watch, playback) in the new layout
+        if self.multiplexer:
+            self.multiplexer.resize(height, width)
+        if self.recorder:
+            self.recorder.record_resize(height, width)
+        
         # Forward resize to backend if connected
         if self.backend_channel and not self.backend_channel.closed:
             try:
@@ -1252,7 +1348,8 @@ class SSHProxyHandler(paramiko.ServerInterface):
 class SSHProxyServer:
     """SSH Proxy Server - intercepts and forwards connections"""
     
-    def __init__(self, nat_config=None, tproxy_config=None, host_key_path='/var/lib/inside-gate/ssh_host_key'):
+    def __init__(self, nat_config=None, tproxy_config=None, host_key_path='/var/lib/inside-gate/ssh_host_key',
+                 relay_loops=None, admission_config=None, session_history_bytes=DEFAULT_HISTORY_BYTES):
         """
         Initialize SSH Proxy Server with dual mode support
         
@@ -1260,12 +1357,15 @@ class SSHProxyServer:
             nat_config: Dict with 'host' and 'port' for NAT mode (or None to disable)
             tproxy_config: Dict with 'host' and 'port' for TPROXY mode (or None to disable)
             host_key_path: Path to SSH host key file
+            relay_loops: Number of relay loop threads forwarding session data (None = auto)
+            admission_config: Dict with connection limits (see admission.DEFAULT_ADMISSION_CONFIG)
+            session_history_bytes: Output history kept per session for join/watch
         """
         self.nat_config = nat_config  # Keep None if not provided
         self.tproxy_config = tproxy_config
         self.host_key_path = host_key_path
         self.host_key = self._load_or_generate_host_key()
-        self.tower_client = TowerClient(GateConfig())
+        self.tower_client = get_client()
         self.heartbeat_interval = 5  # seconds (for fast relay activation)
         self.heartbeat_thread = None
         self.running = False
@@ -1273,9 +1373,7 @@ class SSHProxyServer:
         self.active_connections = {}
         # Session multiplexer registry for join/watch functionality
         self.multiplexer_registry = SessionMultiplexerRegistry()
-        # Forced disconnection times: session_id -> datetime (UTC)
-        # Used by heartbeat to inject immediate/scheduled disconnections
-        self.session_forced_endtimes = {}
+        self.session_history_bytes = session_history_bytes
         # Current grant end times: session_id -> datetime (UTC)
         # Used to detect grant extensions (renew)
         self.session_grant_endtimes = {}
@@ -1283,6 +1381,33 @@ class SSHProxyServer:
         self.session_last_activity = {}
         # Session metadata for terminal title: session_id -> {grant_end_time, inactivity_timeout, server_name}
         self.session_metadata = {}
+        # Shared event-driven loops that forward channel data for all sessions
+        self.relay_pool = RelayLoopPool(relay_loops)
+        # Bounded handshake workers + per-IP/overall connection limits
+        self.admission = AdmissionController(self.handle_client, admission_config)
+        # One timer thread for all session deadlines (grant end, warnings, idle timeout, titles)
+        self.timers = TimerWheel()
+        # One scheduler re-validating grants of all live sessions (batch API call)
+        self.grant_monitor = GrantMonitor(self.tower_client, self._close_connection, self.timers,
+                                          end_time_listener=self._on_grant_end_time_changed)
+        # Idle timeouts and terminal titles of all live sessions
+        self.inactivity_monitor = InactivityMonitor(
+            self.tower_client, self.timers, self.session_last_activity, self.session_metadata,
+            self.update_terminal_title, self.clear_terminal_title
+        )
+        # One waiter for all handshakes parked on MFA (woken by 'mfa_verified' events)
+        self.mfa_waiter = MFAWaiter(self.tower_client)
+        # Background recording uploads for all sessions (relay threads never wait on Tower)
+        gate_config = self.tower_client.config
+        self.recording_uploader = RecordingUploader(
+            self.tower_client,
+            max_queue_bytes=gate_config.recording_queue_max_mb * 1024 * 1024,
+            batch_max_bytes=gate_config.recording_batch_max_kb * 1024
+        )
+        # Local grant decision cache (None if cache_enabled=false)
+        self.grant_cache = None
+        # Grant events pushed by Tower (None if relay.grant_events=false)
+        self.grant_events = None
         
         # Initialize relay manager if configured (for Tower web live view)
         self.relay_manager = None
@@ -1290,11 +1415,9 @@ class SSHProxyServer:
     
     def _init_relay_manager(self):
         """Initialize relay manager if Tower relay is enabled"""
-        from src.gate.config import GateConfig
-        
-        # Get config (will use same instance as tower_client)
+        # Get config (same instance as tower_client)
         try:
-            config = GateConfig()
+            config = get_config()
         except:
             logger.debug("Could not load gate config - relay disabled")
             return
@@ -1318,7 +1441,10 @@ class SSHProxyServer:
                 tower_url=tower_url,
                 gate_api_key=gate_api_key,
                 gate_name=gate_name,
-                multiplexer_registry=self.multiplexer_registry
+                multiplexer_registry=self.multiplexer_registry,
+                frame_interval_ms=config.relay_frame_ms,
+                frame_max_bytes=config.relay_frame_kb * 1024,
+                max_buffer_bytes=config.relay_max_buffer_kb * 1024
             )
             logger.info(f"✓ Tower relay manager initialized (URL: {tower_url})")
         except Exception as e:
@@ -1363,13 +1489,14 @@ class SSHProxyServer:
             logger.error(traceback.format_exc())
             return None
     
-    def forward_channel(self, client_channel, backend_channel, recorder: SSHSessionRecorder = None, db_session_id=None, is_sftp=False, session_id=None, server_name=None, owner_username=None):
+    def forward_channel(self, client_channel, backend_channel, recorder: SSHSessionRecorder = None, db_session_id=None, is_sftp=False, session_id=None, server_name=None, owner_username=None, server_handler=None):
         """Forward data between client and backend server via SSH channels
         
         Args:
             session_id: Session identifier for terminal title clearing and multiplexing
             server_name: Server name for terminal title
             owner_username: Username of session owner (for multiplexing)
+            server_handler: SSHProxyHandler of the client (terminal size, resizes)
         """
         bytes_sent = 0
         bytes_received = 0
@@ -1382,8 +1509,13 @@ class SSHProxyServer:
                 multiplexer = self.multiplexer_registry.register_session(
                     session_id=session_id,
                     owner_username=owner_username,
-                    server_name=server_name
+                    server_name=server_name,
+                    buffer_size=self.session_history_bytes,
+                    rows=server_handler.pty_height if server_handler else None,
+                    cols=server_handler.pty_width if server_handler else None
                 )
+                if server_handler:
+                    server_handler.multiplexer = multiplexer
                 logger.info(f"Session {session_id} registered with multiplexer (owner: {owner_username})")
             except Exception as e:
                 logger.error(f"Failed to register session {session_id} with multiplexer: {e}")
@@ -1399,74 +1531,28 @@ class SSHProxyServer:
         logger.info(f"Starting forward_channel: client_closed={client_channel.closed}, backend_closed={backend_channel.closed}")
         
         try:
-            while True:
-                # Check if channels are still open
-                if client_channel.closed or backend_channel.closed:
-                    logger.info(f"Channel closed in loop: client={client_channel.closed}, backend={backend_channel.closed}")
-                    break
-                
-                # Check for pending input from multiplexed participants (join mode)
-                if multiplexer:
-                    participant_input = multiplexer.get_pending_input()
-                    if participant_input:
-                        try:
-                            backend_channel.send(participant_input)
-                            bytes_sent += len(participant_input)
-                            if recorder:
-                                recorder.write_data(participant_input, 'client')
-                        except Exception as e:
-                            logger.error(f"Error sending participant input to backend: {e}")
-                
-                r, w, x = select.select([client_channel, backend_channel], [], [], 0.1)
-                
-                if client_channel in r:
-                    data = client_channel.recv(4096)
-                    if len(data) == 0:
-                        break
-                    backend_channel.send(data)
-                    bytes_sent += len(data)
-                    if recorder:
-                        # Stream client→server data to Tower as JSONL
-                        recorder.write_data(data, 'client')
-                
-                if backend_channel in r:
-                    data = backend_channel.recv(4096)
-                    logger.debug(f"Backend recv: {len(data)} bytes")
-                    if len(data) == 0:
-                        # Backend closed - try to get exit status before breaking
-                        logger.info(f"Backend channel EOF, checking exit status")
-                        try:
-                            # Small delay for exit status to arrive
-                            import time
-                            time.sleep(0.05)
-                            if backend_channel.exit_status_ready():
-                                exit_status = backend_channel.recv_exit_status()
-                                client_channel.send_exit_status(exit_status)
-                                logger.info(f"Propagated exit status {exit_status} from backend to client")
-                            else:
-                                logger.warning(f"Exit status not ready after backend EOF")
-                        except Exception as e:
-                            logger.warning(f"Failed to propagate exit status: {e}", exc_info=True)
-                        break
-                    
-                    # Send to original client
-                    client_channel.send(data)
-                    bytes_received += len(data)
-                    
-                    # Broadcast to all multiplexed watchers/participants
-                    if multiplexer:
-                        multiplexer.broadcast_output(data)
-                    
-                    # Record session data
-                    if recorder:
-                        # Stream server→client data to Tower as JSONL
-                        recorder.write_data(data, 'server')
+            # Hand the channel pair to the shared relay loops - they wake up only
+            # when a channel has data or closes (no per-session polling)
+            relay = ChannelRelay(
+                client_channel,
+                backend_channel,
+                recorder=recorder,
+                multiplexer=multiplexer,
+                session_id=session_id
+            )
+            self.relay_pool.register(relay)
+            relay.wait()
+            relay.flush_remaining()
+            bytes_sent = relay.bytes_sent
+            bytes_received = relay.bytes_received
         
         except Exception as e:
             logger.debug(f"Channel forwarding ended: {e}")
         
         finally:
             # Unregister session from multiplexer
+            if server_handler:
+                server_handler.multiplexer = None
             if multiplexer and session_id:
                 try:
                     self.multiplexer_registry.unregister_session(session_id)
@@ -2489,7 +2575,8 @@ class SSHProxyServer:
             # Send ANSI escape sequence: OSC 2 ; title BEL
             # \033]2; = OSC 2 (set window title)
             # \007 = BEL (bell terminator)
-            channel.send(f"\033]2;{title}\007".encode())
+            # Called from the timer wheel - skipped while the client's window is full
+            send_nowait(channel, f"\033]2;{title}\007".encode())
             
         except Exception as e:
             # Silently ignore errors (channel might be closed, terminal might not support)
@@ -2505,317 +2592,10 @@ class SSHProxyServer:
                 server_name = server_name[:17] + "..."
             
             title = f"Inside: {server_name} | disconnected"
-            channel.send(f"\033]2;{title}\007".encode())
+            send_nowait(channel, f"\033]2;{title}\007".encode())
         except:
             pass
     
-    def monitor_inactivity_timeout(self, channel, backend_channel, transport, backend_transport,
-                                    inactivity_timeout_minutes, db_session_id, session_id, server_name="unknown"):
-        """Monitor session inactivity and disconnect after configured timeout.
-        
-        Args:
-            channel: Client channel
-            backend_channel: Backend channel
-            transport: Client transport
-            backend_transport: Backend transport
-            inactivity_timeout_minutes: Timeout in minutes (0 or None = disabled)
-            db_session_id: Database session ID for termination reason
-            session_id: Session ID for tracking
-        """
-        try:
-            # Disabled or invalid timeout
-            if not inactivity_timeout_minutes or inactivity_timeout_minutes <= 0:
-                logger.debug(f"Session {session_id}: Inactivity timeout disabled")
-                return
-            
-            logger.info(f"Session {session_id}: Monitoring inactivity timeout ({inactivity_timeout_minutes} minutes)")
-            
-            # Initialize last activity timestamp
-            if session_id not in self.session_last_activity:
-                self.session_last_activity[session_id] = datetime.utcnow()
-            
-            # Convert timeout to seconds
-            timeout_seconds = inactivity_timeout_minutes * 60
-            warning_5min = 300  # 5 minutes in seconds
-            warning_1min = 60   # 1 minute in seconds
-            
-            sent_5min_warning = False
-            sent_1min_warning = False
-            
-            last_title_update = 0  # Track last title update time
-            while True:
-                time.sleep(10)  # Check every 10 seconds
-                
-                # Check if session is still active
-                if not transport.is_active() or not backend_transport.is_active():
-                    logger.debug(f"Session {session_id}: Session disconnected, stopping inactivity monitor")
-                    return
-                
-                # Get last activity time
-                last_activity = self.session_last_activity.get(session_id)
-                if not last_activity:
-                    logger.warning(f"Session {session_id}: No last activity timestamp found")
-                    return
-                
-                # Calculate idle time
-                now = datetime.utcnow()
-                idle_seconds = (now - last_activity).total_seconds()
-                remaining_seconds = timeout_seconds - idle_seconds
-                
-                # Update terminal title periodically (this monitor runs every 10s, so it's the main title updater)
-                # Frequency: 60s normally, 10s when idle >50 min OR grant <10 min
-                current_time = time.time()
-                idle_minutes = int(idle_seconds / 60)
-                
-                # Get grant info from metadata
-                grant_remaining_minutes = None
-                is_warning = False
-                metadata = self.session_metadata.get(session_id, {})
-                grant_end_time = metadata.get('grant_end_time')
-                if grant_end_time:
-                    grant_remaining = (grant_end_time - now).total_seconds()
-                    grant_remaining_minutes = int(grant_remaining / 60)
-                    if grant_remaining < 300:  # <5 min
-                        is_warning = True
-                
-                # Check if we should update title (faster when warning)
-                if remaining_seconds < 300:  # Idle timeout warning
-                    is_warning = True
-                
-                update_interval = 10 if (is_warning or idle_minutes >= (inactivity_timeout_minutes - 10)) else 60
-                
-                if current_time - last_title_update >= update_interval:
-                    self.update_terminal_title(
-                        channel=channel,
-                        server_name=server_name,
-                        grant_remaining_minutes=grant_remaining_minutes,
-                        idle_current_minutes=idle_minutes,
-                        idle_max_minutes=inactivity_timeout_minutes,
-                        is_warning=is_warning
-                    )
-                    last_title_update = current_time
-                
-                # Check if timeout reached
-                if remaining_seconds <= 0:
-                    logger.info(f"Session {session_id}: Inactivity timeout reached ({inactivity_timeout_minutes} min)")
-                    
-                    # Clear terminal title
-                    self.clear_terminal_title(channel, server_name)
-                    
-                    # Send disconnect message
-                    try:
-                        message = (
-                            f"\r\n\r\n"
-                            f"{'='*70}\r\n"
-                            f"  Session disconnected due to inactivity\r\n"
-                            f"  No activity detected for {inactivity_timeout_minutes} minutes\r\n"
-                            f"{'='*70}\r\n\r\n"
-                        )
-                        channel.send(message.encode())
-                        time.sleep(0.5)  # Give time for message to be delivered
-                    except Exception as e:
-                        logger.error(f"Session {session_id}: Failed to send disconnect message: {e}")
-                    
-                    # Close connection
-                    try:
-                        channel.close()
-                        backend_channel.close()
-                    except:
-                        pass
-                    
-                    # Mark termination in database
-                    if db_session_id:
-                        try:
-                            self.tower_client.update_session(
-                                session_id=db_session_id,
-                                is_active=False,
-                                ended_at=datetime.utcnow().isoformat(),
-                                termination_reason='inactivity_timeout'
-                            )
-                        except Exception as e:
-                            logger.error(f"Session {session_id}: Failed to update termination reason: {e}")
-                    
-                    # Remove from tracking
-                    if session_id in self.session_last_activity:
-                        del self.session_last_activity[session_id]
-                    if session_id in self.session_metadata:
-                        del self.session_metadata[session_id]
-                    
-                    return
-                
-                # Send warnings (only for shell sessions with channel)
-                if remaining_seconds <= warning_5min and not sent_5min_warning:
-                    try:
-                        mins_remaining = int(remaining_seconds / 60)
-                        message = (
-                            f"\r\n\r\n"
-                            f"{'='*70}\r\n"
-                            f"  *** WARNING: Inactivity detected ***\r\n"
-                            f"  No activity for {int(idle_seconds / 60)} minutes\r\n"
-                            f"  Session will disconnect in {mins_remaining} minute(s)\r\n"
-                            f"  Press any key to continue working\r\n"
-                            f"{'='*70}\r\n\r\n"
-                        )
-                        channel.send(message.encode())
-                        sent_5min_warning = True
-                        logger.info(f"Session {session_id}: Sent 5-minute inactivity warning")
-                    except Exception as e:
-                        logger.error(f"Session {session_id}: Failed to send 5-minute warning: {e}")
-                
-                if remaining_seconds <= warning_1min and not sent_1min_warning:
-                    try:
-                        message = (
-                            f"\r\n\r\n"
-                            f"{'='*70}\r\n"
-                            f"  *** WARNING: Session disconnecting in 1 minute ***\r\n"
-                            f"  No activity detected - press any key to continue\r\n"
-                            f"{'='*70}\r\n\r\n"
-                        )
-                        channel.send(message.encode())
-                        sent_1min_warning = True
-                        logger.info(f"Session {session_id}: Sent 1-minute inactivity warning")
-                    except Exception as e:
-                        logger.error(f"Session {session_id}: Failed to send 1-minute warning: {e}")
-                        
-        except Exception as e:
-            logger.error(f"Session {session_id}: Error in inactivity monitor: {e}")
-    
-    def monitor_grant_expiry_v11(self, channel, backend_channel, transport, backend_transport,
-                                 db_session_id, session_id, server_name="unknown"):
-        """v1.11: Simplified grant expiry monitoring with periodic API polling.
-        
-        Single source of truth: API endpoint /api/v1/sessions/{id}/grant_status
-        Polls every 10 seconds to get current grant status.
-        State-based warnings: sent_5min, sent_1min flags.
-        No restart logic, no extension detection, no cached end_time.
-        
-        Args:
-            db_session_id: Database session ID for API queries
-            session_id: Gate session ID for tracking
-            server_name: Target server name for terminal title display
-        """
-        sent_5min_warning = False
-        sent_1min_warning = False
-        
-        try:
-            tower_client = TowerClient(GateConfig())
-            logger.info(f"Session {session_id}: Starting v1.11 grant monitor (polling every 10s)")
-            
-            while True:
-                # Sleep first (10 second polling interval)
-                time.sleep(10)
-                
-                # Check if session still active
-                if not transport.is_active() or not backend_transport.is_active():
-                    logger.info(f"Session {session_id}: Transport closed, exiting monitor")
-                    return
-                
-                # Poll API for current grant status
-                try:
-                    status = tower_client.get_session_grant_status(db_session_id)
-                except Exception as e:
-                    logger.error(f"Session {session_id}: Failed to poll grant status: {e}")
-                    continue  # Keep trying
-                
-                # Check if grant still valid
-                if not status['valid']:
-                    reason = status.get('reason', 'Access denied')
-                    logger.info(f"Session {session_id}: Grant no longer valid: {reason}")
-                    
-                    # Send termination message
-                    disconnect_msg = (
-                        f"\r\n\r\n"
-                        f"{'='*70}\r\n"
-                        f"  *** Session terminated: {reason} ***\r\n"
-                        f"  Disconnecting now...\r\n"
-                        f"{'='*70}\r\n\r\n"
-                    )
-                    try:
-                        channel.send(disconnect_msg.encode())
-                        time.sleep(1)
-                    except:
-                        pass
-                    
-                    # Close connection
-                    self._close_connection(channel, backend_channel, transport, backend_transport, session_id, 'grant_revoked')
-                    return
-                
-                # Grant still valid - check end_time for warnings
-                end_time_str = status.get('end_time')
-                if not end_time_str:
-                    # Permanent grant, no warnings needed
-                    continue
-                
-                # Parse end_time (can be 'Z' suffix or +HH:MM timezone)
-                # Convert to naive UTC for comparison
-                if end_time_str.endswith('Z'):
-                    end_time_str = end_time_str.replace('Z', '+00:00')
-                end_time_dt = datetime.fromisoformat(end_time_str)
-                # Convert to UTC and strip timezone for naive comparison
-                if end_time_dt.tzinfo is not None:
-                    end_time = end_time_dt.astimezone(pytz.utc).replace(tzinfo=None)
-                else:
-                    end_time = end_time_dt
-                
-                # Calculate remaining time
-                now = datetime.utcnow()
-                remaining_seconds = (end_time - now).total_seconds()
-                
-                if remaining_seconds <= 0:
-                    # Grant expired
-                    logger.info(f"Session {session_id}: Grant expired")
-                    
-                    disconnect_msg = (
-                        f"\r\n\r\n"
-                        f"{'='*70}\r\n"
-                        f"  *** Your access grant has expired ***\r\n"
-                        f"  Disconnecting now...\r\n"
-                        f"{'='*70}\r\n\r\n"
-                    )
-                    try:
-                        channel.send(disconnect_msg.encode())
-                        time.sleep(1)
-                    except:
-                        pass
-                    
-                    self._close_connection(channel, backend_channel, transport, backend_transport, session_id, 'grant_expired')
-                    return
-                
-                # Check if we should send 5-minute warning
-                if remaining_seconds <= 300 and not sent_5min_warning:
-                    sent_5min_warning = True
-                    warning_msg = (
-                        f"\r\n\r\n"
-                        f"{'='*70}\r\n"
-                        f"  *** WARNING: Your access grant expires in 5 minutes ***\r\n"
-                        f"  Your session will be automatically disconnected at {end_time} UTC\r\n"
-                        f"{'='*70}\r\n\r\n"
-                    )
-                    try:
-                        channel.send(warning_msg.encode())
-                        logger.info(f"Session {session_id}: Sent 5-minute warning")
-                    except Exception as e:
-                        logger.error(f"Session {session_id}: Failed to send 5-min warning: {e}")
-                
-                # Check if we should send 1-minute warning
-                elif remaining_seconds <= 60 and not sent_1min_warning:
-                    sent_1min_warning = True
-                    warning_msg = (
-                        f"\r\n\r\n"
-                        f"{'='*70}\r\n"
-                        f"  *** WARNING: Your access grant expires in 1 minute ***\r\n"
-                        f"  Your session will be automatically disconnected at {end_time} UTC\r\n"
-                        f"{'='*70}\r\n\r\n"
-                    )
-                    try:
-                        channel.send(warning_msg.encode())
-                        logger.info(f"Session {session_id}: Sent 1-minute warning")
-                    except Exception as e:
-                        logger.error(f"Session {session_id}: Failed to send 1-min warning: {e}")
-                
-        except Exception as e:
-            logger.error(f"Session {session_id}: Error in v1.11 grant monitor: {e}", exc_info=True)
-    
     def _close_connection(self, channel, backend_channel, transport, backend_transport, session_id, termination_reason):
         """Helper to close connection and update Tower API."""
         # Close channels and transports
@@ -2838,7 +2618,7 @@ class SSHProxyServer:
         
         # Update Tower API
         try:
-            tower_client = TowerClient(GateConfig())
+            tower_client = get_client()
             tower_client.update_session(
                 session_id=session_id,
                 ended_at=datetime.utcnow().isoformat(),
@@ -2849,252 +2629,6 @@ class SSHProxyServer:
         except Exception as e:
             logger.error(f"Session {session_id}: Failed to update Tower API: {e}")
     
-    def monitor_grant_expiry(self, channel, backend_channel, transport, backend_transport, 
-                             grant_end_time, db_session_id, session_id, server_name="unknown"):
-        """OLD v1.10 monitoring - DEPRECATED, use monitor_grant_expiry_v11 instead.
-        
-        Monitor grant expiry and send warnings, then disconnect when grant expires.
-        
-        Also checks for forced disconnection times injected by heartbeat.
-        For permanent grants (grant_end_time=None), only monitors for forced disconnection.
-        Updates terminal title with countdown timer.
-        
-        Args:
-            server_name: Target server name for terminal title display
-        """
-        try:
-            # Use updated grant_end_time from session_grant_endtimes if available (may be updated after MFA)
-            if session_id in self.session_grant_endtimes:
-                grant_end_time = self.session_grant_endtimes[session_id]
-                logger.info(f"Session {session_id}: Using grant_end_time from session tracking: {grant_end_time}")
-            
-            # Check if there's a forced disconnection time (from heartbeat)
-            if session_id in self.session_forced_endtimes:
-                forced_end = self.session_forced_endtimes[session_id]
-                # Use the earlier time between grant expiry and forced disconnect
-                if grant_end_time is None or forced_end < grant_end_time:
-                    logger.info(f"Session {session_id}: Using forced disconnect time {forced_end}")
-                    grant_end_time = forced_end
-            
-            # Permanent grant - only check for forced disconnection every 30 seconds
-            if grant_end_time is None:
-                logger.debug(f"Session {session_id}: Permanent grant, monitoring for revocation only")
-                while True:
-                    time.sleep(30)
-                    # Check if session is still active
-                    if not transport.is_active() or not backend_transport.is_active():
-                        logger.info(f"Session {session_id}: Disconnected normally")
-                        return
-                    
-                    # Check if forced disconnect was injected (grant revoked)
-                    if session_id in self.session_forced_endtimes:
-                        forced_end = self.session_forced_endtimes[session_id]
-                        now = datetime.utcnow()
-                        if forced_end <= now:
-                            logger.info(f"Session {session_id}: Grant revoked, terminating immediately")
-                            grant_end_time = forced_end
-                            break
-                        else:
-                            grant_end_time = forced_end
-                            logger.info(f"Session {session_id}: Grant revoked, will disconnect at {forced_end}")
-                            break
-            
-            # Main monitoring loop - restarts if grant is extended
-            while True:
-                now = datetime.utcnow()
-                remaining = (grant_end_time - now).total_seconds()
-                
-                logger.debug(f"Session {session_id}: Grant expires in {remaining/60:.1f} minutes ({grant_end_time})")
-                
-                # Store grant end time in metadata for inactivity monitor to use in title
-                if session_id in self.session_metadata:
-                    self.session_metadata[session_id]['grant_end_time'] = grant_end_time
-                
-                # Warning times (in seconds before expiry)
-                warnings = [
-                    (300, "5 minutes"),  # 5 minutes
-                    (60, "1 minute"),    # 1 minute
-                ]
-                
-                grant_extended_during_warning = False
-                for warning_seconds, warning_text in warnings:
-                    if remaining > warning_seconds:
-                        # Sleep until warning time (in small increments to check for forced disconnect)
-                        sleep_time = remaining - warning_seconds
-                        logger.debug(f"Session {session_id}: Sleeping {sleep_time:.0f}s until {warning_text} warning")
-                        
-                        # Sleep in 1-second increments to check for forced disconnect
-                        for _ in range(int(sleep_time)):
-                            time.sleep(1)
-                            
-                            # DISABLED: Extension detection causes false positives
-                            # TODO: v1.11 refactor will replace this with periodic polling
-                            # if session_id in self.session_grant_endtimes:
-                            #     new_end_time = self.session_grant_endtimes[session_id]
-                            #     if new_end_time != grant_end_time:
-                            #         logger.info(f"Session {session_id}: Grant time changed")
-                            
-                            # Check if forced disconnect was injected
-                            if session_id in self.session_forced_endtimes:
-                                forced_end = self.session_forced_endtimes[session_id]
-                                now = datetime.utcnow()
-                                if forced_end <= now:
-                                    logger.info(f"Session {session_id}: Forced disconnect detected, terminating immediately")
-                                    # Jump to immediate disconnect
-                                    remaining = 0
-                                    break
-                                else:
-                                    # Update grant_end_time to forced time
-                                    grant_end_time = forced_end
-                                    remaining = (grant_end_time - now).total_seconds()
-                                    logger.info(f"Session {session_id}: Updated end_time to forced disconnect at {forced_end}")
-                                    break
-                            # Check if session is still active
-                            if not transport.is_active() or not backend_transport.is_active():
-                                logger.info(f"Session {session_id}: Already disconnected during sleep")
-                                return
-                        
-                        # If forced disconnect caused break, skip to final disconnect
-                        if remaining <= 0:
-                            break
-                        
-                        # DISABLED: grant_extended_during_warning causes false restart loops
-                        # If grant was extended, restart from beginning of while loop
-                        # if grant_extended_during_warning:
-                        #     logger.info(f"Session {session_id}: Restarting countdown due to grant extension")
-                        #     break
-                        
-                        # Check if session is still active
-                        if not transport.is_active() or not backend_transport.is_active():
-                            logger.info(f"Session {session_id}: Already disconnected before {warning_text} warning")
-                            return
-                        
-                        # Send wall-style warning
-                        now = datetime.utcnow()
-                        remaining = (grant_end_time - now).total_seconds()
-                        if remaining > 0:
-                            message = (
-                                f"\r\n\r\n"
-                                f"{'='*70}\r\n"
-                                f"  *** WARNING: Your access grant expires in {warning_text} ***\r\n"
-                                f"  Your session will be automatically disconnected at {grant_end_time} UTC\r\n"
-                                f"{'='*70}\r\n\r\n"
-                            )
-                            try:
-                                channel.send(message.encode())
-                                logger.info(f"Session {session_id}: Sent {warning_text} warning")
-                            except Exception as e:
-                                logger.error(f"Session {session_id}: Failed to send warning: {e}")
-                                return
-                        
-                        remaining = (grant_end_time - now).total_seconds()
-                
-                # DISABLED: grant_extended_during_warning logic causes false positives
-                # If grant was extended during warnings, restart the while loop
-                # if grant_extended_during_warning:
-                #     continue
-                
-                # Sleep until expiry (in small increments to check for forced disconnect)
-                grant_was_extended = False
-                if remaining > 0:
-                    logger.debug(f"Session {session_id}: Sleeping {remaining:.0f}s until grant expiry")
-                    for _ in range(int(remaining)):
-                        time.sleep(1)
-                        
-                        # DISABLED: Extension detection during final countdown causes false positives
-                        # TODO: v1.11 refactor will replace this with periodic polling
-                        
-                        # Check if forced disconnect was injected
-                        if session_id in self.session_forced_endtimes:
-                            forced_end = self.session_forced_endtimes[session_id]
-                            now = datetime.utcnow()
-                            if forced_end <= now:
-                                logger.info(f"Session {session_id}: Forced disconnect detected during final countdown")
-                                break
-                        # Check if session is still active
-                        if not transport.is_active() or not backend_transport.is_active():
-                            logger.info(f"Session {session_id}: Already disconnected during final countdown")
-                            return
-                
-                # DISABLED: grant_was_extended logic
-                # Break out of while loop - time to disconnect
-                break
-            
-            # Check if session is still active
-            if not transport.is_active() or not backend_transport.is_active():
-                logger.info(f"Session {session_id}: Already disconnected before grant expiry")
-                return
-            
-            # Determine disconnect reason
-            disconnect_reason = "Your access grant has expired"
-            termination_reason = 'grant_expired'
-            
-            # Check if forced termination reason exists
-            if session_id in self.session_forced_endtimes:
-                # Tower API would have set termination_reason via update_session
-                # Default messages for common reasons
-                termination_reason = 'gate_maintenance'  # Will be overridden by Tower API if different
-                disconnect_reason = "Session terminated by administrator"
-                
-                # Clean up forced endtime
-                del self.session_forced_endtimes[session_id]
-            
-            # Clear terminal title before disconnect
-            self.clear_terminal_title(channel, server_name)
-            
-            # Send final disconnection message
-            final_message = (
-                f"\r\n\r\n"
-                f"{'='*70}\r\n"
-                f"  *** {disconnect_reason} ***\r\n"
-                f"  Disconnecting now...\r\n"
-                f"{'='*70}\r\n\r\n"
-            )
-            try:
-                channel.send(final_message.encode())
-                time.sleep(1)  # Give time for message to be sent
-            except:
-                pass
-            
-            logger.info(f"Session {session_id}: Grant expired, closing connection")
-            
-            # Close channels and transports
-            try:
-                backend_channel.close()
-            except:
-                pass
-            
-            try:
-                channel.close()
-            except:
-                pass
-            
-            try:
-                backend_transport.close()
-            except:
-                pass
-            
-            try:
-                transport.close()
-            except:
-                pass
-            
-            # Update session via Tower API
-            try:
-                tower_client = TowerClient(GateConfig())
-                tower_client.update_session(
-                    session_id=session_id,
-                    ended_at=datetime.utcnow().isoformat(),
-                    is_active=False,
-                    termination_reason=termination_reason
-                )
-                logger.info(f"Session {session_id}: Updated via Tower API with termination_reason='{termination_reason}'")
-            except Exception as e:
-                logger.error(f"Session {session_id}: Failed to update via Tower API: {e}")
-                
-        except Exception as e:
-            logger.error(f"Session {session_id}: Error in grant expiry monitor: {e}", exc_info=True)
-    
     def log_scp_transfer(self, db_session_id, command, direction):
         """Log SCP file transfer to logger only (Tower API tracks via session recording)"""
         try:
@@ -3131,8 +2665,12 @@ class SSHProxyServer:
         """Update transfer statistics (no-op, Tower API tracks via session recording)"""
         pass  # Transfer stats tracked by Tower API via session recording
     
-    def handle_client(self, client_socket, client_addr, is_tproxy=False):
-        """Handle incoming client connection"""
+    def handle_client(self, client_socket, client_addr, is_tproxy=False, ticket=None):
+        """Handle incoming client connection
+        
+        Args:
+            ticket: Admission ticket - its handshake slot is released once auth is over
+        """
         from datetime import datetime  # Import at function start to avoid UnboundLocalError
         
         source_ip = client_addr[0]
@@ -3165,13 +2703,17 @@ class SSHProxyServer:
             transport.add_server_key(self.host_key)
             
             # Create server handler with source and dest IPs
-            server_handler = SSHProxyHandler(source_ip, dest_ip)
+            server_handler = SSHProxyHandler(source_ip, dest_ip, self.mfa_waiter)
             server_handler.is_tproxy = is_tproxy  # Mark as TPROXY connection
             server_handler.transport = transport  # Store transport reference for banner sending
             transport.start_server(server=server_handler)
             
             # Wait for authentication (increased timeout for MFA flow - up to 5 min + buffer)
             channel = transport.accept(360)
+            
+            # Handshake over (success or not) - free the slot for queued connections
+            if ticket:
+                ticket.handshake_done()
             if channel is None:
                 logger.warning(f"No channel opened from {source_ip}")
                 # If no_grant_reason is set, send disconnect message with reason
@@ -3880,8 +3422,10 @@ class SSHProxyServer:
                     server_ip=target_server.ip_address,
                     server_name=target_server.name,
                     tower_client=server_handler.tower_client,
-                    server_instance=self
+                    server_instance=self,
+                    terminal_size=(server_handler.pty_height, server_handler.pty_width)
                 )
+                server_handler.recorder = recorder
                 recorder.record_event('session_start', f"User {user.username} connecting to {target_server.ip_address}")
             
             # Get policy_id from access_result (Tower API response)
@@ -4113,26 +3657,19 @@ class SSHProxyServer:
                     'server_name': target_server.name
                 }
                 
-                # v1.11: Use new polling-based monitor (no more grant_end_time parameter!)
-                monitor_thread = threading.Thread(
-                    target=self.monitor_grant_expiry_v11,
-                    args=(channel, backend_channel, transport, backend_transport, 
-                          db_session.id, session_id, target_server.name),
-                    daemon=True
+                # Grant expiry/revocation is checked for all sessions in one batch call
+                self.grant_monitor.register(
+                    session_id, db_session.id, channel, backend_channel,
+                    transport, backend_transport, target_server.name,
+                    end_time=grant_end_time
                 )
-                monitor_thread.start()
-                logger.debug(f"Session {session_id}: Started v1.11 grant monitor thread (API polling)")
                 
-                # Start inactivity timeout monitor (if enabled)
+                # Inactivity timeout and title countdown are timers on the shared wheel (if enabled)
                 if inactivity_timeout_minutes and inactivity_timeout_minutes > 0:
-                    inactivity_monitor = threading.Thread(
-                        target=self.monitor_inactivity_timeout,
-                        args=(channel, backend_channel, transport, backend_transport,
-                              inactivity_timeout_minutes, db_session.id, session_id, target_server.name),
-                        daemon=True
+                    self.inactivity_monitor.register(
+                        session_id, db_session.id, channel, backend_channel,
+                        transport, backend_transport, inactivity_timeout_minutes, target_server.name
                     )
-                    inactivity_monitor.start()
-                    logger.debug(f"Session {session_id}: Started inactivity timeout monitor ({inactivity_timeout_minutes} min)")
                 else:
                     logger.debug(f"Session {session_id}: Inactivity timeout disabled")
             
@@ -4147,7 +3684,7 @@ class SSHProxyServer:
             else:
                 self.forward_channel(channel, backend_channel, recorder, db_session.id, is_sftp, 
                                    session_id=session_id, server_name=target_server.name, 
-                                   owner_username=user.username)
+                                   owner_username=user.username, server_handler=server_handler)
             
             # Calculate session duration
             started_at = datetime.utcnow() - timedelta(seconds=0)  # Will be calculated by Tower API
@@ -4178,6 +3715,8 @@ class SSHProxyServer:
             logger.info(f"Session {session_id} removed from utmp")
             
             # Unregister from active connections
+            self.grant_monitor.unregister(session_id)
+            self.inactivity_monitor.unregister(session_id)
             if session_id in self.active_connections:
                 del self.active_connections[session_id]
                 logger.debug(f"Session {session_id} unregistered from active connections")
@@ -4220,7 +3759,7 @@ class SSHProxyServer:
             if 'server_handler' in locals() and hasattr(server_handler, 'pending_mfa_token') and server_handler.pending_mfa_token:
                 try:
                     logger.info(f"Cleaning up pending MFA challenge: {server_handler.pending_mfa_token[:20]}...")
-                    tower_client = TowerClient(GateConfig())
+                    tower_client = get_client()
                     tower_client.cancel_mfa_challenge(server_handler.pending_mfa_token)
                 except Exception as e:
                     logger.warning(f"Failed to cleanup MFA challenge: {e}")
@@ -4246,7 +3785,10 @@ class SSHProxyServer:
             client_socket.close()
     
     def send_heartbeat_loop(self):
-        """Send periodic heartbeats to Tower and check for sessions to terminate"""
+        """Send periodic heartbeats to Tower
+        
+        Grant expiry/revocation of live sessions is checked by self.grant_monitor.
+        """
         logger.info(f"Heartbeat thread started (interval: {self.heartbeat_interval}s)")
         
         while self.running:
@@ -4255,29 +3797,39 @@ class SSHProxyServer:
                 # Tower will track session counts from API calls
                 # Send list of active session IDs for relay management
                 active_session_ids = list(self.active_connections.keys())
+                connection_stats = self.admission.get_stats()
+                cache_stats = self.grant_cache.get_stats() if self.grant_cache else None
                 response = self.tower_client.heartbeat(
                     active_stays=0, 
                     active_sessions=len(active_session_ids),
-                    active_session_ids=active_session_ids
+                    active_session_ids=active_session_ids,
+                    connection_stats=connection_stats,
+                    cache_stats=cache_stats
                 )
                 
+                if connection_stats['queued'] or connection_stats['rejected_total']:
+                    logger.info(
+                        f"Connections: {connection_stats['queued']} queued, "
+                        f"{connection_stats['handshaking']} handshaking, {connection_stats['active']} active, "
+                        f"{connection_stats['rejected_total']} rejected {connection_stats['rejected']}"
+                    )
+                
                 if len(self.active_connections) > 0:
-                    logger.debug(f"Heartbeat sent, checking {len(self.active_connections)} active sessions")
+                    logger.debug(f"Heartbeat sent, {len(self.active_connections)} active sessions")
                 else:
                     logger.debug(f"Heartbeat sent, no active sessions")
                 
+                if cache_stats:
+                    logger.debug(
+                        f"Grant cache: {cache_stats['entries']} entries, hit rate {cache_stats['hit_rate']:.1%}, "
+                        f"grants age {cache_stats['grants_age_seconds']}s"
+                    )
+                
                 # Process relay commands from Tower (if relay manager enabled)
                 relay_sessions = response.get('relay_sessions', [])
                 if relay_sessions and hasattr(self, 'relay_manager') and self.relay_manager:
                     self.relay_manager.process_relay_commands(relay_sessions)
                 
-                # Check for sessions that should be terminated
-                # 1. Grant expired/cancelled
-                # 2. User deactivated
-                # 3. Policy changed
-                # 4. Maintenance mode
-                self.check_and_terminate_sessions()
-                
             except Exception as e:
                 logger.error(f"Heartbeat thread error: {e}", exc_info=True)
             
@@ -4289,108 +3841,56 @@ class SSHProxyServer:
         
         logger.info("Heartbeat thread stopped")
     
-    def check_and_terminate_sessions(self):
-        """Check active sessions and terminate those that should be killed
-        
-        Uses local active_connections registry to find sessions, then checks
-        via Tower API if each session should still be allowed.
-        
-        Reasons for termination:
-        - Grant expired or cancelled (checked via Tower API)
-        - User deactivated (checked via Tower API)  
-        - Policy changed (checked via Tower API)
-        - Maintenance mode (checked via Tower API)
-        """
-        try:
-            # Get all active sessions from local registry
-            # active_connections: {session_id: {transport, source_ip, proxy_ip, ...}}
-            for session_id, session_info in list(self.active_connections.items()):
-                source_ip = session_info.get('source_ip')
-                proxy_ip = session_info.get('proxy_ip')
-                protocol = session_info.get('protocol', 'ssh')
-                ssh_username = session_info.get('ssh_username')
-                
-                if not source_ip or not proxy_ip:
-                    logger.debug(f"Session {session_id}: Missing connection info, skipping check")
-                    continue
-                
-                try:
-                    # Check via Tower API if grant still valid
-                    result = self.tower_client.check_grant(
-                        source_ip=source_ip,
-                        destination_ip=proxy_ip,
-                        protocol=protocol,
-                        ssh_login=ssh_username
-                    )
-                    
-                    if not result.get('allowed'):
-                        # Access denied - terminate session
-                        reason = result.get('reason', 'Access revoked')
-                        denial_reason = result.get('denial_reason', 'access_denied')
-                        
-                        # Get disconnect_at from API response or default to 5 seconds
-                        disconnect_at_str = result.get('disconnect_at')
-                        if disconnect_at_str:
-                            from dateutil import parser as dateparser
-                            disconnect_at = dateparser.isoparse(disconnect_at_str)
-                            if disconnect_at.tzinfo is not None:
-                                disconnect_at = disconnect_at.replace(tzinfo=None)
-                        else:
-                            disconnect_at = datetime.utcnow() + timedelta(seconds=5)
-                        
-                        logger.warning(
-                            f"Session {session_id} ({ssh_username}@{proxy_ip}) should be terminated: {reason} ({denial_reason})"
-                        )
-                        
-                        # Inject forced disconnect time - monitor_grant_expiry thread will handle it
-                        self.session_forced_endtimes[session_id] = disconnect_at
-                        
-                        logger.info(
-                            f"Session {session_id}: Forced disconnect injected, "
-                            f"will disconnect at {disconnect_at} (reason: {reason})"
-                        )
-                    else:
-                        # Access still allowed - check if grant time changed
-                        effective_end_str = result.get('effective_end_time')
-                        if effective_end_str:
-                            from dateutil import parser as dateparser
-                            new_end_time = dateparser.isoparse(effective_end_str)
-                            if new_end_time.tzinfo is not None:
-                                new_end_time = new_end_time.replace(tzinfo=None)
-                            
-                            # Check if grant time changed (extended or shortened)
-                            old_end_time = self.session_grant_endtimes.get(session_id)
-                            if old_end_time and new_end_time != old_end_time:
-                                if new_end_time > old_end_time:
-                                    logger.info(
-                                        f"Session {session_id}: Grant extended from {old_end_time} to {new_end_time}"
-                                    )
-                                else:
-                                    logger.info(
-                                        f"Session {session_id}: Grant shortened from {old_end_time} to {new_end_time}"
-                                    )
-                                # Update stored end time - monitor will detect this
-                                self.session_grant_endtimes[session_id] = new_end_time
-                            elif not old_end_time:
-                                # First time seeing this session - store end time
-                                self.session_grant_endtimes[session_id] = new_end_time
-                
-                except Exception as e:
-                    logger.error(f"Error checking session {session_id}: {e}")
-                    continue
-        
-        except Exception as e:
-            logger.error(f"Error in check_and_terminate_sessions: {e}")
+    def _on_grant_event(self, event):
+        """Tower pushed a grant/maintenance change - drop cached decisions, re-validate sessions"""
+        if event.get('type') == 'mfa_verified':
+            # Only wakes the waiting handshake - grants and live sessions did not change
+            self.mfa_waiter.notify(event)
+            return
+        if self.grant_cache:
+            self.grant_cache.invalidate(f"grant event {event.get('type')}")
+        self.grant_monitor.check_now(event)
+    
+    def _on_grant_events_connection(self, connected):
+        """Grant event stream went up/down - schedulers fall back to polling while down"""
+        self.grant_monitor.set_push_connected(connected)
+        self.mfa_waiter.set_push_connected(connected)
+    
+    def _on_grant_end_time_changed(self, session_id, end_time):
+        """Grant monitor callback - keep terminal title countdown in sync"""
+        metadata = self.session_metadata.get(session_id)
+        if metadata is not None:
+            metadata['grant_end_time'] = end_time
     
     def start(self):
         """Start the proxy server with NAT and/or TPROXY listeners"""
         logger.info(f"Starting SSH Proxy Server")
         
+        # Start grant cache refresh before accepting connections
+        self.grant_cache = init_grant_cache(self.tower_client.config, self.tower_client)
+        
         # Start heartbeat thread
         self.running = True
         self.heartbeat_thread = threading.Thread(target=self.send_heartbeat_loop, daemon=True)
         self.heartbeat_thread.start()
         
+        # Start admission dispatcher (handshake worker limit)
+        self.admission.start()
+        self.timers.start()
+        self.grant_monitor.start()
+        self.mfa_waiter.start()
+        self.recording_uploader.start()
+        
+        # Subscribe to grant events (revocations/extensions applied without waiting for a poll)
+        if self.tower_client.config.grant_events_enabled:
+            self.grant_events = GrantEventListener(
+                self.tower_client.config,
+                on_event=self._on_grant_event,
+                on_connection_change=self._on_grant_events_connection
+            )
+            self.grant_events.start()
+        listen_backlog = self.admission.config['listen_backlog']
+        
         listeners = []
         
         # Setup NAT listener (traditional mode)
@@ -4398,7 +3898,7 @@ class SSHProxyServer:
             nat_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             nat_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             nat_socket.bind((self.nat_config['host'], self.nat_config['port']))
-            nat_socket.listen(100)
+            nat_socket.listen(listen_backlog)
             listeners.append(('NAT', nat_socket, False))
             logger.info(f"NAT mode listening on {self.nat_config['host']}:{self.nat_config['port']}")
         
@@ -4412,7 +3912,7 @@ class SSHProxyServer:
             tproxy_socket.setsockopt(socket.SOL_IP, IP_TRANSPARENT, 1)
             
             tproxy_socket.bind((self.tproxy_config['host'], self.tproxy_config['port']))
-            tproxy_socket.listen(100)
+            tproxy_socket.listen(listen_backlog)
             listeners.append(('TPROXY', tproxy_socket, True))
             logger.info(f"TPROXY mode listening on {self.tproxy_config['host']}:{self.tproxy_config['port']}")
         
@@ -4429,15 +3929,15 @@ class SSHProxyServer:
                 
                 for listener_name, listener_sock, is_tproxy in listeners:
                     if listener_sock in readable:
-                        client_socket, client_addr = listener_sock.accept()
+                        try:
+                            client_socket, client_addr = listener_sock.accept()
+                        except OSError as e:
+                            logger.warning(f"{listener_name}: accept failed: {e}")
+                            continue
                         logger.debug(f"{listener_name}: Accepted connection from {client_addr}")
                         
-                        client_thread = threading.Thread(
-                            target=self.handle_client,
-                            args=(client_socket, client_addr, is_tproxy)
-                        )
-                        client_thread.daemon = True
-                        client_thread.start()
+                        # Queue for a handshake worker (refused with SSH disconnect if over limits)
+                        self.admission.submit(client_socket, client_addr, is_tproxy)
         
         except KeyboardInterrupt:
             logger.info("Shutting down SSH Proxy Server...")
@@ -4445,6 +3945,19 @@ class SSHProxyServer:
             if self.heartbeat_thread:
                 self.heartbeat_thread.join(timeout=5)
             
+            # Refuse queued connections, stop relay loops (releases session threads)
+            self.admission.stop()
+            self.relay_pool.stop()
+            self.grant_monitor.stop()
+            self.timers.stop()
+            self.mfa_waiter.stop()
+            # Send queued recording chunks (sessions not finished keep offline files)
+            self.recording_uploader.stop()
+            if self.grant_events:
+                self.grant_events.stop()
+            if self.grant_cache:
+                self.grant_cache.stop()
+            
             # Close all listeners
             for _, sock, _ in listeners:
                 sock.close()
@@ -4457,7 +3970,7 @@ def cleanup_stale_sessions():
     """Clean up active sessions and stays from previous runs on startup via Tower API"""
     logger.info("Requesting Tower to cleanup stale sessions for this gate")
     try:
-        tower_client = TowerClient(GateConfig())
+        tower_client = get_client()
         result = tower_client.cleanup_stale_sessions()
         logger.info(
             f"Tower cleaned up {result.get('closed_sessions')} sessions and "
@@ -4510,6 +4023,22 @@ def main():
         # Host key path from config
         host_key_path = config.get('advanced', 'host_key_path', fallback='/var/lib/inside-gate/ssh_host_key')
         
+        # Relay loop threads forwarding session data (0 = auto)
+        relay_loops = config.getint('advanced', 'relay_loops', fallback=0)
+        
+        # Output history per session for join/watch (fixed memory per session)
+        session_history_bytes = config.getint('advanced', 'session_history_kb', fallback=64) * 1024
+        
+        # Connection admission limits
+        admission_config = {
+            'handshake_workers': config.getint('advanced', 'handshake_workers', fallback=128),
+            'max_connections': config.getint('advanced', 'max_sessions', fallback=1000),
+            'max_connections_per_ip': config.getint('advanced', 'max_connections_per_ip', fallback=50),
+            'queue_size': config.getint('advanced', 'accept_queue_size', fallback=256),
+            'queue_timeout': config.getint('advanced', 'accept_queue_timeout', fallback=30),
+            'listen_backlog': config.getint('advanced', 'listen_backlog', fallback=1024)
+        }
+        
         # NAT mode configuration
         if config.getboolean('proxy', 'nat_enabled', fallback=False):
             nat_config = {
@@ -4530,6 +4059,9 @@ def main():
         logger.warning(f"Config file not found: {config_file}, using defaults (TPROXY mode only)")
         tproxy_config = {'host': '0.0.0.0', 'port': 8022}
         host_key_path = '/var/lib/inside-gate/ssh_host_key'
+        relay_loops = 0
+        admission_config = None
+        session_history_bytes = DEFAULT_HISTORY_BYTES
     
     # Clean up stale sessions from previous runs
     cleanup_stale_sessions()
@@ -4538,7 +4070,9 @@ def main():
     load_messages()
     
     # Start proxy server
-    proxy = SSHProxyServer(nat_config=nat_config, tproxy_config=tproxy_config, host_key_path=host_key_path)
+    proxy = SSHProxyServer(nat_config=nat_config, tproxy_config=tproxy_config, host_key_path=host_key_path,
+                           relay_loops=relay_loops, admission_config=admission_config,
+                           session_history_bytes=session_history_bytes)
     proxy.start()
 
 
@@ -0,0 +1,245 @@
+"""
+Timer Wheel - One thread firing all session deadlines of a gate process
+
+Hierarchical timing wheel (levels of 64 slots, 0.1s tick at level 0, each
+level 64x coarser: 6.4s, 6.8min, 7.3h, 19 days). Timers far away sit in a
+coarse slot and cascade down to finer levels as their time comes closer;
+timers beyond the top level are re-inserted when their slot comes round.
+Schedule and cancel are O(1).
+
+The thread does not tick: it sleeps until the next occupied slot (a timer
+due or a slot to cascade) and is woken early only when a timer is scheduled
+before that. Callbacks run on the wheel thread, one after another - they must
+be short (send a message, re-arm a timer) and hand slow work (disconnect,
+Tower requests) to a thread of their own.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    """Handle of one scheduled callback"""
+
+    __slots__ = ('wheel', 'expires', 'callback', 'args', 'slot')
+
+    def __init__(self, wheel: 'TimerWheel', expires: int, callback: Callable, args: tuple):
+        self.wheel = wheel
+        self.expires = expires  # Tick the timer is due at
+        self.callback = callback
+        self.args = args
+        self.slot = None  # Set holding the timer while pending
+
+    def cancel(self):
+        """Drop the timer (no-op once fired or cancelled)"""
+        self.wheel._cancel(self)
+
+    @property
+    def pending(self) -> bool:
+        return self.slot is not None
+
+
+class TimerWheel:
+    """Hierarchical timer wheel with one scheduler thread
+
+    Usage:
+        timers = TimerWheel()
+        timers.start()
+        timer = timers.schedule(300, callback, session)
+        ...
+        timer.cancel()
+    """
+
+    def __init__(self, tick: float = 0.1, slot_bits: int = 6, levels: int = 4):
+        """Initialize timer wheel
+
+        Args:
+            tick: Seconds per level 0 slot (timers never fire early, at most one tick late)
+            slot_bits: log2 of slots per level
+            levels: Number of levels
+        """
+        self.tick = tick
+        self.bits = slot_bits
+        self.size = 1 << slot_bits
+        self.mask = self.size - 1
+        self.levels = levels
+        self.max_delta = (1 << (slot_bits * levels)) - 1
+
+        self.wheels = [[set() for _ in range(self.size)] for _ in range(levels)]
+        self.origin = time.monotonic()
+        self.current = 0  # Next tick to process
+        self.next_event = None  # Tick the thread sleeps until (None = no timers)
+
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.pending = 0
+        self.scheduled = 0
+        self.cancelled = 0
+        self.fired = 0
+        self.cascaded = 0
+        self.wakeups = 0
+        self.errors = 0
+
+    def start(self):
+        """Start scheduler thread"""
+        self._thread = threading.Thread(target=self._run, name='TimerWheel', daemon=True)
+        self._thread.start()
+        logger.info(f"Timer wheel started ({self.levels} levels x {self.size} slots, tick {self.tick}s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def schedule(self, delay: float, callback: Callable, *args) -> Timer:
+        """Call callback(*args) on the wheel thread after delay seconds
+
+        Args:
+            delay: Seconds from now (<= 0 fires on the next tick)
+            callback: Callable run when due
+            *args: Arguments for callback
+
+        Returns:
+            Timer (cancel() drops it)
+        """
+        expires = math.ceil((time.monotonic() - self.origin + max(delay, 0)) / self.tick)
+        timer = Timer(self, expires, callback, args)
+        with self.lock:
+            self.scheduled += 1
+            self._add(timer)
+            wake = self.next_event is None or expires < self.next_event
+        if wake:
+            self._wake.set()
+        return timer
+
+    def _cancel(self, timer: Timer):
+        with self.lock:
+            if timer.slot is not None:
+                timer.slot.discard(timer)
+                timer.slot = None
+                self.pending -= 1
+                self.cancelled += 1
+
+    def _add(self, timer: Timer):
+        """Put timer in the slot of the finest level that covers its distance"""
+        at = max(timer.expires, self.current)
+        delta = at - self.current
+        if delta > self.max_delta:
+            # Beyond the top level - parked, re-inserted when its slot cascades
+            at = self.current + self.max_delta
+            delta = self.max_delta
+        level = 0
+        while delta >> (self.bits * (level + 1)):
+            level += 1
+        slot = self.wheels[level][(at >> (self.bits * level)) & self.mask]
+        slot.add(timer)
+        timer.slot = slot
+        self.pending += 1
+
+    def _take(self, level: int, index: int) -> set:
+        timers = self.wheels[level][index]
+        self.wheels[level][index] = set()
+        self.pending -= len(timers)
+        for timer in timers:
+            timer.slot = None
+        return timers
+
+    def _process(self, tick: int) -> list:
+        """Cascade the coarse slots starting at tick, return timers due at tick"""
+        self.current = tick
+        for level in range(1, self.levels):
+            shift = self.bits * level
+            if tick & ((1 << shift) - 1):
+                break
+            for timer in self._take(level, (tick >> shift) & self.mask):
+                self.cascaded += 1
+                self._add(timer)
+
+        due = []
+        self.current = tick + 1
+        for timer in self._take(0, tick & self.mask):
+            if timer.expires <= tick:
+                due.append(timer)
+            else:
+                self._add(timer)
+        return due
+
+    def _next_event_tick(self) -> Optional[int]:
+        """First tick with a level 0 slot due or a coarse slot to cascade"""
+        best = None
+        for i in range(self.size):
+            if self.wheels[0][(self.current + i) & self.mask]:
+                best = self.current + i
+                break
+        for level in range(1, self.levels):
+            shift = self.bits * level
+            base = -(-self.current >> shift)  # First slot boundary not processed yet
+            for i in range(self.size):
+                if self.wheels[level][(base + i) & self.mask]:
+                    candidate = (base + i) << shift
+                    if best is None or candidate < best:
+                        best = candidate
+                    break
+        return best
+
+    def _advance(self, now: int) -> list:
+        """Process every tick with work up to now (empty ticks are skipped)"""
+        due = []
+        while True:
+            tick = self._next_event_tick()
+            if tick is None or tick > now:
+                self.current = max(self.current, now + 1)
+                self.next_event = tick
+                return due
+            due.extend(self._process(tick))
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = int((time.monotonic() - self.origin) / self.tick + 1e-6)
+            with self.lock:
+                due = self._advance(now)
+                next_event = self.next_event
+
+            for timer in due:
+                self.fired += 1
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Timer callback {getattr(timer.callback, '__name__', timer.callback)} failed: {e}",
+                                 exc_info=True)
+
+            if due:
+                continue  # Callbacks may have scheduled timers already due
+
+            wait = None
+            if next_event is not None:
+                wait = self.origin + next_event * self.tick - time.monotonic()
+                if wait <= 0:
+                    continue
+            self._wake.wait(wait)
+            self._wake.clear()
+            self.wakeups += 1
+
+    def get_stats(self) -> dict:
+        """Current wheel counters"""
+        with self.lock:
+            return {
+                'pending': self.pending,
+                'scheduled': self.scheduled,
+                'cancelled': self.cancelled,
+                'fired': self.fired,
+                'cascaded': self.cascaded,
+                'wakeups': self.wakeups,
+                'errors': self.errors
+            }
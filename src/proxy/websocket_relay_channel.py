@@ -3,6 +3,13 @@ WebSocket Relay Channel - Relays session output from Gate to Tower
 
 Implements Paramiko channel interface to integrate with SessionMultiplexer.
 Acts as a watcher that sends output to Tower via WebSocket.
+
+Output is sent as binary Socket.IO attachments. send() only appends to a
+buffer; a sender thread coalesces it into frames of at most frame_max_bytes
+or frame_interval_ms and keeps at most RELAY_MAX_IN_FLIGHT frames unacknowledged
+by Tower. When Tower (or its browsers) cannot keep up, output accumulates up
+to max_buffer_bytes and the oldest output is dropped - the session itself is
+never slowed down by the relay.
 """
 
 import logging
@@ -13,6 +20,11 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Frames sent to Tower without acknowledgement before the sender waits
+RELAY_MAX_IN_FLIGHT = 4
+# Seconds without acknowledgement after which in-flight frames are written off
+RELAY_ACK_TIMEOUT = 10.0
+
 
 class WebSocketRelayChannel:
     """Paramiko channel interface that relays session output to Tower via WebSocket
@@ -23,7 +35,9 @@ class WebSocketRelayChannel:
     """
     
     def __init__(self, session_id: str, tower_url: str, gate_api_key: str, gate_name: str, 
-                 owner_username: str, server_name: str, multiplexer=None):
+                 owner_username: str, server_name: str, multiplexer=None,
+                 frame_interval_ms: int = 20, frame_max_bytes: int = 64 * 1024,
+                 max_buffer_bytes: int = 1024 * 1024):
         """Initialize relay channel
         
         Args:
@@ -34,6 +48,9 @@ class WebSocketRelayChannel:
             owner_username: Session owner username
             server_name: Target server name
             multiplexer: SessionMultiplexer instance (for bidirectional input)
+            frame_interval_ms: Longest time output is held back to coalesce a frame
+            frame_max_bytes: Largest frame sent to Tower
+            max_buffer_bytes: Output buffered while Tower is slow (oldest dropped beyond)
         """
         self.session_id = session_id
         self.tower_url = tower_url
@@ -43,9 +60,25 @@ class WebSocketRelayChannel:
         self.server_name = server_name
         self.multiplexer = multiplexer  # For bidirectional relay
         
+        self.frame_interval = frame_interval_ms / 1000.0
+        self.frame_max_bytes = frame_max_bytes
+        self.max_buffer_bytes = max_buffer_bytes
+        
         self.closed = False
         self._lock = threading.Lock()
         
+        # Output waiting for the sender thread
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._buffer_since = None  # When the oldest buffered byte arrived
+        self._in_flight = 0
+        self._last_ack = time.monotonic()
+        self._dropping = False
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.dropped_bytes = 0
+        self._sender = None
+        
         # Create Socket.IO client (not server!)
         self.sio = socketio.Client(
             reconnection=True,
@@ -75,22 +108,34 @@ class WebSocketRelayChannel:
         except Exception as e:
             logger.error(f"[Relay:{session_id}] Failed to connect to Tower: {e}")
             raise
+        
+        self._sender = threading.Thread(target=self._send_loop, name=f'RelaySender-{session_id}', daemon=True)
+        self._sender.start()
     
     def _on_connect(self):
         """Called when WebSocket connects to Tower"""
         logger.info(f"[Relay:{self.session_id}] WebSocket connected to Tower")
         
-        # Send registration message
-        self.sio.emit('gate_relay_register', {
+        # Send registration message (terminal size lets Tower render the screen for browsers)
+        registration = {
             'session_id': self.session_id,
             'gate_name': self.gate_name,
             'owner_username': self.owner_username,
             'server_name': self.server_name
-        })
+        }
+        if self.multiplexer:
+            registration['rows'] = self.multiplexer.keyframe.rows
+            registration['cols'] = self.multiplexer.keyframe.cols
+        self.sio.emit('gate_relay_register', registration)
     
     def _on_disconnect(self):
         """Called when WebSocket disconnects"""
         logger.warning(f"[Relay:{self.session_id}] WebSocket disconnected from Tower")
+        
+        # Acks of frames in flight will not arrive
+        with self._cond:
+            self._in_flight = 0
+            self._cond.notify()
     
     def _on_relay_ack(self, data):
         """Called when Tower acknowledges relay registration"""
@@ -125,32 +170,114 @@ class WebSocketRelayChannel:
     # Paramiko channel interface methods
     
     def send(self, data: bytes) -> int:
-        """Send data to Tower (called by SessionMultiplexer.broadcast_output)
+        """Queue output for Tower (called by SessionMultiplexer.broadcast_output)
+        
+        Never blocks on Tower - the sender thread delivers buffered output.
         
         Args:
             data: Output bytes to relay
             
         Returns:
-            Number of bytes sent
+            Number of bytes accepted
         """
         if self.closed:
             return 0
         
-        try:
-            # Convert bytes to list for JSON serialization
-            data_array = list(data)
+        with self._cond:
+            if self._buffer_since is None:
+                self._buffer_since = time.monotonic()
+            self._buffer += data
+            excess = len(self._buffer) - self.max_buffer_bytes
+            if excess > 0:
+                # Tower is not keeping up - watchers miss the oldest output
+                del self._buffer[:excess]
+                self.dropped_bytes += excess
+                if not self._dropping:
+                    self._dropping = True
+                    logger.warning(
+                        f"[Relay:{self.session_id}] Tower not keeping up - dropping relay output "
+                        f"(buffer {self.max_buffer_bytes} bytes)"
+                    )
+            self._cond.notify()
+        
+        return len(data)
+    
+    def _next_frame(self) -> Optional[bytes]:
+        """Wait for a frame that may be sent (None once closed and flushed)"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.closed:
+                    # Flush what is left without waiting for acks
+                    if not self._buffer:
+                        return None
+                    break
+                if self._in_flight >= RELAY_MAX_IN_FLIGHT:
+                    if now - self._last_ack < RELAY_ACK_TIMEOUT:
+                        self._cond.wait(RELAY_ACK_TIMEOUT - (now - self._last_ack))
+                        continue
+                    logger.warning(
+                        f"[Relay:{self.session_id}] No ack from Tower for {RELAY_ACK_TIMEOUT:.0f}s - "
+                        f"resuming output"
+                    )
+                    self._in_flight = 0
+                if not self._buffer:
+                    self._cond.wait()
+                    continue
+                wait = self._buffer_since + self.frame_interval - now
+                if len(self._buffer) >= self.frame_max_bytes or wait <= 0:
+                    break
+                self._cond.wait(wait)
             
-            # Emit to Tower
-            self.sio.emit('gate_session_output', {
+            frame = bytes(self._buffer[:self.frame_max_bytes])
+            del self._buffer[:self.frame_max_bytes]
+            self._buffer_since = time.monotonic() if self._buffer else None
+            if self._in_flight == 0:
+                self._last_ack = time.monotonic()
+            self._in_flight += 1
+            self._dropping = False
+            return frame
+    
+    def _send_loop(self):
+        """Sender thread: coalesced binary frames to Tower"""
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+            
+            try:
+                self.sio.emit('gate_session_output', {
+                    'session_id': self.session_id,
+                    'gate_name': self.gate_name,
+                    'output': frame  # Binary attachment
+                }, callback=self._on_output_ack)
+                self.frames_sent += 1
+                self.bytes_sent += len(frame)
+            except Exception as e:
+                logger.error(f"[Relay:{self.session_id}] Failed to relay output: {e}")
+                with self._cond:
+                    self._in_flight = max(0, self._in_flight - 1)
+    
+    def _on_output_ack(self, *args):
+        """Tower received a frame"""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._last_ack = time.monotonic()
+            self._cond.notify()
+    
+    def terminal_resized(self, rows: int, cols: int):
+        """Owner's terminal was resized (called by SessionMultiplexer)"""
+        if self.closed or not self.sio.connected:
+            return
+        try:
+            self.sio.emit('gate_session_resize', {
                 'session_id': self.session_id,
                 'gate_name': self.gate_name,
-                'output': data_array
+                'rows': rows,
+                'cols': cols
             })
-            
-            return len(data)
         except Exception as e:
-            logger.error(f"[Relay:{self.session_id}] Failed to relay output: {e}")
-            return 0
+            logger.debug(f"[Relay:{self.session_id}] Failed to relay resize: {e}")
     
     def recv(self, size: int) -> bytes:
         """Receive data (not used for watch-only relay)"""
@@ -171,10 +298,20 @@ class WebSocketRelayChannel:
             if self.closed:
                 return
             
-            self.closed = True
+            with self._cond:
+                self.closed = True
+                self._cond.notify()
             logger.info(f"[Relay:{self.session_id}] Closing relay channel")
             
             try:
+                # Let the sender flush buffered output
+                if self._sender and self._sender is not threading.current_thread():
+                    self._sender.join(timeout=1.0)
+                logger.info(
+                    f"[Relay:{self.session_id}] Relayed {self.bytes_sent} bytes in {self.frames_sent} frames "
+                    f"({self.dropped_bytes} bytes dropped)"
+                )
+                
                 # Send unregister message
                 if self.sio.connected:
                     self.sio.emit('gate_relay_unregister', {
@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 
 from config.saml_config import SAML_SETTINGS, INSIDE_ACCESS_GROUP_ID
 from src.core.database import SessionLocal, MFAChallenge, User, Stay, AuditLog, UserGroup
+from src.web.grant_events import publish_grant_event
 from sqlalchemy import text
 
 saml_bp = Blueprint('saml', __name__, url_prefix='/auth/saml')
@@ -479,6 +480,10 @@ def _handle_mfa_saml_auth(nameid, attributes, mfa_token):
         
         db.commit()
         
+        # Wake the gate handshake waiting for this challenge (gate also polls as fallback)
+        publish_grant_event('mfa_verified', gate_id=challenge.gate_id, mfa_token=mfa_token,
+                            user_id=user.id)
+        
         # Success page
         return render_template_string("""
         <!DOCTYPE html>
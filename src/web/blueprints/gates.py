@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required
 from src.web.permissions import admin_required
 from src.core.database import Gate
+from src.api.auth import invalidate_gate_token_cache
 from datetime import datetime, timedelta
 import ipaddress
 
@@ -25,11 +26,10 @@ def list():
     now = datetime.utcnow()
     heartbeat_warning_threshold = timedelta(minutes=2)  # 4 heartbeats at 30s interval
     
+    from src.core.ip_pool import IPPoolManager
+    allocated_counts = IPPoolManager.allocated_counts(db)
+    
     for gate in gates:
-        from src.core.ip_pool import IPPoolManager
-        pool_mgr = IPPoolManager(gate=gate)
-        available_ips = pool_mgr.get_available_ips(db, gate_id=gate.id)
-        
         # Calculate total IPs in range
         try:
             start_ip = ipaddress.IPv4Address(gate.ip_pool_start)
@@ -39,8 +39,8 @@ def list():
             total_ips = 0
         
         gate.pool_total = total_ips
-        gate.pool_available = len(available_ips)
-        gate.pool_allocated = total_ips - len(available_ips)
+        gate.pool_allocated = allocated_counts.get(gate.id, 0)
+        gate.pool_available = total_ips - gate.pool_allocated
         
         # Check heartbeat freshness
         if gate.is_active and gate.last_heartbeat:
@@ -65,12 +65,11 @@ def data():
     now = datetime.utcnow()
     heartbeat_warning_threshold = timedelta(minutes=2)
     
+    from src.core.ip_pool import IPPoolManager
+    allocated_counts = IPPoolManager.allocated_counts(db)
+    
     gates_data = []
     for gate in gates:
-        from src.core.ip_pool import IPPoolManager
-        pool_mgr = IPPoolManager(gate=gate)
-        available_ips = pool_mgr.get_available_ips(db, gate_id=gate.id)
-        
         # Calculate total IPs in range
         try:
             start_ip = ipaddress.IPv4Address(gate.ip_pool_start)
@@ -79,7 +78,7 @@ def data():
         except:
             total_ips = 0
         
-        pool_allocated = total_ips - len(available_ips)
+        pool_allocated = allocated_counts.get(gate.id, 0)
         
         # Check heartbeat freshness
         heartbeat_warning = False
@@ -100,7 +99,7 @@ def data():
             'ip_pool_network': gate.ip_pool_network,
             'pool_total': total_ips,
             'pool_allocated': pool_allocated,
-            'pool_available': len(available_ips),
+            'pool_available': total_ips - pool_allocated,
             'last_heartbeat': gate.last_heartbeat.strftime('%Y-%m-%d %H:%M:%S') if gate.last_heartbeat else None,
             'heartbeat_warning': heartbeat_warning,
             'is_active': gate.is_active,
@@ -134,12 +133,12 @@ def view(gate_id):
     # Get available IPs
     from src.core.ip_pool import IPPoolManager
     pool_mgr = IPPoolManager(gate=gate)
-    available_ips = pool_mgr.get_available_ips(db, gate_id=gate.id)
+    available_ips = pool_mgr.get_available_ips(db, gate_id=gate.id, limit=20)  # Show first 20
     
     return render_template('gates/view.html', 
                          gate=gate, 
                          allocations=allocations,
-                         available_ips=available_ips[:20])  # Show first 20
+                         available_ips=available_ips)
 
 
 @gates_bp.route('/add', methods=['GET', 'POST'])
@@ -298,6 +297,7 @@ def edit(gate_id):
             gate.updated_at = datetime.utcnow()
             
             db.commit()
+            invalidate_gate_token_cache(gate.id)
             flash(f'Gate {gate.name} updated successfully!', 'success')
             return redirect(url_for('gates.view', gate_id=gate.id))
         except Exception as e:
@@ -332,6 +332,7 @@ def delete(gate_id):
         gate_name = gate.name
         db.delete(gate)
         db.commit()
+        invalidate_gate_token_cache(gate_id)
         flash(f'Gate {gate_name} deleted successfully!', 'success')
         return redirect(url_for('gates.list'))
     except Exception as e:
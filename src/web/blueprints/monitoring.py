@@ -7,6 +7,7 @@ from src.web.permissions import admin_required
 from datetime import datetime, timedelta
 
 from src.core.database import AuditLog, User, Server
+from src.web.recording_cache import recording_cache
 
 monitoring_bp = Blueprint('monitoring', __name__)
 
@@ -141,3 +142,10 @@ def api_stats_by_user():
     ).limit(10).all()
     
     return jsonify([{'user': s.username, 'total': s.total} for s in stats])
+
+@monitoring_bp.route('/api/stats/recording_cache')
+@login_required
+@admin_required
+def api_stats_recording_cache():
+    """API endpoint for parsed recording cache metrics (hits, misses, evictions, size)"""
+    return jsonify(recording_cache.get_stats())
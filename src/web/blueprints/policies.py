@@ -10,6 +10,7 @@ from src.core.database import AccessPolicy, User, UserSourceIP, Server, ServerGr
 from src.core.duration_parser import parse_duration, format_duration
 from src.core.schedule_checker import format_schedule_description
 from src.web.permissions import admin_required
+from src.web.grant_events import publish_grant_event
 
 policies_bp = Blueprint('policies', __name__)
 
@@ -501,6 +502,7 @@ def edit(policy_id):
             db.add(audit_log)
             
             db.commit()
+            publish_grant_event('policy_updated', policy_id=policy.id)
             flash('Policy updated successfully!', 'success')
             return redirect(url_for('policies.index'))
             
@@ -552,6 +554,7 @@ def revoke(policy_id):
         # Keep is_active=True (temporal expiry, not soft delete)
         policy.end_time = datetime.utcnow()
         db.commit()
+        publish_grant_event('policy_revoked', policy_id=policy.id)
         flash('Policy revoked successfully! Access expired immediately.', 'success')
     except Exception as e:
         db.rollback()
@@ -590,6 +593,7 @@ def renew(policy_id):
             flash(f'Permanent policy converted to {hours}-hour grant!', 'success')
         
         db.commit()
+        publish_grant_event('policy_renewed', policy_id=policy.id)
     except ValueError:
         db.rollback()
         flash('Invalid number of days', 'danger')
@@ -2,11 +2,16 @@
 Sessions Blueprint - Session History and Log Viewer
 """
 
-from flask import Blueprint, render_template, request, jsonify, send_file, abort, g
+from flask import Blueprint, render_template, request, jsonify, send_file, abort, g, Response, stream_with_context
 from flask_login import login_required, current_user
 from src.web.permissions import admin_required
+from src.web.recording_display import ansi_to_html, build_log_entries
+from src.web import recording_tail
+from src.web import recording_screen
+from src.web.recording_cache import recording_cache
 from src.core.database import SessionLocal, Session, User, Server, Stay
-from datetime import datetime, timedelta
+from src.core import recording_format, recording_index
+from datetime import datetime, timedelta, timezone
 import json
 import os
 from pathlib import Path
@@ -22,117 +27,126 @@ sessions_bp = Blueprint('sessions', __name__, url_prefix='/sessions')
 SSH_RECORDING_DIR = '/var/log/jumphost/ssh_recordings'
 RDP_RECORDING_DIR = '/var/log/jumphost/rdp_recordings/replays'
 
-# Cache for parsed recordings (file_path -> (mtime, parsed_data))
-_recording_cache = {}
+# Events decoded per page of an indexed (JSONL/binary) SSH recording
+RECORDING_PAGE_SIZE = 1000
 
 
 def get_cached_recording(file_path):
     """
     Get parsed recording from cache or parse if needed.
-    Cache is invalidated when file modification time changes.
+    Cache entries are invalidated when the file's mtime or size changes
+    (see src.web.recording_cache).
     """
     if not os.path.exists(file_path):
         return None
     
-    current_mtime = os.path.getmtime(file_path)
-    
-    # Check cache
-    if file_path in _recording_cache:
-        cached_mtime, cached_data = _recording_cache[file_path]
-        if cached_mtime == current_mtime:
-            return cached_data
-    
-    # Parse and cache
-    parsed_data = parse_ssh_recording_internal(file_path)
-    _recording_cache[file_path] = (current_mtime, parsed_data)
-    
-    # Limit cache size to 50 entries
-    if len(_recording_cache) > 50:
-        # Remove oldest entries
-        oldest_keys = sorted(_recording_cache.keys(), 
-                           key=lambda k: _recording_cache[k][0])[:10]
-        for key in oldest_keys:
-            del _recording_cache[key]
-    
-    return parsed_data
+    return recording_cache.get(file_path, 'full', lambda: parse_ssh_recording_internal(file_path))
 
 
-def check_session_access(session, db):
+def parse_ssh_recording(file_path):
     """
-    Check if current user has access to view this session.
-    - Admin/Operator (level < 900): Full access to all sessions
-    - Regular user (level >= 900): Only access to own sessions (via stay)
-    
-    Returns True if access granted, False otherwise.
+    Parse SSH recording with caching support.
     """
-    # Admin/Operator - full access
-    if current_user.permission_level < 900:
-        return True
-    
-    # Regular user - check if session belongs to their stay
-    if session.stay_id:
-        stay = db.query(Stay).filter(Stay.id == session.stay_id).first()
-        if stay and stay.user_id == current_user.id:
-            return True
-    
-    # Fallback: check direct user_id (older sessions without stay_id)
-    if session.user_id == current_user.id:
-        return True
-    
-    return False
+    return get_cached_recording(file_path)
 
 
-def get_full_recording_path(session):
+def parse_ssh_recording_page(file_path, page=None, start=None, end=None):
     """
-    Get full path to recording file based on protocol and filename.
-    Returns None if no recording path set.
+    Parse one page or time window of an SSH recording.
+    
+    JSONL and binary recordings are read through their seekable index
+    (src.core.recording_index), so only the requested events are decoded and
+    memory use does not grow with the recording. Other formats (legacy JSON,
+    raw) fall back to parse_ssh_recording().
+    
+    Args:
+        file_path: Recording file
+        page: 1-based page of RECORDING_PAGE_SIZE events (None = last page)
+        start: Window start in seconds from session start (instead of page)
+        end: Window end in seconds (None = end of recording)
+    
+    Returns:
+        Same dict as parse_ssh_recording() plus page, total_pages, page_size,
+        first_event, last_event, has_more (window longer than one page) and
+        duration_seconds (recorded time, for the screen seek bar)
     """
-    if not session.recording_path:
-        # Try to find file by session_id if path not set
-        if session.protocol == 'ssh':
-            # SSH format: timestamp_username_server_source_{session_id}.log
-            import glob
-            pattern = os.path.join(SSH_RECORDING_DIR, f'*{session.session_id}.log')
-            matches = glob.glob(pattern)
-            if matches:
-                return matches[0]
-        elif session.protocol == 'rdp':
-            # RDP format: rdp_replay_*_{session_id}.pyrdp
-            import glob
-            pattern = os.path.join(RDP_RECORDING_DIR, f'*{session.session_id}.pyrdp')
-            matches = glob.glob(pattern)
-            if matches:
-                return matches[0]
+    if not os.path.exists(file_path):
         return None
     
-    # If already absolute path, return as-is
-    if os.path.isabs(session.recording_path):
-        return session.recording_path
+    try:
+        index = recording_index.get_index(file_path)
+    except Exception as e:
+        logger.error(f"Failed to index recording {file_path}: {e}")
+        return {'error': str(e)}
     
-    # Otherwise construct full path based on protocol
-    if session.protocol == 'ssh':
-        return os.path.join(SSH_RECORDING_DIR, session.recording_path)
-    elif session.protocol == 'rdp':
-        return os.path.join(RDP_RECORDING_DIR, session.recording_path)
+    if index is None:
+        return parse_ssh_recording(file_path)
     
-    return session.recording_path
-
-
-def recording_exists(session):
-    """
-    Check if recording file actually exists on filesystem.
-    """
-    full_path = get_full_recording_path(session)
-    if not full_path:
-        return False
-    return os.path.exists(full_path)
+    total_pages = max(1, (index.event_count + RECORDING_PAGE_SIZE - 1) // RECORDING_PAGE_SIZE)
+    has_more = False
+    if start is not None or end is not None:
+        first = index.find_event(int((start or 0) * 1000))
+        last = index.find_event(int(end * 1000) + 1) - 1 if end is not None else index.event_count - 1
+        if last - first >= RECORDING_PAGE_SIZE:
+            last = first + RECORDING_PAGE_SIZE - 1
+            has_more = True
+        page = first // RECORDING_PAGE_SIZE + 1
+    else:
+        page = total_pages if page is None else min(max(1, page), total_pages)
+        first = (page - 1) * RECORDING_PAGE_SIZE
+        last = min(first + RECORDING_PAGE_SIZE, index.event_count) - 1
+    
+    # Rendered page is cached (and shared on disk once the recording is finished)
+    data = recording_cache.get(file_path, f'page-{first}-{last}',
+                               lambda: _render_recording_page(index, first, last),
+                               persist=bool(index.meta.get('session_end')))
+    return dict(data,
+                page=page,
+                total_pages=total_pages,
+                page_size=RECORDING_PAGE_SIZE,
+                first_event=first,
+                last_event=last,
+                has_more=has_more,
+                duration_seconds=index.duration_ms / 1000)
 
 
-def parse_ssh_recording(file_path):
+def _render_recording_page(index, first, last):
     """
-    Parse SSH recording with caching support.
+    Decode events first..last of an indexed recording into log entries.
     """
-    return get_cached_recording(file_path)
+    events = [event for _, event in index.iter_events(first, last) if event]
+    
+    # Session metadata from the index (first session_start / last session_end event)
+    session_start_event = index.meta.get('session_start')
+    if session_start_event:
+        start_time_str = session_start_event.get('timestamp', '')
+        username = session_start_event.get('username', 'unknown')
+        server_ip = session_start_event.get('server', 'unknown')
+        session_start = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
+    else:
+        session_start = datetime.fromtimestamp((index.base_ms or 0) / 1000, timezone.utc)
+        start_time_str = session_start.isoformat() if index.base_ms else ''
+        username = 'unknown'
+        server_ip = 'unknown'
+    
+    session_end_event = index.meta.get('session_end')
+    if session_end_event:
+        end_time_str = session_end_event.get('timestamp', '')
+        duration = session_end_event.get('duration', 0)
+    else:
+        end_time_str = ''
+        duration = 0
+    
+    return {
+        'session_start': start_time_str,
+        'session_end': end_time_str,
+        'total_duration': f"{int(duration)}s" if duration else 'streaming',
+        'total_events': index.event_count,
+        'log_entries': build_log_entries(events, session_start),
+        'username': username,
+        'server_ip': server_ip,
+        'format': index.format
+    }
 
 
 def parse_ssh_recording_internal(file_path):
@@ -147,95 +161,6 @@ def parse_ssh_recording_internal(file_path):
     if not os.path.exists(file_path):
         return None
     
-    def ansi_to_html(text):
-        """Convert ANSI escape sequences to HTML with colors"""
-        import re
-        
-        # First, remove non-SGR escape sequences (they don't affect display)
-        # Remove CSI sequences (except SGR): ESC [ ... (not ending in 'm')
-        text = re.sub(r'\x1b\[[0-9;?]*[A-Zac-ln-z]', '', text)
-        # Remove OSC sequences: ESC ] ... BEL or ESC ] ... ESC \
-        text = re.sub(r'\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)', '', text)
-        # Remove other escape sequences
-        text = re.sub(r'\x1b[()][AB012]', '', text)  # Character set selection
-        text = re.sub(r'\x1b[=>]', '', text)  # Keypad mode
-        
-        # ANSI color map (SGR parameters)
-        colors = {
-            '30': '#000000', '31': '#cd0000', '32': '#00cd00', '33': '#cdcd00',
-            '34': '#0000ee', '35': '#cd00cd', '36': '#00cdcd', '37': '#e5e5e5',
-            '90': '#7f7f7f', '91': '#ff0000', '92': '#00ff00', '93': '#ffff00',
-            '94': '#5c5cff', '95': '#ff00ff', '96': '#00ffff', '97': '#ffffff',
-        }
-        
-        bg_colors = {
-            '40': '#000000', '41': '#cd0000', '42': '#00cd00', '43': '#cdcd00',
-            '44': '#0000ee', '45': '#cd00cd', '46': '#00cdcd', '47': '#e5e5e5',
-            '100': '#7f7f7f', '101': '#ff0000', '102': '#00ff00', '103': '#ffff00',
-            '104': '#5c5cff', '105': '#ff00ff', '106': '#00ffff', '107': '#ffffff',
-        }
-        
-        # Current style state
-        current_fg = None
-        current_bg = None
-        bold = False
-        
-        result = []
-        open_span = False
-        
-        # Split by ESC sequences
-        parts = re.split(r'(\x1b\[[0-9;]*m)', text)
-        
-        for part in parts:
-            if part.startswith('\x1b[') and part.endswith('m'):
-                # Parse SGR sequence
-                codes = part[2:-1].split(';')
-                
-                for code in codes:
-                    if code == '' or code == '0':
-                        # Reset
-                        if open_span:
-                            result.append('</span>')
-                            open_span = False
-                        current_fg = None
-                        current_bg = None
-                        bold = False
-                    elif code == '1':
-                        bold = True
-                    elif code == '22':
-                        bold = False
-                    elif code in colors:
-                        current_fg = colors[code]
-                    elif code in bg_colors:
-                        current_bg = bg_colors[code]
-                
-                # Close previous span if any
-                if open_span:
-                    result.append('</span>')
-                    open_span = False
-                
-                # Open new span with current styles
-                if current_fg or current_bg or bold:
-                    styles = []
-                    if current_fg:
-                        styles.append(f'color: {current_fg}')
-                    if current_bg:
-                        styles.append(f'background-color: {current_bg}')
-                    if bold:
-                        styles.append('font-weight: bold')
-                    result.append(f'<span style="{"; ".join(styles)}">')
-                    open_span = True
-            else:
-                # Regular text - escape HTML but preserve structure
-                import html
-                result.append(html.escape(part))
-        
-        # Close any open span
-        if open_span:
-            result.append('</span>')
-        
-        return ''.join(result)
-    
     # Detect file format
     try:
         with open(file_path, 'rb') as f:
@@ -246,23 +171,30 @@ def parse_ssh_recording_internal(file_path):
             # .rec format has 4-line text header followed by JSONL
             first_line = header.split(b'\n')[0]
             
+            # Binary format (compressed frames, src.core.recording_format)
+            is_binary = recording_format.is_binary_recording(header)
+            
             # Check if it's JSONL format (immediate JSON or after header like .rec files)
             is_jsonl = (first_line.startswith(b'{"type":') or 
                        b'"timestamp"' in first_line or
                        b'Session Recording' in header)  # .rec format detection
             
-            if is_jsonl:
-                # JSONL format (JSON Lines - one event per line)
-                events = []
-                for line in f:
-                    line_str = line.decode('utf-8', errors='replace').strip()
-                    if line_str:
-                        try:
-                            event = json.loads(line_str)
-                            events.append(event)
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Invalid JSONL line: {e}")
-                            continue
+            if is_binary or is_jsonl:
+                if is_binary:
+                    # Decoded to the same event dicts as JSONL
+                    events = recording_format.read_events(f)
+                else:
+                    # JSONL format (JSON Lines - one event per line)
+                    events = []
+                    for line in f:
+                        line_str = line.decode('utf-8', errors='replace').strip()
+                        if line_str:
+                            try:
+                                event = json.loads(line_str)
+                                events.append(event)
+                            except json.JSONDecodeError as e:
+                                logger.warning(f"Invalid JSONL line: {e}")
+                                continue
                 
                 # Extract session metadata from first event (session_start)
                 session_start_event = events[0] if events and events[0].get('type') == 'session_start' else None
@@ -290,87 +222,7 @@ def parse_ssh_recording_internal(file_path):
                     end_time_str = ''
                     duration = 0
                 
-                log_entries = []
-                
-                for event in events:
-                    event_type = event.get('type', 'unknown')
-                    
-                    # Skip metadata events
-                    if event_type in ['session_start', 'session_end']:
-                        continue
-                    
-                    # Parse event timestamp
-                    event_ts_str = event.get('timestamp', '')
-                    if event_ts_str:
-                        event_ts = datetime.fromisoformat(event_ts_str.replace('Z', '+00:00'))
-                        elapsed_seconds = (event_ts - session_start).total_seconds()
-                    else:
-                        elapsed_seconds = 0
-                    
-                    content = event.get('data', '')
-                    
-                    # Skip single keystrokes
-                    if event_type == 'client':
-                        if '\n' not in content and '\r' not in content and len(content) < 2:
-                            continue
-                    
-                    # Format elapsed time
-                    if elapsed_seconds < 60:
-                        elapsed_str = f"{int(elapsed_seconds)}s"
-                    elif elapsed_seconds < 3600:
-                        minutes = int(elapsed_seconds // 60)
-                        seconds = int(elapsed_seconds % 60)
-                        elapsed_str = f"{minutes}m {seconds}s"
-                    else:
-                        hours = int(elapsed_seconds // 3600)
-                        minutes = int((elapsed_seconds % 3600) // 60)
-                        elapsed_str = f"{hours}h {minutes}m"
-                    
-                    # Format timestamp
-                    event_ts_str = event_ts.strftime('%H:%M:%S') if 'event_ts' in locals() else ''
-                    
-                    # Convert ANSI to HTML for display
-                    display_content = content
-                    if event_type in ['server', 'client']:
-                        original_length = len(content)
-                        truncated = False
-                        if original_length > 2000:
-                            content = content[:2000]
-                            truncated = True
-                        
-                        display_content = ansi_to_html(content)
-                        
-                        if truncated:
-                            display_content += '... (truncated)'
-                    
-                    entry = {
-                        'timestamp': event_ts_str,
-                        'elapsed': elapsed_str,
-                        'elapsed_seconds': elapsed_seconds,
-                        'type': event_type,
-                        'content': display_content,
-                        'content_length': len(content),
-                        'raw': event
-                    }
-                    
-                    log_entries.append(entry)
-                
-                # Group consecutive events of the same type within 100ms
-                grouped_entries = []
-                for entry in log_entries:
-                    if entry['type'] in ['session_start', 'session_end']:
-                        grouped_entries.append(entry)
-                        continue
-                    
-                    # Try to merge with previous entry if same type and within 100ms
-                    if (grouped_entries and 
-                        grouped_entries[-1]['type'] == entry['type'] and
-                        entry['elapsed_seconds'] - grouped_entries[-1]['elapsed_seconds'] < 0.1):
-                        # Merge content
-                        grouped_entries[-1]['content'] += entry['content']
-                        grouped_entries[-1]['content_length'] += entry['content_length']
-                    else:
-                        grouped_entries.append(entry)
+                grouped_entries = build_log_entries(events, session_start)
                 
                 return {
                     'session_start': start_time_str,
@@ -380,7 +232,7 @@ def parse_ssh_recording_internal(file_path):
                     'log_entries': grouped_entries,
                     'username': username,
                     'server_ip': server_ip,
-                    'format': 'jsonl'
+                    'format': 'binary' if is_binary else 'jsonl'
                 }
             
             elif header.startswith(b'{') or b'"events"' in header:
@@ -821,7 +673,11 @@ def view(session_id):
             if file_exists or session.is_active:
                 full_path = get_full_recording_path(session)
                 if full_path:
-                    recording_data = parse_ssh_recording(full_path)
+                    # One page of events - active sessions open on the last page (live tail)
+                    page = request.args.get('page', type=int)
+                    if page is None and not session.is_active:
+                        page = 1
+                    recording_data = parse_ssh_recording_page(full_path, page=page)
         elif session.protocol == 'rdp' and file_exists:
             full_path = get_full_recording_path(session)
             recording_info = get_rdp_recording_info(full_path)
@@ -843,6 +699,9 @@ def live_events(session_id):
     """
     Get live session events for active SSH sessions (permission-checked).
     Returns events after a given timestamp (for polling).
+    
+    Served from the recording's shared incremental tail (src.web.recording_tail),
+    which only decodes bytes appended since the previous poll of any viewer.
     """
     db = SessionLocal()
     try:
@@ -856,6 +715,9 @@ def live_events(session_id):
             return jsonify({'error': 'Access denied'}), 403
         
         if not session.is_active:
+            full_path = get_full_recording_path(session)
+            if full_path:
+                recording_tail.evict_tail(full_path)
             return jsonify({'error': 'Session is not active', 'is_active': False}), 200
         
         if session.protocol != 'ssh':
@@ -869,28 +731,115 @@ def live_events(session_id):
         if not full_path or not os.path.exists(full_path):
             return jsonify({'error': 'Recording file not found'}), 404
         
-        # For active sessions, ALWAYS parse fresh (bypass cache)
-        # File is being written in real-time, mtime doesn't change until close
-        recording_data = parse_ssh_recording_internal(full_path)
-        if not recording_data or 'error' in recording_data:
+        # File is being written in real-time - decode only what was appended
+        tail = recording_tail.get_tail(full_path)
+        try:
+            new_events = tail.entries_after(after_seconds)
+        except Exception as e:
+            logger.error(f"Failed to read live recording {full_path}: {e}")
             return jsonify({'error': 'Failed to parse recording'}), 500
         
-        # Filter events that are newer than 'after' timestamp
-        new_events = [
-            entry for entry in recording_data['log_entries']
-            if entry['elapsed_seconds'] > after_seconds
-        ]
-        
         return jsonify({
             'is_active': session.is_active,
             'events': new_events,
-            'total_events': recording_data['total_events'],
-            'session_duration': recording_data['total_duration']
+            'total_events': tail.total_events,
+            'session_duration': 'streaming'
         })
     finally:
         db.close()
 
 
+@sessions_bp.route('/<session_id>/events')
+@login_required
+def recording_events(session_id):
+    """
+    Get one page or time window of SSH recording events (permission-checked).
+    
+    Query parameters:
+        page: 1-based page of RECORDING_PAGE_SIZE events (default: last page)
+        start, end: Time window in seconds from session start (instead of page)
+    """
+    db = SessionLocal()
+    try:
+        session = db.query(Session).filter(Session.session_id == session_id).first()
+        
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        # Check access permission
+        if not check_session_access(session, db):
+            return jsonify({'error': 'Access denied'}), 403
+        
+        if session.protocol != 'ssh':
+            return jsonify({'error': 'Event pages only supported for SSH'}), 400
+        
+        full_path = get_full_recording_path(session)
+        if not full_path or not os.path.exists(full_path):
+            return jsonify({'error': 'Recording file not found'}), 404
+        
+        recording_data = parse_ssh_recording_page(
+            full_path,
+            page=request.args.get('page', type=int),
+            start=request.args.get('start', type=float),
+            end=request.args.get('end', type=float)
+        )
+        if not recording_data or 'error' in recording_data:
+            return jsonify({'error': 'Failed to parse recording'}), 500
+        
+        return jsonify(recording_data)
+    finally:
+        db.close()
+
+
+@sessions_bp.route('/<session_id>/screen')
+@login_required
+def recording_screen_at(session_id):
+    """
+    Get the terminal screen at a point of an SSH recording (permission-checked).
+    
+    Rendered from the nearest screen keyframe (src.web.recording_screen), so
+    seeking does not replay the recording from the start.
+    
+    Query parameters:
+        at: Seconds from session start (default: end of recording)
+        event: Event number to stop before (instead of at)
+    """
+    db = SessionLocal()
+    try:
+        session = db.query(Session).filter(Session.session_id == session_id).first()
+        
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        # Check access permission
+        if not check_session_access(session, db):
+            return jsonify({'error': 'Access denied'}), 403
+        
+        if session.protocol != 'ssh':
+            return jsonify({'error': 'Screen playback only supported for SSH'}), 400
+        
+        full_path = get_full_recording_path(session)
+        if not full_path or not os.path.exists(full_path):
+            return jsonify({'error': 'Recording file not found'}), 404
+        
+        try:
+            index = recording_index.get_index(full_path)
+            if index is None:
+                return jsonify({'error': 'Screen playback not supported for this recording format'}), 400
+            screen = recording_screen.screen_at(
+                full_path, index,
+                at=request.args.get('at', type=float),
+                event=request.args.get('event', type=int)
+            )
+        except Exception as e:
+            logger.error(f"Failed to render screen of recording {full_path}: {e}", exc_info=True)
+            return jsonify({'error': 'Failed to render recording screen'}), 500
+        
+        return jsonify(screen)
+    finally:
+        db.close()
+
+
 @sessions_bp.route('/<session_id>/download')
 @login_required
 def download(session_id):
@@ -913,6 +862,19 @@ def download(session_id):
         
         # Determine filename and mimetype
         if session.protocol == 'ssh':
+            with open(full_path, 'rb') as f:
+                is_binary = recording_format.is_binary_recording(f.read(len(recording_format.FILE_MAGIC)))
+            if is_binary:
+                # Binary recordings are downloaded as JSONL, converted block by block
+                def generate_jsonl():
+                    with open(full_path, 'rb') as f:
+                        for frame in recording_format.iter_frames(f):
+                            event = recording_format.frame_to_event(*frame)
+                            yield json.dumps(event, separators=(',', ':')) + '\n'
+                
+                return Response(stream_with_context(generate_jsonl()),
+                                mimetype='application/json',
+                                headers={'Content-Disposition': f'attachment; filename=ssh_session_{session_id}.jsonl'})
             filename = f"ssh_session_{session_id}.json"
             mimetype = 'application/json'
         else:
@@ -977,7 +939,7 @@ def log_json(session_id):
         full_path = get_full_recording_path(session)
         
         if session.protocol == 'ssh':
-            recording_data = parse_ssh_recording(full_path)
+            recording_data = parse_ssh_recording_page(full_path, page=request.args.get('page', 1, type=int))
             return jsonify(recording_data)
         elif session.protocol == 'rdp':
             recording_info = get_rdp_recording_info(full_path)
@@ -994,6 +956,7 @@ def log_json(session_id):
 def convert_to_mp4(session_id):
     """Queue RDP session for MP4 conversion"""
     from src.core.database import MP4ConversionQueue
+    from src.core.mp4_converter import notify_queue
     
     db = SessionLocal()
     try:
@@ -1022,6 +985,7 @@ def convert_to_mp4(session_id):
                 existing.progress = 0
                 existing.total = 0
                 existing.created_at = datetime.utcnow()
+                notify_queue(db)
                 db.commit()
                 return jsonify({'message': 'Queued for retry', 'status': 'pending'})
         
@@ -1040,6 +1004,7 @@ def convert_to_mp4(session_id):
             priority=0
         )
         db.add(new_job)
+        notify_queue(db)
         db.commit()
         
         return jsonify({
@@ -0,0 +1,60 @@
+"""
+Grant Events - Push grant/policy invalidations from Tower to gates
+
+Gates keep one long-lived Socket.IO connection subscribed to grant events
+(auth {'gate_api_key': ..., 'subscribe': 'grant_events'}). Policy revoke/renew
+and maintenance changes publish a 'grant_event'; gates react by re-validating
+their live sessions immediately instead of waiting for the next poll.
+A verified MFA challenge publishes 'mfa_verified' (with its token) to the gate
+that created it, which wakes the SSH handshake waiting for it.
+
+Events carry what changed, not the new state - gates always fetch the
+authoritative status via /api/v1/sessions/grant_status.
+"""
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Room joined by every subscribed gate; per-gate rooms are GATE_ROOM_PREFIX + gate_id
+GRANT_EVENTS_ROOM = 'grant_events'
+GATE_ROOM_PREFIX = 'grant_events_gate_'
+
+# SocketIO instance will be injected by init_grant_events()
+socketio = None
+
+
+def init_grant_events(socketio_instance):
+    """Set the initialized SocketIO instance (called from websocket_events.register_handlers)"""
+    global socketio
+    socketio = socketio_instance
+
+
+def gate_room(gate_id: int) -> str:
+    return f"{GATE_ROOM_PREFIX}{gate_id}"
+
+
+def publish_grant_event(event_type: str, gate_id: int = None, **details):
+    """Notify gates that grants/sessions changed - call AFTER db.commit()
+
+    Args:
+        event_type: e.g. 'policy_revoked', 'policy_renewed', 'gate_maintenance', 'mfa_verified'
+        gate_id: Only notify this gate (None = all gates)
+        **details: Extra JSON-serializable fields (policy_id, server_id, ...)
+    """
+    if socketio is None or socketio.server is None:
+        logger.debug(f"Grant event {event_type} not published - Socket.IO not initialized")
+        return
+
+    payload = {
+        'type': event_type,
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        **details
+    }
+    room = gate_room(gate_id) if gate_id else GRANT_EVENTS_ROOM
+    try:
+        socketio.emit('grant_event', payload, room=room)
+        logger.info(f"[GrantEvents] Published {event_type} to {room}: {details}")
+    except Exception as e:
+        # Never fail the admin action - gates still poll as fallback
+        logger.warning(f"[GrantEvents] Failed to publish {event_type}: {e}")
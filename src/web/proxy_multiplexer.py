@@ -2,16 +2,21 @@
 Proxy Multiplexer - Represents a session running on remote gate
 
 Receives output from gate via WebSocket relay and broadcasts to browser watchers.
-Similar to SessionMultiplexer but for proxied sessions (not local).
+Similar to SessionMultiplexer but for proxied sessions (not local). New
+watchers get the current screen rendered from the history (ScreenKeyframe).
 """
 
 import logging
 import threading
-from collections import deque
 from typing import Dict, Optional
 
+from src.proxy.session_multiplexer import OutputRingBuffer, ScreenKeyframe
+
 logger = logging.getLogger(__name__)
 
+# Session history kept for new watchers (gate output arrives in coalesced frames of up to 64KB)
+HISTORY_MAX_BYTES = 64 * 1024
+
 
 class ProxySessionMultiplexer:
     """Represents a session running on remote gate
@@ -20,7 +25,8 @@ class ProxySessionMultiplexer:
     Allows browser clients to watch as if session was local.
     """
     
-    def __init__(self, session_id: str, gate_name: str, owner_username: str, server_name: str):
+    def __init__(self, session_id: str, gate_name: str, owner_username: str, server_name: str,
+                 rows: Optional[int] = None, cols: Optional[int] = None):
         """Initialize proxy multiplexer
         
         Args:
@@ -28,14 +34,17 @@ class ProxySessionMultiplexer:
             gate_name: Gate where session is running
             owner_username: Session owner
             server_name: Target server name
+            rows: Owner's terminal height (None = 24)
+            cols: Owner's terminal width (None = 80)
         """
         self.session_id = session_id
         self.gate_name = gate_name
         self.owner_username = owner_username
         self.server_name = server_name
         
-        # Ring buffer for session history (50KB)
-        self.ring_buffer = deque(maxlen=512)  # ~50KB with 100-byte chunks
+        # Ring buffer for session history (HISTORY_MAX_BYTES) and its current screen
+        self.ring_buffer = OutputRingBuffer(HISTORY_MAX_BYTES)
+        self.keyframe = ScreenKeyframe(self.ring_buffer, rows, cols)
         self.total_bytes_received = 0
         
         # Browser watchers: {sid: WebSocketChannelAdapter}
@@ -94,19 +103,37 @@ class ProxySessionMultiplexer:
                 f"total watchers: {len(self.web_watchers)})"
             )
             
-            # Send session history to new watcher
+            # Send current screen to new watcher
             try:
-                history_bytes = b''.join(self.ring_buffer)
-                if history_bytes:
+                if self.ring_buffer.end:
+                    history_bytes = self._screen_snapshot()
                     channel.send(history_bytes)
                     logger.info(
-                        f"[Proxy:{self.session_id}] Sent {len(history_bytes)} bytes history to {username}"
+                        f"[Proxy:{self.session_id}] Sent {len(history_bytes)} bytes screen snapshot to {username}"
                     )
             except Exception as e:
                 logger.error(f"[Proxy:{self.session_id}] Failed to send history to {username}: {e}")
             
             return True
     
+    def _screen_snapshot(self) -> bytes:
+        """Rendered screen (buffered output since the last screen boundary if emulation fails)"""
+        try:
+            return self.keyframe.render()
+        except Exception as e:
+            logger.error(f"[Proxy:{self.session_id}] Failed to render screen: {e}", exc_info=True)
+            self.keyframe.screen = None
+            return self.ring_buffer.snapshot()
+    
+    def resize(self, rows: int, cols: int):
+        """Owner's terminal was resized (relayed by the gate)"""
+        with self._lock:
+            try:
+                self.keyframe.resize(rows, cols)
+            except Exception as e:
+                logger.error(f"[Proxy:{self.session_id}] Failed to resize screen: {e}", exc_info=True)
+                self.keyframe.screen = None
+    
     def remove_watcher(self, watcher_id: str):
         """Remove browser watcher
         
@@ -140,7 +167,8 @@ class ProxyMultiplexerRegistry:
         logger.info("ProxyMultiplexerRegistry initialized")
     
     def register_session(self, session_id: str, gate_name: str, owner_username: str, 
-                        server_name: str) -> ProxySessionMultiplexer:
+                        server_name: str, rows: Optional[int] = None,
+                        cols: Optional[int] = None) -> ProxySessionMultiplexer:
         """Register a proxied session
         
         Args:
@@ -148,6 +176,8 @@ class ProxyMultiplexerRegistry:
             gate_name: Gate where session is running
             owner_username: Session owner
             server_name: Target server name
+            rows: Owner's terminal height
+            cols: Owner's terminal width
             
         Returns:
             ProxySessionMultiplexer instance
@@ -161,7 +191,9 @@ class ProxyMultiplexerRegistry:
                 session_id=session_id,
                 gate_name=gate_name,
                 owner_username=owner_username,
-                server_name=server_name
+                server_name=server_name,
+                rows=rows,
+                cols=cols
             )
             
             self._sessions[session_id] = multiplexer
@@ -0,0 +1,226 @@
+"""
+Recording Cache - Size-bounded LRU cache for parsed SSH recordings
+
+Parsed recordings (legacy full parses and rendered pages of indexed
+recordings) are kept in memory up to RECORDING_CACHE_MAX_MB in total, least
+recently used first out. Entry size is the length of the entry's JSON
+serialization, which is also what is persisted.
+
+With RECORDING_CACHE_DISK enabled, entries of finished recordings are also
+written as gzipped JSON to a .cache directory next to the recording, so other
+workers (and the next restart) load them instead of parsing the recording
+again. Every entry is validated against the recording's mtime and size. The
+directory is created 0700 and only used while it is owned by this user and
+not writable by anyone else - its content is shown as audit data. Without a
+writable recordings directory there is no disk tier.
+
+Metrics are exposed with get_stats() (monitoring blueprint).
+"""
+import gzip
+import json
+import logging
+import os
+import stat
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = '.cache'
+
+
+class RecordingCache:
+    """In-memory LRU (bounded by bytes) with optional shared on-disk tier"""
+
+    def __init__(self, max_bytes: int, disk_enabled: bool = True, disk_max_bytes: int = 1024 * 1024 * 1024):
+        """Initialize cache
+
+        Args:
+            max_bytes: Total size of in-memory entries
+            disk_enabled: Persist entries of finished recordings on disk
+            disk_max_bytes: Total size of persisted entries per cache directory
+        """
+        self.max_bytes = max_bytes
+        self.disk_enabled = disk_enabled
+        self.disk_max_bytes = disk_max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (file_path, key) -> (validator, size, data)
+        self.total_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_writes = 0
+        self.disk_errors = 0
+
+    def get(self, file_path: str, key: str, loader: Callable[[], Optional[dict]], persist: bool = True):
+        """Cached result of loader() for one view (key) of a recording
+
+        Args:
+            file_path: Recording file (mtime and size validate entries)
+            key: View of the recording, e.g. 'full' or 'page-1-1000'
+            loader: Parses the recording; results that are None or contain
+                    'error' are returned but not cached
+            persist: Entry may be written to the disk tier (finished recordings)
+
+        Returns:
+            Parsed data
+        """
+        file_stat = os.stat(file_path)
+        validator = [file_stat.st_mtime_ns, file_stat.st_size]
+        cache_key = (file_path, key)
+
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None:
+                if entry[0] == validator:
+                    self.entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(cache_key)
+
+        if self.disk_enabled:
+            data, size = self._disk_load(file_path, key, validator)
+            if data is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self._store(cache_key, validator, size, data)
+                return data
+
+        with self.lock:
+            self.misses += 1
+        data = loader()
+        if data is None or 'error' in data:
+            return data
+
+        serialized = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        with self.lock:
+            self._store(cache_key, validator, len(serialized), data)
+        if self.disk_enabled and persist:
+            self._disk_store(file_path, key, validator, serialized)
+        return data
+
+    def invalidate(self, file_path: str):
+        """Drop in-memory entries of a recording (disk entries fail validation by themselves)"""
+        with self.lock:
+            for cache_key in [k for k in self.entries if k[0] == file_path]:
+                self._remove(cache_key)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'disk_enabled': self.disk_enabled,
+                'disk_writes': self.disk_writes,
+                'disk_errors': self.disk_errors
+            }
+
+    def _store(self, cache_key, validator, size: int, data):
+        """Insert entry and evict least recently used ones (caller holds self.lock)"""
+        if cache_key in self.entries:
+            self._remove(cache_key)
+        if size > self.max_bytes:
+            return  # Larger than the whole cache - served uncached
+        self.entries[cache_key] = (validator, size, data)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, cache_key):
+        _, size, _ = self.entries.pop(cache_key)
+        self.total_bytes -= size
+
+    def _disk_path(self, file_path: str, key: str) -> str:
+        """Cache file in the .cache directory next to the recording"""
+        return os.path.join(os.path.dirname(file_path), CACHE_DIR_NAME,
+                            f"{os.path.basename(file_path)}.{key}.json.gz")
+
+    @staticmethod
+    def _trusted_dir(cache_dir: str) -> bool:
+        """True if cache_dir is a real directory owned by us that nobody else can write to"""
+        try:
+            dir_stat = os.lstat(cache_dir)
+        except OSError:
+            return False
+        return (stat.S_ISDIR(dir_stat.st_mode) and dir_stat.st_uid == os.geteuid()
+                and not dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+    def _disk_load(self, file_path: str, key: str, validator):
+        path = self._disk_path(file_path, key)
+        if not os.path.exists(path) or not self._trusted_dir(os.path.dirname(path)):
+            return None, 0
+        try:
+            with gzip.open(path, 'rb') as f:
+                serialized = f.read()
+            cached = json.loads(serialized)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable recording cache file {path}: {e}")
+            return None, 0
+        if cached.get('validator') == validator:
+            return cached['data'], len(serialized)
+        return None, 0
+
+    def _disk_store(self, file_path: str, key: str, validator, serialized: bytes):
+        """Write entry to the recording's cache directory and prune it to disk_max_bytes"""
+        if len(serialized) > self.disk_max_bytes:
+            return
+        body = b'{"validator":' + json.dumps(validator).encode('ascii') + b',"data":' + serialized + b'}'
+        path = self._disk_path(file_path, key)
+        cache_dir = os.path.dirname(path)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            if not self._trusted_dir(cache_dir):
+                raise OSError(f"{cache_dir} is not a private directory of this user")
+            with gzip.open(tmp_path, 'wb', compresslevel=1) as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Cannot write recording cache file {path}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            with self.lock:
+                self.disk_errors += 1
+            return
+        with self.lock:
+            self.disk_writes += 1
+        self._prune_disk(cache_dir)
+
+    def _prune_disk(self, cache_dir: str):
+        """Remove least recently written cache files above disk_max_bytes"""
+        try:
+            files = []
+            for entry in os.scandir(cache_dir):
+                if entry.name.endswith('.json.gz'):
+                    entry_stat = entry.stat()
+                    files.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+            total = sum(f[1] for f in files)
+            for _, size, path in sorted(files):
+                if total <= self.disk_max_bytes:
+                    break
+                os.unlink(path)
+                total -= size
+        except OSError as e:
+            logger.warning(f"Failed to prune recording cache {cache_dir}: {e}")
+
+
+recording_cache = RecordingCache(
+    max_bytes=int(os.getenv('RECORDING_CACHE_MAX_MB', '256')) * 1024 * 1024,
+    disk_enabled=os.getenv('RECORDING_CACHE_DISK', '1').lower() in ('1', 'true', 'yes'),
+    disk_max_bytes=int(os.getenv('RECORDING_CACHE_DISK_MAX_MB', '1024')) * 1024 * 1024
+)
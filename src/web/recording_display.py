@@ -0,0 +1,181 @@
+"""
+Recording Display - HTML log entries for SSH recording events
+
+Shared by the session viewer (full and paged parsing) and the live tail.
+"""
+import html
+import re
+from datetime import datetime
+
+
+def ansi_to_html(text):
+    """Convert ANSI escape sequences to HTML with colors"""
+    # First, remove non-SGR escape sequences (they don't affect display)
+    # Remove CSI sequences (except SGR): ESC [ ... (not ending in 'm')
+    text = re.sub(r'\x1b\[[0-9;?]*[A-Zac-ln-z]', '', text)
+    # Remove OSC sequences: ESC ] ... BEL or ESC ] ... ESC \
+    text = re.sub(r'\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)', '', text)
+    # Remove other escape sequences
+    text = re.sub(r'\x1b[()][AB012]', '', text)  # Character set selection
+    text = re.sub(r'\x1b[=>]', '', text)  # Keypad mode
+    
+    # ANSI color map (SGR parameters)
+    colors = {
+        '30': '#000000', '31': '#cd0000', '32': '#00cd00', '33': '#cdcd00',
+        '34': '#0000ee', '35': '#cd00cd', '36': '#00cdcd', '37': '#e5e5e5',
+        '90': '#7f7f7f', '91': '#ff0000', '92': '#00ff00', '93': '#ffff00',
+        '94': '#5c5cff', '95': '#ff00ff', '96': '#00ffff', '97': '#ffffff',
+    }
+    
+    bg_colors = {
+        '40': '#000000', '41': '#cd0000', '42': '#00cd00', '43': '#cdcd00',
+        '44': '#0000ee', '45': '#cd00cd', '46': '#00cdcd', '47': '#e5e5e5',
+        '100': '#7f7f7f', '101': '#ff0000', '102': '#00ff00', '103': '#ffff00',
+        '104': '#5c5cff', '105': '#ff00ff', '106': '#00ffff', '107': '#ffffff',
+    }
+    
+    # Current style state
+    current_fg = None
+    current_bg = None
+    bold = False
+    
+    result = []
+    open_span = False
+    
+    # Split by ESC sequences
+    parts = re.split(r'(\x1b\[[0-9;]*m)', text)
+    
+    for part in parts:
+        if part.startswith('\x1b[') and part.endswith('m'):
+            # Parse SGR sequence
+            codes = part[2:-1].split(';')
+    
+            for code in codes:
+                if code == '' or code == '0':
+                    # Reset
+                    if open_span:
+                        result.append('</span>')
+                        open_span = False
+                    current_fg = None
+                    current_bg = None
+                    bold = False
+                elif code == '1':
+                    bold = True
+                elif code == '22':
+                    bold = False
+                elif code in colors:
+                    current_fg = colors[code]
+                elif code in bg_colors:
+                    current_bg = bg_colors[code]
+    
+            # Close previous span if any
+            if open_span:
+                result.append('</span>')
+                open_span = False
+    
+            # Open new span with current styles
+            if current_fg or current_bg or bold:
+                styles = []
+                if current_fg:
+                    styles.append(f'color: {current_fg}')
+                if current_bg:
+                    styles.append(f'background-color: {current_bg}')
+                if bold:
+                    styles.append('font-weight: bold')
+                result.append(f'<span style="{"; ".join(styles)}">')
+                open_span = True
+        else:
+            # Regular text - escape HTML but preserve structure
+            result.append(html.escape(part))
+    
+    # Close any open span
+    if open_span:
+        result.append('</span>')
+    
+    return ''.join(result)
+
+
+def format_elapsed(elapsed_seconds):
+    """Elapsed time label for a log entry (45s, 3m 12s, 2h 5m)"""
+    if elapsed_seconds < 60:
+        return f"{int(elapsed_seconds)}s"
+    elif elapsed_seconds < 3600:
+        minutes = int(elapsed_seconds // 60)
+        seconds = int(elapsed_seconds % 60)
+        return f"{minutes}m {seconds}s"
+    else:
+        hours = int(elapsed_seconds // 3600)
+        minutes = int((elapsed_seconds % 3600) // 60)
+        return f"{hours}h {minutes}m"
+
+
+def build_log_entries(events, session_start):
+    """
+    Display entries for JSONL-style events: elapsed time, ANSI converted to HTML,
+    single keystrokes skipped, same-type events within 100ms grouped.
+    """
+    log_entries = []
+    
+    for event in events:
+        event_type = event.get('type', 'unknown')
+        
+        # Skip metadata events
+        if event_type in ['session_start', 'session_end', 'resize']:
+            continue
+        
+        # Parse event timestamp
+        event_ts_str = event.get('timestamp', '')
+        if event_ts_str:
+            event_ts = datetime.fromisoformat(event_ts_str.replace('Z', '+00:00'))
+            elapsed_seconds = (event_ts - session_start).total_seconds()
+            event_ts_str = event_ts.strftime('%H:%M:%S')
+        else:
+            elapsed_seconds = 0
+        
+        content = event.get('data', '')
+        
+        # Skip single keystrokes
+        if event_type == 'client':
+            if '\n' not in content and '\r' not in content and len(content) < 2:
+                continue
+        
+        # Convert ANSI to HTML for display
+        display_content = content
+        if event_type in ['server', 'client']:
+            original_length = len(content)
+            truncated = False
+            if original_length > 2000:
+                content = content[:2000]
+                truncated = True
+            
+            display_content = ansi_to_html(content)
+            
+            if truncated:
+                display_content += '... (truncated)'
+        
+        entry = {
+            'timestamp': event_ts_str,
+            'elapsed': format_elapsed(elapsed_seconds),
+            'elapsed_seconds': elapsed_seconds,
+            'type': event_type,
+            'content': display_content,
+            'content_length': len(content),
+            'raw': event
+        }
+        
+        log_entries.append(entry)
+    
+    # Group consecutive events of the same type within 100ms
+    grouped_entries = []
+    for entry in log_entries:
+        # Try to merge with previous entry if same type and within 100ms
+        if (grouped_entries and 
+            grouped_entries[-1]['type'] == entry['type'] and
+            entry['elapsed_seconds'] - grouped_entries[-1]['elapsed_seconds'] < 0.1):
+            # Merge content
+            grouped_entries[-1]['content'] += entry['content']
+            grouped_entries[-1]['content_length'] += entry['content_length']
+        else:
+            grouped_entries.append(entry)
+    
+    return grouped_entries
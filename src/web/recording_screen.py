@@ -0,0 +1,121 @@
+"""
+Recording Screen - Terminal screen at any point of an SSH recording
+
+The transcript shows what was sent; showing what the user saw at a given
+moment means running the server output up to that moment through a terminal
+emulator (src.core.terminal_screen). One pass over the recording takes
+keyframes (rendered screen every KEYFRAME_INTERVAL_MS of recording time or
+KEYFRAME_BYTES of output), cached like parsed pages in recording_cache, so a
+seek restores the nearest keyframe and replays only the events after it.
+"""
+import bisect
+import logging
+from datetime import datetime
+from typing import Optional
+
+from src.core import recording_format
+from src.core.terminal_screen import DEFAULT_COLS, DEFAULT_ROWS, TerminalScreen
+from src.web.recording_cache import recording_cache
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_INTERVAL_MS = 10000
+KEYFRAME_BYTES = 256 * 1024
+
+
+def _apply_event(screen: TerminalScreen, event: Optional[dict]) -> int:
+    """Apply one recording event to the screen, returns output bytes fed"""
+    if not event:
+        return 0
+    event_type = event.get('type')
+    if event_type == 'server':
+        data = event.get('data', '').encode('utf-8')
+        screen.feed(data)
+        return len(data)
+    if event_type == 'resize' and event.get('rows') and event.get('cols'):
+        screen.resize(int(event['rows']), int(event['cols']))
+    return 0
+
+
+def _elapsed_ms(event: dict, base_ms: Optional[int]) -> Optional[int]:
+    timestamp = event.get('timestamp') if event else None
+    if not timestamp or base_ms is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return recording_format.timestamp_ms(dt) - base_ms
+
+
+def build_keyframes(index) -> dict:
+    """
+    Run an indexed recording through the emulator once and keep keyframes.
+
+    Returns:
+        {'keyframes': [{'event', 'elapsed_ms', 'rows', 'cols', 'screen'}, ...]}
+        where screen is the rendered state before event number 'event'
+    """
+    start_event = index.meta.get('session_start') or {}
+    rows = start_event.get('rows') or DEFAULT_ROWS
+    cols = start_event.get('cols') or DEFAULT_COLS
+    screen = TerminalScreen(rows, cols)
+    keyframes = [{'event': 0, 'elapsed_ms': 0, 'rows': rows, 'cols': cols, 'screen': ''}]
+
+    last_ms = 0
+    pending_bytes = 0
+    for number, event in index.iter_events():
+        pending_bytes += _apply_event(screen, event)
+        if not pending_bytes:
+            continue
+        elapsed = _elapsed_ms(event, index.base_ms)
+        if elapsed is None:
+            continue
+        if elapsed - last_ms >= KEYFRAME_INTERVAL_MS or pending_bytes >= KEYFRAME_BYTES:
+            keyframes.append({
+                'event': number + 1,
+                'elapsed_ms': elapsed,
+                'rows': screen.rows,
+                'cols': screen.cols,
+                'screen': screen.render().decode('utf-8')
+            })
+            last_ms = elapsed
+            pending_bytes = 0
+
+    logger.debug(f"Built {len(keyframes)} screen keyframes for {index.recording_path}")
+    return {'keyframes': keyframes}
+
+
+def screen_at(file_path: str, index, at: Optional[float] = None, event: Optional[int] = None) -> dict:
+    """
+    Terminal screen after the events up to a point of the recording.
+
+    Args:
+        file_path: Recording file
+        index: RecordingIndex of the recording
+        at: Seconds from session start (events at or before it are applied)
+        event: Event number to stop before (instead of at; default: end)
+
+    Returns:
+        TerminalScreen.to_dict() plus event, elapsed_ms and keyframe_event
+    """
+    if event is None:
+        event = index.find_event(int(at * 1000) + 1) if at is not None else index.event_count
+    event = min(max(0, event), index.event_count)
+
+    data = recording_cache.get(file_path, 'keyframes', lambda: build_keyframes(index),
+                               persist=bool(index.meta.get('session_end')))
+    keyframes = data['keyframes']
+    position = bisect.bisect_right([k['event'] for k in keyframes], event) - 1
+    keyframe = keyframes[position]
+
+    screen = TerminalScreen(keyframe['rows'], keyframe['cols'])
+    screen.feed(keyframe['screen'].encode('utf-8'))
+    if event > keyframe['event']:
+        for _, recorded in index.iter_events(keyframe['event'], event - 1):
+            _apply_event(screen, recorded)
+
+    return dict(screen.to_dict(),
+                event=event,
+                elapsed_ms=index.elapsed_ms(event - 1) if event else 0,
+                keyframe_event=keyframe['event'])
@@ -0,0 +1,224 @@
+"""
+Recording Tail - Incremental reader for SSH recordings of active sessions
+
+The live view used to re-parse the whole growing recording on every poll of
+every viewer. A RecordingTail is shared by all viewers of one recording: it
+remembers the byte offset it has decoded up to (and a partial last line or
+block), decodes only bytes appended since, and keeps the most recent display
+entries. It starts near the end of the file using the recording's seekable
+index (src.core.recording_index).
+
+Viewers either poll /sessions/<id>/live (served from the tail) or subscribe
+over Socket.IO ('subscribe_recording'); Tower's recording chunk endpoints
+call notify_appended() so new entries are pushed to subscribers as soon as a
+gate uploads them. Tails are evicted when the recording is finalized or after
+TAIL_IDLE_TIMEOUT without viewers.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List
+
+from src.core import recording_format, recording_index
+from src.web.recording_display import build_log_entries
+
+logger = logging.getLogger(__name__)
+
+# Most recent display entries kept per recording
+TAIL_MAX_ENTRIES = 2000
+# Bytes decoded per read (bounded memory when a viewer joins late)
+TAIL_READ_SIZE = 4 * 1024 * 1024
+# Seconds a tail without viewers is kept
+TAIL_IDLE_TIMEOUT = 300
+
+# SocketIO instance will be injected by init_recording_tail()
+socketio = None
+
+_tails = {}  # file_path -> RecordingTail
+_tails_lock = threading.Lock()
+
+
+def init_recording_tail(socketio_instance):
+    """Set the initialized SocketIO instance (called from websocket_events.register_handlers)"""
+    global socketio
+    socketio = socketio_instance
+
+
+def tail_room(file_path: str) -> str:
+    """Socket.IO room of a recording's subscribers"""
+    return 'recording_tail_' + hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:16]
+
+
+class RecordingTail:
+    """Decoded tail of one growing JSONL or binary recording"""
+
+    def __init__(self, file_path: str):
+        """Initialize tail (nothing is read until the first poll)"""
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=TAIL_MAX_ENTRIES)
+        self.offset = None  # Next byte to decode (None = not started)
+        self.pending = b''  # Incomplete line/block at offset
+        self.format = None
+        self.session_start = None
+        self.total_events = 0
+        self.subscribers = 0
+        self.last_used = time.monotonic()
+
+    def _start(self):
+        """Position at the checkpoint before the last TAIL_MAX_ENTRIES events"""
+        index = recording_index.get_index(self.file_path)
+        if index is None:
+            raise ValueError('Recording format does not support live tail')
+
+        self.format = index.format
+        session_start_event = index.meta.get('session_start')
+        if session_start_event:
+            self.session_start = datetime.fromisoformat(
+                session_start_event['timestamp'].replace('Z', '+00:00'))
+        elif index.base_ms:
+            self.session_start = datetime.fromtimestamp(index.base_ms / 1000, timezone.utc)
+
+        start_event = max(0, index.event_count - TAIL_MAX_ENTRIES)
+        checkpoints = [c for c in index.checkpoints if c[1] <= start_event]
+        if checkpoints:
+            self.offset, self.total_events, _ = checkpoints[-1]
+        else:
+            self.offset = len(recording_format.FILE_MAGIC) if self.format == 'binary' else 0
+            self.total_events = 0
+        self.pending = b''
+
+    def poll(self) -> List[dict]:
+        """Decode bytes appended since the last poll
+
+        Returns:
+            New display entries (also added to self.entries)
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            if self.offset is None:
+                self._start()
+
+            size = os.path.getsize(self.file_path)
+            if size < self.offset:
+                # File replaced - start over
+                self.entries.clear()
+                self._start()
+
+            new_entries = deque(maxlen=TAIL_MAX_ENTRIES)
+            with open(self.file_path, 'rb') as f:
+                f.seek(self.offset)
+                while self.offset < size:
+                    data = f.read(min(TAIL_READ_SIZE, size - self.offset))
+                    if not data:
+                        break
+                    self.offset += len(data)
+                    events = self._decode(self.pending + data)
+                    self.total_events += len(events)
+                    if self.session_start is None and events and events[0].get('timestamp'):
+                        self.session_start = datetime.fromisoformat(
+                            events[0]['timestamp'].replace('Z', '+00:00'))
+                    if events:
+                        new_entries.extend(build_log_entries(events, self.session_start))
+
+            self.entries.extend(new_entries)
+            return list(new_entries)
+
+    def _decode(self, buf: bytes) -> List[dict]:
+        """Events of complete lines/blocks in buf (the rest is kept in self.pending)"""
+        events = []
+        if self.format == 'binary':
+            pos = 0
+            header_size = recording_format.BLOCK_HEADER.size
+            while pos + header_size <= len(buf):
+                magic, codec, base_ms, raw_len, payload_len = recording_format.BLOCK_HEADER.unpack_from(buf, pos)
+                if magic != recording_format.BLOCK_MAGIC:
+                    raise recording_format.RecordingFormatError(
+                        f"Bad block magic at offset {self.offset - len(buf) + pos}")
+                if pos + header_size + payload_len > len(buf):
+                    break
+                payload = buf[pos + header_size:pos + header_size + payload_len]
+                for frame in recording_format.decode_block(codec, base_ms, raw_len, payload):
+                    events.append(recording_format.frame_to_event(*frame))
+                pos += header_size + payload_len
+            self.pending = buf[pos:]
+            return events
+
+        lines = buf.split(b'\n')
+        self.pending = lines.pop()
+        for line in lines:
+            if not line.lstrip().startswith(b'{'):
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError as e:
+                logger.warning(f"Invalid JSONL line in {self.file_path}: {e}")
+        return events
+
+    def entries_after(self, after_seconds: float) -> List[dict]:
+        """Kept entries newer than after_seconds (polls first)"""
+        self.poll()
+        with self.lock:
+            return [entry for entry in self.entries if entry['elapsed_seconds'] > after_seconds]
+
+
+def get_tail(file_path: str) -> RecordingTail:
+    """Shared tail for a recording (created on first use, idle tails evicted)"""
+    now = time.monotonic()
+    with _tails_lock:
+        for path in [p for p, t in _tails.items()
+                     if not t.subscribers and now - t.last_used > TAIL_IDLE_TIMEOUT]:
+            del _tails[path]
+        tail = _tails.get(file_path)
+        if tail is None:
+            tail = _tails[file_path] = RecordingTail(file_path)
+        tail.last_used = now
+        return tail
+
+
+def subscribe(file_path: str) -> RecordingTail:
+    """Count a Socket.IO subscriber (pushes start with the next notify_appended)"""
+    tail = get_tail(file_path)
+    with _tails_lock:
+        tail.subscribers += 1
+    return tail
+
+
+def unsubscribe(file_path: str):
+    with _tails_lock:
+        tail = _tails.get(file_path)
+        if tail and tail.subscribers:
+            tail.subscribers -= 1
+
+
+def notify_appended(file_path: str):
+    """Recording grew (gate chunk appended) - push new entries to subscribers"""
+    tail = _tails.get(file_path)
+    if tail is None or not tail.subscribers or socketio is None or socketio.server is None:
+        return
+    try:
+        entries = tail.poll()
+        if entries:
+            socketio.emit('recording_events', {
+                'events': entries,
+                'total_events': tail.total_events
+            }, room=tail_room(file_path))
+    except Exception as e:
+        # Viewers fall back to polling /live
+        logger.warning(f"Failed to push recording events for {file_path}: {e}")
+
+
+def evict_tail(file_path: str):
+    """Drop a recording's tail (finalized) and tell subscribers the session ended"""
+    with _tails_lock:
+        tail = _tails.pop(file_path, None)
+    if tail and tail.subscribers and socketio is not None and socketio.server is not None:
+        try:
+            socketio.emit('recording_ended', {}, room=tail_room(file_path))
+        except Exception as e:
+            logger.warning(f"Failed to notify recording end for {file_path}: {e}")
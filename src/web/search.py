@@ -10,7 +10,7 @@ import io
 from src.core.database import (
     Session as DBSession, User, Server, AccessPolicy, SessionTransfer,
     UserGroup, UserGroupMember, ServerGroup, ServerGroupMember,
-    SessionLocal
+    SessionLocal, group_descendants_cte
 )
 
 search_bp = Blueprint('search', __name__, url_prefix='/search')
@@ -48,47 +48,21 @@ def smart_detect_search_term(q):
 
 
 def get_users_in_group(group_id, db):
-    """Get all users in a group (recursive)"""
-    group = db.query(UserGroup).filter_by(id=group_id).first()
-    if not group:
-        return []
-    
-    user_ids = set()
-    
-    # Direct members
-    direct_members = db.query(UserGroupMember.user_id).filter(
-        UserGroupMember.user_group_id == group_id
-    ).all()
-    user_ids.update([m[0] for m in direct_members])
-    
-    # Recursive: child groups
-    child_groups = db.query(UserGroup).filter_by(parent_group_id=group_id).all()
-    for child in child_groups:
-        user_ids.update(get_users_in_group(child.id, db))
-    
-    return list(user_ids)
+    """Get all users in a group (recursive, one query)"""
+    groups = group_descendants_cte(group_id, db, UserGroup)
+    members = db.query(UserGroupMember.user_id).filter(
+        UserGroupMember.user_group_id.in_(db.query(groups.c.group_id))
+    ).distinct()
+    return [m[0] for m in members]
 
 
 def get_servers_in_group(group_id, db):
-    """Get all servers in a group (recursive)"""
-    group = db.query(ServerGroup).filter_by(id=group_id).first()
-    if not group:
-        return []
-    
-    server_ids = set()
-    
-    # Direct members
-    direct_members = db.query(ServerGroupMember.server_id).filter(
-        ServerGroupMember.group_id == group_id
-    ).all()
-    server_ids.update([m[0] for m in direct_members])
-    
-    # Recursive: child groups
-    child_groups = db.query(ServerGroup).filter_by(parent_group_id=group_id).all()
-    for child in child_groups:
-        server_ids.update(get_servers_in_group(child.id, db))
-    
-    return list(server_ids)
+    """Get all servers in a group (recursive, one query)"""
+    groups = group_descendants_cte(group_id, db, ServerGroup)
+    members = db.query(ServerGroupMember.server_id).filter(
+        ServerGroupMember.group_id.in_(db.query(groups.c.group_id))
+    ).distinct()
+    return [m[0] for m in members]
 
 
 def build_session_query(filters, db):
@@ -157,12 +157,17 @@ function initLiveSessionViewer() {
             console.log('[WebSocket] Relay activated:', data);
         });
         
-        socket.on('session_output', function(data) {
+        socket.on('session_output', function(data, ack) {
             // Receive output from SessionMultiplexer via WebSocketChannelAdapter
-            // data.data is array of bytes (converted from Python bytes object)
-            if (data.data && data.data.length > 0) {
+            // data.data is an ArrayBuffer (binary attachment); older Towers send an array of bytes
+            if (data.data && (data.data.byteLength || data.data.length)) {
                 const bytes = new Uint8Array(data.data);
-                terminal.write(bytes);
+                // Ack once xterm.js has processed the frame - Tower holds back output until then
+                terminal.write(bytes, function() {
+                    if (ack) ack();
+                });
+            } else if (ack) {
+                ack();
             }
         });
         
@@ -0,0 +1,125 @@
+/**
+ * Recording Screen Player with xterm.js
+ * Shows the terminal screen at any point of an SSH recording. Tower renders
+ * the screen from the nearest keyframe (/sessions/<id>/screen?at=<seconds>),
+ * so seeking never replays the recording from the start.
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    initScreenPlayer();
+});
+
+function initScreenPlayer() {
+    const player = document.getElementById('screen-player');
+    if (!player) {
+        return;  // Not an indexed SSH recording
+    }
+    
+    const sessionId = player.dataset.sessionId;
+    const toggleBtn = document.getElementById('toggle-screen');
+    const seek = document.getElementById('screen-seek');
+    const timeLabel = document.getElementById('screen-time');
+    const container = document.getElementById('screen-container');
+    const hint = document.getElementById('screen-hint');
+    
+    let terminal = null;
+    let requestedAt = null;
+    let loading = false;
+    
+    toggleBtn.addEventListener('click', function() {
+        if (terminal) {
+            hideScreen();
+        } else {
+            showScreen();
+        }
+    });
+    
+    function showScreen() {
+        terminal = new Terminal({
+            cursorBlink: false,
+            disableStdin: true,
+            scrollback: 0,
+            fontSize: 14,
+            fontFamily: '"Courier New", Courier, monospace',
+            theme: {
+                background: '#000000',
+                foreground: '#ffffff'
+            }
+        });
+        terminal.open(document.getElementById('screen-terminal'));
+        
+        container.style.display = 'block';
+        seek.style.display = 'block';
+        timeLabel.style.display = 'inline';
+        hint.style.display = 'block';
+        toggleBtn.innerHTML = '<i class="bi bi-display"></i> Hide Screen';
+        
+        loadScreen(parseFloat(seek.value));
+    }
+    
+    function hideScreen() {
+        terminal.dispose();
+        terminal = null;
+        container.style.display = 'none';
+        seek.style.display = 'none';
+        timeLabel.style.display = 'none';
+        hint.style.display = 'none';
+        toggleBtn.innerHTML = '<i class="bi bi-display"></i> Show Screen';
+    }
+    
+    function formatTime(seconds) {
+        const h = Math.floor(seconds / 3600);
+        const m = Math.floor((seconds % 3600) / 60);
+        const s = Math.floor(seconds % 60);
+        return [h, m, s].map(function(v) { return String(v).padStart(2, '0'); }).join(':');
+    }
+    
+    function loadScreen(at) {
+        // One request at a time - the latest position wins
+        requestedAt = at;
+        timeLabel.textContent = formatTime(at);
+        if (loading || !terminal) {
+            return;
+        }
+        loading = true;
+        
+        fetch(`/sessions/${sessionId}/screen?at=${at}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    console.error('[Screen] Error:', data.error);
+                    return;
+                }
+                if (!terminal) {
+                    return;
+                }
+                terminal.resize(data.cols, data.rows);
+                terminal.reset();
+                terminal.write(data.screen);
+            })
+            .catch(error => {
+                console.error('[Screen] Failed to load screen:', error);
+            })
+            .finally(() => {
+                loading = false;
+                if (requestedAt !== at) {
+                    loadScreen(requestedAt);
+                }
+            });
+    }
+    
+    seek.addEventListener('input', function() {
+        loadScreen(parseFloat(seek.value));
+    });
+    
+    // Clicking a transcript entry shows the screen right after it
+    document.querySelectorAll('#ssh-log-viewer .log-entry').forEach(function(entry) {
+        entry.addEventListener('click', function() {
+            if (!terminal) {
+                return;
+            }
+            seek.value = entry.dataset.timestamp;
+            loadScreen(parseFloat(entry.dataset.timestamp));
+        });
+    });
+}
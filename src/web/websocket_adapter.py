@@ -1,14 +1,27 @@
 """
 WebSocket Channel Adapter - Implements Paramiko channel interface for WebSocket
 Allows SessionMultiplexer to treat WebSocket clients as Paramiko channels
+
+Output is emitted as binary attachments and acknowledged by the browser. With
+MAX_IN_FLIGHT frames unacknowledged, further output is coalesced into one
+pending frame (at most MAX_PENDING_BYTES, oldest dropped beyond) that is sent
+on the next ack, so a slow browser does not grow Tower's send queue.
 """
 import logging
 import threading
+import time
 from typing import Optional
 from flask_socketio import emit
 
 logger = logging.getLogger(__name__)
 
+# Output frames sent to a browser without acknowledgement
+MAX_IN_FLIGHT = 8
+# Output held for a slow browser
+MAX_PENDING_BYTES = 1024 * 1024
+# Seconds without any ack after which the browser is assumed not to send them (older page)
+ACK_TIMEOUT = 10.0
+
 
 class WebSocketChannelAdapter:
     """Adapter that implements Paramiko channel interface for WebSocket clients
@@ -38,6 +51,15 @@ class WebSocketChannelAdapter:
         self.closed = False
         self.lock = threading.Lock()
         
+        # Output flow control (separate from self.lock, which recv() holds while waiting)
+        self.output_lock = threading.Lock()
+        self.in_flight = 0
+        self.last_ack = time.monotonic()
+        self.acks_supported = True
+        self.acks_received = 0
+        self.pending = bytearray()
+        self.dropped_bytes = 0
+        
         # Input buffer for join mode (when web client sends keystrokes)
         self.input_buffer = bytearray()
         self.input_available = threading.Event()
@@ -53,22 +75,54 @@ class WebSocketChannelAdapter:
             data: Raw terminal output bytes
             
         Returns:
-            Number of bytes sent
+            Number of bytes sent (or queued for a slow client)
         """
         if self.closed:
             return 0
         
+        size = len(data)
+        with self.output_lock:
+            if self.acks_supported and self.in_flight >= MAX_IN_FLIGHT:
+                if self.acks_received or time.monotonic() - self.last_ack < ACK_TIMEOUT:
+                    # Browser is behind - coalesce until the next ack
+                    self.pending += data
+                    excess = len(self.pending) - MAX_PENDING_BYTES
+                    if excess > 0:
+                        del self.pending[:excess]
+                        self.dropped_bytes += excess
+                    return size
+                logger.warning(f"No output acks from WebSocket {self.room} - flow control disabled")
+                self.acks_supported = False
+            if self.pending:
+                data = bytes(self.pending) + data
+                self.pending.clear()
+            self.in_flight += 1
+        
+        return size if self._emit(data) else 0
+    
+    def _emit(self, data: bytes) -> bool:
         try:
-            # Emit binary data to specific room (web client)
-            # xterm.js will receive this as Uint8Array
-            self.socketio.emit('session_output', 
-                              {'data': list(data)},  # Convert bytes to list for JSON
-                              room=self.room)
-            return len(data)
+            # Binary attachment - xterm.js receives it as ArrayBuffer
+            self.socketio.emit('session_output', {'data': data},
+                               room=self.room, callback=self._on_ack)
+            return True
         except Exception as e:
             logger.error(f"Error sending to WebSocket {self.room}: {e}")
             self.closed = True
-            return 0
+            return False
+    
+    def _on_ack(self, *args):
+        """Browser wrote a frame - send output coalesced meanwhile"""
+        with self.output_lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.last_ack = time.monotonic()
+            self.acks_received += 1
+            if not self.pending or self.closed:
+                return
+            data = bytes(self.pending)
+            self.pending.clear()
+            self.in_flight += 1
+        self._emit(data)
     
     def recv(self, size: int, timeout: Optional[float] = None) -> bytes:
         """Receive data from web client (for join mode)
@@ -13,11 +13,13 @@ from flask_socketio import emit, join_room, leave_room, disconnect
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.core.database import SessionLocal, Session as DBSession
+from src.core.database import SessionLocal, Session as DBSession, Gate, Stay
 from src.proxy.session_multiplexer import SessionMultiplexerRegistry
 from src.web.websocket_adapter import WebSocketChannelAdapter
 from src.web.proxy_multiplexer import get_proxy_registry
 from src.web import relay_tracking
+from src.web import grant_events
+from src.web import recording_tail
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +37,8 @@ def register_handlers(socketio_instance):
     """
     global socketio
     socketio = socketio_instance
+    grant_events.init_grant_events(socketio_instance)
+    recording_tail.init_recording_tail(socketio_instance)
     logger.info("[SOCKETIO] Registering event handlers...")
     
     # Now register all handlers using the initialized socketio instance
@@ -43,6 +47,7 @@ def register_handlers(socketio_instance):
     _register_session_input_handler()
     _register_terminal_resize_handler()
     _register_disconnect_handler()
+    _register_recording_tail_handlers()
     
     # Register gate relay handlers (for receiving output from gates)
     _register_gate_relay_handlers()
@@ -58,6 +63,8 @@ def _register_connect_handler():
         # Check if this is a gate relay connection (has gate_api_key in auth)
         if auth and isinstance(auth, dict) and 'gate_api_key' in auth:
             gate_name = auth.get('gate_name', 'unknown')
+            if auth.get('subscribe') == 'grant_events':
+                return _subscribe_grant_events(auth['gate_api_key'], gate_name)
             logger.info(f"[SOCKETIO] Gate relay connected: {gate_name}, sid={request.sid}")
             emit('connected', {'message': 'Gate relay connected', 'gate_name': gate_name})
             return
@@ -74,6 +81,24 @@ def _register_connect_handler():
         emit('connected', {'message': 'WebSocket connected', 'user': current_user.username})
 
 
+def _subscribe_grant_events(gate_api_key, gate_name):
+    """Gate subscribes to grant events - token must match an active gate"""
+    db = SessionLocal()
+    try:
+        gate = db.query(Gate).filter(Gate.api_token == gate_api_key).first()
+        if not gate or not gate.is_active:
+            logger.warning(f"[SOCKETIO] Grant events subscription rejected for {gate_name}, sid={request.sid}")
+            return False  # Reject connection
+        gate_id = gate.id
+    finally:
+        db.close()
+    
+    join_room(grant_events.GRANT_EVENTS_ROOM)
+    join_room(grant_events.gate_room(gate_id))
+    logger.info(f"[SOCKETIO] Gate {gate_name} subscribed to grant events, sid={request.sid}")
+    emit('connected', {'message': 'Subscribed to grant events', 'gate_name': gate_name})
+
+
 def _register_watch_session_handler():
     """Register watch_session event handler"""
     @socketio.on('watch_session')
@@ -300,6 +325,11 @@ def _register_disconnect_handler():
         # Remove from relay tracking (if watching gate session)
         relay_tracking.unregister_watch_request(request.sid)
         
+        # Stop pushing recording log entries
+        recording_path = recording_subscriptions.pop(request.sid, None)
+        if recording_path:
+            recording_tail.unsubscribe(recording_path)
+        
         if request.sid in active_channels:
             channel = active_channels[request.sid]
             session_id = channel.session_id
@@ -324,6 +354,75 @@ def _register_disconnect_handler():
 # Track active WebSocket channels
 active_channels = {}  # request.sid -> WebSocketChannelAdapter
 
+# Recording log subscriptions (session view live log)
+recording_subscriptions = {}  # request.sid -> recording path
+
+
+def _can_view_recording(session: DBSession, db) -> bool:
+    """Same rule as the session viewer (sessions blueprint check_session_access)"""
+    # Admin/Operator - full access
+    if current_user.permission_level < 900:
+        return True
+    
+    # Regular user - own sessions (via stay, or direct user_id for older sessions)
+    if session.stay_id:
+        stay = db.query(Stay).filter(Stay.id == session.stay_id).first()
+        if stay and stay.user_id == current_user.id:
+            return True
+    return session.user_id == current_user.id
+
+
+def _register_recording_tail_handlers():
+    """Register recording log subscription handlers (live log on session view page)"""
+    @socketio.on('subscribe_recording')
+    def handle_subscribe_recording(data):
+        """Push new log entries of an active session's recording
+        
+        Client sends:
+        {
+            'session_id': 'abc123',
+            'after': 12.5  # elapsed seconds of the last entry the page shows
+        }
+        
+        Server responds with 'recording_events' ({'events': [...], 'total_events': N})
+        now and whenever the gate uploads more, and 'recording_ended' on finalize.
+        """
+        if not current_user or not current_user.is_authenticated:
+            emit('error', {'message': 'Authentication required'})
+            return
+        
+        session_id = data.get('session_id')
+        db = SessionLocal()
+        try:
+            session = db.query(DBSession).filter(DBSession.session_id == session_id).first()
+            if not session or not _can_view_recording(session, db):
+                emit('error', {'message': 'Access denied'})
+                return
+            recording_path = session.recording_path
+            if not session.is_active or session.protocol != 'ssh' or not recording_path \
+                    or not os.path.isabs(recording_path) or not os.path.exists(recording_path):
+                # Page keeps polling /sessions/<id>/live
+                emit('recording_unavailable', {'session_id': session_id})
+                return
+        finally:
+            db.close()
+        
+        previous = recording_subscriptions.pop(request.sid, None)
+        if previous:
+            leave_room(recording_tail.tail_room(previous))
+            recording_tail.unsubscribe(previous)
+        
+        join_room(recording_tail.tail_room(recording_path))
+        tail = recording_tail.subscribe(recording_path)
+        recording_subscriptions[request.sid] = recording_path
+        
+        try:
+            events = tail.entries_after(float(data.get('after') or 0))
+        except Exception as e:
+            logger.error(f"Failed to read live recording {recording_path}: {e}")
+            events = []
+        emit('recording_events', {'events': events, 'total_events': tail.total_events})
+
 
 def check_session_access(session: DBSession, db) -> bool:
     """Check if current user has permission to view this session
@@ -363,13 +462,16 @@ def _register_gate_relay_handlers():
             'session_id': 'abc123',
             'gate_name': 'tailscale-etop',
             'owner_username': 'p.mojski',
-            'server_name': 'auto-185-186-155-15'
+            'server_name': 'auto-185-186-155-15',
+            'rows': 24, 'cols': 80  # Owner's terminal size (older gates omit it)
         }
         """
         session_id = data.get('session_id')
         gate_name = data.get('gate_name')
         owner_username = data.get('owner_username')
         server_name = data.get('server_name')
+        rows = data.get('rows')
+        cols = data.get('cols')
         
         if not all([session_id, gate_name, owner_username, server_name]):
             logger.error(f"[GateRelay] Missing required fields in gate_relay_register")
@@ -388,9 +490,13 @@ def _register_gate_relay_handlers():
                 session_id=session_id,
                 gate_name=gate_name,
                 owner_username=owner_username,
-                server_name=server_name
+                server_name=server_name,
+                rows=rows,
+                cols=cols
             )
             logger.info(f"[GateRelay:{session_id}] Created proxy multiplexer")
+        elif rows and cols:
+            proxy_multiplexer.resize(rows, cols)
         
         # Join gate to room for bidirectional communication
         gate_room = f"gate_{gate_name}"
@@ -453,26 +559,48 @@ def _register_gate_relay_handlers():
         Data: {
             'session_id': 'abc123',
             'gate_name': 'tailscale-etop',
-            'output': [72, 101, 108, 108, 111]  # bytes as array
+            'output': b'...'  # binary attachment (older gates: bytes as array)
         }
+        
+        The return value acknowledges the frame - gates keep only a few frames
+        unacknowledged, so a busy Tower slows the relay down instead of queueing.
         """
         session_id = data.get('session_id')
-        output_array = data.get('output', [])
+        output = data.get('output')
         
-        if not session_id or not output_array:
-            return
+        if not session_id or not output:
+            return True
         
         # Get proxy multiplexer
         proxy_multiplexer = proxy_registry.get_session(session_id)
         if not proxy_multiplexer:
             logger.warning(f"[GateRelay:{session_id}] Received output but no proxy multiplexer")
-            return
+            return True
         
-        # Convert array back to bytes
-        output_bytes = bytes(output_array)
+        output_bytes = output if isinstance(output, bytes) else bytes(output)
         
         # Broadcast to browser watchers
         proxy_multiplexer.receive_output_from_gate(output_bytes)
+        return True
+    
+    @socketio.on('gate_session_resize')
+    def handle_gate_session_resize(data):
+        """Owner of a relayed session resized the terminal
+        
+        Data: {
+            'session_id': 'abc123',
+            'gate_name': 'tailscale-etop',
+            'rows': 50,
+            'cols': 200
+        }
+        """
+        session_id = data.get('session_id')
+        rows = data.get('rows')
+        cols = data.get('cols')
+        
+        proxy_multiplexer = proxy_registry.get_session(session_id) if session_id else None
+        if proxy_multiplexer and rows and cols:
+            proxy_multiplexer.resize(int(rows), int(cols))
     
     @socketio.on('gate_relay_unregister')
     def handle_gate_relay_unregister(data):